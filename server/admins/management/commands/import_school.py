@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from admins.onboarding import FIELDS, FORMATS, SchoolImport, read_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports a school onboarding file (buses, staff or families) in '
+        'chunks of one transaction each, reporting progress per chunk. '
+        'Re-running a file is safe; --resume-from skips rows a failed run '
+        'already committed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(FIELDS))
+        parser.add_argument('path', help='CSV, JSON or JSON-lines file')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--resume-from', type=int, default=0,
+                            help='Skip this many rows, as reported by a failed run')
+        parser.add_argument('--assigned-by', default=None, help='Username recorded on the assignments')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of {path}, pass --format")
+
+        assigned_by = None
+        if options['assigned_by']:
+            assigned_by = User.objects.filter(username=options['assigned_by']).first()
+            if assigned_by is None:
+                raise CommandError(f"No user named {options['assigned_by']}")
+
+        importer = SchoolImport(
+            options['kind'], chunk_size=options['chunk_size'], assigned_by=assigned_by, progress=self._progress,
+        )
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as source:
+                result = importer.run(read_rows(source, fmt), resume_from=options['resume_from'])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except (DatabaseError, ValidationError, ValueError) as exc:
+            raise CommandError(
+                f"Import stopped after row {importer.result.next_row}: {exc}. "
+                f"Fix the data and re-run with --resume-from {importer.result.next_row}"
+            )
+
+        for error in result.errors:
+            self.stderr.write(f"  row {error.row}: {error.message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.rows} {result.kind} rows in {result.chunks} chunks: "
+            f"{result.created} created, {result.updated} updated, {result.assigned} assigned, "
+            f"{len(result.errors)} skipped in {result.seconds:.2f}s — {result.rows_per_second:.0f} rows/s"
+        ))
+
+    def _progress(self, result):
+        self.stdout.write(
+            f"  {result.next_row} rows done ({result.created} created, {result.updated} updated, "
+            f"{result.assigned} assigned, {len(result.errors)} errors) — {result.rows_per_second:.0f} rows/s"
+        )
@@ -0,0 +1,478 @@
+"""
+Chunked bulk import for onboarding a school.
+
+AdminAddParentView, AdminAddDriverView and the assign-* endpoints create
+one record per request, each user through create_user() (a full password
+hash) and each child and assignment with its own INSERT — importing a few
+thousand families took hours of API calls.
+
+SchoolImport streams rows from a CSV, JSON or JSON-lines source and
+writes them in chunks, one transaction per chunk, with a fixed number of
+statements per chunk whatever its size:
+
+    * validate every row of the chunk; bad rows are reported and skipped
+    * look up existing records by natural key      1 query per model
+    * create the new ones                          bulk_create
+    * refresh the changed ones                     bulk_update
+    * assign children to their bus                 the bulk assignment engine
+
+Three kinds of file are understood (see FIELDS):
+
+    buses     bus_number, number_plate, capacity, model
+    staff     role (driver|minder), names, phone_number, license_number,
+              email, bus_number
+    families  one row per child: parent names, parent_phone, parent_email,
+              address, child names, class_grade, bus_number
+
+Imported users get an unusable password instead of a generated one, which
+skips the hashing entirely: drivers, minders and parents log in with their
+phone number, and an admin can set a password later through the usual
+change-password endpoints.
+
+Rows are upserted by natural key (bus_number, phone number, and parent
+plus child name), so re-running a file never duplicates anything.  Bus
+and staff rows update the existing record; parents and children that
+already exist are left as they are and only get their bus assignment.  A
+failed import can also be resumed where it stopped: every committed chunk
+advances ImportResult.next_row, which `import_school --resume-from`
+accepts to skip the rows already written.
+"""
+
+import csv
+import io
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from assignments.models import Assignment
+from assignments.services import AssignmentService
+from assignments.utilization import BusUtilization
+from buses.models import Bus
+from busminders.models import BusMinder
+from children.models import Child
+from drivers.models import Driver
+from parents.models import Parent
+
+User = get_user_model()
+
+FORMATS = ('csv', 'json', 'jsonl')
+
+# Columns per kind; the first tuple lists the required ones
+FIELDS = {
+    'buses': (
+        ('bus_number', 'number_plate'),
+        ('capacity', 'model'),
+    ),
+    'staff': (
+        ('role', 'first_name', 'last_name', 'phone_number'),
+        ('license_number', 'email', 'bus_number'),
+    ),
+    'families': (
+        ('parent_first_name', 'parent_last_name', 'parent_phone', 'child_first_name', 'child_last_name', 'class_grade'),
+        ('parent_email', 'address', 'bus_number'),
+    ),
+}
+
+ROLES = {'driver': Driver, 'minder': BusMinder}
+USER_TYPES = {'driver': 'driver', 'minder': 'busminder'}
+ASSIGNMENT_TYPES = {'driver': 'driver_to_bus', 'minder': 'minder_to_bus'}
+
+
+@dataclass
+class RowError:
+    row: int
+    message: str
+
+
+@dataclass
+class ImportResult:
+    kind: str
+    # Rows consumed so far, counted from the start of the source; resume here
+    next_row: int = 0
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    assigned: int = 0
+    chunks: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'kind': self.kind,
+            'nextRow': self.next_row,
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'assigned': self.assigned,
+            'chunks': self.chunks,
+            'errors': [{'row': error.row, 'message': error.message} for error in self.errors],
+            'seconds': round(self.seconds, 3),
+        }
+
+
+def normalize_row(record):
+    """
+    `record` with lowercased keys and stripped string values, whatever the
+    source: natural keys are compared as strings, so a phone number sent
+    as a JSON number must match the one stored.
+    """
+    if not isinstance(record, dict):
+        raise ValidationError({'rows': 'Every row must be an object'})
+    return {
+        str(key).strip().lower(): '' if value is None else str(value).strip()
+        for key, value in record.items() if key is not None
+    }
+
+
+def read_rows(source, fmt='csv'):
+    """
+    Rows of `source` (a text stream, or str/bytes) as dicts.  CSV and JSON
+    lines are read lazily, a row at a time.
+    """
+    if fmt not in FORMATS:
+        raise ValidationError({'format': f"format must be one of {', '.join(FORMATS)}"})
+    if isinstance(source, bytes):
+        source = source.decode('utf-8-sig')
+    if isinstance(source, str):
+        source = io.StringIO(source)
+
+    if fmt == 'csv':
+        records = csv.DictReader(source)
+    elif fmt == 'jsonl':
+        records = (json.loads(line) for line in source if line.strip())
+    else:
+        records = json.load(source)
+        if not isinstance(records, list):
+            raise ValidationError({'rows': 'A JSON import must be a list of objects'})
+
+    yield from records
+
+
+class SchoolImport:
+    """
+    Import one kind of onboarding file.  `progress`, if given, is called
+    with the ImportResult after every committed chunk.
+    """
+
+    def __init__(self, kind, chunk_size=500, assigned_by=None, progress=None):
+        if kind not in FIELDS:
+            raise ValidationError({'kind': f"kind must be one of {', '.join(FIELDS)}"})
+        self.kind = kind
+        self.chunk_size = max(1, int(chunk_size))
+        self.assigned_by = assigned_by
+        self.progress = progress
+        self.result = ImportResult(kind=kind)
+
+    def run(self, rows, resume_from=0):
+        """
+        Import `rows` (an iterable of dicts, see normalize_row), skipping
+        the first `resume_from` of them.  Returns the ImportResult; a
+        database error propagates after the chunks before it were
+        committed, leaving self.result.next_row at the row to resume from.
+        """
+        result = self.result
+        result.next_row = resume_from
+        started = time.perf_counter()
+        rows = iter(rows)
+        # Drain the rows a previous run already committed
+        for _ in islice(rows, resume_from):
+            pass
+        rows = map(normalize_row, rows)
+
+        write_chunk = getattr(self, f'_import_{self.kind}')
+        try:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                before = (result.created, result.updated, result.assigned, len(result.errors))
+                try:
+                    numbered = self._validate(enumerate(chunk, start=result.next_row + 1))
+                    with transaction.atomic():
+                        write_chunk(numbered)
+                except Exception:
+                    # The chunk was rolled back; count only what was committed
+                    result.created, result.updated, result.assigned, errors = before
+                    del result.errors[errors:]
+                    raise
+                result.next_row += len(chunk)
+                result.rows += len(chunk)
+                result.chunks += 1
+                if self.progress:
+                    result.seconds = time.perf_counter() - started
+                    self.progress(result)
+        finally:
+            result.seconds = time.perf_counter() - started
+        return result
+
+    def _validate(self, numbered_rows):
+        """(row number, row) pairs that have every required column."""
+        required, _optional = FIELDS[self.kind]
+        valid = []
+        for number, row in numbered_rows:
+            missing = [name for name in required if not row.get(name)]
+            if missing:
+                self._error(number, f"Missing {', '.join(missing)}")
+            elif self.kind == 'staff' and row['role'].lower() not in ROLES:
+                self._error(number, f"Unknown role '{row['role']}', expected driver or minder")
+            elif self.kind == 'staff' and row['role'].lower() == 'driver' and not row.get('license_number'):
+                self._error(number, 'Missing license_number')
+            elif self.kind == 'buses' and row.get('capacity') and not row['capacity'].isdigit():
+                self._error(number, f"Invalid capacity '{row['capacity']}'")
+            else:
+                valid.append((number, row))
+        return valid
+
+    def _error(self, number, message):
+        self.result.errors.append(RowError(row=number, message=message))
+
+    def _buses_by_number(self, numbered_rows):
+        """Buses named in the chunk's bus_number column; unknown ones are row errors."""
+        wanted = {row['bus_number'] for _, row in numbered_rows if row.get('bus_number')}
+        buses = {bus.bus_number: bus for bus in Bus.objects.filter(bus_number__in=wanted)}
+        for number, row in numbered_rows:
+            if row.get('bus_number') and row['bus_number'] not in buses:
+                self._error(number, f"Unknown bus {row['bus_number']}")
+        return buses
+
+    @staticmethod
+    def _phones_in_use(phones):
+        """Every phone number in `phones` already on an account, mapped to its user ids."""
+        in_use = {}
+        for phone, user_id in [
+            *User.objects.filter(phone_number__in=phones).values_list('phone_number', 'pk'),
+            *Driver.objects.filter(phone_number__in=phones).values_list('phone_number', 'user_id'),
+            *BusMinder.objects.filter(phone_number__in=phones).values_list('phone_number', 'user_id'),
+            *Parent.objects.filter(contact_number__in=phones).values_list('contact_number', 'user_id'),
+        ]:
+            in_use.setdefault(phone, set()).add(user_id)
+        return in_use
+
+    @staticmethod
+    def _new_users(user_type, people):
+        """bulk_create users for `people` (first, last, phone, email), without a password hash."""
+        return User.objects.bulk_create([
+            User(
+                username=f"{user_type}_{uuid.uuid4().hex[:8]}",
+                password=make_password(None),
+                first_name=first_name,
+                last_name=last_name,
+                phone_number=phone,
+                email=email,
+                user_type=user_type,
+            )
+            for first_name, last_name, phone, email in people
+        ])
+
+    def _import_buses(self, numbered_rows):
+        by_number = {}
+        for number, row in numbered_rows:
+            # A later row for the same bus wins
+            by_number[row['bus_number']] = (number, row)
+
+        existing = Bus.objects.in_bulk(list(by_number), field_name='bus_number')
+        plate_owners = dict(Bus.objects.filter(
+            number_plate__in=[row['number_plate'] for _, row in by_number.values()]
+        ).values_list('number_plate', 'bus_number'))
+
+        created, changed = [], []
+        for bus_number, (number, row) in by_number.items():
+            owner = plate_owners.setdefault(row['number_plate'], bus_number)
+            if owner != bus_number:
+                self._error(number, f"Number plate {row['number_plate']} already belongs to bus {owner}")
+                continue
+            values = {'number_plate': row['number_plate'], 'model': row.get('model', '')}
+            if row.get('capacity'):
+                values['capacity'] = int(row['capacity'])
+            bus = existing.get(bus_number)
+            if bus is None:
+                created.append(Bus(bus_number=bus_number, **values))
+            elif any(getattr(bus, name) != value for name, value in values.items()):
+                for name, value in values.items():
+                    setattr(bus, name, value)
+                changed.append(bus)
+
+        Bus.objects.bulk_create(created)
+        Bus.objects.bulk_update(changed, ['number_plate', 'model', 'capacity'])
+        if created or changed:
+            # bulk_create/bulk_update send no post_save
+            BusUtilization.invalidate()
+        self.result.created += len(created)
+        self.result.updated += len(changed)
+
+    def _import_staff(self, numbered_rows):
+        by_phone = {}
+        for number, row in numbered_rows:
+            by_phone[row['phone_number']] = (number, row)
+
+        profiles = {
+            **{('driver', d.phone_number): d for d in Driver.objects.select_related('user').filter(phone_number__in=list(by_phone))},
+            **{('minder', m.phone_number): m for m in BusMinder.objects.select_related('user').filter(phone_number__in=list(by_phone))},
+        }
+        in_use = self._phones_in_use(list(by_phone))
+        buses = self._buses_by_number(list(by_phone.values()))
+
+        new_rows, changed_users, placements = [], [], []
+        for phone, (number, row) in by_phone.items():
+            role = row['role'].lower()
+            profile = profiles.get((role, phone))
+            if profile is None and phone in in_use:
+                self._error(number, f"Phone number {phone} is already registered to another account")
+                continue
+            if profile is None:
+                new_rows.append((number, row))
+                continue
+            user = profile.user
+            if (user.first_name, user.last_name) != (row['first_name'], row['last_name']):
+                user.first_name, user.last_name = row['first_name'], row['last_name']
+                changed_users.append(user)
+            placements.append((role, profile, row))
+
+        licences = {row['license_number'] for _, row in new_rows if row['role'].lower() == 'driver'}
+        taken = set(Driver.objects.filter(license_number__in=licences).values_list('license_number', flat=True))
+        accepted = []
+        for number, row in new_rows:
+            if row['role'].lower() == 'driver' and row['license_number'] in taken:
+                self._error(number, f"License number {row['license_number']} is already registered")
+            else:
+                if row['role'].lower() == 'driver':
+                    taken.add(row['license_number'])
+                accepted.append(row)
+
+        for role, model in ROLES.items():
+            rows = [row for row in accepted if row['role'].lower() == role]
+            if not rows:
+                continue
+            users = self._new_users(USER_TYPES[role], [
+                (row['first_name'], row['last_name'], row['phone_number'], row.get('email', '')) for row in rows
+            ])
+            extra = (lambda row: {'license_number': row['license_number']}) if role == 'driver' else (lambda row: {})
+            created = model.objects.bulk_create([
+                model(user=user, phone_number=row['phone_number'], **extra(row)) for user, row in zip(users, rows)
+            ])
+            for profile, user, row in zip(created, users, rows):
+                profile.user = user
+                placements.append((role, profile, row))
+            self.result.created += len(created)
+
+        User.objects.bulk_update(changed_users, ['first_name', 'last_name'])
+        self.result.updated += len(changed_users)
+
+        # At most a couple of staff per bus, so the regular path is fine here
+        current = set(Assignment.objects.filter(
+            assignment_type__in=ASSIGNMENT_TYPES.values(), status='active',
+            assignee_object_id__in=[profile.pk for _, profile, _ in placements],
+        ).values_list('assignment_type', 'assignee_object_id', 'assigned_to_object_id'))
+        for role, profile, row in placements:
+            bus = buses.get(row.get('bus_number'))
+            if bus is None or (ASSIGNMENT_TYPES[role], profile.pk, bus.pk) in current:
+                continue
+            AssignmentService.create_assignment(
+                assignment_type=ASSIGNMENT_TYPES[role],
+                assignee=profile,
+                assigned_to=bus,
+                assigned_by=self.assigned_by,
+                reason='School onboarding import',
+                auto_cancel_conflicting=True,
+            )
+            self.result.assigned += 1
+
+    def _import_families(self, numbered_rows):
+        rows_by_phone = {}
+        for number, row in numbered_rows:
+            rows_by_phone.setdefault(row['parent_phone'], []).append((number, row))
+        phones = list(rows_by_phone)
+
+        parents = {p.contact_number: p for p in Parent.objects.select_related('user').filter(contact_number__in=phones)}
+        in_use = self._phones_in_use(phones)
+
+        new_phones = []
+        for phone, family in rows_by_phone.items():
+            if phone not in parents and phone in in_use:
+                for number, _row in family:
+                    self._error(number, f"Phone number {phone} is already registered to another account")
+            elif phone not in parents:
+                new_phones.append(phone)
+
+        # The first row of a family carries the parent's details
+        heads = [rows_by_phone[phone][0][1] for phone in new_phones]
+        users = self._new_users('parent', [
+            (row['parent_first_name'], row['parent_last_name'], row['parent_phone'], row.get('parent_email', ''))
+            for row in heads
+        ])
+        for parent in Parent.objects.bulk_create([
+            Parent(user=user, contact_number=row['parent_phone'], address=row.get('address', ''))
+            for user, row in zip(users, heads)
+        ]):
+            parents[parent.contact_number] = parent
+        self.result.created += len(users)
+
+        family_rows = [(number, row) for phone in phones if phone in parents for number, row in rows_by_phone[phone]]
+        known = {
+            (parent_id, first_name, last_name): child_id
+            for child_id, parent_id, first_name, last_name in Child.objects.filter(
+                parent_id__in=[parent.pk for parent in parents.values()]
+            ).values_list('id', 'parent_id', 'first_name', 'last_name')
+        }
+        new_children, child_rows = [], []
+        for number, row in family_rows:
+            key = (parents[row['parent_phone']].pk, row['child_first_name'], row['child_last_name'])
+            if key not in known:
+                known[key] = None
+                new_children.append(Child(
+                    first_name=row['child_first_name'],
+                    last_name=row['child_last_name'],
+                    class_grade=row['class_grade'],
+                    address=row.get('address', ''),
+                    parent=parents[row['parent_phone']],
+                ))
+            child_rows.append((number, row, key))
+        for child in Child.objects.bulk_create(new_children):
+            known[(child.parent_id, child.first_name, child.last_name)] = child.id
+        self.result.created += len(new_children)
+
+        self._assign_children(child_rows, known)
+
+    def _assign_children(self, child_rows, child_ids):
+        """Put each row's child on its bus, one bulk-engine batch per bus."""
+        buses = self._buses_by_number([(number, row) for number, row, _key in child_rows])
+        wanted = {}
+        for number, row, key in child_rows:
+            bus = buses.get(row.get('bus_number'))
+            if bus is not None:
+                wanted.setdefault(bus.pk, {})[child_ids[key]] = number
+
+        on_bus = set(Assignment.objects.filter(
+            assignment_type='child_to_bus', status='active',
+            assignee_object_id__in=[child_id for by_child in wanted.values() for child_id in by_child],
+        ).values_list('assigned_to_object_id', 'assignee_object_id'))
+
+        buses_by_pk = {bus.pk: bus for bus in buses.values()}
+        for bus_id, by_child in wanted.items():
+            children_ids = [child_id for child_id in by_child if (bus_id, child_id) not in on_bus]
+            if not children_ids:
+                continue
+            try:
+                # A savepoint, so a full bus only loses its own rows
+                with transaction.atomic():
+                    AssignmentService.bulk_assign_children(
+                        buses_by_pk[bus_id], children_ids, assigned_by=self.assigned_by
+                    )
+            except ValidationError as exc:
+                message = '; '.join(exc.messages)
+                for child_id in children_ids:
+                    self._error(by_child[child_id], f"Not assigned to bus {buses_by_pk[bus_id].bus_number}: {message}")
+                continue
+            self.result.assigned += len(children_ids)
@@ -10,6 +10,7 @@ from .views import (
     AdminAssignDriverToBusView,
     AdminAssignBusMinderToBusView,
     AdminAssignChildToBusView,
+    AdminImportView,
     dashboard_stats,
 )
 from users.serializers import UserRegistrationSerializer
@@ -58,4 +59,6 @@ urlpatterns = [
         AdminAssignChildToBusView.as_view(),
         name="admin-assign-child-to-bus",
     ),
+    # Bulk onboarding (buses, staff, families) in chunks
+    path("import/", AdminImportView.as_view(), name="admin-import"),
 ]
@@ -652,3 +652,68 @@ class AdminAssignChildToBusView(APIView):
             },
             status=status.HTTP_200_OK,
         )
+
+
+import io
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError
+from .onboarding import SchoolImport, read_rows
+
+
+class AdminImportView(APIView):
+    """
+    Bulk onboarding import of buses, staff or families (see admins.onboarding).
+
+    Endpoint: POST /api/admins/import/
+    Body: {"kind": "families", "format": "csv", "file": <upload>}
+       or {"kind": "buses", "rows": [{"bus_number": "B1", ...}, ...]}
+    Optional: "resumeFrom" (rows already imported), "chunkSize"
+
+    Rows are written in chunks of one transaction each.  If a chunk fails,
+    the response carries the result so far; re-post the same file with
+    "resumeFrom" set to its nextRow.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        kind = request.data.get("kind")
+        upload = request.FILES.get("file")
+        try:
+            resume_from = int(request.data.get("resumeFrom") or 0)
+            chunk_size = int(request.data.get("chunkSize") or 500)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "resumeFrom and chunkSize must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            importer = SchoolImport(kind, chunk_size=chunk_size, assigned_by=request.user)
+            if upload is not None:
+                rows = read_rows(io.TextIOWrapper(upload.file, encoding="utf-8-sig"),
+                                 request.data.get("format") or "csv")
+            elif isinstance(request.data.get("rows"), list):
+                rows = request.data["rows"]
+            else:
+                return Response(
+                    {"error": "Provide a file upload or a rows list"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            result = importer.run(rows, resume_from=resume_from)
+        except DjangoValidationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            # Malformed JSON part-way through the source
+            return Response(
+                {"error": f"Import stopped: {e}", "result": importer.result.as_dict()},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except DatabaseError as e:
+            return Response(
+                {"error": f"Import stopped: {e}", "result": importer.result.as_dict()},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
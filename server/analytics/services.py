@@ -17,6 +17,7 @@ from children.models import Child
 from users.models import User
 from parents.models import Parent
 from assignments.models import Assignment
+from assignments.temporal import valid_on
 
 
 class AnalyticsService:
@@ -141,6 +142,12 @@ class AnalyticsService:
 
         fleet_change = cls.calculate_percentage_change(fleet_utilization, prev_fleet_utilization)
 
+        # Children assigned to a bus, as of the last day of each period
+        riders = Assignment.objects.filter(assignment_type='child_to_bus')
+        current_riders = valid_on(riders, end_date).values('assignee_object_id').distinct().count()
+        previous_riders = valid_on(riders, prev_end).values('assignee_object_id').distinct().count()
+        riders_change = cls.calculate_percentage_change(current_riders, previous_riders)
+
         # Average Trip Duration (in minutes)
         completed_trips = Trip.objects.filter(
             scheduled_time__date__gte=start_date,
@@ -206,6 +213,11 @@ class AnalyticsService:
                 'value': avg_duration,
                 'change': duration_change,
                 'change_label': f'vs last {period}'
+            },
+            'assigned_children': {
+                'value': current_riders,
+                'change': riders_change,
+                'change_label': f'vs last {period}'
             }
         }
 
@@ -58,6 +58,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "assignments.middleware.AssignmentIdentityMapMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -233,6 +234,10 @@ REDIS_LOCATION_UPDATES_CHANNEL = "location_updates"
 REDIS_BUS_LOCATION_KEY_PATTERN = "bus:{bus_id}:location"
 REDIS_LOCATION_TTL = 60  # seconds
 
+# Seconds the fleet utilization report stays cached; it is also dropped on
+# every assignment or bus change (see assignments.utilization).
+BUS_UTILIZATION_CACHE_TTL = config("BUS_UTILIZATION_CACHE_TTL", cast=int, default=300)
+
 # Supabase Configuration for Magic Link Authentication
 SUPABASE_URL = config("SUPABASE_URL", default="")
 SUPABASE_PUBLISHABLE_KEY = config("SUPABASE_PUBLISHABLE_KEY", default="")
@@ -249,6 +254,27 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Drain the notification outbox on a background thread after each commit
+# that queues trip events. Disable when a dedicated
+# `manage.py dispatch_notifications --loop` worker does it instead.
+NOTIFICATION_OUTBOX_AUTODISPATCH = config("NOTIFICATION_OUTBOX_AUTODISPATCH", cast=bool, default=True)
+
+# Per-parent Redis stream of sent notifications, replayed to clients that
+# reconnect with their last-seen stream id (see notifications.stream).
+NOTIFICATION_STREAM_MAXLEN = config("NOTIFICATION_STREAM_MAXLEN", cast=int, default=200)
+NOTIFICATION_STREAM_TTL = config("NOTIFICATION_STREAM_TTL", cast=int, default=7 * 24 * 3600)
+
+# Read notifications older than this are moved to monthly archives by
+# `manage.py archive_notifications` (see notifications.retention).
+NOTIFICATION_RETENTION_DAYS = config("NOTIFICATION_RETENTION_DAYS", cast=int, default=90)
+
+# Push providers keyed by the name stored on DevicePushToken.provider; see
+# notifications.push for the options.  Empty disables push.
+PUSH_PROVIDERS = {}
+PUSH_DEFAULT_PROVIDER = config("PUSH_DEFAULT_PROVIDER", default="fcm")
+# Concurrent provider requests per dispatch
+PUSH_WORKERS = config("PUSH_WORKERS", cast=int, default=8)
+
 
 # -----------------------------------------------------------------------
 # School & Mapbox (route optimisation)
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AssignmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assignments'
+
+    def ready(self):
+        """
+        Connect the cache invalidation receivers, the overlap constraint and
+        the CurrentAssignment backfill.
+        """
+        import assignments.identity_map
+        import assignments.utilization
+        from assignments.intervals import install_interval_constraint
+        from assignments.models import backfill_current_assignments
+
+        post_migrate.connect(install_interval_constraint, sender=self)
+        post_migrate.connect(backfill_current_assignments, sender=self)
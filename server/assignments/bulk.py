@@ -0,0 +1,292 @@
+"""
+Set-based bulk assignment of children to a bus or route.
+
+AssignmentService.bulk_assign_children_to_bus/_route used to cancel the
+target's existing assignments one save() at a time and then call
+create_assignment() per child, each running its own conflict query,
+capacity recount, insert, Assignment.save() cascade, CurrentAssignment
+sync, history insert and signal receivers — minutes for a start-of-term
+reassignment of a few thousand children.
+
+BulkAssignmentEngine.run() does the same work for the whole batch with a
+fixed number of statements inside one transaction:
+
+    * load the children                                   1 query
+    * conflicts (same child, other target, overlapping)   1 query
+    * capacity (assigned_bus FK children, bus only)       1 query
+    * cancel replaced + conflicting assignments           1-2 UPDATEs
+    * expire other leftover active child_to_bus rows      1 UPDATE
+    * insert assignments, CurrentAssignment, history      bulk_create
+    * stop templates and the utilization cache            a few queries
+
+The outcome matches the per-child path: the same statuses and notes on
+displaced assignments, one 'created' history row per new assignment, and
+a ValidationError (nothing written) when the batch does not fit the bus.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, Q, TextField, Value, When
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from buses.models import Bus
+from children.models import Child
+
+from .intervals import overlapping
+from .models import Assignment, AssignmentHistory, CurrentAssignment, ended_valid_to
+from .utilization import BusUtilization
+
+
+@dataclass
+class ChildAssignmentResult:
+    """What happened to one child of the batch."""
+    child_id: int
+    assignment: Assignment
+    # Active assignments this one displaced: cancelled as conflicts or
+    # replaced, or expired as leftovers of an earlier window.
+    cancelled_ids: list = field(default_factory=list)
+    expired_ids: list = field(default_factory=list)
+
+
+@dataclass
+class BulkAssignmentResult:
+    results: list = field(default_factory=list)
+    # Assignments of other children to the target that the batch replaced
+    replaced_ids: list = field(default_factory=list)
+
+    @property
+    def assignments(self):
+        return [result.assignment for result in self.results]
+
+
+def normalize_child_ids(children_ids):
+    """Validate the request list: a non-empty list of distinct integer ids."""
+    if not isinstance(children_ids, (list, tuple)):
+        raise ValidationError({
+            'children_ids': 'children_ids must be a list of child IDs'
+        })
+
+    if not children_ids:
+        raise ValidationError({
+            'children_ids': 'At least one child ID is required'
+        })
+
+    try:
+        normalized_ids = [int(child_id) for child_id in children_ids]
+    except (TypeError, ValueError):
+        raise ValidationError({
+            'children_ids': 'children_ids must contain only integer IDs'
+        })
+
+    if len(normalized_ids) != len(set(normalized_ids)):
+        raise ValidationError({
+            'children_ids': 'Duplicate child IDs are not allowed in children_ids'
+        })
+    return normalized_ids
+
+
+def _append_note(note):
+    """notes + note on a new line, as Assignment.cancel() writes it."""
+    return Case(
+        When(notes='', then=Value(note)),
+        default=Concat('notes', Value(f'\n{note}')),
+        output_field=TextField(),
+    )
+
+
+class BulkAssignmentEngine:
+    """
+    Assign a batch of children to one bus ('child_to_bus') or route
+    ('child_to_route').  With `replace`, the target's other current
+    children are cancelled so the batch becomes its full list.
+    """
+
+    def __init__(self, target, assigned_by=None, effective_date=None, replace=False, reason=None):
+        self.target = target
+        self.is_bus = isinstance(target, Bus)
+        self.assignment_type = 'child_to_bus' if self.is_bus else 'child_to_route'
+        self.assigned_by = assigned_by
+        if isinstance(effective_date, str):
+            try:
+                effective_date = date.fromisoformat(effective_date)
+            except ValueError:
+                raise ValidationError({'effective_date': 'effective_date must be a YYYY-MM-DD date'})
+        self.effective_date = effective_date or timezone.now().date()
+        self.replace = replace
+        self.reason = reason or (
+            f"Bulk assignment to bus {target.bus_number}" if self.is_bus
+            else f"Bulk assignment to route {target.route_code}"
+        )
+
+    def run(self, children_ids):
+        children_ids = normalize_child_ids(children_ids)
+
+        children = Child.objects.in_bulk(children_ids)
+        if len(children) != len(children_ids):
+            raise ValidationError({
+                'children': 'One or more children not found'
+            })
+
+        child_ct = ContentType.objects.get_for_model(Child)
+        target_ct = ContentType.objects.get_for_model(self.target)
+        today = timezone.now().date()
+
+        with transaction.atomic():
+            if self.is_bus:
+                # Serialise concurrent batches for the same bus so capacity holds
+                list(Bus.objects.select_for_update().filter(pk=self.target.pk).values_list('pk'))
+                self._check_capacity(children_ids)
+
+            active = Assignment.objects.filter(
+                assignment_type=self.assignment_type,
+                assignee_content_type=child_ct,
+                status='active',
+            )
+
+            replaced = []
+            if self.replace:
+                replaced = list(
+                    Assignment.get_assignments_to(self.target, self.assignment_type).values_list('pk', flat=True)
+                )
+                self._cancel(replaced, f"Replaced by new bulk assignment to bus {self.target.bus_number}"
+                             if self.is_bus else f"Replaced by new bulk assignment to route {self.target.route_code}")
+
+            conflicts = {}
+            for pk, child_id in overlapping(active.filter(
+                assignee_object_id__in=children_ids,
+                assigned_to_content_type=target_ct,
+            ).exclude(
+                assigned_to_object_id=self.target.pk
+            ).exclude(pk__in=replaced), self.effective_date).values_list('pk', 'assignee_object_id'):
+                conflicts.setdefault(child_id, []).append(pk)
+            self._cancel(
+                [pk for pks in conflicts.values() for pk in pks],
+                f"Cancelled due to new assignment created on {today}",
+            )
+
+            # Assignment.save() expires whatever child_to_bus rows are still
+            # active for the child; child_to_route has no such rule.
+            leftovers = {}
+            if self.is_bus:
+                for pk, child_id in active.filter(
+                    assignee_object_id__in=children_ids
+                ).values_list('pk', 'assignee_object_id'):
+                    leftovers.setdefault(child_id, []).append(pk)
+                displaced = [pk for pks in leftovers.values() for pk in pks]
+                if displaced:
+                    Assignment.objects.filter(pk__in=displaced).update(
+                        status='expired',
+                        notes=Concat('notes', Value('\nAuto-expired: Child reassigned to different bus')),
+                        valid_to=ended_valid_to(today),
+                        updated_at=timezone.now(),
+                    )
+                    CurrentAssignment.objects.filter(assignment_id__in=displaced).delete()
+
+            assignments = Assignment.objects.bulk_create([
+                Assignment(
+                    assignment_type=self.assignment_type,
+                    assignee_content_type=child_ct,
+                    assignee_object_id=child_id,
+                    assigned_to_content_type=target_ct,
+                    assigned_to_object_id=self.target.pk,
+                    effective_date=self.effective_date,
+                    assigned_by=self.assigned_by,
+                    status='active',
+                    reason=self.reason,
+                    metadata={},
+                )
+                for child_id in children_ids
+            ])
+            CurrentAssignment.objects.bulk_create([
+                CurrentAssignment(assignment_id=assignment.pk, **CurrentAssignment.expected_fields(assignment))
+                for assignment in assignments
+            ])
+            AssignmentHistory.objects.bulk_create([
+                AssignmentHistory(
+                    assignment=assignment,
+                    action='created',
+                    performed_by=self.assigned_by,
+                    changes={
+                        'assignment_type': self.assignment_type,
+                        'assignee': str(children[assignment.assignee_object_id]),
+                        'assigned_to': str(self.target),
+                        'effective_date': str(self.effective_date),
+                        'expiry_date': None,
+                    },
+                    notes=f"Assignment created: {self.reason}",
+                )
+                for assignment in assignments
+            ])
+
+            if self.is_bus:
+                self._sync_stop_templates(children_ids)
+            BusUtilization.invalidate()
+
+        result = BulkAssignmentResult(replaced_ids=replaced)
+        for child_id, assignment in zip(children_ids, assignments):
+            assignment.assignee = children[child_id]
+            assignment.assigned_to = self.target
+            result.results.append(ChildAssignmentResult(
+                child_id=child_id,
+                assignment=assignment,
+                cancelled_ids=conflicts.get(child_id, []),
+                expired_ids=leftovers.get(child_id, []),
+            ))
+        return result
+
+    def _check_capacity(self, children_ids):
+        """
+        The batch plus children still on the bus through the legacy FK
+        must fit; without `replace`, so must the bus's current children.
+        """
+        capacity = getattr(self.target, 'capacity', 0)
+        if len(children_ids) > capacity:
+            raise ValidationError({
+                'capacity': (
+                    f'Bus capacity ({capacity}) exceeded. '
+                    f'You selected {len(children_ids)} children but the bus only fits {capacity}.'
+                )
+            })
+        on_bus = set(Child.objects.filter(assigned_bus=self.target).values_list('id', flat=True))
+        if not self.replace:
+            # An add-only batch keeps the children already assigned to the bus
+            on_bus |= set(CurrentAssignment.objects.filter(
+                bus_id=self.target.pk, assignment_type='child_to_bus'
+            ).values_list('child_id', flat=True))
+        total = len(on_bus | set(children_ids))
+        if total > capacity:
+            raise ValidationError({
+                'capacity': (
+                    f'Bus capacity ({capacity}) exceeded. '
+                    f'Current: {len(on_bus - set(children_ids))}, Attempting to add: {len(children_ids)}'
+                )
+            })
+
+    @staticmethod
+    def _cancel(pks, reason):
+        if not pks:
+            return
+        Assignment.objects.filter(pk__in=pks).update(
+            status='cancelled',
+            notes=_append_note(f"Cancelled: {reason}"),
+            valid_to=ended_valid_to(),
+            updated_at=timezone.now(),
+        )
+        CurrentAssignment.objects.filter(assignment_id__in=pks).delete()
+
+    def _sync_stop_templates(self, children_ids):
+        """Bulk equivalent of the per-save stop template receivers."""
+        # Lazy import: trips depends on assignments
+        from trips.models import RouteStopTemplate
+        from trips.stop_templates import StopTemplateService
+
+        stale = Q(child_id__in=children_ids) & ~Q(bus_id=self.target.pk)
+        if self.replace:
+            stale |= Q(bus_id=self.target.pk) & ~Q(child_id__in=children_ids)
+        RouteStopTemplate.objects.filter(stale).delete()
+        StopTemplateService.build_templates({(self.target.pk, child_id) for child_id in children_ids})
@@ -0,0 +1,164 @@
+"""
+Scheduled expiry of assignments past their expiry date.
+
+AssignmentService.expire_old_assignments() used to load every due
+assignment, call expire() on it (a save() with its CurrentAssignment sync
+and signal receivers) and insert one AssignmentHistory row at a time.
+Nothing ran it on a schedule either, so "active" rows that had quietly
+run out kept piling up behind every active-assignment filter.
+
+expire_due_assignments() does the whole run in one transaction:
+
+    1. one UPDATE ... RETURNING flips every due row to 'expired' and hands
+       back what the follow-up steps need (type, assignee, target),
+    2. their CurrentAssignment rows are deleted by the returned ids,
+    3. the 'expired' history rows are bulk-inserted,
+    4. stop templates of expired child_to_bus rows are removed, in one
+       statement across all buses, and the bus utilization report is
+       invalidated, once per run.
+
+The deletes go out in batches of DELETE_BATCH ids, so the statement count
+is fixed up to that many expired rows and grows by one per batch beyond.
+
+Backends without UPDATE ... RETURNING select the ids first and update by
+primary key; the outcome is the same.  Run it daily from cron with the
+`expire_assignments` management command.
+"""
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Assignment, AssignmentHistory, CurrentAssignment
+from .utilization import BusUtilization
+
+EXPIRED_NOTE = 'Automatically expired by system'
+
+# Ids per DELETE, well under PostgreSQL's 65535 bind parameters
+DELETE_BATCH = 10000
+
+# The assignment type fixes both content types, so the object ids suffice
+RETURNED_FIELDS = ('id', 'assignment_type', 'assignee_object_id', 'assigned_to_object_id')
+
+
+@dataclass
+class ExpiryResult:
+    expired: int = 0
+    history: int = 0
+    bus_ids: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.expired / self.seconds if self.seconds else 0.0
+
+
+def due_assignments(today=None):
+    """Active assignments whose expiry date is before `today`."""
+    return Assignment.objects.filter(status='active', expiry_date__lt=today or timezone.now().date())
+
+
+def _supports_update_returning():
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def _expire_returning(today, now):
+    """Expire every due row in one statement; returns their RETURNED_FIELDS tuples."""
+    meta = Assignment._meta
+    qn = connection.ops.quote_name
+    column = lambda name: qn(meta.get_field(name).column)
+    sql = (
+        f"UPDATE {qn(meta.db_table)} "
+        f"SET {column('status')} = %s, {column('updated_at')} = %s "
+        f"WHERE {column('status')} = %s AND {column('expiry_date')} < %s "
+        f"RETURNING {', '.join(column(name) for name in RETURNED_FIELDS)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ['expired', now, 'active', today])
+        return cursor.fetchall()
+
+
+def _expire_by_pk(today, now):
+    """Fallback for backends without UPDATE ... RETURNING."""
+    rows = list(due_assignments(today).select_for_update().values_list(*RETURNED_FIELDS))
+    Assignment.objects.filter(pk__in=[row[0] for row in rows]).update(status='expired', updated_at=now)
+    return rows
+
+
+def _bus_id(assignment_type, assignee_id, assigned_to_id):
+    if assignment_type == 'bus_to_route':
+        return assignee_id
+    if assignment_type.endswith('_to_bus'):
+        return assigned_to_id
+    return None
+
+
+def _batches(items, size=DELETE_BATCH):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _remove_stop_templates(child_bus_pairs):
+    """Bulk equivalent of the post_save receiver for non-active child_to_bus rows."""
+    # Lazy import: trips depends on assignments
+    from trips.models import RouteStopTemplate
+
+    for pairs in _batches(child_bus_pairs):
+        by_bus = defaultdict(set)
+        for bus_id, child_id in pairs:
+            by_bus[bus_id].add(child_id)
+        RouteStopTemplate.objects.filter(reduce(or_, (
+            Q(bus_id=bus_id, child_id__in=child_ids) for bus_id, child_ids in by_bus.items()
+        ))).delete()
+
+
+def expire_due_assignments(today=None):
+    """
+    Expire every active assignment whose expiry date is before `today`
+    (default: the current date) and record an 'expired' history row for
+    each.  Returns an ExpiryResult.
+    """
+    today = today or timezone.now().date()
+    result = ExpiryResult()
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        expire = _expire_returning if _supports_update_returning() else _expire_by_pk
+        rows = expire(today, timezone.now())
+        if rows:
+            ids = [row[0] for row in rows]
+            for batch in _batches(ids):
+                CurrentAssignment.objects.filter(assignment_id__in=batch).delete()
+            result.history = len(AssignmentHistory.objects.bulk_create(
+                (AssignmentHistory(
+                    assignment_id=pk,
+                    action='expired',
+                    performed_by=None,
+                    changes={'status': 'expired'},
+                    notes=EXPIRED_NOTE,
+                ) for pk in ids),
+                batch_size=500,
+            ))
+
+            bus_ids = set()
+            child_bus_pairs = []
+            for _pk, assignment_type, assignee_id, assigned_to_id in rows:
+                bus_id = _bus_id(assignment_type, assignee_id, assigned_to_id)
+                if bus_id is not None:
+                    bus_ids.add(bus_id)
+                if assignment_type == 'child_to_bus':
+                    child_bus_pairs.append((assigned_to_id, assignee_id))
+            _remove_stop_templates(child_bus_pairs)
+            BusUtilization.invalidate()
+
+            result.expired = len(ids)
+            result.bus_ids = sorted(bus_ids)
+
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,107 @@
+"""
+Request-scoped identity map for assignment lookups.
+
+One request often walks the same driver -> bus -> route chain several
+times: the login views and MyBusView/MyRouteView look up the bus's route
+twice, and the parent dashboard repeats the driver and route lookups for
+every child on the same bus.  Each call was a fresh CurrentAssignment
+query followed by GenericForeignKey dereferences.
+
+Inside a scope (AssignmentIdentityMapMiddleware opens one per request,
+identity_scope() opens one anywhere else):
+
+    * each (entity, side, assignment type) lookup runs once and its
+      result list is reused,
+    * every entity reached through an assignment is loaded once and
+      shared, so `assignment.assigned_to` is the same Bus instance in
+      every lookup that reaches it.
+
+The scope lives in a ContextVar, so concurrent requests under ASGI (and
+sync views run in threads by asgiref, which copy the context) never see
+each other's maps.  Saving or deleting an Assignment drops the memoized
+lookups of the current scope, so a view that writes and then reads again
+sees its own changes.  Outside a scope the helpers simply run the query
+and leave the generic relations lazy, as before.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ASSIGNED_TO, ASSIGNEE, Assignment
+from .resolvers import resolve_assignment_entities
+
+_scope = ContextVar('assignment_identity_map', default=None)
+
+
+class IdentityMap:
+    def __init__(self):
+        # (content type id, pk) -> instance
+        self.entities = {}
+        # (content type id, pk, side, assignment type) -> [Assignment, ...]
+        self.lookups = {}
+
+    def register(self, entity):
+        key = (ContentType.objects.get_for_model(entity).id, entity.pk)
+        return self.entities.setdefault(key, entity)
+
+
+def current_map():
+    """The identity map of the current scope, or None outside one."""
+    return _scope.get()
+
+
+@contextmanager
+def identity_scope():
+    """Open a fresh identity map for the duration of the block."""
+    token = _scope.set(IdentityMap())
+    try:
+        yield _scope.get()
+    finally:
+        _scope.reset(token)
+
+
+def _lookup(entity, side, assignment_type):
+    query = Assignment.get_active_assignments_for if side == ASSIGNEE else Assignment.get_assignments_to
+    scope = _scope.get()
+    if scope is None:
+        return list(query(entity, assignment_type))
+
+    scope.register(entity)
+    key = (ContentType.objects.get_for_model(entity).id, entity.pk, side, assignment_type)
+    if key not in scope.lookups:
+        scope.lookups[key] = resolve_assignment_entities(
+            query(entity, assignment_type), known=scope.entities, assigned_by=False
+        )
+    return scope.lookups[key]
+
+
+def active_assignments_for(entity, assignment_type=None):
+    """Memoized Assignment.get_active_assignments_for(), as a list."""
+    return _lookup(entity, ASSIGNEE, assignment_type)
+
+
+def assignments_to(entity, assignment_type=None):
+    """Memoized Assignment.get_assignments_to(), as a list."""
+    return _lookup(entity, ASSIGNED_TO, assignment_type)
+
+
+def first_active_for(entity, assignment_type=None):
+    """Like get_active_assignments_for(...).first()."""
+    return next(iter(active_assignments_for(entity, assignment_type)), None)
+
+
+def first_assignment_to(entity, assignment_type=None):
+    """Like get_assignments_to(...).first()."""
+    return next(iter(assignments_to(entity, assignment_type)), None)
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+def forget_lookups(sender, **kwargs):
+    scope = _scope.get()
+    if scope is not None:
+        scope.lookups.clear()
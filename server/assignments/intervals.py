@@ -0,0 +1,124 @@
+"""
+Date-interval overlap for assignment conflict checks.
+
+An assignment is active over the closed period [effective_date,
+expiry_date], where a NULL expiry_date means "permanent".  Conflict checks
+used to spell overlap as several OR'd Q filters (a different set for
+dated and permanent assignments), which planners turn into index-unfriendly
+OR chains over the whole table.
+
+overlapping() filters a queryset to the rows whose period intersects a
+given one:
+
+    * PostgreSQL: daterange(effective_date, expiry_date, '[]') && the
+      probe range.  install_interval_constraint() (run after migrate) adds
+      an exclusion constraint on that expression together with the
+      assignee, so a conflict is a single GiST probe and two concurrent
+      transactions can never both commit overlapping active assignments
+      of the same assignee and type to different targets.
+    * Other backends: the canonical two-comparison overlap test
+      (start <= probe end AND (end IS NULL OR end >= probe start)),
+      backed by the partial index on active assignments per assignee.
+      SQLite serialises writers, so the application check is enough there.
+
+The constraint is installed outside the migration files because it needs
+the btree_gist extension and has no SQLite equivalent.
+"""
+
+import logging
+
+from django.db import DatabaseError, connections, transaction
+from django.db.models import BooleanField, DateField, F, Func, Q, Value
+from django.db.models.functions import Cast
+
+from .models import Assignment
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_CONSTRAINT = 'assignment_no_overlapping_active'
+FALLBACK_INDEX = 'assignment_active_period_gist'
+# Point-in-time lookups over [effective_date, valid_to), see temporal.py
+VALIDITY_INDEX = 'assignment_validity_gist'
+VALIDITY_SQL = "daterange(effective_date, valid_to, '[)')"
+
+PERIOD_SQL = "daterange(effective_date, expiry_date, '[]')"
+
+
+class _Period(Func):
+    """daterange(start, end, '[]'); a NULL end is unbounded."""
+    function = 'daterange'
+    template = "%(function)s(%(expressions)s, '[]')"
+    # Only ever compared in SQL; Django has no range field without psycopg
+    output_field = DateField()
+
+
+class _Overlaps(Func):
+    arg_joiner = ' && '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+def overlap_q(effective_date, expiry_date=None):
+    """Portable Q for rows whose period intersects [effective_date, expiry_date]."""
+    condition = Q(expiry_date__isnull=True) | Q(expiry_date__gte=effective_date)
+    if expiry_date is not None:
+        condition &= Q(effective_date__lte=expiry_date)
+    return condition
+
+
+def overlapping(queryset, effective_date, expiry_date=None):
+    """`queryset` narrowed to assignments overlapping [effective_date, expiry_date]."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(overlap_q(effective_date, expiry_date))
+    return queryset.filter(_Overlaps(
+        _Period(F('effective_date'), F('expiry_date')),
+        _Period(Cast(Value(effective_date), DateField()), Cast(Value(expiry_date), DateField())),
+    ))
+
+
+def is_overlap_violation(exc):
+    """True if an IntegrityError came from the exclusion constraint."""
+    return OVERLAP_CONSTRAINT in str(exc)
+
+
+def install_interval_constraint(using='default', **kwargs):
+    """
+    post_migrate receiver: add the exclusion constraint on PostgreSQL,
+    and the GiST index behind point-in-time queries.
+
+    If existing rows already overlap, the constraint cannot be created; a
+    plain GiST index on the same columns is built instead so conflict
+    probes stay indexed, and a warning names the constraint to retry once
+    the data is cleaned up (e.g. after `expire_assignments`).
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    table = connection.ops.quote_name(Assignment._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {VALIDITY_INDEX} ON {table} USING gist ({VALIDITY_SQL})")
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        cursor.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", [OVERLAP_CONSTRAINT])
+        if cursor.fetchone():
+            return
+        try:
+            with transaction.atomic(using=using):
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {OVERLAP_CONSTRAINT} EXCLUDE USING gist ("
+                    f"assignee_content_type_id WITH =, assignee_object_id WITH =, assignment_type WITH =, "
+                    f"assigned_to_content_type_id WITH =, assigned_to_object_id WITH <>, "
+                    f"{PERIOD_SQL} WITH &&"
+                    f") WHERE (status = 'active')"
+                )
+            cursor.execute(f"DROP INDEX IF EXISTS {FALLBACK_INDEX}")
+        except DatabaseError as exc:
+            logger.warning(
+                f"Could not add {OVERLAP_CONSTRAINT}, overlapping active assignments exist: {exc}. "
+                f"Falling back to index {FALLBACK_INDEX}."
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {FALLBACK_INDEX} ON {table} USING gist ("
+                f"assignee_content_type_id, assignee_object_id, assignment_type, {PERIOD_SQL}"
+                f") WHERE status = 'active'"
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from assignments.temporal import backfill_valid_to
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills Assignment.valid_to on rows written before point-in-time '
+        'queries existed. Safe to re-run; only rows still missing it are touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = backfill_valid_to(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Backfilled valid_to on {updated} assignments"))
@@ -0,0 +1,97 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from assignments.models import Assignment
+from assignments.services import AssignmentService
+from buses.models import Bus
+from children.models import Child
+from parents.models import Parent
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks a start-of-term bulk reassignment: the per-child '
+        'create_assignment() path against the set-based bulk engine. All '
+        'data is created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--children', type=int, default=2000)
+        parser.add_argument('--moving', type=float, default=0.5,
+                            help='Share of children currently on another bus')
+
+    def handle(self, *args, **options):
+        n = options['children']
+        results = []
+        for label, assign in (('per-child', self._per_child), ('bulk engine', self._bulk)):
+            with transaction.atomic():
+                bus, children_ids = self._seed(n, options['moving'])
+                queries, ms = self._measure(lambda: assign(bus, children_ids))
+                on_bus = Assignment.get_assignments_to(bus, 'child_to_bus').count()
+                transaction.set_rollback(True)
+            results.append((label, queries, ms, on_bus))
+
+        self.stdout.write(f"Bulk assignment of {n} children ({options['moving']:.0%} moving from another bus)")
+        for label, queries, ms, on_bus in results:
+            self.stdout.write(f"  {label:11}: {queries:7d} queries, {ms:9.1f} ms, {on_bus} on bus")
+        self.stdout.write(self.style.SUCCESS(f"  speedup: {results[0][2] / results[1][2]:.1f}x"))
+
+    @staticmethod
+    def _measure(run):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            run()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        return queries, elapsed_ms
+
+    @staticmethod
+    def _seed(n, moving):
+        stamp = time.time_ns()
+        bus, old_bus = Bus.objects.bulk_create([
+            Bus(bus_number=f'BA{stamp % 10**8}-{i}', number_plate=f'BULK {stamp % 10**8} {i}', capacity=n + 10)
+            for i in range(2)
+        ])
+        users = User.objects.bulk_create(
+            User(username=f'bulk_parent_{stamp}_{i}', user_type='parent', phone_number=f'b{stamp % 10**8}{i}')
+            for i in range(max(1, n // 2))
+        )
+        parents = Parent.objects.bulk_create(Parent(user=user, contact_number=user.phone_number) for user in users)
+        children = Child.objects.bulk_create(
+            Child(first_name='Kid', last_name=str(i), class_grade='P1', parent=parents[i % len(parents)])
+            for i in range(n)
+        )
+        movers = [child.id for child in children[:int(n * moving)]]
+        if movers:
+            AssignmentService.bulk_assign_children_to_bus(old_bus, movers)
+        return bus, [child.id for child in children]
+
+    @staticmethod
+    def _per_child(bus, children_ids):
+        """The original implementation: one create_assignment() per child."""
+        with transaction.atomic():
+            for existing in Assignment.get_assignments_to(bus, 'child_to_bus'):
+                existing.cancel(reason=f"Replaced by new bulk assignment to bus {bus.bus_number}")
+            for child in Child.objects.filter(id__in=children_ids):
+                AssignmentService.create_assignment(
+                    assignment_type='child_to_bus',
+                    assignee=child,
+                    assigned_to=bus,
+                    reason=f"Bulk assignment to bus {bus.bus_number}",
+                    auto_cancel_conflicting=True,
+                )
+
+    @staticmethod
+    def _bulk(bus, children_ids):
+        AssignmentService.bulk_assign_children_to_bus(bus, children_ids)
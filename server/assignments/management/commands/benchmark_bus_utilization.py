@@ -0,0 +1,133 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from assignments.models import Assignment, BusRoute, CurrentAssignment
+from assignments.utilization import CACHE_KEY, BusUtilization
+from buses.models import Bus
+from busminders.models import BusMinder
+from children.models import Child
+from drivers.models import Driver
+from parents.models import Parent
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the bus utilization report: the per-bus loop it replaced, '
+        'the set-based build and a cached read. All data is created inside a '
+        'transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buses', type=int, default=500)
+        parser.add_argument('--children', type=int, default=20000)
+        parser.add_argument('--skip-legacy', action='store_true', help='Do not time the per-bus loop')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._seed(options['buses'], options['children'])
+            results = []
+            if not options['skip_legacy']:
+                results.append(('per-bus loop', *self._measure(self._legacy)))
+            cache.delete(CACHE_KEY)
+            results.append(('set-based', *self._measure(BusUtilization.compute)))
+            BusUtilization.get()
+            results.append(('cached', *self._measure(BusUtilization.get)))
+            cache.delete(CACHE_KEY)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Bus utilization — {options['buses']} buses, {options['children']} children")
+        for label, queries, ms, report in results:
+            self.stdout.write(f"  {label:13}: {queries:6d} queries, {ms:9.1f} ms, {len(report)} buses")
+        if len(results) == 3:
+            self.stdout.write(self.style.SUCCESS(f"  speedup: {results[0][2] / results[1][2]:.1f}x uncached"))
+
+    @staticmethod
+    def _measure(build):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            report = build()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        return queries, elapsed_ms, report
+
+    def _seed(self, n_buses, n_children):
+        stamp = int(time.time())
+
+        def users(role, count):
+            return User.objects.bulk_create(
+                User(username=f'util_{role}_{stamp}_{i}', user_type=role, first_name=role.title(),
+                     last_name=str(i), phone_number=f'u{stamp % 10**6}{role[0]}{i}')
+                for i in range(count)
+            )
+
+        buses = Bus.objects.bulk_create(
+            Bus(bus_number=f'U{stamp % 10**6}-{i}', number_plate=f'UTIL {stamp % 10**6} {i}', capacity=60)
+            for i in range(n_buses)
+        )
+        drivers = Driver.objects.bulk_create(
+            Driver(user=user, license_number=f'UL-{user.pk}') for user in users('driver', n_buses)
+        )
+        minders = BusMinder.objects.bulk_create(BusMinder(user=user) for user in users('busminder', n_buses))
+        routes = BusRoute.objects.bulk_create(
+            BusRoute(name=f'Util route {i}', route_code=f'U{stamp % 10**6}-{i}') for i in range(n_buses)
+        )
+        parents = Parent.objects.bulk_create(
+            Parent(user=user, contact_number=user.phone_number) for user in users('parent', n_children // 2 or 1)
+        )
+        children = Child.objects.bulk_create(
+            Child(first_name='Kid', last_name=str(i), class_grade='P1', parent=parents[i % len(parents)])
+            for i in range(n_children)
+        )
+
+        ct = ContentType.objects.get_for_model
+        links = []
+        for i, bus in enumerate(buses):
+            links += [('driver_to_bus', drivers[i], bus), ('minder_to_bus', minders[i], bus),
+                      ('bus_to_route', bus, routes[i])]
+        links += [('child_to_bus', child, buses[i % n_buses]) for i, child in enumerate(children)]
+        assignments = Assignment.objects.bulk_create(
+            (Assignment(assignment_type=kind, status='active',
+                        assignee_content_type=ct(assignee), assignee_object_id=assignee.pk,
+                        assigned_to_content_type=ct(target), assigned_to_object_id=target.pk)
+             for kind, assignee, target in links),
+            batch_size=2000,
+        )
+        CurrentAssignment.objects.bulk_create(
+            (CurrentAssignment(assignment_id=a.pk, **CurrentAssignment.expected_fields(a)) for a in assignments),
+            batch_size=2000,
+        )
+
+    @staticmethod
+    def _legacy():
+        """The query pattern of the original per-bus implementation."""
+        report = []
+        for bus in Bus.objects.all():
+            child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+            count = child_assignments.count()
+            driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
+            driver = driver_assignment.assignee if driver_assignment else None
+            minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
+            minder = minder_assignment.assignee if minder_assignment else None
+            route_assignment = Assignment.get_assignments_to(bus, 'bus_to_route').first()
+            route = route_assignment.assigned_to if route_assignment else None
+            children = []
+            for assignment in child_assignments:
+                child = assignment.assignee
+                parent = child.parent
+                children.append((child.id, parent.user.get_full_name() if parent else 'N/A'))
+            report.append((bus.id, count, driver and driver.user.first_name, minder and minder.user.first_name,
+                           route and route.name, children))
+        return report
@@ -0,0 +1,117 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from assignments.models import BusRoute
+from assignments.services import AssignmentService
+from buses.models import Bus
+from busminders.models import BusMinder
+from children.models import Child
+from drivers.models import Driver
+from parents.models import Parent
+
+User = get_user_model()
+
+IDENTITY_MAP_MIDDLEWARE = 'assignments.middleware.AssignmentIdentityMapMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Counts queries for the endpoints that walk the driver -> bus -> '
+        'route chain, with and without the request-scoped assignment '
+        'identity map. All data is created inside a transaction that is '
+        'rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--children', type=int, default=40)
+        parser.add_argument('--siblings', type=int, default=3,
+                            help="Children of the parent whose dashboard is fetched")
+
+    def handle(self, *args, **options):
+        without = [m for m in settings.MIDDLEWARE if m != IDENTITY_MAP_MIDDLEWARE]
+        results = []
+        with transaction.atomic():
+            seed = self._seed(options['children'], options['siblings'])
+            for label, call in self._endpoints(seed):
+                row = [label]
+                for middleware in (without, [*without, IDENTITY_MAP_MIDDLEWARE]):
+                    # A fresh client per run: the handler caches its middleware chain
+                    with override_settings(MIDDLEWARE=middleware):
+                        row.extend(self._measure(lambda: call(APIClient())))
+                results.append(row)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Request lookups — bus with {options['children']} children")
+        self.stdout.write(f"  {'endpoint':28} {'without map':>22} {'with map':>22}")
+        for label, q0, ms0, q1, ms1 in results:
+            self.stdout.write(f"  {label:28} {q0:5d} queries {ms0:7.1f} ms {q1:5d} queries {ms1:7.1f} ms")
+
+    @staticmethod
+    def _measure(call):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            response = call()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.content[:200]
+        return queries, elapsed_ms
+
+    @staticmethod
+    def _endpoints(seed):
+        def as_user(user, path):
+            def call(client):
+                client.force_authenticate(user=user)
+                return client.get(path)
+            return call
+
+        def login(path, phone_number):
+            return lambda client: client.post(path, {'phone_number': phone_number}, format='json')
+
+        driver_user = seed['driver'].user
+        return [
+            ('auth/phone-login (driver)', login('/api/auth/phone-login/', seed['driver'].phone_number)),
+            ('auth/phone-login (minder)', login('/api/auth/phone-login/', seed['minder'].phone_number)),
+            ('drivers/phone-login', login('/api/drivers/phone-login/', seed['driver'].phone_number)),
+            ('drivers/my-bus', as_user(driver_user, '/api/drivers/my-bus/')),
+            ('drivers/my-route', as_user(driver_user, '/api/drivers/my-route/')),
+            ('parents/<id> (retrieve)', as_user(seed['parent'].user, f"/api/parents/{seed['parent'].pk}/")),
+        ]
+
+    @staticmethod
+    def _seed(n_children, n_siblings):
+        stamp = time.time_ns() % 10**8
+
+        def user(role, i=0):
+            return User.objects.create(username=f'lookup_{role}_{stamp}_{i}', user_type=role,
+                                       first_name=role.title(), last_name=str(i))
+
+        bus = Bus.objects.create(bus_number=f'L{stamp}', number_plate=f'LOOK {stamp}', capacity=n_children + 10)
+        route = BusRoute.objects.create(name=f'Lookup route {stamp}', route_code=f'L{stamp}')
+        driver = Driver.objects.create(user=user('driver'), license_number=f'L-{stamp}', phone_number=f'ld{stamp}')
+        minder = BusMinder.objects.create(user=user('busminder'), phone_number=f'lm{stamp}')
+        parent = Parent.objects.create(user=user('parent'), contact_number=f'lp{stamp}', address='1 Lookup Lane')
+        others = [Parent.objects.create(user=user('parent', i), contact_number=f'lp{stamp}{i}')
+                  for i in range(1, 4)]
+
+        AssignmentService.create_assignment('driver_to_bus', driver, bus)
+        AssignmentService.create_assignment('minder_to_bus', minder, bus)
+        AssignmentService.create_assignment('bus_to_route', bus, route)
+        children = Child.objects.bulk_create(
+            Child(first_name='Kid', last_name=str(i), class_grade='P1',
+                  parent=parent if i < n_siblings else others[i % len(others)])
+            for i in range(n_children)
+        )
+        AssignmentService.bulk_assign_children_to_bus(bus, [child.id for child in children])
+        return {'driver': driver, 'minder': minder, 'parent': parent}
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assignments.models import Assignment, CurrentAssignment, ENTITY_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Verifies the denormalized CurrentAssignment table against Assignment: '
+        'active assignments without a row, rows for assignments that are no longer '
+        'active, and rows whose columns differ. --repair rewrites the bad rows. '
+        'Missing rows are also backfilled automatically after migrate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Fix every difference found')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        columns = ['assignment_type', 'effective_date', 'expiry_date'] + [f'{f}_id' for f in ENTITY_FIELDS.values()]
+        actual = {
+            row['assignment_id']: row
+            for row in CurrentAssignment.objects.values('assignment_id', *columns).iterator(options['chunk_size'])
+        }
+
+        missing, mismatched = [], []
+        expected_ids = set()
+        for assignment in Assignment.objects.filter(status='active').iterator(options['chunk_size']):
+            fields = CurrentAssignment.expected_fields(assignment)
+            if fields is None:
+                continue
+            expected_ids.add(assignment.pk)
+            row = actual.get(assignment.pk)
+            if row is None:
+                missing.append((assignment.pk, fields))
+            elif any(row[column] != fields.get(column) for column in columns):
+                mismatched.append((assignment.pk, fields))
+        stale = [pk for pk in actual if pk not in expected_ids]
+
+        self.stdout.write(
+            f"Checked {len(expected_ids)} active assignments against {len(actual)} current rows: "
+            f"{len(missing)} missing, {len(stale)} stale, {len(mismatched)} mismatched"
+        )
+        if not (missing or stale or mismatched):
+            self.stdout.write(self.style.SUCCESS("CurrentAssignment is consistent"))
+            return
+        if not options['repair']:
+            for label, ids in (('missing', [pk for pk, _ in missing]), ('stale', stale),
+                               ('mismatched', [pk for pk, _ in mismatched])):
+                if ids:
+                    self.stdout.write(self.style.WARNING(f"  {label}: {ids[:20]}{' ...' if len(ids) > 20 else ''}"))
+            self.stdout.write("Run with --repair to fix")
+            return
+
+        rows, dangling = CurrentAssignment.without_dangling(missing + mismatched)
+        if dangling:
+            self.stdout.write(self.style.WARNING(
+                f"  skipped {len(dangling)} assignments pointing at deleted records: {dangling[:20]}"
+            ))
+
+        with transaction.atomic():
+            CurrentAssignment.objects.filter(
+                assignment_id__in=stale + [pk for pk, _ in mismatched]
+            ).delete()
+            CurrentAssignment.objects.bulk_create(
+                [CurrentAssignment(assignment_id=pk, **fields) for pk, fields in rows],
+                batch_size=options['chunk_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {len(missing) + len(stale) + len(mismatched)} CurrentAssignment rows"
+        ))
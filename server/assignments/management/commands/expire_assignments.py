@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assignments.expiry import due_assignments, expire_due_assignments
+
+
+class Command(BaseCommand):
+    help = (
+        'Expires active assignments whose expiry date has passed, writing an '
+        '"expired" history row for each, in one set-based pass. Run daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None,
+                            help='Expire assignments ending before this YYYY-MM-DD date (default: today)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many are due')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be a YYYY-MM-DD date')
+
+        if options['dry_run']:
+            self.stdout.write(f"{due_assignments(today).count()} assignments due for expiry")
+            return
+
+        result = expire_due_assignments(today)
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {result.expired} assignments ({result.history} history rows, "
+            f"{len(result.bus_ids)} buses affected) in {result.seconds:.2f}s "
+            f"— {result.rows_per_second:.0f} rows/s"
+        ))
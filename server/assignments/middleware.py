@@ -0,0 +1,25 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .identity_map import identity_scope
+
+
+class AssignmentIdentityMapMiddleware:
+    """Give every request its own assignment identity map (see identity_map.py)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with identity_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with identity_scope():
+            return await self.get_response(request)
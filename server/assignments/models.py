@@ -1,12 +1,27 @@
+import logging
+from datetime import timedelta
+
 from django.db import models
-from django.db.models import Value
-from django.db.models.functions import Concat
+from django.db.models import DateField, F, Value
+from django.db.models.functions import Coalesce, Concat, Greatest, Least
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+
+def ended_valid_to(day=None):
+    """
+    valid_to for rows that stop being active on `day` (default today), as an
+    update() expression: the earlier of their current end and `day`, never
+    before effective_date.  Mirrors Assignment._compute_valid_to().
+    """
+    day = Value(day or timezone.now().date(), output_field=DateField())
+    return Greatest(F('effective_date'), Least(Coalesce(F('valid_to'), day), day))
+
 
 class BusRoute(models.Model):
     """
@@ -166,6 +181,15 @@ class Assignment(models.Model):
         blank=True,
         help_text="When this assignment expires (null = permanent)"
     )
+    valid_to = models.DateField(
+        null=True,
+        blank=True,
+        help_text=(
+            "Exclusive end of the days this assignment was in effect: the day after "
+            "expiry_date, or the day it was cancelled/expired if earlier (null = open). "
+            "Maintained by save(); see assignments/temporal.py"
+        )
+    )
 
     # Audit trail
     assigned_by = models.ForeignKey(
@@ -211,8 +235,15 @@ class Assignment(models.Model):
         indexes = [
             models.Index(fields=['assignment_type', 'status']),
             models.Index(fields=['effective_date', 'expiry_date']),
+            models.Index(fields=['effective_date', 'valid_to']),
             models.Index(fields=['assignee_content_type', 'assignee_object_id']),
             models.Index(fields=['assigned_to_content_type', 'assigned_to_object_id']),
+            # Conflict probes (see intervals.py); PostgreSQL also gets a GiST exclusion constraint
+            models.Index(
+                fields=['assignee_content_type', 'assignee_object_id', 'assignment_type', 'effective_date'],
+                condition=models.Q(status='active'),
+                name='assignment_active_assignee_idx',
+            ),
         ]
 
     def __str__(self):
@@ -296,66 +327,71 @@ class Assignment(models.Model):
             # For driver_to_bus and minder_to_bus, ensure only ONE active assignment per bus
             if self.assignment_type in ['driver_to_bus', 'minder_to_bus']:
                 # Cancel/expire any other active assignments of the same type for this bus
-                Assignment.objects.filter(
+                self._expire_displaced(Assignment.objects.filter(
                     assignment_type=self.assignment_type,
                     assigned_to_content_type=self.assigned_to_content_type,
                     assigned_to_object_id=self.assigned_to_object_id,
                     status='active'
-                ).exclude(pk=self.pk if self.pk else None).update(
-                    status='expired',
-                    notes=Concat(
-                        'notes',
-                        Value('\nAuto-expired: New assignment created'),
-                    ),
-                )
+                ), '\nAuto-expired: New assignment created')
 
             # For minder_to_bus, also ensure one busminder isn't assigned to multiple buses
             if self.assignment_type == 'minder_to_bus':
                 # Cancel any other active bus assignments for this busminder
-                Assignment.objects.filter(
+                self._expire_displaced(Assignment.objects.filter(
                     assignment_type='minder_to_bus',
                     assignee_content_type=self.assignee_content_type,
                     assignee_object_id=self.assignee_object_id,
                     status='active'
-                ).exclude(pk=self.pk if self.pk else None).update(
-                    status='expired',
-                    notes=Concat(
-                        'notes',
-                        Value('\nAuto-expired: Busminder reassigned to different bus'),
-                    ),
-                )
+                ), '\nAuto-expired: Busminder reassigned to different bus')
 
             # For driver_to_bus, ensure a driver isn't assigned to multiple buses
             if self.assignment_type == 'driver_to_bus':
-                Assignment.objects.filter(
+                self._expire_displaced(Assignment.objects.filter(
                     assignment_type='driver_to_bus',
                     assignee_content_type=self.assignee_content_type,
                     assignee_object_id=self.assignee_object_id,
                     status='active'
-                ).exclude(pk=self.pk if self.pk else None).update(
-                    status='expired',
-                    notes=Concat(
-                        'notes',
-                        Value('\nAuto-expired: Driver reassigned to different bus'),
-                    ),
-                )
+                ), '\nAuto-expired: Driver reassigned to different bus')
 
             # For child_to_bus, ensure a child isn't assigned to multiple buses
             if self.assignment_type == 'child_to_bus':
-                Assignment.objects.filter(
+                self._expire_displaced(Assignment.objects.filter(
                     assignment_type='child_to_bus',
                     assignee_content_type=self.assignee_content_type,
                     assignee_object_id=self.assignee_object_id,
                     status='active'
-                ).exclude(pk=self.pk if self.pk else None).update(
-                    status='expired',
-                    notes=Concat(
-                        'notes',
-                        Value('\nAuto-expired: Child reassigned to different bus'),
-                    ),
-                )
+                ), '\nAuto-expired: Child reassigned to different bus')
 
+        self.valid_to = self._compute_valid_to()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'valid_to'}
         super().save(*args, **kwargs)
+        CurrentAssignment.sync(self)
+
+    def _compute_valid_to(self):
+        # Dates may still be strings or datetimes here (callers pass request data through)
+        start = self._meta.get_field('effective_date').to_python(self.effective_date)
+        expiry = self._meta.get_field('expiry_date').to_python(self.expiry_date)
+        if self.status == 'active':
+            return expiry + timedelta(days=1) if expiry else None
+        if self.status == 'pending':
+            return start
+        # Ended: in effect until today at the latest; idempotent on later saves
+        today = timezone.now().date()
+        valid_to = self._meta.get_field('valid_to').to_python(self.valid_to)
+        return max(start, min(valid_to or today, today))
+
+    def _expire_displaced(self, queryset, note):
+        """Expire the active assignments this one replaces, and drop them from CurrentAssignment."""
+        displaced = list(queryset.exclude(pk=self.pk if self.pk else None).values_list('pk', flat=True))
+        if not displaced:
+            return
+        Assignment.objects.filter(pk__in=displaced).update(
+            status='expired',
+            notes=Concat('notes', Value(note)),
+            valid_to=ended_valid_to(),
+        )
+        CurrentAssignment.objects.filter(assignment_id__in=displaced).delete()
 
     @classmethod
     def get_active_assignments_for(cls, entity, assignment_type=None):
@@ -369,23 +405,7 @@ class Assignment(models.Model):
         Returns:
             QuerySet of active assignments
         """
-        content_type = ContentType.objects.get_for_model(entity)
-        today = timezone.now().date()
-
-        filters = {
-            'assignee_content_type': content_type,
-            'assignee_object_id': entity.pk,
-            'status': 'active',
-            'effective_date__lte': today,
-        }
-
-        if assignment_type:
-            filters['assignment_type'] = assignment_type
-
-        return cls.objects.filter(**filters).filter(
-            models.Q(expiry_date__isnull=True) |
-            models.Q(expiry_date__gte=today)
-        )
+        return cls._current(entity, ASSIGNEE, assignment_type)
 
     @classmethod
     def get_assignments_to(cls, entity, assignment_type=None):
@@ -399,23 +419,204 @@ class Assignment(models.Model):
         Returns:
             QuerySet of active assignments
         """
-        content_type = ContentType.objects.get_for_model(entity)
+        return cls._current(entity, ASSIGNED_TO, assignment_type)
+
+    @classmethod
+    def _current(cls, entity, side, assignment_type=None):
+        """
+        Active assignments with `entity` on `side`, found through the typed
+        CurrentAssignment foreign keys (one indexed join) rather than a
+        ContentType + object id filter on this table.
+        """
+        field = ENTITY_FIELDS.get(entity._meta.label_lower)
+        if field is None:
+            return cls.objects.none()
+        types = [t for t, roles in ASSIGNMENT_ROLES.items() if roles[side] == field]
+        if assignment_type:
+            types = [t for t in types if t == assignment_type]
         today = timezone.now().date()
+        return cls.objects.filter(
+            models.Q(current__expiry_date__isnull=True) | models.Q(current__expiry_date__gte=today),
+            **{f'current__{field}': entity.pk},
+            current__assignment_type__in=types,
+            current__effective_date__lte=today,
+            status='active',
+        )
+
 
-        filters = {
-            'assigned_to_content_type': content_type,
-            'assigned_to_object_id': entity.pk,
-            'status': 'active',
-            'effective_date__lte': today,
+# Which side of an assignment each type's entities sit on, as
+# CurrentAssignment field names: (assignee, assigned_to).
+ASSIGNEE, ASSIGNED_TO = 0, 1
+ASSIGNMENT_ROLES = {
+    'driver_to_bus': ('driver', 'bus'),
+    'minder_to_bus': ('minder', 'bus'),
+    'child_to_bus': ('child', 'bus'),
+    'bus_to_route': ('bus', 'route'),
+    'driver_to_route': ('driver', 'route'),
+    'minder_to_route': ('minder', 'route'),
+    'child_to_route': ('child', 'route'),
+}
+ENTITY_FIELDS = {
+    'buses.bus': 'bus',
+    'drivers.driver': 'driver',
+    'busminders.busminder': 'minder',
+    'children.child': 'child',
+    'assignments.busroute': 'route',
+}
+
+
+class CurrentAssignment(models.Model):
+    """
+    Denormalized copy of every active Assignment with real foreign keys.
+
+    Assignment's GenericForeignKeys make "which bus is this child on?" a
+    ContentType lookup, a filter on (content type, object id) and another
+    query to dereference the result.  Each active assignment gets one row
+    here with the two entities it links in typed columns (e.g. child + bus
+    for child_to_bus), so those lookups are single indexed joins — see
+    CurrentAssignment.related().
+
+    Assignment.save() keeps the table in sync; rows are removed when an
+    assignment stops being active.  Date windows are copied so future and
+    lapsed assignments are filtered without touching Assignment.
+    Missing rows are backfilled after every migrate (see
+    backfill_current_assignments); `manage.py check_current_assignments`
+    verifies (and with --repair, rebuilds) the table against Assignment.
+    """
+    assignment = models.OneToOneField(
+        Assignment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='current'
+    )
+    assignment_type = models.CharField(max_length=20, choices=Assignment.ASSIGNMENT_TYPES)
+
+    bus = models.ForeignKey('buses.Bus', on_delete=models.CASCADE, null=True, blank=True,
+                            related_name='current_assignments')
+    driver = models.ForeignKey('drivers.Driver', on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='current_assignments')
+    minder = models.ForeignKey('busminders.BusMinder', on_delete=models.CASCADE, null=True, blank=True,
+                               related_name='current_assignments')
+    child = models.ForeignKey('children.Child', on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='current_assignments')
+    route = models.ForeignKey(BusRoute, on_delete=models.CASCADE, null=True, blank=True,
+                              related_name='current_assignments')
+
+    effective_date = models.DateField()
+    expiry_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bus', 'assignment_type']),
+            models.Index(fields=['driver', 'assignment_type']),
+            models.Index(fields=['minder', 'assignment_type']),
+            models.Index(fields=['child', 'assignment_type']),
+            models.Index(fields=['route', 'assignment_type']),
+        ]
+
+    def __str__(self):
+        return f"current {self.assignment_type} #{self.assignment_id}"
+
+    @staticmethod
+    def expected_fields(assignment):
+        """Column values this table should hold for `assignment`, or None if it should have no row."""
+        roles = ASSIGNMENT_ROLES.get(assignment.assignment_type)
+        if assignment.status != 'active' or roles is None:
+            return None
+        assignee_field, assigned_to_field = roles
+        return {
+            'assignment_type': assignment.assignment_type,
+            f'{assignee_field}_id': assignment.assignee_object_id,
+            f'{assigned_to_field}_id': assignment.assigned_to_object_id,
+            'effective_date': assignment.effective_date,
+            'expiry_date': assignment.expiry_date,
         }
 
-        if assignment_type:
-            filters['assignment_type'] = assignment_type
+    @classmethod
+    def sync(cls, assignment):
+        """Bring `assignment`'s row up to date after it was saved."""
+        fields = cls.expected_fields(assignment)
+        if fields is None:
+            cls.objects.filter(assignment_id=assignment.pk).delete()
+            return
+        # Changing an assignment's type must clear the columns of the old one
+        cleared = {f'{field}_id': None for field in ENTITY_FIELDS.values()}
+        if not cls.objects.filter(assignment_id=assignment.pk).update(**{**cleared, **fields}):
+            cls(assignment_id=assignment.pk, **fields).save(force_insert=True)
 
-        return cls.objects.filter(**filters).filter(
-            models.Q(expiry_date__isnull=True) |
-            models.Q(expiry_date__gte=today)
+    @classmethod
+    def without_dangling(cls, rows, using='default'):
+        """
+        Split (assignment id, fields) rows into those whose entities all
+        exist and the ids of those pointing at deleted records.
+        """
+        existing = {}
+        for field in ENTITY_FIELDS.values():
+            ids = {fields[f'{field}_id'] for _, fields in rows if f'{field}_id' in fields}
+            model = cls._meta.get_field(field).related_model
+            existing[field] = set(model.objects.using(using).filter(pk__in=ids).values_list('pk', flat=True))
+        kept, dangling = [], []
+        for pk, fields in rows:
+            if all(fields[f'{field}_id'] in existing[field] for field in ENTITY_FIELDS.values()
+                   if f'{field}_id' in fields):
+                kept.append((pk, fields))
+            else:
+                dangling.append(pk)
+        return kept, dangling
+
+    @classmethod
+    def backfill(cls, using='default', chunk_size=2000):
+        """
+        Add the rows missing for active assignments, e.g. those written
+        before this table existed.  Returns the number of rows added.
+        """
+        missing = [
+            (assignment.pk, fields)
+            for assignment in Assignment.objects.using(using).filter(
+                status='active', current__isnull=True
+            ).iterator(chunk_size)
+            if (fields := cls.expected_fields(assignment)) is not None
+        ]
+        if not missing:
+            return 0
+        rows, _dangling = cls.without_dangling(missing, using=using)
+        cls.objects.using(using).bulk_create(
+            [cls(assignment_id=pk, **fields) for pk, fields in rows], batch_size=chunk_size
         )
+        return len(rows)
+
+    @classmethod
+    def related(cls, entity, role, on=None):
+        """
+        Entities currently assigned to/from `entity` in `role` ('bus',
+        'driver', 'minder', 'child' or 'route'), as a queryset of that model,
+        most recently assigned first:
+
+            CurrentAssignment.related(child, 'bus').first()
+            CurrentAssignment.related(bus, 'child')
+        """
+        field = ENTITY_FIELDS[entity._meta.label_lower]
+        types = [t for t, roles in ASSIGNMENT_ROLES.items() if set(roles) == {field, role}]
+        model = cls._meta.get_field(role).related_model
+        on = on or timezone.now().date()
+        return model.objects.filter(
+            models.Q(current_assignments__expiry_date__isnull=True)
+            | models.Q(current_assignments__expiry_date__gte=on),
+            **{f'current_assignments__{field}': entity.pk},
+            current_assignments__assignment_type__in=types,
+            current_assignments__effective_date__lte=on,
+        ).order_by('-current_assignments__assignment__assigned_at')
+
+
+def backfill_current_assignments(using='default', **kwargs):
+    """
+    post_migrate receiver: active-assignment lookups only see assignments
+    with a CurrentAssignment row, so fill in any that are missing (all of
+    them on the first deploy).  A no-op query once the table is complete.
+    """
+    added = CurrentAssignment.backfill(using=using)
+    if added:
+        logger.info(f"Backfilled {added} CurrentAssignment rows")
 
 
 class AssignmentHistory(models.Model):
@@ -0,0 +1,88 @@
+"""
+Batch resolution of Assignment's generic relations.
+
+`assignment.assignee` and `assignment.assigned_to` are GenericForeignKeys,
+so serializing a page of assignments used to cost one query per side per
+row, plus one more for every `driver.user` / `child.parent` the serializer
+touched afterwards.  resolve_assignment_entities() groups a batch by
+content type, loads each type with a single in_bulk() query (with the
+relations the serializers read joined in), and primes the GFK caches so
+the existing attribute access is served from memory.
+
+AssignmentSerializer(..., many=True) does this automatically; call it
+directly before looping over `ca.assignee` in views.  Passing `known`
+(the request identity map, see identity_map.py) reuses instances loaded
+earlier in the request and records the ones loaded now.
+"""
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+
+from .models import Assignment
+
+# Relations read from each entity type when it is serialized.
+SELECT_RELATED = {
+    'driver': ('user',),
+    'busminder': ('user',),
+    'child': ('parent__user',),
+}
+
+_SIDES = (
+    (Assignment.assignee, 'assignee_content_type_id', 'assignee_object_id'),
+    (Assignment.assigned_to, 'assigned_to_content_type_id', 'assigned_to_object_id'),
+)
+
+
+def resolve_assignment_entities(assignments, known=None, assigned_by=True):
+    """
+    Load the assignee, assigned_to and assigned_by of every assignment in
+    one query per content type.  Returns the assignments as a list.
+
+    `known` maps (content type id, pk) to instances that are used instead
+    of querying; newly loaded instances are added to it.  `assigned_by`
+    False leaves that relation lazy for callers that never read it.
+    """
+    assignments = list(assignments)
+    loaded = known if known is not None else {}
+
+    wanted = defaultdict(set)  # content type id -> object ids
+    for assignment in assignments:
+        for gfk, ct_attr, id_attr in _SIDES:
+            key = (getattr(assignment, ct_attr), getattr(assignment, id_attr))
+            if key[0] is not None and not gfk.is_cached(assignment) and key not in loaded:
+                wanted[key[0]].add(key[1])
+
+    for ct_id, ids in wanted.items():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None:
+            continue
+        queryset = model._default_manager.select_related(*SELECT_RELATED.get(model._meta.model_name, ()))
+        for pk, obj in queryset.in_bulk(ids).items():
+            loaded[(ct_id, pk)] = obj
+
+    for assignment in assignments:
+        for gfk, ct_attr, id_attr in _SIDES:
+            ct_id = getattr(assignment, ct_attr)
+            if ct_id is not None and not gfk.is_cached(assignment):
+                # Dangling references are cached as None rather than re-queried
+                gfk.set_cached_value(assignment, loaded.get((ct_id, getattr(assignment, id_attr))))
+
+    if assigned_by:
+        _resolve_assigned_by(assignments)
+    return assignments
+
+
+def _resolve_assigned_by(assignments):
+    field = Assignment._meta.get_field('assigned_by')
+    ids = {
+        a.assigned_by_id for a in assignments
+        if a.assigned_by_id is not None and not field.is_cached(a)
+    }
+    if not ids:
+        return
+    users = get_user_model()._default_manager.in_bulk(ids)
+    for assignment in assignments:
+        if assignment.assigned_by_id in ids:
+            field.set_cached_value(assignment, users.get(assignment.assigned_by_id))
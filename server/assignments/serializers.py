@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
 from .models import Assignment, BusRoute, AssignmentHistory
+from .resolvers import resolve_assignment_entities
 from buses.models import Bus
 from drivers.models import Driver
 from busminders.models import BusMinder
@@ -106,6 +107,14 @@ class BusRouteCreateSerializer(serializers.ModelSerializer):
         ]
 
 
+class AssignmentListSerializer(serializers.ListSerializer):
+    """Resolves the generic relations of the whole list before serializing it"""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return super().to_representation(resolve_assignment_entities(iterable))
+
+
 class AssignmentSerializer(serializers.ModelSerializer):
     """Full Assignment serializer - uses camelCase for frontend consistency"""
 
@@ -147,10 +156,11 @@ class AssignmentSerializer(serializers.ModelSerializer):
             'reason', 'notes', 'metadata',
             'isCurrentlyActive', 'updatedAt'
         ]
+        list_serializer_class = AssignmentListSerializer
 
     def get_assigneeType(self, obj):
         """Return human-readable assignee type"""
-        return obj.assignee_content_type.model
+        return ContentType.objects.get_for_id(obj.assignee_content_type_id).model
 
     def get_assigneeName(self, obj):
         """Return name of the assignee"""
@@ -210,7 +220,7 @@ class AssignmentSerializer(serializers.ModelSerializer):
 
     def get_assignedToType(self, obj):
         """Return human-readable assigned-to type"""
-        return obj.assigned_to_content_type.model
+        return ContentType.objects.get_for_id(obj.assigned_to_content_type_id).model
 
     def get_assignedToName(self, obj):
         """Return name of what's being assigned to"""
@@ -370,7 +380,7 @@ class AssignmentCreateSerializer(serializers.Serializer):
 class AssignmentHistorySerializer(serializers.ModelSerializer):
     """Serializer for assignment history - uses camelCase"""
 
-    assignmentId = serializers.IntegerField(source='assignment.id', read_only=True)
+    assignmentId = serializers.IntegerField(source='assignment_id', read_only=True)
     performedById = serializers.IntegerField(source='performed_by.id', read_only=True, allow_null=True)
     performedByName = serializers.SerializerMethodField()
     performedAt = serializers.DateTimeField(source='performed_at', read_only=True)
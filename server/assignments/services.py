@@ -4,12 +4,16 @@ Assignment service layer for business logic and complex operations.
 
 import logging
 from django.contrib.contenttypes.models import ContentType
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from .models import Assignment, BusRoute, AssignmentHistory
-from buses.models import Bus
+from .bulk import BulkAssignmentEngine
+from .expiry import expire_due_assignments
+from .intervals import is_overlap_violation, overlapping
+from .temporal import assignment_graph
+from .utilization import BusUtilization
 from drivers.models import Driver
 from busminders.models import BusMinder
 from children.models import Child
@@ -118,37 +122,47 @@ class AssignmentService:
                     )
                 })
 
-        # Create assignment
-        with transaction.atomic():
-            assignment = Assignment.objects.create(
-                assignment_type=assignment_type,
-                assignee_content_type=assignee_ct,
-                assignee_object_id=assignee.pk,
-                assigned_to_content_type=assigned_to_ct,
-                assigned_to_object_id=assigned_to.pk,
-                effective_date=effective_date,
-                expiry_date=expiry_date,
-                assigned_by=assigned_by,
-                status='active',
-                reason=reason,
-                notes=notes,
-                metadata=metadata
-            )
+        # Create assignment. On PostgreSQL the exclusion constraint catches
+        # a conflicting assignment committed concurrently since the check above.
+        try:
+            with transaction.atomic():
+                assignment = Assignment.objects.create(
+                    assignment_type=assignment_type,
+                    assignee_content_type=assignee_ct,
+                    assignee_object_id=assignee.pk,
+                    assigned_to_content_type=assigned_to_ct,
+                    assigned_to_object_id=assigned_to.pk,
+                    effective_date=effective_date,
+                    expiry_date=expiry_date,
+                    assigned_by=assigned_by,
+                    status='active',
+                    reason=reason,
+                    notes=notes,
+                    metadata=metadata
+                )
 
-            # Create history entry
-            AssignmentHistory.objects.create(
-                assignment=assignment,
-                action='created',
-                performed_by=assigned_by,
-                changes={
-                    'assignment_type': assignment_type,
-                    'assignee': str(assignee),
-                    'assigned_to': str(assigned_to),
-                    'effective_date': str(effective_date),
-                    'expiry_date': str(expiry_date) if expiry_date else None
-                },
-                notes=f"Assignment created: {reason}"
-            )
+                # Create history entry
+                AssignmentHistory.objects.create(
+                    assignment=assignment,
+                    action='created',
+                    performed_by=assigned_by,
+                    changes={
+                        'assignment_type': assignment_type,
+                        'assignee': str(assignee),
+                        'assigned_to': str(assigned_to),
+                        'effective_date': str(effective_date),
+                        'expiry_date': str(expiry_date) if expiry_date else None
+                    },
+                    notes=f"Assignment created: {reason}"
+                )
+        except IntegrityError as exc:
+            if not is_overlap_violation(exc):
+                raise
+            raise ValidationError({
+                'conflicts': [
+                    f"{assignee} already has an overlapping active {assignment_type} assignment"
+                ]
+            })
 
         return assignment
 
@@ -165,27 +179,11 @@ class AssignmentService:
         Returns:
             QuerySet of conflicting assignments
         """
-        from django.db.models import Q
-
         assignee_ct = ContentType.objects.get_for_model(assignee)
         assigned_to_ct = ContentType.objects.get_for_model(assigned_to)
 
-        # Build date range query
-        if expiry_date:
-            # New assignment has expiry date
-            date_conflict = (
-                Q(effective_date__lte=expiry_date, expiry_date__gte=effective_date) |
-                Q(effective_date__lte=expiry_date, expiry_date__isnull=True)
-            )
-        else:
-            # New assignment is permanent
-            date_conflict = (
-                Q(effective_date__lte=effective_date) &
-                (Q(expiry_date__gte=effective_date) | Q(expiry_date__isnull=True))
-            ) | Q(effective_date__gte=effective_date)
-
         # Find same assignee assigned to different entity of same type
-        conflicts = Assignment.objects.filter(
+        conflicts = overlapping(Assignment.objects.filter(
             assignment_type=assignment_type,
             assignee_content_type=assignee_ct,
             assignee_object_id=assignee.pk,
@@ -193,99 +191,57 @@ class AssignmentService:
             status='active'
         ).exclude(
             assigned_to_object_id=assigned_to.pk
-        ).filter(date_conflict)
+        ), effective_date, expiry_date)
 
         return conflicts
 
     @staticmethod
-    def bulk_assign_children_to_bus(bus, children_ids, assigned_by=None, effective_date=None, auto_cancel_conflicting=False):
+    def bulk_assign_children(target, children_ids, assigned_by=None, effective_date=None, replace=False):
         """
-        Bulk assign multiple children to a bus with capacity validation.
+        Assign a batch of children to a bus or route in one transaction,
+        validated and written set-wise (see assignments.bulk).
 
         Args:
-            bus: Bus instance
+            target: Bus or BusRoute instance
             children_ids: List of child IDs
             assigned_by: User making assignments
             effective_date: When assignments start
+            replace: Cancel the target's other current children first
 
         Returns:
-            List of created Assignment instances
+            BulkAssignmentResult with one ChildAssignmentResult per child
 
         Raises:
-            ValidationError: If capacity exceeded or children don't exist
+            ValidationError: If ids are invalid, children don't exist or
+            the batch exceeds the bus capacity
         """
-        # Basic input validation to prevent hard-to-debug errors further down
-        if not isinstance(children_ids, (list, tuple)):
-            raise ValidationError({
-                'children_ids': 'children_ids must be a list of child IDs'
-            })
-
-        if not children_ids:
-            raise ValidationError({
-                'children_ids': 'At least one child ID is required'
-            })
-
-        # Ensure all IDs are integers and there are no duplicates
-        try:
-            normalized_ids = [int(child_id) for child_id in children_ids]
-        except (TypeError, ValueError):
-            raise ValidationError({
-                'children_ids': 'children_ids must contain only integer IDs'
-            })
-
-        if len(normalized_ids) != len(set(normalized_ids)):
-            raise ValidationError({
-                'children_ids': 'Duplicate child IDs are not allowed in children_ids'
-            })
-
-        children_ids = normalized_ids
-
-        if effective_date is None:
-            effective_date = timezone.now().date()
-
-        # Get children
-        children = Child.objects.filter(id__in=children_ids)
+        return BulkAssignmentEngine(
+            target, assigned_by=assigned_by, effective_date=effective_date, replace=replace
+        ).run(children_ids)
 
-        if len(children) != len(children_ids):
-            raise ValidationError({
-                'children': 'One or more children not found'
-            })
+    @staticmethod
+    def bulk_assign_children_to_bus(bus, children_ids, assigned_by=None, effective_date=None, auto_cancel_conflicting=False):
+        """
+        Bulk assign multiple children to a bus with capacity validation.
 
-        # This is a REPLACE operation — validate only against the new list size
-        bus_capacity = getattr(bus, 'capacity', 0)
-        if len(children_ids) > bus_capacity:
-            raise ValidationError({
-                'capacity': (
-                    f'Bus capacity ({bus_capacity}) exceeded. '
-                    f'You selected {len(children_ids)} children but the bus only fits {bus_capacity}.'
-                )
-            })
+        This is a REPLACE operation: the bus's current children are
+        cancelled and the batch becomes its full list.
 
-        # Create assignments, cancelling all existing child_to_bus assignments
-        # for this bus first so this is a clean replace rather than an append.
-        assignments = []
-        with transaction.atomic():
-            # Cancel all current child assignments for this bus
-            existing = Assignment.get_assignments_to(bus, 'child_to_bus')
-            for existing_assignment in existing:
-                existing_assignment.cancel(
-                    cancelled_by=assigned_by,
-                    reason=f"Replaced by new bulk assignment to bus {bus.bus_number}"
-                )
+        Args:
+            bus: Bus instance
+            children_ids: List of child IDs
+            assigned_by: User making assignments
+            effective_date: When assignments start
 
-            for child in children:
-                assignment = AssignmentService.create_assignment(
-                    assignment_type='child_to_bus',
-                    assignee=child,
-                    assigned_to=bus,
-                    assigned_by=assigned_by,
-                    effective_date=effective_date,
-                    reason=f"Bulk assignment to bus {bus.bus_number}",
-                    auto_cancel_conflicting=True,
-                )
-                assignments.append(assignment)
+        Returns:
+            List of created Assignment instances
 
-        return assignments
+        Raises:
+            ValidationError: If capacity exceeded or children don't exist
+        """
+        return AssignmentService.bulk_assign_children(
+            bus, children_ids, assigned_by=assigned_by, effective_date=effective_date, replace=True
+        ).assignments
 
     @staticmethod
     def bulk_assign_children_to_route(route, children_ids, assigned_by=None, effective_date=None):
@@ -301,33 +257,9 @@ class AssignmentService:
         Returns:
             List of created Assignment instances
         """
-        if effective_date is None:
-            effective_date = timezone.now().date()
-
-        # Get children
-        children = Child.objects.filter(id__in=children_ids)
-
-        if len(children) != len(children_ids):
-            raise ValidationError({
-                'children': 'One or more children not found'
-            })
-
-        # Create assignments
-        assignments = []
-        with transaction.atomic():
-            for child in children:
-                assignment = AssignmentService.create_assignment(
-                    assignment_type='child_to_route',
-                    assignee=child,
-                    assigned_to=route,
-                    assigned_by=assigned_by,
-                    effective_date=effective_date,
-                    reason=f"Bulk assignment to route {route.route_code}",
-                    auto_cancel_conflicting=True
-                )
-                assignments.append(assignment)
-
-        return assignments
+        return AssignmentService.bulk_assign_children(
+            route, children_ids, assigned_by=assigned_by, effective_date=effective_date
+        ).assignments
 
     @staticmethod
     def get_entity_current_assignments(entity):
@@ -383,32 +315,20 @@ class AssignmentService:
     def expire_old_assignments():
         """
         Expire assignments that have passed their expiry date.
-        Should be run as a scheduled task (e.g., daily cron job).
+        Run daily from cron via the `expire_assignments` management command.
 
         Returns:
             Number of assignments expired
         """
-        today = timezone.now().date()
-
-        expired_assignments = Assignment.objects.filter(
-            status='active',
-            expiry_date__lt=today
-        )
+        return expire_due_assignments().expired
 
-        count = 0
-        with transaction.atomic():
-            for assignment in expired_assignments:
-                assignment.expire()
-                AssignmentHistory.objects.create(
-                    assignment=assignment,
-                    action='expired',
-                    performed_by=None,
-                    changes={'status': 'expired'},
-                    notes='Automatically expired by system'
-                )
-                count += 1
-
-        return count
+    @staticmethod
+    def get_assignment_graph(day):
+        """
+        Bus <-> driver, minder, route and children graph in effect on `day`,
+        built from assignment validity intervals in one query.
+        """
+        return assignment_graph(day)
 
     @staticmethod
     def get_route_statistics(route):
@@ -454,94 +374,12 @@ class AssignmentService:
         Get detailed utilization statistics for all buses including children and parent information.
 
         Returns:
-            List of dicts with bus utilization data
+            List of dicts with bus utilization data, busiest bus first.
+            Built set-based and cached; see assignments.utilization.
         """
         logger.info("Getting bus utilization statistics")
         try:
-            buses = Bus.objects.all()
-            logger.debug(f"Found {buses.count()} buses to process")
-            utilization = []
-
-            for bus in buses:
-                logger.debug(f"Processing bus: {bus.bus_number} (ID: {bus.id})")
-                # Get all child assignments for this bus
-                child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
-                child_count = child_assignments.count()
-
-                # Get driver assignment
-                driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-                driver = driver_assignment.assignee if driver_assignment else None
-
-                # Get minder assignment
-                minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
-                minder = minder_assignment.assignee if minder_assignment else None
-
-                # Get route assignment for this bus
-                route_assignment = Assignment.get_assignments_to(bus, 'bus_to_route').first()
-                route = route_assignment.assigned_to if route_assignment else None
-
-                # Build children list with parent information
-                children_list = []
-                for assignment in child_assignments:
-                    try:
-                        child = assignment.assignee
-                        if not child:
-                            continue  # Skip if child is None
-
-                        parent = child.parent if hasattr(child, 'parent') else None
-
-                        # Get parent name and phone safely
-                        parent_name = 'N/A'
-                        parent_phone = 'N/A'
-                        if parent:
-                            if hasattr(parent, 'user') and parent.user:
-                                parent_name = parent.user.get_full_name() or f"{parent.user.first_name} {parent.user.last_name}".strip() or 'N/A'
-                            parent_phone = getattr(parent, 'contact_number', 'N/A') or 'N/A'
-
-                        children_list.append({
-                            'id': child.id,
-                            'first_name': getattr(child, 'first_name', 'Unknown'),
-                            'last_name': getattr(child, 'last_name', 'Unknown'),
-                            'grade': getattr(child, 'grade', 'N/A'),
-                            'parent_name': parent_name,
-                            'parent_phone': parent_phone,
-                        })
-                    except Exception as e:
-                        # Log the error but continue processing other children
-                        logger.warning(f"Error processing child assignment {assignment.id} for bus {bus.bus_number}: {str(e)}")
-                        continue
-
-                utilization.append({
-                    'bus_id': bus.id,
-                    'bus_number': bus.bus_number,
-                    'license_plate': getattr(bus, 'number_plate', 'N/A'),
-                    'capacity': bus.capacity,
-                    'assigned_children': child_count,
-                    'available_seats': bus.capacity - child_count,
-                    'utilization_percentage': round((child_count / bus.capacity * 100), 2) if bus.capacity > 0 else 0,
-                    'driver': {
-                        'id': driver.user.id if driver else None,
-                        'first_name': driver.user.first_name if driver else None,
-                        'last_name': driver.user.last_name if driver else None,
-                        'phone': driver.user.email if driver else None,
-                    } if driver else None,
-                    'minder': {
-                        'id': minder.user.id if minder else None,
-                        'first_name': minder.user.first_name if minder else None,
-                        'last_name': minder.user.last_name if minder else None,
-                        'phone': minder.phone_number if minder and hasattr(minder, 'phone_number') else None,
-                    } if minder else None,
-                    'route': {
-                        'id': route.id if route else None,
-                        'name': route.name if route else None,
-                        'route_code': route.route_code if route else None,
-                    } if route else None,
-                    'children': children_list,
-                })
-
-            logger.info(f"Successfully processed {len(utilization)} buses")
-            return sorted(utilization, key=lambda x: x['utilization_percentage'], reverse=True)
-
+            return BusUtilization.get()
         except Exception as e:
             logger.error(f"Error in get_bus_utilization: {str(e)}", exc_info=True)
             raise ValidationError(f"Failed to get bus utilization: {str(e)}")
@@ -0,0 +1,162 @@
+"""
+Point-in-time assignment queries: "who was on bus X on date D?".
+
+Every Assignment row carries the days it was in effect as the half-open
+interval [effective_date, valid_to).  Assignment.save() and the bulk
+update paths maintain valid_to (see ended_valid_to() in models.py): the
+day after expiry_date while active, clipped to the day the assignment was
+cancelled or expired.  A row cancelled before it started has an empty
+interval; a NULL valid_to is open-ended.
+
+valid_on() narrows a queryset to the rows in effect on a day — on
+PostgreSQL as daterange(effective_date, valid_to, '[)') @> day, served by
+the GiST index installed after migrate (intervals.py); elsewhere as two
+comparisons over the (effective_date, valid_to) index.
+
+assignment_graph() builds the whole bus <-> driver, minder, route and
+children graph for a day from a single statement: the bus and the names
+of the linked entities are correlated subqueries, so nothing is replayed
+from AssignmentHistory and nothing is fetched per bus.
+"""
+
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import BooleanField, Case, DateField, F, Func, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast
+
+from buses.models import Bus
+from busminders.models import BusMinder
+from children.models import Child
+from drivers.models import Driver
+
+from .models import Assignment, BusRoute
+
+GRAPH_TYPES = ('driver_to_bus', 'minder_to_bus', 'child_to_bus', 'bus_to_route')
+
+# Which single-valued slot of a bus each type fills; children are a list
+SLOTS = {'driver_to_bus': 'driver', 'minder_to_bus': 'minder', 'bus_to_route': 'route'}
+
+
+class _Validity(Func):
+    function = 'daterange'
+    template = "%(function)s(%(expressions)s, '[)')"
+    # Only ever compared in SQL; Django has no range field without psycopg
+    output_field = DateField()
+
+
+class _Contains(Func):
+    arg_joiner = ' @> '
+    template = '(%(expressions)s)'
+    output_field = BooleanField()
+
+
+def valid_on(queryset, day):
+    """`queryset` narrowed to assignments in effect on `day`."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(
+            Q(valid_to__isnull=True) | Q(valid_to__gt=day),
+            effective_date__lte=day,
+        )
+    return queryset.filter(_Contains(
+        _Validity(F('effective_date'), F('valid_to')),
+        Cast(Value(day), DateField()),
+    ))
+
+
+def _name(column_by_type):
+    """CASE over assignment_type picking a name column of the linked entity."""
+    return Case(*(
+        When(assignment_type=assignment_type, then=Subquery(
+            model.objects.filter(pk=OuterRef('member_id')).values(column)[:1]
+        ))
+        for assignment_type, (model, column) in column_by_type.items()
+    ))
+
+
+def graph_rows(day):
+    """One row per assignment in effect on `day`, with bus and member names."""
+    is_route = Q(assignment_type='bus_to_route')
+    return valid_on(
+        Assignment.objects.filter(assignment_type__in=GRAPH_TYPES), day
+    ).annotate(
+        bus_id=Case(When(is_route, then=F('assignee_object_id')), default=F('assigned_to_object_id')),
+        member_id=Case(When(is_route, then=F('assigned_to_object_id')), default=F('assignee_object_id')),
+    ).annotate(
+        bus_number=Subquery(Bus.objects.filter(pk=OuterRef('bus_id')).values('bus_number')[:1]),
+        first_name=_name({
+            'driver_to_bus': (Driver, 'user__first_name'),
+            'minder_to_bus': (BusMinder, 'user__first_name'),
+            'child_to_bus': (Child, 'first_name'),
+            'bus_to_route': (BusRoute, 'name'),
+        }),
+        last_name=_name({
+            'driver_to_bus': (Driver, 'user__last_name'),
+            'minder_to_bus': (BusMinder, 'user__last_name'),
+            'child_to_bus': (Child, 'last_name'),
+            'bus_to_route': (BusRoute, 'route_code'),
+        }),
+    ).order_by('bus_id', 'effective_date', 'id').values(
+        'id', 'assignment_type', 'status', 'effective_date', 'expiry_date',
+        'bus_id', 'bus_number', 'member_id', 'first_name', 'last_name',
+    )
+
+
+def assignment_graph(day):
+    """
+    The bus <-> driver, minder, route and children graph in effect on
+    `day`, one entry per bus that had any of them, ordered by bus id.
+    """
+    buses = {}
+    for row in graph_rows(day):
+        bus = buses.setdefault(row['bus_id'], {
+            'busId': row['bus_id'],
+            'busNumber': row['bus_number'],
+            'driver': None,
+            'minder': None,
+            'route': None,
+            'children': [],
+        })
+        assignment = {
+            'assignmentId': row['id'],
+            'status': row['status'],
+            'effectiveDate': row['effective_date'],
+            'expiryDate': row['expiry_date'],
+        }
+        if row['assignment_type'] == 'bus_to_route':
+            member = {'id': row['member_id'], 'name': row['first_name'], 'routeCode': row['last_name']}
+        else:
+            member = {'id': row['member_id'], 'firstName': row['first_name'], 'lastName': row['last_name']}
+
+        slot = SLOTS.get(row['assignment_type'])
+        if slot is None:
+            bus['children'].append({**member, **assignment})
+        else:
+            # Rows come oldest first, so a later assignment on the same day wins
+            bus[slot] = {**member, **assignment}
+    return list(buses.values())
+
+
+def backfill_valid_to(chunk_size=1000):
+    """
+    Fill valid_to on rows written before it existed.  Ended rows take
+    updated_at as the day they stopped (the best record there is), clipped
+    to their expiry.  Returns the number of rows updated.
+    """
+    updated = 0
+    while True:
+        # Active permanent rows are correctly open-ended with a NULL valid_to
+        chunk = list(Assignment.objects.filter(valid_to__isnull=True).exclude(
+            status='active', expiry_date__isnull=True
+        ).order_by('pk')[:chunk_size])
+        if not chunk:
+            return updated
+        for assignment in chunk:
+            if assignment.status != 'active':
+                ended = assignment.updated_at.date()
+                if assignment.expiry_date:
+                    ended = min(ended, assignment.expiry_date + timedelta(days=1))
+                assignment.valid_to = ended
+            assignment.valid_to = assignment._compute_valid_to()
+        Assignment.objects.bulk_update(chunk, ['valid_to'])
+        updated += len(chunk)
@@ -9,6 +9,7 @@ from .views import (
     ChildAssignmentsView,
     ParentChildrenAssignmentsView,
     MinderAssignmentsView,
+    AssignmentsAsOfView,
     QuickAssignView
 )
 
@@ -43,6 +44,9 @@ urlpatterns = [
     # Convenience endpoints - Minder
     path('minder/<int:minder_id>/buses/', MinderAssignmentsView.as_view(), name='minder-buses'),
 
+    # Point-in-time state
+    path('as-of/', AssignmentsAsOfView.as_view(), name='assignments-as-of'),
+
     # Quick assignment endpoints
     path('quick/<str:assignment_type>/', QuickAssignView.as_view(), name='quick-assign'),
 ]
@@ -0,0 +1,168 @@
+"""
+Fleet-wide bus utilization report.
+
+The report used to walk every bus and run four Assignment queries per bus
+plus one per child to dereference the child, parent and parent user.  It
+is now built from three set-based queries against CurrentAssignment,
+whatever the fleet size:
+
+    1. buses, with their assigned-children count aggregated
+    2. driver / minder / route of every bus
+    3. every assigned child joined with its parent and parent user
+
+The result is cached under `assignments:bus_utilization` and dropped
+whenever an assignment or bus is saved or deleted.  Edits to people's
+names only show up after BUS_UTILIZATION_CACHE_TTL.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from buses.models import Bus
+
+from .models import Assignment, CurrentAssignment
+
+CACHE_KEY = 'assignments:bus_utilization'
+DEFAULT_CACHE_TTL = 300
+
+CREW_TYPES = ('driver_to_bus', 'minder_to_bus', 'bus_to_route')
+
+
+def _window(on, prefix=''):
+    return (
+        Q(**{f'{prefix}effective_date__lte': on})
+        & (Q(**{f'{prefix}expiry_date__isnull': True}) | Q(**{f'{prefix}expiry_date__gte': on}))
+    )
+
+
+class BusUtilization:
+    """Build, cache and invalidate the bus utilization report."""
+
+    @staticmethod
+    def get():
+        report = cache.get(CACHE_KEY)
+        if report is None:
+            report = BusUtilization.compute()
+            cache.set(CACHE_KEY, report, getattr(settings, 'BUS_UTILIZATION_CACHE_TTL', DEFAULT_CACHE_TTL))
+        return report
+
+    @staticmethod
+    def invalidate():
+        cache.delete(CACHE_KEY)
+        # Again after commit, in case a reader cached the pre-commit state meanwhile
+        transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+    @staticmethod
+    def compute(on=None):
+        """The report for every bus, busiest first.  Three queries."""
+        on = on or timezone.now().date()
+
+        buses = Bus.objects.annotate(assigned_children=Count(
+            'current_assignments',
+            filter=Q(current_assignments__assignment_type='child_to_bus') & _window(on, 'current_assignments__'),
+        )).values('id', 'bus_number', 'number_plate', 'capacity', 'assigned_children')
+
+        crew = defaultdict(dict)  # bus id -> assignment type -> row
+        for row in (
+            CurrentAssignment.objects.filter(_window(on), assignment_type__in=CREW_TYPES)
+            .order_by('-assignment__assigned_at')
+            .values(
+                'bus_id', 'assignment_type',
+                'driver__user_id', 'driver__user__first_name', 'driver__user__last_name', 'driver__user__email',
+                'minder__user_id', 'minder__user__first_name', 'minder__user__last_name', 'minder__phone_number',
+                'route_id', 'route__name', 'route__route_code',
+            )
+        ):
+            # Most recent assignment of each type wins, as .first() did
+            crew[row['bus_id']].setdefault(row['assignment_type'], row)
+
+        children = defaultdict(list)
+        for row in (
+            CurrentAssignment.objects.filter(_window(on), assignment_type='child_to_bus')
+            .order_by('-assignment__assigned_at')
+            .values(
+                'bus_id', 'child_id', 'child__first_name', 'child__last_name', 'child__class_grade',
+                'child__parent__user__first_name', 'child__parent__user__last_name',
+                'child__parent__contact_number', 'child__parent_id',
+            )
+        ):
+            children[row['bus_id']].append(_child(row))
+
+        utilization = []
+        for bus in buses:
+            count, capacity = bus['assigned_children'], bus['capacity']
+            roles = crew.get(bus['id'], {})
+            utilization.append({
+                'bus_id': bus['id'],
+                'bus_number': bus['bus_number'],
+                'license_plate': bus['number_plate'],
+                'capacity': capacity,
+                'assigned_children': count,
+                'available_seats': capacity - count,
+                'utilization_percentage': round((count / capacity * 100), 2) if capacity > 0 else 0,
+                'driver': _driver(roles.get('driver_to_bus')),
+                'minder': _minder(roles.get('minder_to_bus')),
+                'route': _route(roles.get('bus_to_route')),
+                'children': children.get(bus['id'], []),
+            })
+
+        return sorted(utilization, key=lambda x: x['utilization_percentage'], reverse=True)
+
+
+def _driver(row):
+    if row is None:
+        return None
+    return {
+        'id': row['driver__user_id'],
+        'first_name': row['driver__user__first_name'],
+        'last_name': row['driver__user__last_name'],
+        'phone': row['driver__user__email'],
+    }
+
+
+def _minder(row):
+    if row is None:
+        return None
+    return {
+        'id': row['minder__user_id'],
+        'first_name': row['minder__user__first_name'],
+        'last_name': row['minder__user__last_name'],
+        'phone': row['minder__phone_number'],
+    }
+
+
+def _route(row):
+    if row is None:
+        return None
+    return {'id': row['route_id'], 'name': row['route__name'], 'route_code': row['route__route_code']}
+
+
+def _child(row):
+    parent_name = parent_phone = 'N/A'
+    if row['child__parent_id'] is not None:
+        full_name = f"{row['child__parent__user__first_name'] or ''} {row['child__parent__user__last_name'] or ''}"
+        parent_name = full_name.strip() or 'N/A'
+        parent_phone = row['child__parent__contact_number'] or 'N/A'
+    return {
+        'id': row['child_id'],
+        'first_name': row['child__first_name'],
+        'last_name': row['child__last_name'],
+        'grade': row['child__class_grade'] or 'N/A',
+        'parent_name': parent_name,
+        'parent_phone': parent_phone,
+    }
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_delete, sender=Assignment)
+@receiver(post_save, sender=Bus)
+@receiver(post_delete, sender=Bus)
+def invalidate_bus_utilization(sender, **kwargs):
+    BusUtilization.invalidate()
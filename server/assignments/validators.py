@@ -2,8 +2,10 @@
 Validators for assignment business rules and constraints.
 """
 
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from .intervals import overlapping
 from .models import Assignment
 
 
@@ -44,26 +46,12 @@ class AssignmentValidator:
         Raises:
             ValidationError: If driver is already assigned
         """
-        from django.db.models import Q
-
-        # Check for overlapping assignments
-        existing = Assignment.objects.filter(
-            assignee_content_type__model='driver',
+        existing = overlapping(Assignment.objects.filter(
+            assignee_content_type=ContentType.objects.get_for_model(driver),
             assignee_object_id=driver.pk,
             assignment_type__in=['driver_to_bus', 'driver_to_route'],
             status='active'
-        )
-
-        if expiry_date:
-            existing = existing.filter(
-                Q(effective_date__lte=expiry_date, expiry_date__gte=effective_date) |
-                Q(effective_date__lte=expiry_date, expiry_date__isnull=True)
-            )
-        else:
-            existing = existing.filter(
-                Q(effective_date__lte=effective_date) &
-                (Q(expiry_date__gte=effective_date) | Q(expiry_date__isnull=True))
-            )
+        ), effective_date, expiry_date)
 
         if existing.exists():
             assignments = ", ".join([
@@ -87,25 +75,12 @@ class AssignmentValidator:
         Raises:
             ValidationError: If minder is already assigned
         """
-        from django.db.models import Q
-
-        existing = Assignment.objects.filter(
-            assignee_content_type__model='busminder',
+        existing = overlapping(Assignment.objects.filter(
+            assignee_content_type=ContentType.objects.get_for_model(minder),
             assignee_object_id=minder.pk,
             assignment_type__in=['minder_to_bus', 'minder_to_route'],
             status='active'
-        )
-
-        if expiry_date:
-            existing = existing.filter(
-                Q(effective_date__lte=expiry_date, expiry_date__gte=effective_date) |
-                Q(effective_date__lte=expiry_date, expiry_date__isnull=True)
-            )
-        else:
-            existing = existing.filter(
-                Q(effective_date__lte=effective_date) &
-                (Q(expiry_date__gte=effective_date) | Q(expiry_date__isnull=True))
-            )
+        ), effective_date, expiry_date)
 
         if existing.exists():
             assignments = ", ".join([
@@ -129,25 +104,12 @@ class AssignmentValidator:
         Raises:
             ValidationError: If child is already assigned
         """
-        from django.db.models import Q
-
-        existing = Assignment.objects.filter(
-            assignee_content_type__model='child',
+        existing = overlapping(Assignment.objects.filter(
+            assignee_content_type=ContentType.objects.get_for_model(child),
             assignee_object_id=child.pk,
             assignment_type__in=['child_to_bus', 'child_to_route'],
             status='active'
-        )
-
-        if expiry_date:
-            existing = existing.filter(
-                Q(effective_date__lte=expiry_date, expiry_date__gte=effective_date) |
-                Q(effective_date__lte=expiry_date, expiry_date__isnull=True)
-            )
-        else:
-            existing = existing.filter(
-                Q(effective_date__lte=effective_date) &
-                (Q(expiry_date__gte=effective_date) | Q(expiry_date__isnull=True))
-            )
+        ), effective_date, expiry_date)
 
         if existing.exists():
             assignments = ", ".join([
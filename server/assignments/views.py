@@ -1,4 +1,5 @@
 import logging
+from datetime import date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -8,6 +9,7 @@ from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.exceptions import ValidationError
 from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 
 from .models import Assignment, BusRoute, AssignmentHistory
 
@@ -19,6 +21,7 @@ from .serializers import (
     BusRouteCreateSerializer,
     AssignmentHistorySerializer
 )
+from .resolvers import resolve_assignment_entities
 from .services import AssignmentService
 from .validators import AssignmentValidator
 from buses.models import Bus
@@ -30,6 +33,28 @@ from children.serializers import ChildSerializer
 from parents.models import Parent
 
 
+def _bus_crew(bus):
+    """The bus's current driver and minder assignments, people loaded in one batch."""
+    crew = {}
+    assignments = Assignment.get_assignments_to(bus).filter(assignment_type__in=['driver_to_bus', 'minder_to_bus'])
+    for assignment in resolve_assignment_entities(assignments):
+        crew.setdefault(assignment.assignment_type, assignment)
+    return crew.get('driver_to_bus'), crew.get('minder_to_bus')
+
+
+def _bulk_results(result):
+    """Per-child outcome of a bulk assignment, for the response."""
+    return [
+        {
+            'childId': child.child_id,
+            'assignmentId': child.assignment.id,
+            'cancelledAssignmentIds': child.cancelled_ids,
+            'expiredAssignmentIds': child.expired_ids,
+        }
+        for child in result.results
+    ]
+
+
 class BusRouteViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing bus routes.
@@ -184,7 +209,7 @@ class AssignmentViewSet(viewsets.ModelViewSet):
     def history(self, request, pk=None):
         """Get history for this assignment"""
         assignment = self.get_object()
-        history = assignment.history.all()
+        history = assignment.history.select_related('performed_by')
         serializer = AssignmentHistorySerializer(history, many=True)
         return Response(serializer.data)
 
@@ -231,18 +256,21 @@ class AssignmentViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            assignments = AssignmentService.bulk_assign_children_to_bus(
-                bus=bus,
-                children_ids=children_ids,
+            result = AssignmentService.bulk_assign_children(
+                bus,
+                children_ids,
                 assigned_by=request.user if request.user.is_authenticated else None,
-                effective_date=effective_date
+                effective_date=effective_date,
+                replace=True
             )
+            assignments = result.assignments
 
             logger.info(f"Successfully bulk assigned {len(assignments)} children to bus {bus.bus_number}")
             serializer = AssignmentSerializer(assignments, many=True)
             return Response({
                 'message': f'Successfully assigned {len(assignments)} children to bus {bus.bus_number}',
-                'assignments': serializer.data
+                'assignments': serializer.data,
+                'results': _bulk_results(result)
             }, status=status.HTTP_201_CREATED)
 
         except DjangoValidationError as e:
@@ -295,17 +323,19 @@ class AssignmentViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            assignments = AssignmentService.bulk_assign_children_to_route(
-                route=route,
-                children_ids=children_ids,
+            result = AssignmentService.bulk_assign_children(
+                route,
+                children_ids,
                 assigned_by=request.user if request.user.is_authenticated else None,
                 effective_date=effective_date
             )
+            assignments = result.assignments
 
             serializer = AssignmentSerializer(assignments, many=True)
             return Response({
                 'message': f'Successfully assigned {len(assignments)} children to route {route.route_code}',
-                'assignments': serializer.data
+                'assignments': serializer.data,
+                'results': _bulk_results(result)
             }, status=status.HTTP_201_CREATED)
 
         except DjangoValidationError as e:
@@ -425,7 +455,7 @@ class AssignmentHistoryViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Filter history based on query parameters"""
-        queryset = AssignmentHistory.objects.order_by('-id')
+        queryset = AssignmentHistory.objects.select_related('performed_by').order_by('-id')
 
         # Filter by assignment ID
         assignment_id = self.request.query_params.get('assignmentId')
@@ -500,7 +530,7 @@ class DriverAssignmentsView(APIView):
             bus = assignment.assigned_to
             child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
 
-            children = [ca.assignee for ca in child_assignments]
+            children = [ca.assignee for ca in resolve_assignment_entities(child_assignments)]
 
             return Response({
                 'bus': BusSerializer(bus).data,
@@ -556,7 +586,7 @@ class BusAssignmentsView(APIView):
         if query_type == 'children':
             # Get children on this bus
             child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
-            children = [ca.assignee for ca in child_assignments]
+            children = [ca.assignee for ca in resolve_assignment_entities(child_assignments)]
 
             return Response({
                 'bus': BusSerializer(bus).data,
@@ -613,13 +643,13 @@ class BusAssignmentsView(APIView):
             })
 
         elif query_type == 'all':
-            # Get all assignments for this bus
-            assignments = Assignment.get_assignments_to(bus)
+            # Get all assignments for this bus, with every assignee loaded per type
+            assignments = resolve_assignment_entities(Assignment.get_assignments_to(bus))
 
             # Organize by type
-            driver_assignment = assignments.filter(assignment_type='driver_to_bus').first()
-            minder_assignment = assignments.filter(assignment_type='minder_to_bus').first()
-            child_assignments = assignments.filter(assignment_type='child_to_bus')
+            driver_assignment = next((a for a in assignments if a.assignment_type == 'driver_to_bus'), None)
+            minder_assignment = next((a for a in assignments if a.assignment_type == 'minder_to_bus'), None)
+            child_assignments = [a for a in assignments if a.assignment_type == 'child_to_bus']
 
             driver = driver_assignment.assignee if driver_assignment else None
             minder = minder_assignment.assignee if minder_assignment else None
@@ -689,8 +719,7 @@ class ChildAssignmentsView(APIView):
             bus = assignment.assigned_to
 
             # Get driver and minder for the bus
-            driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-            minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
+            driver_assignment, minder_assignment = _bus_crew(bus)
 
             return Response({
                 'child': ChildSerializer(child).data,
@@ -765,8 +794,7 @@ class ParentChildrenAssignmentsView(APIView):
                 bus = bus_assignment.assigned_to
 
                 # Get driver and minder
-                driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-                minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
+                driver_assignment, minder_assignment = _bus_crew(bus)
 
                 child_info['bus'] = BusSerializer(bus).data
                 child_info['driver'] = {
@@ -820,7 +848,7 @@ class MinderAssignmentsView(APIView):
             )
 
         # Get all bus assignments for this minder
-        assignments = Assignment.get_active_assignments_for(minder, 'minder_to_bus')
+        assignments = resolve_assignment_entities(Assignment.get_active_assignments_for(minder, 'minder_to_bus'))
 
         buses_data = []
         for assignment in assignments:
@@ -850,6 +878,34 @@ class MinderAssignmentsView(APIView):
         })
 
 
+class AssignmentsAsOfView(APIView):
+    """
+    Point-in-time assignment state, for incident investigation and history.
+
+    Endpoints:
+    - GET /api/assignments/as-of/?date=YYYY-MM-DD - Bus <-> driver, minder,
+      route and children graph in effect on that date (default: today)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        raw_date = request.query_params.get('date')
+        try:
+            day = date.fromisoformat(raw_date) if raw_date else timezone.now().date()
+        except ValueError:
+            return Response(
+                {'error': 'date must be a YYYY-MM-DD date'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        buses = AssignmentService.get_assignment_graph(day)
+        return Response({
+            'date': day,
+            'buses': buses,
+            'count': len(buses),
+        })
+
+
 class QuickAssignView(APIView):
     """
     Quick assignment endpoints for common operations.
@@ -280,22 +280,23 @@ class BusLocationConsumer(AsyncWebsocketConsumer):
 
     async def _broadcast_etas(self, bus_id, bus_lat, bus_lng):
         """
-        Compute cumulative, trip-type-aware ETAs using the Mapbox Directions API
-        with sequential waypoints: bus → stop1 → stop2 → … → stopN.
-
-        Using the Directions API (not Matrix) means each child's ETA correctly
-        includes the time the bus spends visiting all earlier stops first:
+        Compute cumulative, trip-type-aware ETAs along the remaining stops:
+        bus → stop1 → stop2 → … → stopN, so each child's ETA includes the
+        time the bus spends visiting all earlier stops first:
 
           ETA(child at stop_i) = Σ leg_durations[0 … i−1]
 
+        Only the first leg starts from the moving bus, so only it is asked of
+        the Mapbox Directions API (when a token is set).  The stop-to-stop
+        legs come from the persistent route matrix (trips.route_matrix),
+        which trip start already filled for these homes.
+
         Stop order is driven by the 'order' DB field, which encodes trip intent:
           pickup  — farthest-from-school stop first, nearest-to-school last.
           dropoff — nearest-to-school stop first, farthest last.
         """
         from django.conf import settings
         token = getattr(settings, "MAPBOX_ACCESS_TOKEN", "")
-        if not token:
-            return
 
         trip_data = await self._get_trip_remaining_stops(bus_id)
         trip_type = trip_data["trip_type"]
@@ -303,47 +304,44 @@ class BusLocationConsumer(AsyncWebsocketConsumer):
         if not stops:
             return
 
-        # Mapbox Directions allows up to 25 waypoints (bus + 24 stops).
-        capped_stops = stops[:24]
-
-        # Waypoints: bus position first, then stops in route order.
-        waypoints = [f"{bus_lng},{bus_lat}"] + [
-            f"{s['lng']},{s['lat']}" for s in capped_stops
-        ]
-        coords_str = ";".join(waypoints)
+        first = stops[0]
         url = (
-            f"https://api.mapbox.com/directions/v5/mapbox/driving/{coords_str}"
+            f"https://api.mapbox.com/directions/v5/mapbox/driving/"
+            f"{bus_lng},{bus_lat};{first['lng']},{first['lat']}"
             f"?access_token={token}&overview=false"
         )
 
-        def _sync_directions():
+        def _sync_first_leg():
             try:
                 resp = req_lib.get(url, timeout=8.0)
                 if resp.status_code != 200:
-                    return {}
+                    return None
                 routes = resp.json().get("routes", [])
-                if not routes:
-                    return {}
-                legs = routes[0].get("legs", [])
-                etas = {}
-                cumulative_secs = 0.0
-                for i, stop in enumerate(capped_stops):
-                    if i < len(legs):
-                        cumulative_secs += legs[i].get("duration", 0)
-                    # All children at this stop share the same cumulative ETA.
-                    for child_id in stop["child_ids"]:
-                        etas[str(child_id)] = int(cumulative_secs)
-                return etas
+                return routes[0].get("duration") if routes else None
             except Exception:
-                return {}
+                return None
 
-        etas = await asyncio.to_thread(_sync_directions)
+        first_leg = await asyncio.to_thread(_sync_first_leg) if token else None
+        offsets = await self._eta_offsets(
+            (bus_lat, bus_lng), [(s["lat"], s["lng"]) for s in stops], first_leg,
+        )
+
+        etas = {}
+        for stop, offset in zip(stops, offsets):
+            # All children at this stop share the same cumulative ETA.
+            for child_id in stop["child_ids"]:
+                etas[str(child_id)] = int(offset)
         if etas:
             await self.channel_layer.group_send(
                 self.group_name,
                 {"type": "bus.eta", "etas": etas, "trip_type": trip_type},
             )
 
+    @database_sync_to_async
+    def _eta_offsets(self, origin, points, first_leg):
+        from trips.route_matrix import eta_offsets
+        return eta_offsets(origin, points, first_leg)
+
     @database_sync_to_async
     def _get_trip_remaining_stops(self, bus_id):
         """
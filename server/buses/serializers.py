@@ -1,13 +1,59 @@
 from datetime import date
 
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Bus, BusLocationHistory
 from django.contrib.auth import get_user_model
-from assignments.models import Assignment
+from assignments.models import CurrentAssignment
 
 User = get_user_model()
 
 
+def with_current_assignments(queryset, on=None):
+    """
+    Annotate a Bus queryset with everything BusSerializer reads from the
+    Assignment API, so a page of buses costs two queries however long it
+    is: the buses with their driver, minder and route joined in as
+    subqueries, plus one prefetch of their children.  BusSerializer falls
+    back to per-bus lookups for instances that were not loaded this way.
+    """
+    on = on or timezone.now().date()
+    window = Q(effective_date__lte=on) & (Q(expiry_date__isnull=True) | Q(expiry_date__gte=on))
+
+    def current(assignment_type, *fields):
+        rows = CurrentAssignment.objects.filter(
+            window, bus=OuterRef('pk'), assignment_type=assignment_type
+        ).order_by('-assignment__assigned_at')
+        return [Subquery(rows.values(field)[:1]) for field in fields]
+
+    driver_id, driver_first, driver_last = current(
+        'driver_to_bus', 'driver_id', 'driver__user__first_name', 'driver__user__last_name')
+    minder_id, minder_first, minder_last = current(
+        'minder_to_bus', 'minder_id', 'minder__user__first_name', 'minder__user__last_name')
+    route_id, route_name = current('bus_to_route', 'route_id', 'route__name')
+
+    return queryset.annotate(
+        current_driver_id=driver_id,
+        current_driver_first_name=driver_first,
+        current_driver_last_name=driver_last,
+        current_minder_id=minder_id,
+        current_minder_first_name=minder_first,
+        current_minder_last_name=minder_last,
+        current_route_id=route_id,
+        current_route_name=route_name,
+    ).prefetch_related(Prefetch(
+        'current_assignments',
+        queryset=CurrentAssignment.objects.filter(window, assignment_type='child_to_bus')
+        .order_by('-assignment__assigned_at').only('assignment_id', 'bus_id', 'child_id'),
+        to_attr='current_children',
+    ))
+
+
+def _full_name(person_id, first_name, last_name):
+    return f"{first_name} {last_name}" if person_id is not None else None
+
+
 class BusSerializer(serializers.ModelSerializer):
     """Full bus serializer - uses camelCase for frontend consistency
 
@@ -45,51 +91,61 @@ class BusSerializer(serializers.ModelSerializer):
 
     def get_driverId(self, obj):
         """Get driver ID from Assignment API"""
-        driver_assignment = Assignment.get_assignments_to(obj, 'driver_to_bus').first()
-        return driver_assignment.assignee.user_id if driver_assignment and driver_assignment.assignee else None
+        if hasattr(obj, 'current_driver_id'):
+            return obj.current_driver_id
+        driver = CurrentAssignment.related(obj, 'driver').first()
+        return driver.user_id if driver else None
 
     def get_driverName(self, obj):
         """Get driver name from Assignment API"""
-        driver_assignment = Assignment.get_assignments_to(obj, 'driver_to_bus').first()
-        if driver_assignment and driver_assignment.assignee:
-            driver = driver_assignment.assignee
+        if hasattr(obj, 'current_driver_id'):
+            return _full_name(obj.current_driver_id, obj.current_driver_first_name, obj.current_driver_last_name)
+        driver = CurrentAssignment.related(obj, 'driver').select_related('user').first()
+        if driver:
             return f"{driver.user.first_name} {driver.user.last_name}"
         return None
 
     def get_minderId(self, obj):
         """Get minder ID from Assignment API"""
-        minder_assignment = Assignment.get_assignments_to(obj, 'minder_to_bus').first()
-        return minder_assignment.assignee.user_id if minder_assignment and minder_assignment.assignee else None
+        if hasattr(obj, 'current_minder_id'):
+            return obj.current_minder_id
+        minder = CurrentAssignment.related(obj, 'minder').first()
+        return minder.user_id if minder else None
 
     def get_minderName(self, obj):
         """Get minder name from Assignment API"""
-        minder_assignment = Assignment.get_assignments_to(obj, 'minder_to_bus').first()
-        if minder_assignment and minder_assignment.assignee:
-            minder = minder_assignment.assignee
+        if hasattr(obj, 'current_minder_id'):
+            return _full_name(obj.current_minder_id, obj.current_minder_first_name, obj.current_minder_last_name)
+        minder = CurrentAssignment.related(obj, 'minder').select_related('user').first()
+        if minder:
             return f"{minder.user.first_name} {minder.user.last_name}"
         return None
 
     def get_assignedChildrenCount(self, obj):
         """Get children count from Assignment API"""
-        child_assignments = Assignment.get_assignments_to(obj, 'child_to_bus')
-        return child_assignments.count()
+        if hasattr(obj, 'current_children'):
+            return len(obj.current_children)
+        return CurrentAssignment.related(obj, 'child').count()
 
     def get_assignedChildrenIds(self, obj):
         """Get list of child IDs from Assignment API"""
-        child_assignments = Assignment.get_assignments_to(obj, 'child_to_bus')
-        return [ca.assignee_object_id for ca in child_assignments]
+        if hasattr(obj, 'current_children'):
+            return [row.child_id for row in obj.current_children]
+        return list(CurrentAssignment.related(obj, 'child').values_list('id', flat=True))
 
     def get_routeId(self, obj):
         """Get the route this bus is assigned to (bus_to_route, bus is assignee)"""
-        route_assignment = Assignment.get_active_assignments_for(obj, 'bus_to_route').first()
-        return route_assignment.assigned_to.id if route_assignment and route_assignment.assigned_to else None
+        if hasattr(obj, 'current_route_id'):
+            return obj.current_route_id
+        route = CurrentAssignment.related(obj, 'route').first()
+        return route.id if route else None
 
     def get_routeName(self, obj):
         """Get the route name this bus is assigned to"""
-        route_assignment = Assignment.get_active_assignments_for(obj, 'bus_to_route').first()
-        if route_assignment and route_assignment.assigned_to:
-            return route_assignment.assigned_to.name
-        return None
+        if hasattr(obj, 'current_route_id'):
+            return obj.current_route_name
+        route = CurrentAssignment.related(obj, 'route').first()
+        return route.name if route else None
 
     def get_status(self, obj):
         """Convert is_active boolean to status string for frontend"""
@@ -37,7 +37,8 @@ from .serializers import (
     BusSerializer,
     BusCreateSerializer,
     PushLocationSerializer,
-    CurrentLocationSerializer
+    CurrentLocationSerializer,
+    with_current_assignments
 )
 from .permissions import IsAdminOrReadOnly, CanManageBusAssignments
 from children.models import Child
@@ -121,6 +122,11 @@ class BusViewSet(viewsets.ModelViewSet):
         """
         queryset = super().get_queryset()
 
+        # Driver, minder, route and children come from the Assignment API;
+        # load them for the whole page up front instead of per bus.
+        if self.action in ('list', 'retrieve'):
+            queryset = with_current_assignments(queryset)
+
         # Future: Add filtering logic based on user role
         # if self.request.user.user_type == 'driver':
         #     return queryset.filter(driver=self.request.user)
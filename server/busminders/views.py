@@ -416,6 +416,7 @@ def start_trip_busminder(request):
     from trips.serializers import TripSerializer
     from assignments.models import Assignment, BusRoute
     from django.utils import timezone
+    from drivers.views import _broadcast_trip_started
 
     try:
         busminder = BusMinder.objects.get(user=request.user)
@@ -443,6 +444,20 @@ def start_trip_busminder(request):
 
     trip_type = request.data.get('trip_type', 'pickup')
 
+    # Pre-generated trip (generate_scheduled_trips): just flip its status.
+    from trips.scheduling import find_scheduled_trip
+    trip = find_scheduled_trip(bus, trip_type)
+    if trip:
+        trip.status = 'in-progress'
+        trip.start_time = timezone.now()
+        trip.bus_minder = request.user
+        trip.save(update_fields=['status', 'start_time', 'bus_minder', 'updated_at'])
+        _broadcast_trip_started(bus, trip)
+        return Response({
+            "message": "Trip started successfully",
+            "trip": TripSerializer(trip).data
+        }, status=status.HTTP_201_CREATED)
+
     # Find the driver assigned to this bus
     driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
     if not driver_assignment:
@@ -489,30 +504,22 @@ def start_trip_busminder(request):
         route=route_name,
     )
 
-    for child_assignment in child_assignments:
-        trip.children.add(child_assignment.assignee)
+    # Same template clone as drivers.views.start_trip, so minder-started
+    # trips get stops too.
+    from trips.stop_templates import StopTemplateService
+    import threading
+
+    stops_created = StopTemplateService.populate_trip(trip, bus)
+    if stops_created >= 2:
+        from trips.views import _optimize_trip_stops_background
+        threading.Thread(
+            target=_optimize_trip_stops_background,
+            args=(trip.id,),
+            daemon=True,
+        ).start()
 
     # Notify parents via WebSocket
-    try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"bus_{bus.id}",
-            {
-                "type": "bus.trip_event",
-                "event_type": "trip_started",
-                "trip_id": trip.id,
-                "trip_type": trip.trip_type,
-                "scheduled_time": trip.scheduled_time.isoformat() if trip.scheduled_time else None,
-                "bus_latitude": float(bus.latitude) if bus.latitude else None,
-                "bus_longitude": float(bus.longitude) if bus.longitude else None,
-                "bus_speed": float(bus.speed) if bus.speed else 0.0,
-                "bus_heading": float(bus.heading) if bus.heading else 0.0,
-            }
-        )
-    except Exception:
-        pass
+    _broadcast_trip_started(bus, trip)
 
     return Response({
         "message": "Trip started successfully",
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Child
-from assignments.models import Assignment
+from assignments.models import Assignment, CurrentAssignment
 
 
 class ChildSerializer(serializers.ModelSerializer):
@@ -40,38 +40,34 @@ class ChildSerializer(serializers.ModelSerializer):
 
     def get_assignedBusId(self, obj):
         """Get assigned bus ID from Assignment API"""
-        assignment = Assignment.get_active_assignments_for(obj, 'child_to_bus').first()
-        return assignment.assigned_to.id if assignment and assignment.assigned_to else None
+        bus = CurrentAssignment.related(obj, 'bus').first()
+        return bus.id if bus else None
 
     def get_assignedBusNumber(self, obj):
         """Get assigned bus number from Assignment API"""
-        assignment = Assignment.get_active_assignments_for(obj, 'child_to_bus').first()
-        return assignment.assigned_to.bus_number if assignment and assignment.assigned_to else None
+        bus = CurrentAssignment.related(obj, 'bus').first()
+        return bus.bus_number if bus else None
 
     def get_routeName(self, obj):
         """Get assigned route name from Assignment API"""
-        assignment = Assignment.get_active_assignments_for(obj, 'child_to_route').first()
-        return assignment.assigned_to.name if assignment and assignment.assigned_to else None
+        route = CurrentAssignment.related(obj, 'route').first()
+        return route.name if route else None
 
     def get_routeCode(self, obj):
         """Get assigned route code from Assignment API"""
-        assignment = Assignment.get_active_assignments_for(obj, 'child_to_route').first()
-        return assignment.assigned_to.route_code if assignment and assignment.assigned_to else None
+        route = CurrentAssignment.related(obj, 'route').first()
+        return route.route_code if route else None
 
     def get_driverName(self, obj):
         """Get driver name from the assigned bus"""
-        # First get the child's bus assignment
-        bus_assignment = Assignment.get_active_assignments_for(obj, 'child_to_bus').first()
-        if not bus_assignment or not bus_assignment.assigned_to:
+        # First get the child's bus, then the driver assigned to that bus
+        bus = CurrentAssignment.related(obj, 'bus').first()
+        if not bus:
             return None
-        
-        bus = bus_assignment.assigned_to
-        # Then get the driver assigned to that bus
-        driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-        if driver_assignment and driver_assignment.assignee:
-            driver = driver_assignment.assignee
-            if hasattr(driver, 'user') and driver.user:
-                return f"{driver.user.first_name} {driver.user.last_name}"
+
+        driver = CurrentAssignment.related(bus, 'driver').select_related('user').first()
+        if driver and driver.user:
+            return f"{driver.user.first_name} {driver.user.last_name}"
         return None
 
 
@@ -4,7 +4,7 @@ from datetime import date
 from rest_framework import serializers
 from .models import Driver
 from users.models import User
-from assignments.models import Assignment
+from assignments.models import Assignment, CurrentAssignment
 
 
 def _validate_phone_format(value):
@@ -59,13 +59,13 @@ class DriverSerializer(serializers.ModelSerializer):
 
     def get_assignedBusId(self, obj):
         """Get assigned bus ID from Assignment API"""
-        assignment = Assignment.get_active_assignments_for(obj, 'driver_to_bus').first()
-        return assignment.assigned_to.id if assignment and assignment.assigned_to else None
+        bus = CurrentAssignment.related(obj, 'bus').first()
+        return bus.id if bus else None
 
     def get_assignedBusNumber(self, obj):
         """Get assigned bus number from Assignment API"""
-        assignment = Assignment.get_active_assignments_for(obj, 'driver_to_bus').first()
-        return assignment.assigned_to.bus_number if assignment and assignment.assigned_to else None
+        bus = CurrentAssignment.related(obj, 'bus').first()
+        return bus.bus_number if bus else None
 
 
 class DriverCreateSerializer(serializers.Serializer):
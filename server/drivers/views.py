@@ -17,7 +17,8 @@ from users.permissions import IsDriver
 from buses.models import Bus
 from children.models import Child
 from attendance.models import Attendance
-from assignments.models import Assignment, BusRoute
+from assignments.identity_map import assignments_to, first_active_for
+from assignments.models import BusRoute
 from datetime import date
 from django.contrib.contenttypes.models import ContentType
 
@@ -90,7 +91,7 @@ class MyBusView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
         # Find active driver-to-bus assignment using Assignment API
-        assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+        assignment = first_active_for(driver, 'driver_to_bus')
 
         if not assignment:
             return Response({
@@ -102,7 +103,7 @@ class MyBusView(APIView):
         bus = assignment.assigned_to
 
         # Get children assigned to this bus using Assignment API
-        child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+        child_assignments = assignments_to(bus, 'child_to_bus')
 
         # Get today's date for attendance
         today = date.today()
@@ -175,7 +176,7 @@ class MyRouteView(APIView):
             }, status=status.HTTP_404_NOT_FOUND)
 
         # Find active driver-to-bus assignment using Assignment API
-        driver_assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+        driver_assignment = first_active_for(driver, 'driver_to_bus')
 
         if not driver_assignment:
             return Response({
@@ -189,7 +190,7 @@ class MyRouteView(APIView):
         route_name = None
 
         # Prefer explicit bus_to_route assignments
-        route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+        route_assignment = first_active_for(bus, 'bus_to_route')
         if route_assignment:
             route_obj = route_assignment.assigned_to
             route_name = getattr(route_obj, 'name', None)
@@ -201,7 +202,7 @@ class MyRouteView(APIView):
                 route_name = fallback_route.name
 
         # Get all children assigned to this bus using Assignment API
-        child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+        child_assignments = assignments_to(bus, 'child_to_bus')
 
         # Get today's date
         today = date.today()
@@ -246,7 +247,7 @@ class MyRouteView(APIView):
         route_name = f"Bus {bus.bus_number} Route"  # fallback
         route_id = None
 
-        route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+        route_assignment = first_active_for(bus, 'bus_to_route')
         if route_assignment:
             route_obj = route_assignment.assigned_to
             if hasattr(route_obj, 'name') and route_obj.name:
@@ -312,7 +313,7 @@ def driver_phone_login(request):
         route_data = None
 
         # Find active driver-to-bus assignment
-        assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+        assignment = first_active_for(driver, 'driver_to_bus')
 
         if assignment:
             bus = assignment.assigned_to
@@ -320,7 +321,7 @@ def driver_phone_login(request):
             # Resolve the driver's active route for this bus using BusRoute
             route_name = None
 
-            route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+            route_assignment = first_active_for(bus, 'bus_to_route')
             if route_assignment:
                 route_obj = route_assignment.assigned_to
                 route_name = getattr(route_obj, 'name', None)
@@ -332,7 +333,7 @@ def driver_phone_login(request):
                     route_name = fallback_route.name
 
             # Get children assigned to this bus
-            child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+            child_assignments = assignments_to(bus, 'child_to_bus')
 
             # Get today's date for attendance
             today = date.today()
@@ -587,13 +588,13 @@ def driver_magic_link_auth(request):
         route_data = None
 
         # Find active driver-to-bus assignment
-        assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+        assignment = first_active_for(driver, 'driver_to_bus')
 
         if assignment:
             bus = assignment.assigned_to
 
             # Get children assigned to this bus
-            child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+            child_assignments = assignments_to(bus, 'child_to_bus')
 
             # Get today's date for attendance
             today = date.today()
@@ -699,6 +700,38 @@ def driver_magic_link_auth(request):
         )
 
 
+def _broadcast_trip_started(bus, trip):
+    """
+    Notify all parents watching this bus so their screens update immediately
+    without waiting for the 60-second poll (mirrors end_trip broadcast).
+    """
+    try:
+        from channels.layers import get_channel_layer
+        from asgiref.sync import async_to_sync
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            f"bus_{bus.id}",
+            {
+                "type": "bus.trip_event",
+                "event_type": "trip_started",
+                "trip_id": trip.id,
+                "trip_type": trip.trip_type,
+                "scheduled_time": (
+                    trip.scheduled_time.isoformat()
+                    if trip.scheduled_time else None
+                ),
+                # Include last known GPS so the parent map marker appears
+                # immediately without waiting for the first live location update.
+                "bus_latitude": float(bus.latitude) if bus.latitude else None,
+                "bus_longitude": float(bus.longitude) if bus.longitude else None,
+                "bus_speed": float(bus.speed) if bus.speed else 0.0,
+                "bus_heading": float(bus.heading) if bus.heading else 0.0,
+            }
+        )
+    except Exception:
+        pass  # Never let a broadcast failure block the HTTP response
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsDriver])
 def start_trip(request):
@@ -722,7 +755,7 @@ def start_trip(request):
         return Response({"error": "Driver profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
     # Find driver's assigned bus
-    assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+    assignment = first_active_for(driver, 'driver_to_bus')
     if not assignment:
         return Response({"error": "You are not assigned to any bus"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -751,8 +784,23 @@ def start_trip(request):
             "message": "Your profile is incomplete. Please contact the administrator to set your full name."
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    # A trip generated ahead of time by generate_scheduled_trips already has
+    # its children and ordered stops — starting it is just a status flip.
+    from trips.scheduling import find_scheduled_trip
+    trip = find_scheduled_trip(bus, trip_type)
+    if trip:
+        trip.status = 'in-progress'
+        trip.start_time = timezone.now()
+        trip.driver = driver.user
+        trip.save(update_fields=['status', 'start_time', 'driver', 'updated_at'])
+        _broadcast_trip_started(bus, trip)
+        return Response({
+            "message": "Trip started successfully",
+            "trip": TripSerializer(trip).data
+        }, status=status.HTTP_201_CREATED)
+
     # Get the actual route assignment from the bus: try bus_to_route Assignment first, then BusRoute.default_bus FK
-    route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+    route_assignment = first_active_for(bus, 'bus_to_route')
     route_name = None
     if route_assignment:
         route_obj = route_assignment.assigned_to
@@ -771,8 +819,8 @@ def start_trip(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     # Validate children are assigned to the bus
-    child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
-    if not child_assignments.exists():
+    child_assignments = assignments_to(bus, 'child_to_bus')
+    if not child_assignments:
         return Response({
             "error": "No children assigned",
             "message": "This bus has no children assigned. Please contact the administrator."
@@ -790,37 +838,14 @@ def start_trip(request):
         route=route_name  # Use actual admin-created route name
     )
 
-    # Add all children and create one Stop per child that has home coordinates.
-    # Stops are created with a provisional order (0,1,2...) which the optimizer
-    # will immediately overwrite with the Mapbox-optimised sequence.
-    from trips.models import Stop
+    # Add all children and create one Stop per child that has home coordinates,
+    # cloned from the bus's precomputed stop templates in a fixed number of
+    # queries. Stops get a provisional order (0,1,2...) which the optimizer
+    # will immediately overwrite with the optimised sequence.
+    from trips.stop_templates import StopTemplateService
     import threading
 
-    stops_created = 0
-    for child_assignment in child_assignments:
-        child = child_assignment.assignee
-        trip.children.add(child)
-
-        parent = getattr(child, 'parent', None)
-        lat = getattr(parent, 'home_latitude', None)
-        lng = getattr(parent, 'home_longitude', None)
-        if lat is None or lng is None:
-            continue  # child has no geocoded home — skip stop creation
-
-        address = (
-            parent.address if parent and parent.address
-            else getattr(child, 'address', None) or 'No address'
-        )
-        stop = Stop.objects.create(
-            trip=trip,
-            address=address,
-            latitude=lat,
-            longitude=lng,
-            scheduled_time=now,
-            order=stops_created,
-        )
-        stop.children.add(child)
-        stops_created += 1
+    stops_created = StopTemplateService.populate_trip(trip, bus)
 
     # Fire Mapbox optimisation in a daemon thread so the HTTP response is not
     # delayed. The thread rewrites Stop.order; all subsequent reads via
@@ -833,33 +858,7 @@ def start_trip(request):
             daemon=True,
         ).start()
 
-    # Notify all parents watching this bus so their screens update immediately
-    # without waiting for the 60-second poll (mirrors end_trip broadcast).
-    try:
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"bus_{bus.id}",
-            {
-                "type": "bus.trip_event",
-                "event_type": "trip_started",
-                "trip_id": trip.id,
-                "trip_type": trip.trip_type,
-                "scheduled_time": (
-                    trip.scheduled_time.isoformat()
-                    if trip.scheduled_time else None
-                ),
-                # Include last known GPS so the parent map marker appears
-                # immediately without waiting for the first live location update.
-                "bus_latitude": float(bus.latitude) if bus.latitude else None,
-                "bus_longitude": float(bus.longitude) if bus.longitude else None,
-                "bus_speed": float(bus.speed) if bus.speed else 0.0,
-                "bus_heading": float(bus.heading) if bus.heading else 0.0,
-            }
-        )
-    except Exception:
-        pass  # Never let a broadcast failure block the HTTP response
+    _broadcast_trip_started(bus, trip)
 
     return Response({
         "message": "Trip started successfully",
@@ -1028,11 +1027,11 @@ class DriverDemoLoginView(APIView):
             bus_data = None
             route_data = None
 
-            assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+            assignment = first_active_for(driver, 'driver_to_bus')
 
             if assignment:
                 bus = assignment.assigned_to
-                child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+                child_assignments = assignments_to(bus, 'child_to_bus')
                 today = date.today()
 
                 children_data = []
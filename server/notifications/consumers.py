@@ -1,14 +1,23 @@
+import asyncio
 import json
 import logging
 
 from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError
 
+from .stream import is_newer, replay
+from .unread import UnreadCounter
+
 
 logger = logging.getLogger(__name__)
 
+# Socket read receipts are applied in batches (see mark_notification_read)
+READ_RECEIPT_FLUSH_DELAY = 1.0  # seconds
+READ_RECEIPT_BATCH_SIZE = 50
+
 
 class ParentNotificationsConsumer(AsyncWebsocketConsumer):
     """
@@ -17,6 +26,8 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
     Features:
     - JWT token authentication
     - Parent-specific notification stream
+    - Missed-notification replay on reconnect (`?last_id=<stream_id>` or a
+      `{"type": "resume", "last_id": ...}` message; see notifications.stream)
     - Handles multiple notification types:
       * Trip notifications (start, end, delays)
       * Attendance notifications (pickup, dropoff)
@@ -34,16 +45,22 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
         self.user = None
         self.parent_id = None
         self.group_name = None
+        self.last_stream_id = None
+        self.replay_buffer = None
+        self.pending_reads = set()
+        self.flush_task = None
 
         # Extract token from query string
         query_string = self.scope.get("query_string", b"").decode()
         logger.debug("ParentNotificationsConsumer: query string=%s", query_string)
         token = None
+        last_id = None
 
         for param in query_string.split("&"):
             if param.startswith("token="):
                 token = param.split("=")[1]
-                break
+            elif param.startswith("last_id="):
+                last_id = param.split("=")[1] or None
 
         if not token:
             # Try to get from headers
@@ -117,8 +134,19 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
         }))
         logger.debug("ParentNotificationsConsumer: connection confirmation sent parent_id=%s", self.parent_id)
 
+        # Reconnecting client: send what it missed before any live event.
+        # The group is already joined, so nothing falls between the two;
+        # send_notification() drops live duplicates of replayed entries.
+        if last_id:
+            await self.replay_missed(last_id)
+
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection."""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        if self.pending_reads and self.parent_id:
+            await self.flush_read_receipts()
         if hasattr(self, 'group_name') and self.group_name:
             await self.channel_layer.group_discard(
                 self.group_name,
@@ -143,6 +171,9 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
                         "notification_id": notification_id
                     }))
 
+            elif message_type == "resume":
+                await self.replay_missed(data.get("last_id"))
+
             elif message_type == "get_unread_count":
                 count = await self.get_unread_count(self.parent_id)
                 await self.send(text_data=json.dumps({
@@ -162,9 +193,46 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             }))
 
     # Channel layer message handlers
+    async def send_notification(self, event, frame):
+        """
+        Send one notification frame, tagged with its replay `stream_id`.
+
+        While a replay is being assembled frames are collected instead of
+        sent; afterwards, live events the replay already covered are dropped.
+        """
+        stream_id = event.get("stream_id")
+        if stream_id:
+            if self.replay_buffer is None and not is_newer(stream_id, self.last_stream_id):
+                return
+            frame["stream_id"] = stream_id
+            self.last_stream_id = stream_id
+        if self.replay_buffer is not None:
+            self.replay_buffer.append(frame)
+            return
+        await self.send(text_data=json.dumps(frame))
+
+    async def replay_missed(self, last_id):
+        """Send everything after `last_id` in a single `replay` frame."""
+        entries, truncated = await sync_to_async(replay)(self.parent_id, last_id)
+        self.replay_buffer = []
+        try:
+            for stream_id, message in entries:
+                handler = getattr(self, message.get("type", ""), None)
+                if handler is not None and message["type"].endswith("_notification"):
+                    await handler({**message, "stream_id": stream_id})
+        finally:
+            frames, self.replay_buffer = self.replay_buffer, None
+        if frames or truncated:
+            await self.send(text_data=json.dumps({
+                "type": "replay",
+                "notifications": frames,
+                "last_id": self.last_stream_id,
+                "truncated": truncated,
+            }))
+
     async def trip_notification(self, event):
         """Handle trip start/end notifications."""
-        await self.send(text_data=json.dumps({
+        await self.send_notification(event, {
             "type": "trip_notification",
             "notification_type": event.get("notification_type"),  # trip_started, trip_ended
             "id": event.get("id"),
@@ -177,11 +245,11 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             "bus_number": event.get("bus_number"),
             "trip_type": event.get("trip_type"),  # pickup, dropoff
             "is_read": False
-        }))
+        })
 
     async def attendance_notification(self, event):
         """Handle child pickup/dropoff notifications."""
-        await self.send(text_data=json.dumps({
+        await self.send_notification(event, {
             "type": "attendance_notification",
             "notification_type": event.get("notification_type"),  # pickup_confirmed, dropoff_complete
             "id": event.get("id"),
@@ -196,11 +264,11 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             "status": event.get("status"),  # picked_up, dropped_off
             "location": event.get("location"),
             "is_read": False
-        }))
+        })
 
     async def route_change_notification(self, event):
         """Handle route change notifications."""
-        await self.send(text_data=json.dumps({
+        await self.send_notification(event, {
             "type": "route_change_notification",
             "notification_type": "route_change",
             "id": event.get("id"),
@@ -213,11 +281,11 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             "bus_number": event.get("bus_number"),
             "change_details": event.get("change_details"),
             "is_read": False
-        }))
+        })
 
     async def emergency_notification(self, event):
         """Handle emergency alerts."""
-        await self.send(text_data=json.dumps({
+        await self.send_notification(event, {
             "type": "emergency_notification",
             "notification_type": "emergency",
             "id": event.get("id"),
@@ -230,11 +298,11 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             "severity": event.get("severity"),  # low, medium, high, critical
             "action_required": event.get("action_required"),
             "is_read": False
-        }))
+        })
 
     async def delay_notification(self, event):
         """Handle delay notifications."""
-        await self.send(text_data=json.dumps({
+        await self.send_notification(event, {
             "type": "delay_notification",
             "notification_type": "major_delay",
             "id": event.get("id"),
@@ -248,11 +316,11 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             "reason": event.get("reason"),
             "estimated_arrival": event.get("estimated_arrival"),
             "is_read": False
-        }))
+        })
 
     async def proximity_notification(self, event):
         """Handle bus proximity alerts."""
-        await self.send(text_data=json.dumps({
+        await self.send_notification(event, {
             "type": "proximity_notification",
             "notification_type": "bus_approaching",
             "id": event.get("id"),
@@ -265,7 +333,20 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
             "distance_km": event.get("distance_km"),
             "estimated_arrival_minutes": event.get("estimated_arrival_minutes"),
             "is_read": False
-        }))
+        })
+
+    async def digest_notification(self, event):
+        """Handle the periodic digest of digest-mode notifications."""
+        await self.send_notification(event, {
+            "type": "digest_notification",
+            "notification_type": "digest",
+            "id": event.get("id"),
+            "title": event.get("title"),
+            "message": event.get("message"),
+            "timestamp": event.get("timestamp"),
+            "counts": event.get("counts"),
+            "is_read": False
+        })
 
     # Database operations
     @database_sync_to_async
@@ -311,26 +392,44 @@ class ParentNotificationsConsumer(AsyncWebsocketConsumer):
         except Parent.DoesNotExist:
             return None
 
-    @database_sync_to_async
-    def mark_notification_read(self, notification_id):
-        """Mark notification as read (if you have a Notification model)."""
-        # Implement if you create a Notification model
-        # from notifications.models import Notification
-        # try:
-        #     notification = Notification.objects.get(id=notification_id)
-        #     notification.is_read = True
-        #     notification.save()
-        # except Notification.DoesNotExist:
-        #     pass
-        pass
+    async def mark_notification_read(self, notification_id):
+        """
+        Queue a read receipt. Receipts are flushed together in one UPDATE
+        after READ_RECEIPT_FLUSH_DELAY, or as soon as READ_RECEIPT_BATCH_SIZE
+        are waiting, so a client marking a whole list read costs one query.
+        """
+        try:
+            self.pending_reads.add(int(notification_id))
+        except (TypeError, ValueError):
+            return
+        if len(self.pending_reads) >= READ_RECEIPT_BATCH_SIZE:
+            await self.flush_read_receipts()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(READ_RECEIPT_FLUSH_DELAY)
+        self.flush_task = None
+        await self.flush_read_receipts()
+
+    async def flush_read_receipts(self):
+        if not self.pending_reads:
+            return
+        ids, self.pending_reads = self.pending_reads, set()
+        await self._mark_read(self.parent_id, ids)
 
     @database_sync_to_async
-    def get_unread_count(self, parent_id):
-        """Get unread notification count."""
-        # Implement if you have a Notification model
-        # from notifications.models import Notification
-        # return Notification.objects.filter(
-        #     parent_id=parent_id,
-        #     is_read=False
-        # ).count()
-        return 0
+    def _mark_read(self, parent_id, notification_ids):
+        from django.utils import timezone
+        from .models import Notification
+
+        updated = Notification.objects.filter(
+            parent_id=parent_id, id__in=notification_ids, is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        UnreadCounter.decr(parent_id, updated)
+        return updated
+
+    async def get_unread_count(self, parent_id):
+        """Get unread notification count (after applying queued receipts)."""
+        await self.flush_read_receipts()
+        return await sync_to_async(UnreadCounter.get)(parent_id)
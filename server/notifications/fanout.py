@@ -0,0 +1,68 @@
+"""
+Fan-out planning: who gets which notification for one event.
+
+Recipients arrive as children, but the unit of delivery is the parent.  A
+parent with three children on the bus used to get three rows and three
+WebSocket messages for one trip start; the planner groups recipients by
+parent and produces one consolidated notification per parent per event,
+naming all of their children.
+"""
+
+from dataclasses import dataclass, field
+
+from .utils import trip_completed_content, trip_started_content
+
+_TRIP_CONTENT = {
+    'trip_started': (trip_started_content, 'trip_started'),
+    'trip_completed': (trip_completed_content, 'trip_ended'),
+}
+
+
+@dataclass
+class PlannedNotification:
+    """One consolidated notification for one parent."""
+    parent_id: int
+    children: list = field(default_factory=list)
+    title: str = ''
+    message: str = ''
+    child_name: str = ''
+
+    @property
+    def child(self):
+        """The child FK for the stored row — only set when there is exactly one."""
+        return self.children[0] if len(self.children) == 1 else None
+
+    @property
+    def child_ids(self):
+        return [child.id for child in self.children]
+
+
+def group_by_parent(children):
+    """{parent_id: [children...]} preserving the order children arrive in."""
+    grouped = {}
+    for child in children:
+        if child.parent_id is None:
+            continue
+        grouped.setdefault(child.parent_id, []).append(child)
+    return grouped
+
+
+def plan_trip_event(trip, event_type, children):
+    """
+    Plan `event_type` ('trip_started' / 'trip_completed') for `children`.
+
+    Returns (websocket notification_type, [PlannedNotification, ...]) with
+    one entry per parent.
+    """
+    content, ws_type = _TRIP_CONTENT[event_type]
+    plan = []
+    for parent_id, siblings in group_by_parent(children).items():
+        child_name, title, message = content(trip, trip.bus, children=siblings)
+        plan.append(PlannedNotification(
+            parent_id=parent_id,
+            children=siblings,
+            title=title,
+            message=message,
+            child_name=child_name,
+        ))
+    return ws_type, plan
@@ -0,0 +1,96 @@
+import random
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from buses.models import Bus
+from children.models import Child
+from notifications.models import Notification, NotificationOutbox, NotificationPreference
+from notifications.outbox import OutboxDispatcher
+from notifications.push import PushDispatcher
+from parents.models import Parent
+from trips.models import Trip
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks a trip-start fan-out with and without parent notification '
+        'preferences: inbox rows written, socket messages and device pushes. '
+        'All data is created inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parents', type=int, default=500)
+        parser.add_argument('--mute', type=float, default=0.25, help='Share of parents muting trip starts')
+        parser.add_argument('--digest', type=float, default=0.15, help='Share taking trip starts as a digest')
+        parser.add_argument('--push-only', type=float, default=0.2, help='Share taking trip starts as push only')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            bus, driver, parents = self._seed(options['parents'])
+            baseline = self._dispatch(bus, driver)
+
+            rng = random.Random(42)
+            shares = (('mute', options['mute']), ('digest', options['digest']),
+                      ('push_only', options['push_only']))
+            preferences = []
+            for parent in parents:
+                roll, mode = rng.random(), 'all'
+                for candidate, share in shares:
+                    if roll < share:
+                        mode = candidate
+                        break
+                    roll -= share
+                if mode != 'all':
+                    preferences.append(NotificationPreference(parent=parent, modes={'trip_started': mode}))
+            NotificationPreference.objects.bulk_create(preferences)
+            filtered = self._dispatch(bus, driver)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Trip start fan-out — {options['parents']} parents, "
+                          f"{len(preferences)} with a non-default trip_started mode")
+        for label, (rows, sockets, pushes, ms) in (('no preferences', baseline), ('preferences', filtered)):
+            self.stdout.write(f"  {label:15}: {rows:5d} rows, {sockets:5d} socket messages, "
+                              f"{pushes:5d} pushes, {ms:7.1f} ms")
+        for i, label in enumerate(('rows', 'socket messages', 'pushes')):
+            saved = baseline[i] - filtered[i]
+            self.stdout.write(self.style.SUCCESS(
+                f"  {label} saved: {saved} ({saved / baseline[i]:.0%})" if baseline[i] else f"  {label} saved: 0"
+            ))
+
+    def _seed(self, n):
+        stamp = int(time.time())
+        bus = Bus.objects.create(bus_number=f'PREF-{stamp}', number_plate=f'PREF {stamp}', capacity=n + 10)
+        driver = User.objects.create_user(username=f'pref_driver_{stamp}', password='x', user_type='driver')
+        parents = []
+        for i in range(n):
+            user = User.objects.create_user(username=f'pref_parent_{stamp}_{i}', password='x', user_type='parent')
+            parent = Parent.objects.create(user=user, contact_number=f'07{stamp % 10**7:07d}{i}')
+            Child.objects.create(first_name=f'Child{i}', last_name='Bench', class_grade='P1',
+                                 parent=parent, assigned_bus=bus)
+            parents.append(parent)
+        return bus, driver, parents
+
+    @staticmethod
+    def _dispatch(bus, driver):
+        now = timezone.now()
+        trip = Trip.objects.create(bus=bus, driver=driver, trip_type='pickup', status='in-progress',
+                                   scheduled_time=now, start_time=now)
+        event = NotificationOutbox(event_type='trip_started', trip=trip)
+        before = Notification.objects.count()
+        # Count what would be sent rather than sending it
+        with mock.patch('notifications.outbox.send_notifications_to_parents') as sockets, \
+                mock.patch.object(PushDispatcher, 'submit') as push_only:
+            started = time.perf_counter()
+            OutboxDispatcher.dispatch_event(event)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        socket_messages = sum(len(call.args[0]) for call in sockets.call_args_list)
+        pushed = socket_messages + sum(len(call.args[0]) for call in push_only.call_args_list)
+        return Notification.objects.count() - before, socket_messages, pushed, elapsed_ms
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+
+from notifications.broadcast import group_send_many
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks a notification burst: one async_to_sync(group_send) per parent '
+        'versus a single batched group_send_many() call. Uses the configured '
+        'channel layer unless --redis-url is given. The layer is flushed between runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=1000)
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--redis-url', help='Benchmark a RedisChannelLayer on this URL')
+
+    def handle(self, *args, **options):
+        if options['redis_url']:
+            from channels_redis.core import RedisChannelLayer
+            layer = RedisChannelLayer(hosts=[options['redis_url']])
+        else:
+            layer = get_channel_layer()
+        n = options['recipients']
+        messages = [
+            (f"parent_notifications_{parent_id}", {
+                'type': 'trip_notification',
+                'notification_type': 'trip_started',
+                'title': 'Pickup Trip Started',
+                'message': "Your child's bus has started the pickup trip.",
+                'trip_id': 1,
+            })
+            for parent_id in range(n)
+        ]
+
+        def per_parent():
+            for group, message in messages:
+                async_to_sync(layer.group_send)(group, message)
+
+        def batched():
+            errors = group_send_many(messages, channel_layer=layer)
+            if errors:
+                raise errors[0]
+
+        legacy = [self._measure(layer, n, per_parent) for _ in range(options['runs'])]
+        batch = [self._measure(layer, n, batched) for _ in range(options['runs'])]
+        async_to_sync(layer.flush)()
+
+        self.stdout.write(f"Layer: {type(layer).__name__}, recipients: {n}")
+        self.stdout.write(f"  per-parent group_send: {min(legacy) * 1000:8.1f} ms")
+        self.stdout.write(f"  group_send_many:       {min(batch) * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  speed-up: {min(legacy) / min(batch):.1f}x"))
+
+    @staticmethod
+    def _measure(layer, n, send):
+        async def seed():
+            await layer.flush()
+            await asyncio.gather(*(
+                layer.group_add(f"parent_notifications_{parent_id}", f"bench.parent{parent_id}")
+                for parent_id in range(n)
+            ))
+
+        async_to_sync(seed)()
+        started = time.perf_counter()
+        send()
+        return time.perf_counter() - started
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = (
+        'Drains the notification outbox: fans queued trip events out to parents. '
+        'Web processes already drain after each commit; run this with --loop as a '
+        'dedicated worker, or from cron to pick up events a crashed process left.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when empty')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            processed = OutboxDispatcher.drain(batch_size=options['batch_size'])
+            if processed:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f"Dispatched {processed} outbox events in {elapsed:.2f}s"
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,61 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.models import Notification, NotificationPreference
+from notifications.utils import send_notifications_to_parents
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends each parent with digest preferences one summary of the digest-mode '
+        'notifications created since their last digest. Run from cron (e.g. daily).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=int, default=24,
+                            help='Look back this far for parents who never had a digest')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        default_since = now - timedelta(hours=options['max_age_hours'])
+
+        digests = {}  # parent_id -> (digest types, since)
+        for parent_id, modes, last_digest_at in NotificationPreference.objects.values_list(
+            'parent_id', 'modes', 'last_digest_at'
+        ):
+            types = {t for t, mode in modes.items() if mode == 'digest'}
+            if types:
+                digests[parent_id] = (types, last_digest_at or default_since)
+        if not digests:
+            self.stdout.write("No parents have digest preferences")
+            return
+
+        counts = defaultdict(Counter)
+        oldest = min(since for _, since in digests.values())
+        for parent_id, notification_type, created_at in Notification.objects.filter(
+            parent_id__in=digests, created_at__gt=oldest
+        ).values_list('parent_id', 'notification_type', 'created_at'):
+            types, since = digests[parent_id]
+            if notification_type in types and created_at > since:
+                counts[parent_id][notification_type] += 1
+
+        labels = dict(Notification.NOTIFICATION_TYPES)
+        messages = []
+        for parent_id, by_type in counts.items():
+            total = sum(by_type.values())
+            summary = ', '.join(f"{n} {labels[t]}" for t, n in by_type.most_common())
+            messages.append((parent_id, 'digest_notification', {
+                'notification_type': 'digest',
+                'title': f"{total} new update{'s' if total != 1 else ''}",
+                'message': summary,
+                'counts': dict(by_type),
+            }))
+        send_notifications_to_parents(messages)
+        NotificationPreference.objects.filter(parent_id__in=digests).update(last_digest_at=now)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {len(messages)} digests covering {sum(sum(c.values()) for c in counts.values())} notifications"
+        ))
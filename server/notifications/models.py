@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -63,10 +64,145 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Both serve keyset pagination of the inbox (see
+        # ParentNotificationListView); the second also answers unread counts.
         indexes = [
-            models.Index(fields=['parent', '-created_at']),
-            models.Index(fields=['parent', 'is_read']),
+            models.Index(fields=['parent', '-created_at', '-id']),
+            models.Index(fields=['parent', 'is_read', '-created_at']),
         ]
 
     def __str__(self):
         return f"{self.notification_type} - {self.title} (Parent: {self.parent.user.get_full_name()})"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Trip events waiting to be fanned out to parents.
+
+    Written by the trip signal in the same transaction as the status change,
+    then drained by notifications.outbox.OutboxDispatcher outside the
+    request — one row per event, however many parents it reaches.
+    """
+    EVENT_TYPES = [
+        ('trip_started', 'Trip Started'),
+        ('trip_completed', 'Trip Completed'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    event_type = models.CharField(max_length=50, choices=EVENT_TYPES)
+    trip = models.ForeignKey(
+        'trips.Trip',
+        on_delete=models.CASCADE,
+        related_name='notification_outbox'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    recipients = models.PositiveIntegerField(default=0, help_text="Notifications created when dispatched")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Not claimed before this (retry backoff)")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} trip={self.trip_id} ({self.status})"
+
+
+class NotificationArchive(models.Model):
+    """
+    A compressed segment of archived notifications for one parent and month.
+
+    notifications.retention moves read notifications older than the
+    retention window here in chunks; each chunk writes at most one segment
+    per (parent, month), so a month is usually a handful of rows instead of
+    hundreds.  `payload` is zlib-compressed JSON, oldest first.
+    """
+    parent = models.ForeignKey(
+        'parents.Parent',
+        on_delete=models.CASCADE,
+        related_name='notification_archives'
+    )
+    month = models.DateField(help_text="First day of the month the notifications were created in")
+    row_count = models.PositiveIntegerField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    payload = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['month', 'first_id']
+        indexes = [
+            models.Index(fields=['parent', 'month']),
+        ]
+
+    def __str__(self):
+        return f"Archive {self.month:%Y-%m} parent={self.parent_id} ({self.row_count} rows)"
+
+
+class DevicePushToken(models.Model):
+    """
+    A parent's device registered for push notifications.
+
+    `provider` names an entry in settings.PUSH_PROVIDERS (see
+    notifications.push).  Tokens the provider reports as unregistered are
+    deleted by the dispatcher.
+    """
+    PLATFORM_CHOICES = [
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+        ('web', 'Web'),
+    ]
+
+    parent = models.ForeignKey(
+        'parents.Parent',
+        on_delete=models.CASCADE,
+        related_name='push_tokens'
+    )
+    token = models.CharField(max_length=512, unique=True)
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+    provider = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['parent', 'provider']),
+        ]
+
+    def __str__(self):
+        return f"{self.platform} token for parent {self.parent_id} via {self.provider}"
+
+
+class NotificationPreference(models.Model):
+    """
+    A parent's per-type delivery modes (see notifications.preferences).
+
+    `modes` holds only the types the parent changed, {type: mode}, so most
+    parents have no row at all and the rest a handful of keys.
+    """
+    parent = models.OneToOneField(
+        'parents.Parent',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_preference'
+    )
+    modes = models.JSONField(default=dict, blank=True)
+    last_digest_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Notification preferences for parent {self.parent_id}"
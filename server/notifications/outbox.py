@@ -0,0 +1,230 @@
+"""
+Notification outbox dispatcher.
+
+trip_status_changed used to build the recipient list and, per child, look
+up the parent, insert a Notification and do a blocking group_send — all
+inside the driver's start/end-trip request.  Now the signal only writes a
+NotificationOutbox row (same transaction as the trip save) and the
+dispatcher fans it out afterwards:
+
+    * recipients for an event are loaded in one query and coalesced to
+      one notification per parent (notifications.fanout),
+    * the recipients' delivery preferences are loaded in one query and
+      muted channels dropped before anything is written
+      (notifications.preferences),
+    * all of its Notification rows go in with one bulk_create,
+    * all of its WebSocket messages go out in one batched send
+      (notifications.utils.send_notifications_to_parents).
+
+After a commit that wrote outbox rows, OutboxDispatcher.kick() drains them
+on a background thread.  `python manage.py dispatch_notifications` drains
+from a separate process (and picks up anything a crashed worker left).
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .fanout import plan_trip_event
+from .models import Notification, NotificationOutbox
+from .preferences import INBOX, PUSH, SOCKET, PreferenceMap
+from .push import PushDispatcher
+from .unread import UnreadCounter
+from .utils import send_notifications_to_parents
+
+MAX_ATTEMPTS = 5
+# Failed events wait 30s, 1m, 2m, ... before the next attempt.
+RETRY_BACKOFF = timedelta(seconds=30)
+# A 'processing' row older than this belonged to a worker that died.
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def trip_recipients(trip):
+    """
+    Children (with their parent) who should hear about `trip`: children on
+    the trip, children with an active child_to_bus assignment to its bus,
+    and children with the legacy assigned_bus FK.  One query.
+    """
+    from assignments.models import CurrentAssignment
+    from children.models import Child
+
+    assigned = CurrentAssignment.objects.filter(
+        bus_id=trip.bus_id, assignment_type='child_to_bus',
+    ).values('child_id')
+    return (
+        Child.objects.filter(
+            Q(trips=trip) | Q(id__in=assigned) | Q(assigned_bus_id=trip.bus_id),
+            parent__isnull=False,
+        )
+        .select_related('parent')
+        .distinct()
+        .order_by('id')
+    )
+
+
+class OutboxDispatcher:
+    """Claim pending outbox rows and fan them out in bulk."""
+
+    _lock = threading.Lock()
+    _worker = None
+    _wanted = False
+
+    @staticmethod
+    def enqueue_trip_event(trip, event_type):
+        """Record a trip event and schedule dispatch once the transaction commits."""
+        NotificationOutbox.objects.create(event_type=event_type, trip=trip)
+        transaction.on_commit(OutboxDispatcher.kick)
+
+    # ------------------------------------------------------------------
+    # Background worker
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def kick(cls):
+        """Make sure a background thread drains the outbox soon."""
+        if not getattr(settings, 'NOTIFICATION_OUTBOX_AUTODISPATCH', True):
+            return
+        with cls._lock:
+            cls._wanted = True
+            if cls._worker is not None:
+                return  # the running worker will loop once more
+            cls._worker = threading.Thread(target=cls._run_worker, daemon=True)
+            cls._worker.start()
+
+    @classmethod
+    def _run_worker(cls):
+        try:
+            while True:
+                with cls._lock:
+                    if not cls._wanted:
+                        cls._worker = None
+                        return
+                    cls._wanted = False
+                try:
+                    cls.drain()
+                except Exception as exc:
+                    print(f"⚠️  Notification outbox worker: {exc}")
+        finally:
+            connection.close()
+
+    # ------------------------------------------------------------------
+    # Draining
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def drain(batch_size=50):
+        """Dispatch until nothing is claimable. Returns events processed."""
+        total = 0
+        while True:
+            close_old_connections()
+            processed = OutboxDispatcher.dispatch_batch(batch_size)
+            if not processed:
+                return total
+            total += processed
+
+    @staticmethod
+    def _claim(batch_size):
+        now = timezone.now()
+        claimable = (
+            Q(status='pending', available_at__lte=now)
+            | Q(status='processing', claimed_at__lt=now - CLAIM_TIMEOUT)
+        )
+        with transaction.atomic():
+            ids = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True)
+                .filter(claimable)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if ids:
+                NotificationOutbox.objects.filter(id__in=ids).update(
+                    status='processing', claimed_at=now, attempts=F('attempts') + 1,
+                )
+        return ids
+
+    @staticmethod
+    def dispatch_batch(batch_size=50):
+        ids = OutboxDispatcher._claim(batch_size)
+        if not ids:
+            return 0
+        events = NotificationOutbox.objects.filter(id__in=ids).select_related('trip__bus')
+        for event in events:
+            try:
+                event.recipients = OutboxDispatcher.dispatch_event(event)
+                event.status = 'done'
+                event.last_error = ''
+            except Exception as exc:
+                event.status = 'failed' if event.attempts >= MAX_ATTEMPTS else 'pending'
+                event.available_at = timezone.now() + RETRY_BACKOFF * 2 ** (event.attempts - 1)
+                event.last_error = str(exc)
+                print(f"❌ Outbox event {event.id} ({event.event_type}) failed: {exc}")
+            event.processed_at = timezone.now()
+            event.save(update_fields=['status', 'recipients', 'last_error', 'available_at', 'processed_at'])
+        return len(ids)
+
+    @staticmethod
+    def dispatch_event(event):
+        """Create and push the parent notifications for one event. Returns the count."""
+        trip = event.trip
+        bus = trip.bus
+
+        ws_type, plan = plan_trip_event(trip, event.event_type, trip_recipients(trip))
+        preferences = PreferenceMap.load(planned.parent_id for planned in plan)
+
+        notifications = []
+        messages = []
+        push_only = []
+        timestamp = datetime.now().isoformat()
+        for planned in plan:
+            channels = preferences.channels(planned.parent_id, event.event_type)
+            if not channels:
+                continue
+            message = {
+                'notification_type': ws_type,
+                'title': planned.title,
+                'message': planned.message,
+                'full_message': planned.message,
+                'trip_id': trip.id,
+                'bus_id': bus.id,
+                'bus_number': bus.bus_number,
+                'trip_type': trip.trip_type,
+                'child_name': planned.child_name,
+                'child_ids': planned.child_ids,
+                'timestamp': timestamp,
+            }
+            if SOCKET in channels:
+                messages.append((planned.parent_id, 'trip_notification', message))
+            elif PUSH in channels:
+                push_only.append((planned.parent_id, message))
+            if INBOX not in channels:
+                continue
+            notifications.append(Notification(
+                parent_id=planned.parent_id,
+                notification_type=event.event_type,
+                title=planned.title,
+                message=planned.message,
+                full_message=planned.message,
+                child=planned.child,
+                bus=bus,
+                trip=trip,
+                additional_data={
+                    'trip_type': trip.trip_type,
+                    'child_name': planned.child_name,
+                    'child_ids': planned.child_ids,
+                },
+            ))
+
+        Notification.objects.bulk_create(notifications)
+        UnreadCounter.incr_many(Counter(n.parent_id for n in notifications))
+        # Rows are the source of truth; a failed socket push is not retried
+        # (the app refetches the list), so it must not fail the event.
+        send_notifications_to_parents(messages)
+        if push_only:
+            PushDispatcher.submit(push_only)
+        print(f"📨 {event.event_type} for trip {trip.id}: {len(notifications)} parent notifications")
+        return len(notifications)
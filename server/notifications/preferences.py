@@ -0,0 +1,89 @@
+"""
+Per-parent notification preferences, evaluated in bulk at fan-out time.
+
+Each parent has at most one NotificationPreference row holding only the
+types they changed, e.g. {"bus_approaching": "mute", "trip_started":
+"digest"}; everything else is delivered on every channel.  A mode maps to
+the delivery channels:
+
+    all        inbox row + WebSocket + device push (default)
+    digest     inbox row only; summarised by `manage.py send_notification_digests`
+    push_only  device push only, no inbox row or socket message
+    mute       nothing
+
+Delivery is planned before anything is written: the outbox loads the
+preferences of a whole recipient set in one query
+(PreferenceMap.load) and skips muted channels before building rows or
+messages.  Emergency alerts ignore preferences.
+"""
+
+from .models import NotificationPreference
+
+INBOX = 'inbox'
+SOCKET = 'socket'
+PUSH = 'push'
+
+ALL_CHANNELS = frozenset({INBOX, SOCKET, PUSH})
+
+MODE_CHANNELS = {
+    'all': ALL_CHANNELS,
+    'digest': frozenset({INBOX}),
+    'push_only': frozenset({PUSH}),
+    'mute': frozenset(),
+}
+
+# Never filtered, whatever the parent chose.
+ALWAYS_DELIVERED = frozenset({'emergency'})
+
+
+def validate_modes(modes):
+    """Return (cleaned modes without defaults, error message or None)."""
+    from .models import Notification
+
+    if not isinstance(modes, dict):
+        return None, "modes must be an object of {notification_type: mode}"
+    types = dict(Notification.NOTIFICATION_TYPES)
+    cleaned = {}
+    for notification_type, mode in modes.items():
+        if notification_type not in types:
+            return None, f"Unknown notification type: {notification_type}"
+        if mode not in MODE_CHANNELS:
+            return None, f"Unknown mode for {notification_type}: {mode} (use one of {', '.join(MODE_CHANNELS)})"
+        if notification_type in ALWAYS_DELIVERED and mode != 'all':
+            return None, f"{notification_type} notifications cannot be turned off"
+        if mode != 'all':
+            cleaned[notification_type] = mode
+    return cleaned, None
+
+
+class PreferenceMap:
+    """Preferences of a recipient set, keyed by parent id."""
+
+    def __init__(self, modes=None):
+        self.modes = modes or {}
+
+    @classmethod
+    def load(cls, parent_ids):
+        """One query for any number of parents; parents without a row use defaults."""
+        parent_ids = list(parent_ids)
+        if not parent_ids:
+            return cls()
+        return cls(dict(
+            NotificationPreference.objects.filter(parent_id__in=parent_ids)
+            .values_list('parent_id', 'modes')
+        ))
+
+    def mode(self, parent_id, notification_type):
+        if notification_type in ALWAYS_DELIVERED:
+            return 'all'
+        return self.modes.get(parent_id, {}).get(notification_type, 'all')
+
+    def channels(self, parent_id, notification_type):
+        return MODE_CHANNELS[self.mode(parent_id, notification_type)]
+
+
+def delivery_channels(parent_id, notification_type):
+    """Channels for a single notification to one parent."""
+    if notification_type in ALWAYS_DELIVERED:
+        return ALL_CHANNELS
+    return PreferenceMap.load([parent_id]).channels(parent_id, notification_type)
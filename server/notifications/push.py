@@ -0,0 +1,335 @@
+"""
+Push notifications to parents' devices.
+
+Until now parents only heard about a trip while the app held a WebSocket
+open, so the mobile apps kept background sockets alive just to receive
+alerts.  Every notification sent through
+notifications.utils.send_notifications_to_parents() is now also pushed to
+the parent's registered devices (DevicePushToken).
+
+Providers (FCM, APNs, ...) implement PushProvider and are configured like
+caches:
+
+    PUSH_PROVIDERS = {
+        'fcm': {
+            'BACKEND': 'myproject.push.FCMProvider',
+            'OPTIONS': {...},          # passed to the constructor
+            'BATCH_SIZE': 500,         # tokens per provider request
+            'RATE_LIMIT': 20,          # requests per second
+        },
+    }
+
+With no providers configured pushing is a no-op.  LocalPushProvider
+records what it would have sent and is what the tests use.
+
+PushDispatcher.dispatch() loads every recipient's tokens in one query,
+groups identical payloads per provider into requests of up to BATCH_SIZE
+tokens, and sends them on a bounded pool of PUSH_WORKERS concurrent
+requests, each provider throttled by its own token bucket.  Requests that
+fail transiently are retried with exponential backoff; tokens the provider
+reports as unregistered are deleted in one query at the end.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .models import DevicePushToken
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_RATE_LIMIT = 20
+DEFAULT_WORKERS = 8
+MAX_ATTEMPTS = 3
+# Retries wait RETRY_BACKOFF, then 2x, 4x, ...
+RETRY_BACKOFF = 0.5
+
+# Fields of a WebSocket message that are not copied into push data: the
+# title/body, and per-recipient ids that would stop otherwise identical
+# payloads from sharing a provider request.
+_SKIPPED_FIELDS = ('title', 'message', 'full_message', 'id', 'timestamp', 'stream_id')
+
+
+class PushProviderError(Exception):
+    """A whole provider request failed; retried when `retryable`."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass(frozen=True)
+class PushMessage:
+    title: str
+    body: str
+    data: tuple = ()  # sorted (key, value) string pairs, so messages are hashable
+
+    @classmethod
+    def from_notification(cls, data):
+        """Build a push from a WebSocket notification payload, or None."""
+        if not data.get('title'):
+            return None
+        extra = {
+            key: str(value) for key, value in data.items()
+            if key not in _SKIPPED_FIELDS and isinstance(value, (str, int, float, bool))
+        }
+        return cls(title=data['title'], body=data.get('message', ''), data=tuple(sorted(extra.items())))
+
+
+@dataclass
+class PushResult:
+    """Outcome of one provider request."""
+    sent: int = 0
+    invalid_tokens: list = field(default_factory=list)
+    retry_tokens: list = field(default_factory=list)
+
+
+class PushProvider:
+    """
+    Interface for a push service.  `send_batch` receives up to `batch_size`
+    device tokens sharing one message and reports which tokens were
+    delivered, which are invalid (to be pruned) and which should be retried.
+    Raise PushProviderError when the whole request failed.
+    """
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = options
+
+    async def send_batch(self, tokens, message):
+        raise NotImplementedError
+
+
+class LocalPushProvider(PushProvider):
+    """
+    Records pushes in memory instead of sending them.  Tokens starting with
+    `invalid` are reported unregistered; tokens starting with `flaky` fail
+    once and then succeed.
+    """
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.sent = []
+        self.requests = 0
+        self._flaked = set()
+
+    async def send_batch(self, tokens, message):
+        self.requests += 1
+        result = PushResult()
+        for token in tokens:
+            if token.startswith('invalid'):
+                result.invalid_tokens.append(token)
+            elif token.startswith('flaky') and token not in self._flaked:
+                self._flaked.add(token)
+                result.retry_tokens.append(token)
+            else:
+                self.sent.append((token, message))
+                result.sent += 1
+        return result
+
+
+class TokenBucket:
+    """Async rate limiter: at most `rate` acquisitions per second."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+_providers = None
+_providers_lock = threading.Lock()
+
+
+def get_providers():
+    """{name: (provider, batch_size, rate_limit)} from settings.PUSH_PROVIDERS."""
+    global _providers
+    with _providers_lock:
+        if _providers is None:
+            _providers = {}
+            for name, config in getattr(settings, 'PUSH_PROVIDERS', {}).items():
+                provider = import_string(config['BACKEND'])(name, **config.get('OPTIONS', {}))
+                _providers[name] = (
+                    provider,
+                    config.get('BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    config.get('RATE_LIMIT', DEFAULT_RATE_LIMIT),
+                )
+        return _providers
+
+
+def reset_providers():
+    """Forget configured providers (after changing PUSH_PROVIDERS)."""
+    global _providers
+    with _providers_lock:
+        _providers = None
+
+
+@dataclass
+class DispatchStats:
+    sent: int = 0
+    failed: int = 0
+    pruned: int = 0
+    requests: int = 0
+
+
+class PushDispatcher:
+    """Fan notifications out to device tokens through the configured providers."""
+
+    _queue = queue.Queue()
+    _lock = threading.Lock()
+    _worker = None
+
+    @staticmethod
+    def plan(notifications):
+        """
+        Group [(parent_id, data), ...] into provider requests:
+        [(provider name, message, [token, ...]), ...].  One query.
+        """
+        providers = get_providers()
+        messages = {}
+        for parent_id, data in notifications:
+            message = PushMessage.from_notification(data)
+            if message is not None:
+                messages.setdefault(parent_id, []).append(message)
+        if not messages or not providers:
+            return []
+
+        tokens = defaultdict(list)  # (provider, message) -> tokens
+        for parent_id, provider, token in (
+            DevicePushToken.objects.filter(parent_id__in=messages, provider__in=providers)
+            .order_by('id').values_list('parent_id', 'provider', 'token')
+        ):
+            for message in messages[parent_id]:
+                tokens[(provider, message)].append(token)
+
+        batches = []
+        for (provider, message), group in tokens.items():
+            size = providers[provider][1]
+            for start in range(0, len(group), size):
+                batches.append((provider, message, group[start:start + size]))
+        return batches
+
+    @staticmethod
+    def dispatch(notifications, workers=None):
+        """Push [(parent_id, data), ...] now. Returns DispatchStats."""
+        batches = PushDispatcher.plan(notifications)
+        if not batches:
+            return DispatchStats()
+        stats, invalid = async_to_sync(PushDispatcher._send_all)(batches, workers)
+        if invalid:
+            stats.pruned, _ = DevicePushToken.objects.filter(token__in=invalid).delete()
+        return stats
+
+    @staticmethod
+    async def _send_all(batches, workers=None):
+        providers = get_providers()
+        limit = asyncio.Semaphore(workers or getattr(settings, 'PUSH_WORKERS', DEFAULT_WORKERS))
+        buckets = {name: TokenBucket(rate) for name, (_, _, rate) in providers.items()}
+        stats = DispatchStats()
+        invalid = []
+
+        async def send(name, message, tokens):
+            provider = providers[name][0]
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                await buckets[name].acquire()
+                async with limit:
+                    stats.requests += 1
+                    try:
+                        result = await provider.send_batch(tokens, message)
+                    except PushProviderError as exc:
+                        if not exc.retryable or attempt == MAX_ATTEMPTS:
+                            print(f"❌ Push via {name} failed for {len(tokens)} tokens: {exc}")
+                            stats.failed += len(tokens)
+                            return
+                        result = PushResult(retry_tokens=list(tokens))
+                stats.sent += result.sent
+                invalid.extend(result.invalid_tokens)
+                tokens = result.retry_tokens
+                if not tokens:
+                    return
+                if attempt < MAX_ATTEMPTS:
+                    await asyncio.sleep(getattr(settings, 'PUSH_RETRY_BACKOFF', RETRY_BACKOFF) * 2 ** (attempt - 1))
+            stats.failed += len(tokens)
+
+        await asyncio.gather(*(send(*batch) for batch in batches))
+        return stats, invalid
+
+    # ------------------------------------------------------------------
+    # Background delivery
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def submit(cls, notifications):
+        """
+        Push [(parent_id, data), ...] on a background thread once the
+        current transaction commits, so provider latency never lands on
+        the request that triggered the notification.
+        """
+        if not get_providers():
+            return
+        notifications = [(parent_id, dict(data)) for parent_id, data in notifications]
+        transaction.on_commit(lambda: cls._enqueue(notifications))
+
+    @classmethod
+    def _enqueue(cls, notifications):
+        cls._queue.put(notifications)
+        with cls._lock:
+            if cls._worker is None:
+                cls._worker = threading.Thread(target=cls._run_worker, daemon=True)
+                cls._worker.start()
+
+    @classmethod
+    def _run_worker(cls):
+        try:
+            while True:
+                try:
+                    notifications = cls._queue.get(timeout=5)
+                except queue.Empty:
+                    with cls._lock:
+                        if cls._queue.empty():
+                            cls._worker = None
+                            return
+                    continue
+                # Drain whatever else queued up meanwhile into one dispatch
+                while True:
+                    try:
+                        notifications += cls._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                try:
+                    stats = cls.dispatch(notifications)
+                    if stats.requests:
+                        print(f"📲 Pushed {stats.sent} notifications in {stats.requests} requests "
+                              f"({stats.failed} failed, {stats.pruned} tokens pruned)")
+                except Exception as exc:
+                    print(f"⚠️  Push worker: {exc}")
+        finally:
+            connection.close()
+
+
+def register_token(parent_id, token, platform, provider):
+    """Attach `token` to the parent, moving it if another account had it."""
+    DevicePushToken.objects.update_or_create(
+        token=token,
+        defaults={'parent_id': parent_id, 'platform': platform, 'provider': provider},
+    )
@@ -0,0 +1,163 @@
+"""
+Notification retention: move old read notifications into monthly archives.
+
+`Notification` rows used to accumulate forever, growing the table and the
+indexes behind the inbox and unread counts.  `archive_notifications()`
+walks read notifications older than NOTIFICATION_RETENTION_DAYS in id
+order, a chunk at a time.  Each chunk is its own short transaction:
+
+    1. read the chunk's rows (with child name / bus number snapshots),
+    2. write one compressed NotificationArchive segment per parent+month,
+    3. delete the rows by primary key.
+
+No statement touches more than `chunk_size` rows, so locks stay short and
+the job can run alongside live traffic.  Unread notifications are never
+archived, so cached unread counters are unaffected.
+
+`read_archive()` is the on-demand read path used by
+`GET /api/notifications/archive/?month=YYYY-MM`.
+"""
+
+import json
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive
+
+DEFAULT_CHUNK_SIZE = 500
+
+ARCHIVED_FIELDS = (
+    'id', 'parent_id', 'notification_type', 'title', 'message', 'full_message',
+    'child_id', 'bus_id', 'trip_id', 'additional_data', 'is_read', 'created_at', 'read_at',
+    'child__first_name', 'child__last_name', 'bus__bus_number',
+)
+
+
+def retention_days():
+    return getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _snapshot(row):
+    """Archived form of a values() row; names are frozen at archive time."""
+    first, last = row.pop('child__first_name'), row.pop('child__last_name')
+    row['child_name'] = f"{first} {last}" if first is not None else (
+        (row['additional_data'] or {}).get('child_name')
+    )
+    row['bus_number'] = row.pop('bus__bus_number')
+    return row
+
+
+def _pack(rows):
+    return zlib.compress(json.dumps(rows, cls=DjangoJSONEncoder).encode('utf-8'))
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+
+
+@dataclass
+class RetentionResult:
+    moved: int = 0
+    segments: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.moved / self.seconds if self.seconds else 0.0
+
+
+def _archive_chunk(cutoff, after_id, chunk_size):
+    """Archive one chunk; returns (rows moved, segments written, last id)."""
+    with transaction.atomic():
+        rows = list(
+            Notification.objects.filter(is_read=True, created_at__lt=cutoff, id__gt=after_id)
+            .order_by('id')
+            .values(*ARCHIVED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0, 0, after_id
+
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row['parent_id'], month_start(row['created_at']))].append(_snapshot(row))
+
+        NotificationArchive.objects.bulk_create([
+            NotificationArchive(
+                parent_id=parent_id,
+                month=month,
+                row_count=len(group),
+                first_id=group[0]['id'],
+                last_id=group[-1]['id'],
+                payload=_pack(group),
+            )
+            for (parent_id, month), group in groups.items()
+        ])
+        ids = [row['id'] for row in rows]
+        Notification.objects.filter(id__in=ids).delete()
+        return len(rows), len(groups), ids[-1]
+
+
+def archive_notifications(days=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=0.0, max_chunks=None, now=None):
+    """
+    Move read notifications older than `days` into NotificationArchive.
+
+    `pause` sleeps between chunks to leave headroom for live traffic;
+    `max_chunks` bounds a single run.  Returns a RetentionResult.
+    """
+    days = retention_days() if days is None else days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    result = RetentionResult()
+    started = time.perf_counter()
+    after_id = 0
+
+    while max_chunks is None or result.chunks < max_chunks:
+        moved, segments, after_id = _archive_chunk(cutoff, after_id, chunk_size)
+        if not moved:
+            break
+        result.moved += moved
+        result.segments += segments
+        result.chunks += 1
+        if pause:
+            time.sleep(pause)
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def read_archive(parent_id, month):
+    """
+    Archived notifications for a parent in the month containing `month`,
+    newest first (the same order as the live inbox).
+    """
+    rows = []
+    for payload in (
+        NotificationArchive.objects.filter(parent_id=parent_id, month=month_start(month))
+        .order_by('first_id')
+        .values_list('payload', flat=True)
+    ):
+        rows.extend(_unpack(payload))
+    rows.reverse()
+    return rows
+
+
+def archived_months(parent_id):
+    """[(month, row count), ...] newest first, for browsing the archive."""
+    return list(
+        NotificationArchive.objects.filter(parent_id=parent_id)
+        .values('month').annotate(total=Sum('row_count'))
+        .order_by('-month').values_list('month', 'total')
+    )
@@ -26,9 +26,26 @@ class NotificationSerializer(serializers.ModelSerializer):
     def get_child_name(self, obj):
         if obj.child:
             return f"{obj.child.first_name} {obj.child.last_name}"
-        return None
+        # Consolidated notifications for several siblings carry the names
+        return (obj.additional_data or {}).get('child_name')
 
     def get_bus_number(self, obj):
         if obj.bus:
             return obj.bus.bus_number
         return None
+
+
+class NotificationListSerializer(serializers.ModelSerializer):
+    """Compact inbox row (?compact=true): no bodies, no JSON payload."""
+    child_name = serializers.SerializerMethodField()
+    bus_number = serializers.CharField(source='bus.bus_number', default=None, read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'notification_type', 'title', 'message', 'child_name', 'bus_number',
+                  'is_read', 'created_at']
+
+    def get_child_name(self, obj):
+        if obj.child:
+            return f"{obj.child.first_name} {obj.child.last_name}"
+        return (obj.additional_data or {}).get('child_name')
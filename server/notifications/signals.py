@@ -1,11 +1,8 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from .utils import (
-    send_trip_started_notification,
-    send_trip_completed_notification,
     send_child_pickup_notification,
     send_child_dropoff_notification,
-    notify_parents_of_children,
 )
 
 
@@ -24,62 +21,30 @@ def trip_pre_save(sender, instance, **kwargs):
 
 @receiver(post_save, sender='trips.Trip')
 def trip_status_changed(sender, instance, created, **kwargs):
-    """Send notifications when trips start or complete.
+    """Queue parent notifications when trips start or complete.
 
     - Trip started: status changes into 'in-progress'.
     - Trip completed: status changes into 'completed'.
+
+    Only an outbox row is written here, in the same transaction as the trip
+    save; notifications.outbox fans it out to parents after commit, so the
+    driver's request does not wait on per-parent inserts and socket pushes.
     """
     trip = instance
     previous_status = getattr(trip, '_previous_status', None)
     current_status = trip.status
 
-    # Collect children related to this trip or assigned to the trip's bus.
-    from children.models import Child
-    from assignments.models import Assignment
-    from django.contrib.contenttypes.models import ContentType
+    if current_status == 'in-progress' and previous_status != 'in-progress':
+        event_type = 'trip_started'
+    elif current_status == 'completed' and previous_status != 'completed':
+        event_type = 'trip_completed'
+    else:
+        return
 
     try:
-        bus_content_type = ContentType.objects.get_for_model(trip.bus)
-        child_content_type = ContentType.objects.get(app_label='children', model='child')
-
-        # Children explicitly added to the trip
-        trip_children_qs = trip.children.filter(parent__isnull=False)
-
-        # Children assigned via Assignment records to this bus
-        child_assignments = Assignment.objects.filter(
-            assigned_to_content_type=bus_content_type,
-            assigned_to_object_id=trip.bus.id,
-            assignee_content_type=child_content_type,
-            status='active'
-        )
-        assignment_child_ids = [assignment.assignee_object_id for assignment in child_assignments]
-
-        # Children with legacy FK assigned_bus
-        fk_children_qs = Child.objects.filter(assigned_bus=trip.bus, parent__isnull=False).values_list('id', flat=True)
-
-        # Union of IDs from trip children, assignment children, and FK children
-        ids = set(trip_children_qs.values_list('id', flat=True))
-        ids.update(assignment_child_ids)
-        ids.update(list(fk_children_qs))
-
-        children = Child.objects.filter(id__in=list(ids), parent__isnull=False)
-
-        # Trip started: transition into 'in-progress'
-        if current_status == 'in-progress' and previous_status != 'in-progress':
-            print(f"🚀 Trip started - sending notifications to {len(children)} parents")
-            for child in children:
-                if child.parent and hasattr(child.parent, 'user'):
-                    send_trip_started_notification(child.parent.user_id, trip, trip.bus, child=child)
-                    print(f"  ✅ Sent to parent of {child.first_name} (parent ID: {child.parent.user_id})")
-
-        # Trip completed: transition into 'completed'
-        elif current_status == 'completed' and previous_status != 'completed':
-            print(f"🏁 Trip completed - sending notifications to {len(children)} parents")
-            for child in children:
-                if child.parent and hasattr(child.parent, 'user'):
-                    send_trip_completed_notification(child.parent.user_id, trip, trip.bus, child=child)
-                    print(f"  ✅ Sent to parent of {child.first_name} (parent ID: {child.parent.user_id})")
-
+        from .outbox import OutboxDispatcher
+        OutboxDispatcher.enqueue_trip_event(trip, event_type)
+        print(f"📬 Queued {event_type} notifications for trip {trip.id}")
     except Exception as e:
         print(f"Error in trip_status_changed signal: {e}")
 
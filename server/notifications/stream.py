@@ -0,0 +1,159 @@
+"""
+Per-parent notification streams for reconnect replay.
+
+Every WebSocket notification sent to a parent is also appended to a bounded
+Redis stream, `notifications:stream:<parent_id>`.  Each frame the consumer
+sends carries the entry's `stream_id`; a client that reconnects passes the
+last one it saw (`?last_id=` or a `resume` message) and gets everything it
+missed in one `replay` frame instead of refetching the whole notification
+list.
+
+Streams are capped at NOTIFICATION_STREAM_MAXLEN entries and expire
+NOTIFICATION_STREAM_TTL seconds after the last append.  When a client's
+last_id is older than the oldest retained entry the replay is flagged
+`truncated` and the client should fall back to the REST list.
+
+With a non-Redis cache (tests, local dev) an in-process store with the
+same semantics is used.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+STREAM_KEY = "notifications:stream:{parent_id}"
+
+
+def _maxlen():
+    return getattr(settings, 'NOTIFICATION_STREAM_MAXLEN', 200)
+
+
+def _ttl():
+    return getattr(settings, 'NOTIFICATION_STREAM_TTL', 7 * 24 * 3600)
+
+
+def parse_id(stream_id):
+    """'1718000000000-3' -> (1718000000000, 3); None for anything malformed."""
+    try:
+        ms, _, seq = str(stream_id).partition('-')
+        return int(ms), int(seq or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_newer(stream_id, than):
+    """True when `stream_id` sorts after `than` (a missing `than` is oldest)."""
+    if not than:
+        return True
+    a, b = parse_id(stream_id), parse_id(than)
+    return a is not None and (b is None or a > b)
+
+
+class _RedisStreams:
+    def __init__(self, client):
+        self.client = client
+
+    def append_many(self, entries):
+        pipe = self.client.pipeline(transaction=False)
+        for parent_id, message in entries:
+            key = STREAM_KEY.format(parent_id=parent_id)
+            pipe.xadd(key, {'m': json.dumps(message)}, maxlen=_maxlen(), approximate=True)
+            pipe.expire(key, _ttl())
+        replies = pipe.execute()
+        return [stream_id.decode() if isinstance(stream_id, bytes) else stream_id
+                for stream_id in replies[0::2]]
+
+    def read_after(self, parent_id, last_id, count):
+        key = STREAM_KEY.format(parent_id=parent_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.xrange(key, min='-', max='+', count=1)
+        pipe.xrange(key, min=f'({last_id}' if last_id else '-', max='+', count=count)
+        first, entries = pipe.execute()
+        oldest = first[0][0].decode() if first else None
+        return oldest, [
+            (stream_id.decode(), json.loads(fields[b'm']))
+            for stream_id, fields in entries
+        ]
+
+
+class _LocalStreams:
+    """Process-local stand-in for when the cache is not Redis."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = defaultdict(list)
+        self.last = (0, 0)
+
+    def _next_id(self):
+        ms = int(time.time() * 1000)
+        seq = self.last[1] + 1 if ms <= self.last[0] else 0
+        self.last = (max(ms, self.last[0]), seq)
+        return f"{self.last[0]}-{self.last[1]}"
+
+    def append_many(self, entries):
+        ids = []
+        with self.lock:
+            for parent_id, message in entries:
+                stream = self.streams[parent_id]
+                stream_id = self._next_id()
+                stream.append((stream_id, json.loads(json.dumps(message))))
+                del stream[:-_maxlen()]
+                ids.append(stream_id)
+        return ids
+
+    def read_after(self, parent_id, last_id, count):
+        with self.lock:
+            stream = list(self.streams.get(parent_id, ()))
+        oldest = stream[0][0] if stream else None
+        return oldest, [entry for entry in stream if is_newer(entry[0], last_id)][:count]
+
+    def clear(self):
+        with self.lock:
+            self.streams.clear()
+
+
+_backend = None
+
+
+def get_streams():
+    global _backend
+    if _backend is None:
+        try:
+            from django_redis import get_redis_connection
+            _backend = _RedisStreams(get_redis_connection('default'))
+        except (ImportError, NotImplementedError):
+            _backend = _LocalStreams()
+    return _backend
+
+
+def append_many(entries):
+    """
+    Append [(parent_id, message), ...] to the parents' streams in one round
+    trip. Returns the new stream ids in order, or Nones if Redis is down —
+    live delivery must not depend on the replay log.
+    """
+    if not entries:
+        return []
+    try:
+        return get_streams().append_many(entries)
+    except Exception as exc:
+        print(f"⚠️  Notification stream append failed: {exc}")
+        return [None] * len(entries)
+
+
+def replay(parent_id, last_id, limit=None):
+    """
+    Entries after `last_id` for a reconnecting parent.
+
+    Returns (entries, truncated): entries are (stream_id, message) oldest
+    first; truncated is True when the gap is larger than the stream kept.
+    """
+    limit = limit or _maxlen()
+    oldest, entries = get_streams().read_after(parent_id, last_id, limit)
+    # If the client's position has been trimmed (or the stream expired),
+    # entries between it and `oldest` may be gone.
+    truncated = bool(last_id) and (oldest is None or is_newer(oldest, last_id))
+    return entries, truncated
@@ -0,0 +1,108 @@
+"""
+Per-parent unread notification counters.
+
+The unread badge used to run
+`Notification.objects.filter(parent=..., is_read=False).count()` on every
+dashboard load and unread-count call.  The count now lives in the cache
+(Redis in production) under `notifications:unread:<parent_id>`:
+
+    * created   -> incr_many() (one round trip for a whole fan-out batch)
+    * read      -> decr()
+    * read-all  -> reset()
+
+A missing counter is recounted from the database on first read; counters
+only move when they exist, so a lost key can never come back too low.
+Counters expire after UNREAD_COUNTER_TTL and `manage.py
+reconcile_unread_counts` rewrites them from the database, so any drift
+is bounded.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Notification
+
+UNREAD_COUNTER_TTL = 24 * 3600
+KEY = "notifications:unread:{parent_id}"
+
+# INCRBY each key only if it exists (absent counters are recounted on read).
+_INCR_EXISTING_LUA = """
+    for i=1,#KEYS do
+        if redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('INCRBY', KEYS[i], ARGV[i])
+        end
+    end
+    return 0
+"""
+
+
+def _key(parent_id):
+    return KEY.format(parent_id=parent_id)
+
+
+def _redis_client():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+class UnreadCounter:
+    """Cached unread counts keyed by parent id."""
+
+    @staticmethod
+    def get(parent_id):
+        count = cache.get(_key(parent_id))
+        if count is None:
+            count = Notification.objects.filter(parent_id=parent_id, is_read=False).count()
+            # add() so a concurrent increment that created the key wins
+            cache.add(_key(parent_id), count, UNREAD_COUNTER_TTL)
+        return max(int(count), 0)
+
+    @staticmethod
+    def incr_many(counts):
+        """Add {parent_id: n} to the parents' counters that are cached."""
+        counts = {parent_id: n for parent_id, n in counts.items() if n}
+        if not counts:
+            return
+        client = _redis_client()
+        if client is not None:
+            keys = [cache.make_key(_key(parent_id)) for parent_id in counts]
+            client.eval(_INCR_EXISTING_LUA, len(keys), *keys, *counts.values())
+            return
+        for parent_id, n in counts.items():
+            try:
+                cache.incr(_key(parent_id), n)
+            except ValueError:
+                pass  # not cached: next get() recounts
+
+    @staticmethod
+    def incr(parent_id, n=1):
+        UnreadCounter.incr_many({parent_id: n})
+
+    @staticmethod
+    def decr(parent_id, n=1):
+        if n <= 0:
+            return
+        try:
+            if cache.decr(_key(parent_id), n) < 0:
+                cache.delete(_key(parent_id))
+        except ValueError:
+            pass
+
+    @staticmethod
+    def reset(parent_id):
+        cache.set(_key(parent_id), 0, UNREAD_COUNTER_TTL)
+
+    @staticmethod
+    def reconcile(parent_ids):
+        """Rewrite the given parents' counters from the database in one query."""
+        parent_ids = list(parent_ids)
+        counts = dict.fromkeys(parent_ids, 0)
+        counts.update(
+            Notification.objects.filter(parent_id__in=parent_ids, is_read=False)
+            .values('parent_id').annotate(n=Count('id')).values_list('parent_id', 'n')
+        )
+        cache.set_many({_key(parent_id): n for parent_id, n in counts.items()}, UNREAD_COUNTER_TTL)
+        return counts
@@ -4,6 +4,10 @@ from .views import (
     mark_notification_read,
     mark_all_notifications_read,
     get_unread_count,
+    notification_archive,
+    register_push_token,
+    unregister_push_token,
+    notification_preferences,
 )
 
 urlpatterns = [
@@ -11,4 +15,8 @@ urlpatterns = [
     path('<int:notification_id>/mark-read/', mark_notification_read, name='notification-mark-read'),
     path('mark-all-read/', mark_all_notifications_read, name='notification-mark-all-read'),
     path('unread-count/', get_unread_count, name='notification-unread-count'),
+    path('archive/', notification_archive, name='notification-archive'),
+    path('devices/', register_push_token, name='notification-device-register'),
+    path('devices/unregister/', unregister_push_token, name='notification-device-unregister'),
+    path('preferences/', notification_preferences, name='notification-preferences'),
 ]
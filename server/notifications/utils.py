@@ -1,7 +1,11 @@
+import threading
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+
+from . import stream
+from .broadcast import group_send_many
+from .preferences import ALL_CHANNELS, INBOX, PUSH, SOCKET, delivery_channels
 
 
 def save_notification_to_db(parent_id, notification_type, title, message, full_message=None, child=None, bus=None, trip=None, additional_data=None):
@@ -9,6 +13,7 @@ def save_notification_to_db(parent_id, notification_type, title, message, full_m
     Save notification to database for persistence.
     """
     from .models import Notification
+    from .unread import UnreadCounter
     from parents.models import Parent
     
     try:
@@ -24,6 +29,7 @@ def save_notification_to_db(parent_id, notification_type, title, message, full_m
             trip=trip,
             additional_data=additional_data or {}
         )
+        UnreadCounter.incr(parent.user_id)
         return notification
     except Parent.DoesNotExist:
         print(f"⚠️ Parent with ID {parent_id} not found, notification not saved")
@@ -33,40 +39,115 @@ def save_notification_to_db(parent_id, notification_type, title, message, full_m
         return None
 
 
-def send_notification_to_parent(parent_id, notification_type, data):
-    """
-    Send a notification to a specific parent via WebSocket.
+_batch_state = threading.local()
 
-    Args:
-        parent_id: The parent's database ID
-        notification_type: Type of notification (trip_notification, attendance_notification, etc.)
-        data: Dictionary containing notification data
-    """
-    channel_layer = get_channel_layer()
-    group_name = f"parent_notifications_{parent_id}"
 
+def _parent_message(parent_id, notification_type, data):
     # Add unique ID and timestamp if not present
     if 'id' not in data:
         data['id'] = str(uuid.uuid4())
     if 'timestamp' not in data:
         data['timestamp'] = datetime.now().isoformat()
+    return f"parent_notifications_{parent_id}", {'type': notification_type, **data}
 
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': notification_type,
-            **data
-        }
-    )
 
+def send_notifications_to_parents(notifications, push=True):
+    """
+    Send many WebSocket notifications in one batched channel-layer call.
+
+    Each message is first appended to its parent's replay stream
+    (notifications.stream) and carries the resulting `stream_id`.  Unless
+    `push` is False the same messages are pushed to the parents' devices in
+    the background (notifications.push).
 
-def send_trip_started_notification(parent_id, trip, bus, child=None):
-    """Send trip started notification to parent.
+    Args:
+        notifications: iterable of (parent_id, notification_type, data)
+    """
+    notifications = list(notifications)
+    if not notifications:
+        return
+    messages = [_parent_message(*notification) for notification in notifications]
+    stream_ids = stream.append_many([
+        (parent_id, message) for (parent_id, _, _), (_, message) in zip(notifications, messages)
+    ])
+    for (_, message), stream_id in zip(messages, stream_ids):
+        if stream_id:
+            message['stream_id'] = stream_id
+    for exc in group_send_many(messages):
+        print(f"❌ Error sending parent notification: {exc}")
+
+    if push:
+        from .push import PushDispatcher
+        PushDispatcher.submit(
+            (parent_id, message) for (parent_id, _, _), (_, message) in zip(notifications, messages)
+        )
+
+
+@contextmanager
+def notification_batch():
+    """
+    Collect every send_notification_to_parent() call made inside the block
+    and send them together on exit.  Nested blocks flush with the outermost.
+    """
+    pending = getattr(_batch_state, 'pending', None)
+    if pending is not None:
+        yield
+        return
+    _batch_state.pending = []
+    try:
+        yield
+    finally:
+        pending, _batch_state.pending = _batch_state.pending, None
+        for push in (True, False):
+            send_notifications_to_parents(
+                [notification for notification, pushed in pending if pushed is push], push=push
+            )
+
+
+def send_notification_to_parent(parent_id, notification_type, data, channels=ALL_CHANNELS):
+    """
+    Send a notification to a specific parent via WebSocket.
+
+    Inside notification_batch() the send is deferred and batched with the
+    rest of the block.
+
+    Args:
+        parent_id: The parent's database ID
+        notification_type: Type of notification (trip_notification, attendance_notification, etc.)
+        data: Dictionary containing notification data
+        channels: Delivery channels from the parent's preferences
+            (notifications.preferences); only SOCKET and PUSH apply here
+    """
+    if SOCKET not in channels:
+        if PUSH in channels:
+            from .push import PushDispatcher
+            PushDispatcher.submit([(parent_id, data)])
+        return
+    pending = getattr(_batch_state, 'pending', None)
+    if pending is not None:
+        pending.append(((parent_id, notification_type, data), PUSH in channels))
+        return
+    send_notifications_to_parents([(parent_id, notification_type, data)], push=PUSH in channels)
+
+
+def children_label(children):
+    """"Amy Otim", "Amy Otim and Ben Otim", "Amy Otim, Ben Otim and Cal Otim"."""
+    names = [f"{child.first_name} {child.last_name}" for child in children]
+    if not names:
+        return "Your child"
+    if len(names) == 1:
+        return names[0]
+    return f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+def trip_started_content(trip, bus, child=None, children=None):
+    """Title and message for a trip-started notification about `child`
+    (or several siblings at once via `children`).
 
     For parents, this is phrased around their child:
     "Child's bus has started pickup trip, bus will be arriving shortly".
     """
-    child_name = f"{child.first_name} {child.last_name}" if child else "Your child"
+    child_name = children_label(children if children is not None else [child] if child else [])
 
     if trip.trip_type == 'pickup':
         title = f"{child_name} Pickup Trip Started"
@@ -78,20 +159,53 @@ def send_trip_started_notification(parent_id, trip, bus, child=None):
         title = f"Bus {bus.bus_number} Started Trip"
         message = f"The {trip.trip_type} trip has started."
 
+    return child_name, title, message
+
+
+def trip_completed_content(trip, bus, child=None, children=None):
+    """Title and message for a trip-completed notification about `child`
+    (or several siblings at once via `children`).
+
+    For pickup trips, parents should see:
+    "ChildName has reached safe at school".
+    """
+    children = children if children is not None else [child] if child else []
+    child_name = children_label(children)
+
+    if trip.trip_type == 'pickup':
+        title = f"{child_name} Reached School Safely"
+        if len(children) > 1:
+            message = f"{child_name} have reached safe at school."
+        else:
+            message = f"{child_name} has reached safe at school."
+    else:
+        # Fallback for non-pickup trips
+        title = f"Bus {bus.bus_number} Trip Completed"
+        message = f"The {trip.trip_type} trip has been completed."
+
+    return child_name, title, message
+
+
+def send_trip_started_notification(parent_id, trip, bus, child=None):
+    """Send trip started notification to parent."""
+    child_name, title, message = trip_started_content(trip, bus, child)
     full_message = message
 
+    channels = delivery_channels(parent_id, 'trip_started')
+
     # Save to database
-    save_notification_to_db(
-        parent_id=parent_id,
-        notification_type='trip_started',
-        title=title,
-        message=message,
-        full_message=full_message,
-        child=child,
-        bus=bus,
-        trip=trip,
-        additional_data={'trip_type': trip.trip_type, 'child_name': child_name}
-    )
+    if INBOX in channels:
+        save_notification_to_db(
+            parent_id=parent_id,
+            notification_type='trip_started',
+            title=title,
+            message=message,
+            full_message=full_message,
+            child=child,
+            bus=bus,
+            trip=trip,
+            additional_data={'trip_type': trip.trip_type, 'child_name': child_name}
+        )
 
     # Send real-time notification
     send_notification_to_parent(
@@ -107,40 +221,31 @@ def send_trip_started_notification(parent_id, trip, bus, child=None):
             'bus_number': bus.bus_number,
             'trip_type': trip.trip_type,
             'child_name': child_name,
-        }
+        },
+        channels=channels
     )
 
 
 def send_trip_completed_notification(parent_id, trip, bus, child=None):
-    """Send trip completed notification to parent.
-
-    For pickup trips, parents should see:
-    "ChildName has reached safe at school".
-    """
-    child_name = f"{child.first_name} {child.last_name}" if child else "Your child"
-
-    if trip.trip_type == 'pickup':
-        title = f"{child_name} Reached School Safely"
-        message = f"{child_name} has reached safe at school."
-    else:
-        # Fallback for non-pickup trips
-        title = f"Bus {bus.bus_number} Trip Completed"
-        message = f"The {trip.trip_type} trip has been completed."
-
+    """Send trip completed notification to parent."""
+    child_name, title, message = trip_completed_content(trip, bus, child)
     full_message = message
 
+    channels = delivery_channels(parent_id, 'trip_completed')
+
     # Save to database
-    save_notification_to_db(
-        parent_id=parent_id,
-        notification_type='trip_completed',
-        title=title,
-        message=message,
-        full_message=full_message,
-        child=child,
-        bus=bus,
-        trip=trip,
-        additional_data={'trip_type': trip.trip_type, 'child_name': child_name}
-    )
+    if INBOX in channels:
+        save_notification_to_db(
+            parent_id=parent_id,
+            notification_type='trip_completed',
+            title=title,
+            message=message,
+            full_message=full_message,
+            child=child,
+            bus=bus,
+            trip=trip,
+            additional_data={'trip_type': trip.trip_type, 'child_name': child_name}
+        )
 
     # Send real-time notification
     send_notification_to_parent(
@@ -156,29 +261,33 @@ def send_trip_completed_notification(parent_id, trip, bus, child=None):
             'bus_number': bus.bus_number,
             'trip_type': trip.trip_type,
             'child_name': child_name,
-        }
+        },
+        channels=channels
     )
 
 
 def send_child_pickup_notification(parent_id, child, bus, attendance):
     """Send child pickup notification to parent."""
+    channels = delivery_channels(parent_id, 'child_picked_up')
+
     # Save to database
-    save_notification_to_db(
-        parent_id=parent_id,
-        notification_type='child_picked_up',
-        title=f'{child.first_name} Picked Up',
-        message=f'{child.first_name} has been picked up by {bus.bus_number}',
-        full_message=f'{child.first_name} {child.last_name} was picked up at {attendance.timestamp.strftime("%I:%M %p")}.',
-        child=child,
-        bus=bus,
-        additional_data={
-            'status': 'picked_up',
-            'location': {
-                'latitude': float(attendance.latitude) if hasattr(attendance, 'latitude') and attendance.latitude else None,
-                'longitude': float(attendance.longitude) if hasattr(attendance, 'longitude') and attendance.longitude else None,
+    if INBOX in channels:
+        save_notification_to_db(
+            parent_id=parent_id,
+            notification_type='child_picked_up',
+            title=f'{child.first_name} Picked Up',
+            message=f'{child.first_name} has been picked up by {bus.bus_number}',
+            full_message=f'{child.first_name} {child.last_name} was picked up at {attendance.timestamp.strftime("%I:%M %p")}.',
+            child=child,
+            bus=bus,
+            additional_data={
+                'status': 'picked_up',
+                'location': {
+                    'latitude': float(attendance.latitude) if hasattr(attendance, 'latitude') and attendance.latitude else None,
+                    'longitude': float(attendance.longitude) if hasattr(attendance, 'longitude') and attendance.longitude else None,
+                }
             }
-        }
-    )
+        )
     
     # Send real-time notification
     send_notification_to_parent(
@@ -198,29 +307,33 @@ def send_child_pickup_notification(parent_id, child, bus, attendance):
                 'latitude': float(attendance.latitude) if hasattr(attendance, 'latitude') and attendance.latitude else None,
                 'longitude': float(attendance.longitude) if hasattr(attendance, 'longitude') and attendance.longitude else None,
             },
-        }
+        },
+        channels=channels
     )
 
 
 def send_child_dropoff_notification(parent_id, child, bus, attendance):
     """Send child dropoff notification to parent."""
+    channels = delivery_channels(parent_id, 'child_dropped_off')
+
     # Save to database
-    save_notification_to_db(
-        parent_id=parent_id,
-        notification_type='child_dropped_off',
-        title=f'{child.first_name} Dropped Off',
-        message=f'{child.first_name} has been dropped off by {bus.bus_number}',
-        full_message=f'{child.first_name} {child.last_name} was dropped off at {attendance.timestamp.strftime("%I:%M %p")}.',
-        child=child,
-        bus=bus,
-        additional_data={
-            'status': 'dropped_off',
-            'location': {
-                'latitude': float(attendance.latitude) if hasattr(attendance, 'latitude') and attendance.latitude else None,
-                'longitude': float(attendance.longitude) if hasattr(attendance, 'longitude') and attendance.longitude else None,
+    if INBOX in channels:
+        save_notification_to_db(
+            parent_id=parent_id,
+            notification_type='child_dropped_off',
+            title=f'{child.first_name} Dropped Off',
+            message=f'{child.first_name} has been dropped off by {bus.bus_number}',
+            full_message=f'{child.first_name} {child.last_name} was dropped off at {attendance.timestamp.strftime("%I:%M %p")}.',
+            child=child,
+            bus=bus,
+            additional_data={
+                'status': 'dropped_off',
+                'location': {
+                    'latitude': float(attendance.latitude) if hasattr(attendance, 'latitude') and attendance.latitude else None,
+                    'longitude': float(attendance.longitude) if hasattr(attendance, 'longitude') and attendance.longitude else None,
+                }
             }
-        }
-    )
+        )
     
     # Send real-time notification
     send_notification_to_parent(
@@ -240,7 +353,8 @@ def send_child_dropoff_notification(parent_id, child, bus, attendance):
                 'latitude': float(attendance.latitude) if hasattr(attendance, 'latitude') and attendance.latitude else None,
                 'longitude': float(attendance.longitude) if hasattr(attendance, 'longitude') and attendance.longitude else None,
             },
-        }
+        },
+        channels=channels
     )
 
 
@@ -257,7 +371,8 @@ def send_route_change_notification(parent_id, bus, change_details):
             'bus_id': bus.id,
             'bus_number': bus.bus_number,
             'change_details': change_details,
-        }
+        },
+        channels=delivery_channels(parent_id, 'route_change')
     )
 
 
@@ -275,7 +390,8 @@ def send_emergency_notification(parent_id, bus, message, severity='high'):
             'bus_number': bus.bus_number,
             'severity': severity,
             'action_required': True if severity in ['high', 'critical'] else False,
-        }
+        },
+        channels=delivery_channels(parent_id, 'emergency')
     )
 
 
@@ -294,7 +410,8 @@ def send_delay_notification(parent_id, bus, delay_minutes, reason, estimated_arr
             'delay_minutes': delay_minutes,
             'reason': reason,
             'estimated_arrival': estimated_arrival,
-        }
+        },
+        channels=delivery_channels(parent_id, 'major_delay')
     )
 
 
@@ -312,7 +429,8 @@ def send_proximity_notification(parent_id, bus, distance_km, estimated_arrival_m
             'bus_number': bus.bus_number,
             'distance_km': distance_km,
             'estimated_arrival_minutes': estimated_arrival_minutes,
-        }
+        },
+        channels=delivery_channels(parent_id, 'bus_approaching')
     )
 
 
@@ -324,7 +442,10 @@ def notify_parents_of_children(children_queryset, notification_func, *args, **kw
         children_queryset: QuerySet of Child objects
         notification_func: The notification function to call
         *args, **kwargs: Arguments to pass to the notification function
+
+    All WebSocket sends go out in one batch at the end.
     """
-    for child in children_queryset:
-        if child.parent:
-            notification_func(child.parent.id, *args, **kwargs)
+    with notification_batch():
+        for child in children_queryset:
+            if child.parent:
+                notification_func(child.parent.id, *args, **kwargs)
@@ -1,10 +1,20 @@
+from datetime import datetime
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
+from django.conf import settings
 from django.utils import timezone
-from .models import Notification
-from .serializers import NotificationSerializer
+
+from apo_basi.pagination import KeysetPagination
+from .models import DevicePushToken, Notification, NotificationPreference
+from .preferences import MODE_CHANNELS, validate_modes
+from .serializers import NotificationListSerializer, NotificationSerializer
+from .push import get_providers, register_token
+from .retention import archived_months, read_archive
+from .unread import UnreadCounter
 
 
 class ParentNotificationListView(generics.ListAPIView):
@@ -12,10 +22,29 @@ class ParentNotificationListView(generics.ListAPIView):
     GET /api/notifications/ - List all notifications for authenticated parent
     Query params:
     - is_read: Filter by read status (true/false)
-    - limit: Number of results (default: 20)
+    - limit: Page size (default: 20, max 100)
+    - cursor: Opaque position from the previous page's `next` link
+    - compact: true for the slim list representation
+    - offset: legacy offset paging (kept for older app builds)
+
+    Pages are keyset-paginated on (created_at, id), so scrolling deep into
+    the history costs the same as the first page.
     """
     permission_classes = [IsAuthenticated]
-    serializer_class = NotificationSerializer
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if 'offset' in self.request.query_params:
+                self._paginator = LimitOffsetPagination()
+            else:
+                self._paginator = KeysetPagination()
+        return self._paginator
+
+    def get_serializer_class(self):
+        if self.request.query_params.get('compact', '').lower() in ('1', 'true'):
+            return NotificationListSerializer
+        return NotificationSerializer
 
     def get_queryset(self):
         user = self.request.user
@@ -24,14 +53,8 @@ class ParentNotificationListView(generics.ListAPIView):
         if user.user_type != 'parent':
             return Notification.objects.none()
         
-        # Get parent's notifications
-        from parents.models import Parent
-        try:
-            parent = Parent.objects.get(user=user)
-        except Parent.DoesNotExist:
-            return Notification.objects.none()
-        
-        queryset = Notification.objects.filter(parent=parent)
+        # Parent uses the user as primary key, so no Parent lookup is needed
+        queryset = Notification.objects.filter(parent_id=user.id).select_related('child', 'bus')
         
         # Filter by read status
         is_read = self.request.query_params.get('is_read')
@@ -39,15 +62,7 @@ class ParentNotificationListView(generics.ListAPIView):
             is_read_bool = is_read.lower() == 'true'
             queryset = queryset.filter(is_read=is_read_bool)
         
-        # Limit results
-        limit = self.request.query_params.get('limit', 20)
-        try:
-            limit = int(limit)
-            queryset = queryset[:limit]
-        except ValueError:
-            pass
-        
-        return queryset
+        return queryset.order_by('-created_at', '-id')
 
 
 @api_view(['POST'])
@@ -75,9 +90,11 @@ def mark_notification_read(request, notification_id):
     
     try:
         notification = Notification.objects.get(id=notification_id, parent=parent)
-        notification.is_read = True
-        notification.read_at = timezone.now()
-        notification.save()
+        if not notification.is_read:
+            notification.is_read = True
+            notification.read_at = timezone.now()
+            notification.save(update_fields=['is_read', 'read_at'])
+            UnreadCounter.decr(parent.user_id)
         
         serializer = NotificationSerializer(notification)
         return Response(serializer.data)
@@ -120,6 +137,7 @@ def mark_all_notifications_read(request):
         is_read=True,
         read_at=timezone.now()
     )
+    UnreadCounter.reset(parent.user_id)
     
     return Response({
         "message": f"{updated_count} notifications marked as read",
@@ -139,9 +157,143 @@ def get_unread_count(request):
         return Response({"count": 0})
     
     from parents.models import Parent
-    try:
-        parent = Parent.objects.get(user=user)
-        count = Notification.objects.filter(parent=parent, is_read=False).count()
-        return Response({"count": count})
-    except Parent.DoesNotExist:
+    if not Parent.objects.filter(user=user).exists():
         return Response({"count": 0})
+    # Parent uses the user as primary key
+    return Response({"count": UnreadCounter.get(user.id)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_archive(request):
+    """
+    GET /api/notifications/archive/ - Months with archived notifications
+    GET /api/notifications/archive/?month=YYYY-MM - That month's notifications
+
+    Read notifications older than the retention window live in compressed
+    monthly archives rather than the inbox; they are only loaded here.
+    """
+    user = request.user
+
+    if user.user_type != 'parent':
+        return Response(
+            {"error": "Only parents can view notification archives"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    month = request.query_params.get('month')
+    if not month:
+        return Response({
+            "months": [
+                {"month": f"{value:%Y-%m}", "count": count}
+                for value, count in archived_months(user.id)
+            ]
+        })
+
+    try:
+        month = datetime.strptime(month, '%Y-%m').date()
+    except ValueError:
+        return Response(
+            {"error": "month must be in YYYY-MM format"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    notifications = read_archive(user.id, month)
+    return Response({
+        "month": f"{month:%Y-%m}",
+        "count": len(notifications),
+        "results": notifications,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def register_push_token(request):
+    """
+    POST /api/notifications/devices/ - Register this device for push
+    Body: {"token": "...", "platform": "android|ios|web", "provider": "fcm"}
+    """
+    user = request.user
+
+    if user.user_type != 'parent':
+        return Response(
+            {"error": "Only parents can register devices"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    token = (request.data.get('token') or '').strip()
+    platform = request.data.get('platform')
+    if not token or platform not in dict(DevicePushToken.PLATFORM_CHOICES):
+        return Response(
+            {"error": "token and a valid platform (android, ios, web) are required"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    provider = request.data.get('provider') or settings.PUSH_DEFAULT_PROVIDER
+    if provider not in get_providers():
+        # Tokens of an unconfigured provider would never be pushed to
+        return Response(
+            {"error": f"Unknown push provider '{provider}'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    from parents.models import Parent
+    if not Parent.objects.filter(user=user).exists():
+        return Response(
+            {"error": "Parent record not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    register_token(user.id, token, platform, provider)
+    return Response({"message": "Device registered"}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def unregister_push_token(request):
+    """
+    POST /api/notifications/devices/unregister/ - Stop pushing to a device
+    Body: {"token": "..."}
+    """
+    deleted, _ = DevicePushToken.objects.filter(
+        parent_id=request.user.id, token=request.data.get('token')
+    ).delete()
+    return Response({"message": "Device unregistered", "count": deleted})
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def notification_preferences(request):
+    """
+    GET /api/notifications/preferences/ - Delivery mode per notification type
+    PUT /api/notifications/preferences/ - Body: {"modes": {"bus_approaching": "mute", ...}}
+
+    Modes: all (default), digest, push_only, mute.  PUT replaces the whole
+    set; types left out go back to "all".
+    """
+    user = request.user
+
+    if user.user_type != 'parent':
+        return Response(
+            {"error": "Only parents have notification preferences"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    if request.method == 'PUT':
+        modes, error = validate_modes(request.data.get('modes', {}))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        NotificationPreference.objects.update_or_create(parent_id=user.id, defaults={'modes': modes})
+    else:
+        modes = (
+            NotificationPreference.objects.filter(parent_id=user.id)
+            .values_list('modes', flat=True).first()
+        ) or {}
+
+    return Response({
+        "modes": {
+            notification_type: modes.get(notification_type, 'all')
+            for notification_type, _ in Notification.NOTIFICATION_TYPES
+        },
+        "available_modes": list(MODE_CHANNELS),
+    })
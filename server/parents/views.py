@@ -21,9 +21,10 @@ from .serializers import ParentLoginSerializer, ParentSerializer, ParentCreateSe
 from children.models import Child
 from attendance.models import Attendance
 from users.permissions import IsParent
-from assignments.models import Assignment
+from assignments.identity_map import first_active_for, first_assignment_to
 from notifications.models import Notification
 from notifications.serializers import NotificationSerializer
+from notifications.unread import UnreadCounter
 from trips.models import Trip
 from datetime import date
 
@@ -86,7 +87,7 @@ class ParentViewSet(viewsets.ModelViewSet):
 
         for child in children:
             # Get child's bus assignment using Assignment API
-            bus_assignment = Assignment.get_active_assignments_for(child, 'child_to_bus').first()
+            bus_assignment = first_active_for(child, 'child_to_bus')
 
             child_data = {
                 "id": child.id,
@@ -105,14 +106,14 @@ class ParentViewSet(viewsets.ModelViewSet):
 
                 # Get driver name
                 from assignments.models import BusRoute
-                driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
+                driver_assignment = first_assignment_to(bus, 'driver_to_bus')
                 driver_name = None
                 if driver_assignment and driver_assignment.assignee:
                     driver = driver_assignment.assignee
                     driver_name = f"{driver.user.first_name} {driver.user.last_name}" if hasattr(driver, 'user') else None
 
                 # Get route information from bus assignment
-                route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+                route_assignment = first_active_for(bus, 'bus_to_route')
                 route_name = None
                 route_code = None
                 if route_assignment and hasattr(route_assignment, 'assigned_to'):
@@ -153,7 +154,7 @@ class ParentViewSet(viewsets.ModelViewSet):
         ).order_by('-created_at')[:10]
 
         notifications_data = NotificationSerializer(notifications, many=True).data
-        unread_count = Notification.objects.filter(parent=parent, is_read=False).count()
+        unread_count = UnreadCounter.get(parent.user_id)
 
         return Response(
             {
@@ -333,7 +334,7 @@ class ParentViewSet(viewsets.ModelViewSet):
         children_data = []
         for child in children:
             # Get child's bus assignment using Assignment API
-            bus_assignment = Assignment.get_active_assignments_for(child, 'child_to_bus').first()
+            bus_assignment = first_active_for(child, 'child_to_bus')
 
             child_data = {
                 "id": child.id,
@@ -352,14 +353,14 @@ class ParentViewSet(viewsets.ModelViewSet):
 
                 # Get driver name
                 from assignments.models import BusRoute
-                driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
+                driver_assignment = first_assignment_to(bus, 'driver_to_bus')
                 driver_name = None
                 if driver_assignment and driver_assignment.assignee:
                     driver = driver_assignment.assignee
                     driver_name = f"{driver.user.first_name} {driver.user.last_name}" if hasattr(driver, 'user') else None
 
                 # Get route information from bus assignment
-                route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+                route_assignment = first_active_for(bus, 'bus_to_route')
                 route_name = None
                 route_code = None
                 if route_assignment and hasattr(route_assignment, 'assigned_to'):
@@ -444,7 +445,7 @@ class ParentLoginView(APIView):
             children_data = []
             for child in children:
                 # Get child's bus assignment using Assignment API
-                bus_assignment = Assignment.get_active_assignments_for(child, 'child_to_bus').first()
+                bus_assignment = first_active_for(child, 'child_to_bus')
 
                 child_data = {
                     "id": child.id,
@@ -458,8 +459,8 @@ class ParentLoginView(APIView):
                 if bus_assignment:
                     bus = bus_assignment.assigned_to
                     # Get driver and minder for the bus
-                    driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-                    minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
+                    driver_assignment = first_assignment_to(bus, 'driver_to_bus')
+                    minder_assignment = first_assignment_to(bus, 'minder_to_bus')
 
                     # Safely build driver info
                     driver_info = None
@@ -634,7 +635,7 @@ class SupabaseMagicLinkAuthView(APIView):
             children_data = []
 
             for child in children:
-                bus_assignment = Assignment.get_active_assignments_for(child, 'child_to_bus').first()
+                bus_assignment = first_active_for(child, 'child_to_bus')
 
                 child_data = {
                     "id": child.id,
@@ -647,8 +648,8 @@ class SupabaseMagicLinkAuthView(APIView):
 
                 if bus_assignment:
                     bus = bus_assignment.assigned_to
-                    driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-                    minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
+                    driver_assignment = first_assignment_to(bus, 'driver_to_bus')
+                    minder_assignment = first_assignment_to(bus, 'minder_to_bus')
 
                     driver_info = None
                     if driver_assignment and driver_assignment.assignee:
@@ -766,7 +767,7 @@ class DemoLoginView(APIView):
             children_data = []
 
             for child in children:
-                bus_assignment = Assignment.get_active_assignments_for(child, 'child_to_bus').first()
+                bus_assignment = first_active_for(child, 'child_to_bus')
 
                 child_data = {
                     "id": child.id,
@@ -779,8 +780,8 @@ class DemoLoginView(APIView):
 
                 if bus_assignment:
                     bus = bus_assignment.assigned_to
-                    driver_assignment = Assignment.get_assignments_to(bus, 'driver_to_bus').first()
-                    minder_assignment = Assignment.get_assignments_to(bus, 'minder_to_bus').first()
+                    driver_assignment = first_assignment_to(bus, 'driver_to_bus')
+                    minder_assignment = first_assignment_to(bus, 'minder_to_bus')
 
                     driver_info = None
                     if driver_assignment and driver_assignment.assignee:
@@ -873,6 +874,7 @@ class UpdateHomeLocationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        old_lat, old_lng = parent.home_latitude, parent.home_longitude
         try:
             parent.home_latitude = float(home_lat)
             parent.home_longitude = float(home_lng)
@@ -883,6 +885,12 @@ class UpdateHomeLocationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Cached road distances from the old pin are no longer this home's.
+        if old_lat is not None and old_lng is not None:
+            from trips.route_matrix import grid_key, invalidate_point
+            if grid_key(old_lat, old_lng) != grid_key(parent.home_latitude, parent.home_longitude):
+                invalidate_point(old_lat, old_lng)
+
         return Response(
             {
                 "success": True,
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from analytics.services import AnalyticsService
+from assignments.models import Assignment
+from assignments.services import AssignmentService
+from assignments.temporal import assignment_graph, valid_on
+from .factories import BusFactory, BusMinderFactory, BusRouteFactory, ChildFactory, DriverFactory, UserFactory
+
+
+class AssignmentAsOfTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.bus = BusFactory()
+
+    def _day(self, n):
+        return self.today + timedelta(days=n)
+
+    def test_validity_follows_expiry_and_cancellation(self):
+        dated = AssignmentService.create_assignment(
+            'child_to_bus', ChildFactory(), self.bus, effective_date=self._day(-10), expiry_date=self._day(-3),
+        )
+        cancelled = AssignmentService.create_assignment('driver_to_bus', DriverFactory(), self.bus,
+                                                        effective_date=self._day(-5))
+        cancelled.cancel(reason='Left')
+        never_started = AssignmentService.create_assignment('minder_to_bus', BusMinderFactory(), self.bus,
+                                                            effective_date=self._day(5))
+        never_started.cancel(reason='Plans changed')
+
+        self.assertEqual(str(Assignment.objects.get(pk=dated.pk).valid_to), str(self._day(-2)))
+
+        def on(n):
+            return set(valid_on(Assignment.objects.all(), self._day(n)).values_list('pk', flat=True))
+
+        self.assertEqual(on(-4), {dated.pk, cancelled.pk})
+        self.assertEqual(on(-2), {cancelled.pk})
+        self.assertEqual(on(0), set())
+        self.assertEqual(on(6), set())
+
+    def test_graph_for_a_past_date_in_one_query(self):
+        driver, new_driver = DriverFactory(), DriverFactory()
+        route = BusRouteFactory()
+        child = ChildFactory()
+        AssignmentService.create_assignment('driver_to_bus', driver, self.bus, effective_date=self._day(-30))
+        AssignmentService.create_assignment('bus_to_route', self.bus, route, effective_date=self._day(-30))
+        AssignmentService.create_assignment('child_to_bus', child, self.bus, effective_date=self._day(-30),
+                                            expiry_date=self._day(-11))
+        # The new driver displaces the old one today
+        AssignmentService.create_assignment('driver_to_bus', new_driver, self.bus)
+
+        with self.assertNumQueries(1):
+            past, = assignment_graph(self._day(-20))
+        self.assertEqual(past['busNumber'], self.bus.bus_number)
+        self.assertEqual(past['driver']['id'], driver.pk)
+        self.assertEqual(past['driver']['firstName'], driver.user.first_name)
+        self.assertEqual(past['route']['routeCode'], route.route_code)
+        self.assertEqual([c['id'] for c in past['children']], [child.pk])
+        self.assertIsNone(past['minder'])
+
+        now, = assignment_graph(self.today)
+        self.assertEqual(now['driver']['id'], new_driver.pk)
+        self.assertEqual(now['children'], [])
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(user=UserFactory(user_type='admin'))
+        AssignmentService.create_assignment('child_to_bus', ChildFactory(), self.bus, effective_date=self._day(-3))
+
+        resp = client.get('/api/assignments/as-of/', {'date': str(self._day(-1))})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['count'], 1)
+        self.assertEqual(resp.data['buses'][0]['busId'], self.bus.pk)
+        self.assertEqual(client.get('/api/assignments/as-of/', {'date': str(self._day(-5))}).data['count'], 0)
+        self.assertEqual(client.get('/api/assignments/as-of/', {'date': 'yesterday'}).status_code, 400)
+
+    def test_backfill_and_period_metric(self):
+        child = ChildFactory()
+        assignment = AssignmentService.create_assignment('child_to_bus', child, self.bus,
+                                                         effective_date=self._day(-20))
+        assignment.cancel(reason='Moved away')
+        Assignment.objects.filter(pk=assignment.pk).update(valid_to=None, updated_at=timezone.now() - timedelta(days=4))
+
+        call_command('backfill_assignment_validity', stdout=StringIO())
+        self.assertEqual(Assignment.objects.get(pk=assignment.pk).valid_to, self._day(-4))
+
+        metrics = AnalyticsService.get_key_metrics('week')
+        self.assertEqual(metrics['assigned_children']['value'], 0)
+        # On the last day of the previous week the child was still riding
+        self.assertEqual(metrics['assigned_children']['change'], -100.0)
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from assignments.expiry import expire_due_assignments
+from assignments.models import AssignmentHistory, CurrentAssignment
+from assignments.services import AssignmentService
+from assignments.utilization import CACHE_KEY, BusUtilization
+from trips.models import RouteStopTemplate
+from .factories import BusFactory, BusRouteFactory, ChildFactory, DriverFactory
+
+
+class ExpireDueAssignmentsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.today = timezone.now().date()
+        self.yesterday = self.today - timedelta(days=1)
+        self.bus = BusFactory()
+        self.other_bus = BusFactory()
+
+    def _assign(self, kind, assignee, target, expiry_date):
+        return AssignmentService.create_assignment(
+            kind, assignee, target, effective_date=self.today - timedelta(days=30), expiry_date=expiry_date,
+        )
+
+    def test_expires_due_rows_and_cleans_up(self):
+        child = ChildFactory()
+        due_child = self._assign('child_to_bus', child, self.bus, self.yesterday)
+        due_route = self._assign('bus_to_route', self.other_bus, BusRouteFactory(), self.yesterday)
+        current = self._assign('driver_to_bus', DriverFactory(), self.bus, self.today)
+        self.assertTrue(RouteStopTemplate.objects.filter(bus=self.bus, child=child).exists())
+        BusUtilization.get()
+
+        result = expire_due_assignments()
+
+        self.assertEqual((result.expired, result.history), (2, 2))
+        self.assertEqual(result.bus_ids, sorted([self.bus.id, self.other_bus.id]))
+        for assignment, status in ((due_child, 'expired'), (due_route, 'expired'), (current, 'active')):
+            assignment.refresh_from_db()
+            self.assertEqual(assignment.status, status)
+        self.assertEqual(list(CurrentAssignment.objects.values_list('assignment_id', flat=True)), [current.id])
+        history = AssignmentHistory.objects.get(assignment=due_child, action='expired')
+        self.assertEqual(history.changes, {'status': 'expired'})
+        self.assertIsNone(history.performed_by)
+        self.assertFalse(RouteStopTemplate.objects.filter(child=child).exists())
+        self.assertIsNone(cache.get(CACHE_KEY))
+
+    def test_statement_count_independent_of_volume(self):
+        def run(n):
+            buses = [BusFactory() for _ in range(3)]
+            for i in range(n):
+                self._assign('child_to_bus', ChildFactory(), buses[i % len(buses)], self.yesterday)
+            self.assertTrue(RouteStopTemplate.objects.filter(bus__in=buses).exists())
+            with self.assertNumQueries(6):
+                self.assertEqual(expire_due_assignments().expired, n)
+            self.assertFalse(RouteStopTemplate.objects.filter(bus__in=buses).exists())
+
+        run(3)
+        run(30)
+
+    def test_nothing_due(self):
+        self._assign('child_to_bus', ChildFactory(), self.bus, self.today)
+        with self.assertNumQueries(3):
+            result = expire_due_assignments()
+        self.assertEqual((result.expired, result.bus_ids), (0, []))
+
+    def test_command_reports_rate(self):
+        self._assign('child_to_bus', ChildFactory(), self.bus, self.yesterday)
+        out = StringIO()
+        call_command('expire_assignments', '--dry-run', stdout=out)
+        self.assertIn('1 assignments due', out.getvalue())
+        call_command('expire_assignments', stdout=out)
+        self.assertIn('Expired 1 assignments', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
@@ -0,0 +1,74 @@
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from assignments import identity_map
+from assignments.services import AssignmentService
+from .factories import BusFactory, BusRouteFactory, ChildFactory, DriverFactory
+
+
+class IdentityMapTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory()
+        self.driver = DriverFactory()
+        self.route = BusRouteFactory()
+        AssignmentService.create_assignment('driver_to_bus', self.driver, self.bus)
+        AssignmentService.create_assignment('bus_to_route', self.bus, self.route)
+
+    def test_lookups_run_once_and_share_instances(self):
+        child = ChildFactory()
+        AssignmentService.create_assignment('child_to_bus', child, self.bus)
+
+        with identity_map.identity_scope():
+            bus = identity_map.first_active_for(self.driver, 'driver_to_bus').assigned_to
+            with self.assertNumQueries(0):
+                self.assertIs(identity_map.first_active_for(self.driver, 'driver_to_bus').assigned_to, bus)
+            self.assertIs(identity_map.first_active_for(child, 'child_to_bus').assigned_to, bus)
+            route = identity_map.first_active_for(bus, 'bus_to_route').assigned_to
+            with self.assertNumQueries(0):
+                self.assertIs(identity_map.first_active_for(bus, 'bus_to_route').assigned_to, route)
+            # A new lookup costs its own query only: both ends are already mapped
+            with self.assertNumQueries(1):
+                crew = identity_map.first_assignment_to(bus, 'driver_to_bus')
+                self.assertIs(crew.assigned_to, bus)
+                self.assertIs(crew.assignee, self.driver)
+
+    def test_writes_forget_memoized_lookups(self):
+        with identity_map.identity_scope():
+            self.assertEqual(len(identity_map.assignments_to(self.bus, 'child_to_bus')), 0)
+            AssignmentService.create_assignment('child_to_bus', ChildFactory(), self.bus)
+            self.assertEqual(len(identity_map.assignments_to(self.bus, 'child_to_bus')), 1)
+
+    def test_scope_is_not_shared(self):
+        seen = []
+        with identity_map.identity_scope() as scope:
+            thread = threading.Thread(target=lambda: seen.append(identity_map.current_map()))
+            thread.start()
+            thread.join()
+            self.assertIs(identity_map.current_map(), scope)
+        self.assertEqual(seen, [None])
+        self.assertIsNone(identity_map.current_map())
+        # Outside a scope nothing is memoized
+        identity_map.first_active_for(self.driver, 'driver_to_bus')
+        with self.assertNumQueries(1):
+            identity_map.first_active_for(self.driver, 'driver_to_bus')
+
+    def test_middleware_cuts_my_route_queries(self):
+        for _ in range(5):
+            AssignmentService.create_assignment('child_to_bus', ChildFactory(), self.bus)
+
+        def count(middleware):
+            client = APIClient()
+            client.force_authenticate(user=self.driver.user)
+            with override_settings(MIDDLEWARE=middleware), CaptureQueriesContext(connection) as ctx:
+                response = client.get('/api/drivers/my-route/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['route_id'], self.route.pk)
+            return len(ctx)
+
+        without = [m for m in settings.MIDDLEWARE if m != 'assignments.middleware.AssignmentIdentityMapMiddleware']
+        self.assertLess(count(settings.MIDDLEWARE), count(without))
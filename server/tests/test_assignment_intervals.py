@@ -0,0 +1,61 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+
+from assignments.intervals import OVERLAP_CONSTRAINT, overlapping
+from assignments.models import Assignment
+from assignments.services import AssignmentService
+from assignments.validators import AssignmentValidator
+from .factories import BusFactory, BusRouteFactory, ChildFactory, DriverFactory
+
+
+class OverlapTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.route = BusRouteFactory()
+
+    def _day(self, n):
+        return self.today + timedelta(days=n)
+
+    def _assignment(self, start, end):
+        return AssignmentService.create_assignment(
+            'child_to_route', ChildFactory(), self.route, effective_date=self._day(start),
+            expiry_date=None if end is None else self._day(end),
+        )
+
+    def test_closed_and_open_periods(self):
+        periods = {
+            'past': self._assignment(0, 4),
+            'touching': self._assignment(5, 9),
+            'inside': self._assignment(12, 14),
+            'future': self._assignment(40, None),
+        }
+
+        def matches(start, end=None):
+            qs = overlapping(Assignment.objects.all(), self._day(start), None if end is None else self._day(end))
+            return {name for name, a in periods.items() if qs.filter(pk=a.pk).exists()}
+
+        self.assertEqual(matches(9, 20), {'touching', 'inside'})
+        self.assertEqual(matches(15, 39), set())
+        # A permanent probe also meets assignments that only start later
+        self.assertEqual(matches(13), {'inside', 'future'})
+        self.assertEqual(matches(100, 101), {'future'})
+
+    def test_permanent_driver_conflicts_with_future_assignment(self):
+        driver = DriverFactory()
+        AssignmentService.create_assignment('driver_to_bus', driver, BusFactory(), effective_date=self._day(30))
+        with self.assertRaises(ValidationError):
+            AssignmentValidator.validate_driver_availability(driver, self.today)
+        AssignmentValidator.validate_driver_availability(driver, self.today, self._day(29))
+
+    def test_constraint_violation_becomes_validation_error(self):
+        child = ChildFactory()
+        error = IntegrityError(f'conflicting key value violates exclusion constraint "{OVERLAP_CONSTRAINT}"')
+        with mock.patch.object(Assignment.objects, 'create', side_effect=error):
+            with self.assertRaises(ValidationError) as cm:
+                AssignmentService.create_assignment('child_to_route', child, self.route)
+        self.assertIn('conflicts', cm.exception.message_dict)
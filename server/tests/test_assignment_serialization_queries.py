@@ -0,0 +1,93 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from assignments.models import Assignment, AssignmentHistory
+from assignments.resolvers import resolve_assignment_entities
+from assignments.serializers import AssignmentSerializer
+from .factories import BusFactory, BusMinderFactory, BusRouteFactory, ChildFactory, DriverFactory, UserFactory
+
+
+def _assign(assignment_type, assignee, assigned_to, **extra):
+    return Assignment.objects.create(assignment_type=assignment_type, assignee=assignee,
+                                     assigned_to=assigned_to, status='active', **extra)
+
+
+class AssignmentSerializationQueryTests(TestCase):
+    def setUp(self):
+        self.admin = UserFactory(user_type='admin', first_name='Ada', last_name='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def _populate(self, buses):
+        for _ in range(buses):
+            bus = BusFactory()
+            _assign('driver_to_bus', DriverFactory(), bus, assigned_by=self.admin)
+            _assign('minder_to_bus', BusMinderFactory(), bus)
+            _assign('child_to_bus', ChildFactory(), bus)
+            _assign('bus_to_route', bus, BusRouteFactory())
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx), resp
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self._populate(2)
+        small, _ = self._queries('/api/assignments/list/?limit=8')
+        self._populate(8)
+        large, resp = self._queries('/api/assignments/list/?limit=40')
+        self.assertEqual(len(resp.data['results']), 40)
+        self.assertEqual(small, large)
+
+    def test_resolved_fields_match_lazy_access(self):
+        self._populate(1)
+        lazy = [AssignmentSerializer(a).data for a in Assignment.objects.order_by('id')]
+        self.assertEqual(AssignmentSerializer(Assignment.objects.order_by('id'), many=True).data, lazy)
+        driver_row = next(row for row in lazy if row['assignmentType'] == 'driver_to_bus')
+        self.assertEqual(driver_row['assignedByName'], 'Ada Admin')
+        self.assertEqual(driver_row['assigneeDetails']['type'], 'driver')
+
+    def test_one_query_per_content_type(self):
+        self._populate(3)
+        assignments = list(Assignment.objects.all())
+        # driver, minder, child, bus, route and the assigning user
+        with self.assertNumQueries(6):
+            resolve_assignment_entities(assignments)
+        with self.assertNumQueries(0):
+            for assignment in assignments:
+                assignment.assignee, assignment.assigned_to, assignment.assigned_by
+            [a.assignee.user.first_name for a in assignments if a.assignment_type == 'driver_to_bus']
+
+    def test_dangling_reference_resolves_to_none(self):
+        child = ChildFactory()
+        assignment = _assign('child_to_bus', child, BusFactory())
+        Assignment.objects.filter(pk=assignment.pk).update(assignee_object_id=child.pk + 1000)
+        assignment.refresh_from_db()
+        resolve_assignment_entities([assignment])
+        with self.assertNumQueries(0):
+            self.assertIsNone(assignment.assignee)
+
+    def _log(self, count):
+        for _ in range(count):
+            assignment = _assign('child_to_bus', ChildFactory(), BusFactory())
+            AssignmentHistory.objects.create(assignment=assignment, action='created', performed_by=UserFactory())
+
+    def test_history_list_queries_do_not_grow(self):
+        self._log(4)
+        small, _ = self._queries('/api/assignments/history/?limit=4')
+        self._log(16)
+        large, resp = self._queries('/api/assignments/history/?limit=20')
+        self.assertEqual(len(resp.data['results']), 20)
+        self.assertEqual(small, large)
+
+    def test_bus_overview_loads_people_in_batches(self):
+        bus = BusFactory()
+        _assign('driver_to_bus', DriverFactory(), bus)
+        for _ in range(3):
+            _assign('child_to_bus', ChildFactory(), bus)
+        resp = self.client.get(f'/api/assignments/bus/{bus.id}/all/')
+        self.assertEqual(resp.data['counts']['children'], 3)
+        self.assertIsNotNone(resp.data['driver'])
@@ -0,0 +1,113 @@
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from assignments.models import Assignment, AssignmentHistory, CurrentAssignment
+from assignments.services import AssignmentService
+from trips.models import RouteStopTemplate
+from .factories import BusFactory, BusRouteFactory, ChildFactory, UserFactory
+
+
+class BulkAssignmentEngineTests(TestCase):
+    def setUp(self):
+        self.admin = UserFactory(user_type='admin')
+        self.bus = BusFactory(capacity=50)
+        self.other_bus = BusFactory(capacity=50)
+
+    def test_replace_cancels_moves_and_records_history(self):
+        staying, leaving, moving = ChildFactory(), ChildFactory(), ChildFactory()
+        old_staying = AssignmentService.create_assignment('child_to_bus', staying, self.bus)
+        old_leaving = AssignmentService.create_assignment('child_to_bus', leaving, self.bus)
+        old_moving = AssignmentService.create_assignment('child_to_bus', moving, self.other_bus)
+
+        result = AssignmentService.bulk_assign_children(
+            self.bus, [staying.id, moving.id], assigned_by=self.admin, replace=True
+        )
+
+        self.assertEqual([r.child_id for r in result.results], [staying.id, moving.id])
+        self.assertEqual(sorted(result.replaced_ids), sorted([old_staying.id, old_leaving.id]))
+        self.assertEqual(result.results[1].cancelled_ids, [old_moving.id])
+
+        for old in (old_staying, old_leaving):
+            old.refresh_from_db()
+            self.assertEqual(old.status, 'cancelled')
+            self.assertIn(f'Cancelled: Replaced by new bulk assignment to bus {self.bus.bus_number}', old.notes)
+        old_moving.refresh_from_db()
+        self.assertEqual(old_moving.status, 'cancelled')
+
+        self.assertEqual(
+            sorted(Assignment.get_assignments_to(self.bus, 'child_to_bus').values_list('assignee_object_id', flat=True)),
+            sorted([staying.id, moving.id]),
+        )
+        self.assertEqual(set(CurrentAssignment.objects.values_list('assignment_id', flat=True)),
+                         {r.assignment.id for r in result.results})
+        history = AssignmentHistory.objects.filter(assignment__in=result.assignments)
+        self.assertEqual(history.count(), 2)
+        self.assertTrue(all(h.performed_by_id == self.admin.id for h in history))
+        self.assertEqual(set(RouteStopTemplate.objects.values_list('bus_id', 'child_id')),
+                         {(self.bus.id, staying.id), (self.bus.id, moving.id)})
+
+    def test_query_count_independent_of_batch_size(self):
+        def run(n):
+            bus = BusFactory(capacity=50)
+            children = [ChildFactory() for _ in range(n)]
+            AssignmentService.create_assignment('child_to_bus', ChildFactory(), bus)
+            for child in children[: n // 2]:
+                AssignmentService.create_assignment('child_to_bus', child, self.other_bus)
+            with CaptureQueriesContext(connection) as ctx:
+                AssignmentService.bulk_assign_children_to_bus(bus, [c.id for c in children])
+            return len(ctx)
+
+        self.assertEqual(run(4), run(40))
+
+    def test_capacity_failure_writes_nothing(self):
+        small = BusFactory(capacity=2)
+        on_fk = ChildFactory(assigned_bus=small)
+        kept = AssignmentService.create_assignment('child_to_bus', ChildFactory(), small)
+        newcomers = [ChildFactory().id for _ in range(2)]
+
+        with self.assertRaises(ValidationError) as cm:
+            AssignmentService.bulk_assign_children_to_bus(small, newcomers)
+        self.assertIn('capacity', cm.exception.message_dict)
+        kept.refresh_from_db()
+        self.assertEqual(kept.status, 'active')
+        self.assertFalse(Assignment.objects.filter(assignee_object_id__in=newcomers).exists())
+
+        # The legacy FK child counts only once if it is part of the batch
+        AssignmentService.bulk_assign_children_to_bus(small, [on_fk.id, newcomers[0]])
+
+    def test_add_only_batches_count_current_children(self):
+        small = BusFactory(capacity=3)
+        AssignmentService.bulk_assign_children(small, [ChildFactory().id, ChildFactory().id])
+        AssignmentService.bulk_assign_children(small, [ChildFactory().id])
+
+        overflow = [ChildFactory().id, ChildFactory().id]
+        with self.assertRaises(ValidationError) as cm:
+            AssignmentService.bulk_assign_children(small, overflow)
+        self.assertIn('capacity', cm.exception.message_dict)
+        self.assertEqual(Assignment.get_assignments_to(small, 'child_to_bus').count(), 3)
+
+        # Replacing the bus's children only counts the batch
+        AssignmentService.bulk_assign_children(small, overflow, replace=True)
+        self.assertEqual(Assignment.get_assignments_to(small, 'child_to_bus').count(), 2)
+
+    def test_route_batches_append(self):
+        route = BusRouteFactory()
+        first, second = ChildFactory(), ChildFactory()
+        AssignmentService.bulk_assign_children_to_route(route, [first.id])
+        assignments = AssignmentService.bulk_assign_children_to_route(route, [second.id], effective_date='2030-01-01')
+        self.assertEqual(str(assignments[0].effective_date), '2030-01-01')
+        self.assertEqual(Assignment.objects.filter(assignment_type='child_to_route', status='active').count(), 2)
+
+    def test_endpoint_returns_per_child_results(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        children = [ChildFactory() for _ in range(3)]
+        resp = client.post('/api/assignments/list/bulk_assign_children_to_bus/', {
+            'busId': self.bus.id, 'childrenIds': [c.id for c in children],
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertEqual([r['childId'] for r in resp.data['results']], [c.id for c in children])
+        self.assertEqual(resp.data['assignments'][0]['assignedToId'], self.bus.id)
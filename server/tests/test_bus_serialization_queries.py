@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from assignments.models import Assignment, BusRoute, CurrentAssignment
+from buses.models import Bus
+from buses.serializers import BusSerializer, with_current_assignments
+from busminders.models import BusMinder
+from children.models import Child
+from drivers.models import Driver
+from .factories import ParentFactory, UserFactory
+
+User = get_user_model()
+
+
+class BusSerializationQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserFactory(user_type='admin'))
+        self.parent = ParentFactory()
+        self.made = 0
+
+    def _fleet(self, n, children_per_bus=2):
+        """n buses, each with a driver, minder, route and children, created in bulk."""
+        start, self.made = self.made, self.made + n
+        buses = Bus.objects.bulk_create(
+            Bus(bus_number=f'B{i}', number_plate=f'P-{i}', capacity=40) for i in range(start, self.made)
+        )
+
+        def staff(role):
+            return User.objects.bulk_create(
+                User(username=f'{role}{i}', user_type=role, first_name=role.title(), last_name=str(i),
+                     phone_number=f'{role}{i}') for i in range(start, self.made)
+            )
+
+        drivers = Driver.objects.bulk_create(
+            Driver(user=user, license_number=f'L-{user.pk}') for user in staff('driver')
+        )
+        minders = BusMinder.objects.bulk_create(BusMinder(user=user) for user in staff('busminder'))
+        routes = BusRoute.objects.bulk_create(
+            BusRoute(name=f'Route {i}', route_code=f'R{i}') for i in range(start, self.made)
+        )
+        children = Child.objects.bulk_create(
+            Child(first_name='Kid', last_name=str(i), class_grade='1', parent=self.parent)
+            for i in range(n * children_per_bus)
+        )
+
+        ct = ContentType.objects.get_for_model
+        links = []
+        for i, bus in enumerate(buses):
+            links += [('driver_to_bus', drivers[i], bus), ('minder_to_bus', minders[i], bus),
+                      ('bus_to_route', bus, routes[i])]
+            links += [('child_to_bus', child, bus)
+                      for child in children[i * children_per_bus:(i + 1) * children_per_bus]]
+        assignments = Assignment.objects.bulk_create(
+            Assignment(assignment_type=kind, status='active',
+                       assignee_content_type=ct(assignee), assignee_object_id=assignee.pk,
+                       assigned_to_content_type=ct(target), assigned_to_object_id=target.pk)
+            for kind, assignee, target in links
+        )
+        CurrentAssignment.objects.bulk_create(
+            CurrentAssignment(assignment_id=a.pk, **CurrentAssignment.expected_fields(a)) for a in assignments
+        )
+        return buses
+
+    def _list_queries(self, limit):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f'/api/buses/?limit={limit}')
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx), resp
+
+    def test_list_query_count_at_10_and_500_buses(self):
+        self._fleet(10)
+        small, resp = self._list_queries(10)
+        self.assertEqual(len(resp.data['results']), 10)
+
+        self._fleet(490)
+        large, resp = self._list_queries(500)
+        self.assertEqual(len(resp.data['results']), 500)
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 4)  # auth is forced; count + buses + children
+
+    def test_annotated_fields_match_per_bus_lookups(self):
+        self._fleet(3, children_per_bus=3)
+        Bus.objects.create(bus_number='EMPTY', number_plate='EMPTY', capacity=40)
+        plain = [BusSerializer(bus).data for bus in Bus.objects.order_by('id')]
+        annotated = BusSerializer(with_current_assignments(Bus.objects.order_by('id')), many=True).data
+        self.assertEqual(annotated, plain)
+        self.assertEqual(annotated[0]['driverName'], 'Driver 0')
+        self.assertEqual(len(annotated[0]['assignedChildrenIds']), 3)
+        self.assertIsNone(annotated[-1]['minderName'])
+
+    def test_detail_is_annotated(self):
+        bus, = self._fleet(1)
+        with self.assertNumQueries(2):
+            resp = self.client.get(f'/api/buses/{bus.id}/')
+        self.assertEqual(resp.data['routeName'], 'Route 0')
+        self.assertEqual(resp.data['assignedChildrenCount'], 2)
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from assignments.services import AssignmentService
+from assignments.utilization import BusUtilization
+from .factories import BusFactory, BusMinderFactory, BusRouteFactory, ChildFactory, DriverFactory, ParentFactory
+
+
+class BusUtilizationQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def _bus(self, children=2):
+        bus = BusFactory(capacity=10)
+        AssignmentService.create_assignment('driver_to_bus', DriverFactory(), bus)
+        AssignmentService.create_assignment('minder_to_bus', BusMinderFactory(), bus)
+        AssignmentService.create_assignment('bus_to_route', bus, BusRouteFactory())
+        for _ in range(children):
+            AssignmentService.create_assignment('child_to_bus', ChildFactory(), bus)
+        return bus
+
+    def test_query_count_independent_of_fleet_size(self):
+        self._bus()
+        with self.assertNumQueries(3):
+            self.assertEqual(len(BusUtilization.compute()), 1)
+        for _ in range(4):
+            self._bus(children=3)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(BusUtilization.compute()), 5)
+
+    def test_children_and_crew_details(self):
+        parent = ParentFactory(user__first_name='Grace', user__last_name='Namu', contact_number='0700111222')
+        bus = self._bus(children=0)
+        child = ChildFactory(parent=parent, class_grade='3')
+        AssignmentService.create_assignment('child_to_bus', child, bus)
+
+        report, = AssignmentService.get_bus_utilization()
+        self.assertEqual(report['assigned_children'], 1)
+        self.assertEqual(report['utilization_percentage'], 10.0)
+        self.assertEqual(report['children'], [{
+            'id': child.id, 'first_name': child.first_name, 'last_name': child.last_name, 'grade': '3',
+            'parent_name': 'Grace Namu', 'parent_phone': '0700111222',
+        }])
+        self.assertIsNotNone(report['route']['route_code'])
+        self.assertEqual(set(report['driver']), {'id', 'first_name', 'last_name', 'phone'})
+
+    def test_cached_until_assignments_change(self):
+        bus = self._bus(children=1)
+        self.assertEqual(AssignmentService.get_bus_utilization()[0]['assigned_children'], 1)
+        with self.assertNumQueries(0):
+            AssignmentService.get_bus_utilization()
+
+        assignment = AssignmentService.create_assignment('child_to_bus', ChildFactory(), bus)
+        self.assertEqual(AssignmentService.get_bus_utilization()[0]['assigned_children'], 2)
+
+        assignment.cancel(reason='Moved')
+        self.assertEqual(AssignmentService.get_bus_utilization()[0]['assigned_children'], 1)
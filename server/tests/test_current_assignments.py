@@ -0,0 +1,103 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
+from django.test import TestCase
+from django.utils import timezone
+
+from assignments.models import Assignment, CurrentAssignment
+from .factories import BusFactory, BusMinderFactory, BusRouteFactory, ChildFactory, DriverFactory
+
+
+def _assign(assignment_type, assignee, assigned_to, **extra):
+    return Assignment.objects.create(assignment_type=assignment_type, assignee=assignee,
+                                     assigned_to=assigned_to, status='active', **extra)
+
+
+class CurrentAssignmentSyncTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory()
+        self.other_bus = BusFactory()
+        self.child = ChildFactory()
+
+    def test_active_assignment_gets_typed_row(self):
+        assignment = _assign('child_to_bus', self.child, self.bus)
+        row = CurrentAssignment.objects.get(assignment=assignment)
+        self.assertEqual((row.child_id, row.bus_id, row.driver_id), (self.child.id, self.bus.id, None))
+
+    def test_reassignment_and_cancel_remove_rows(self):
+        first = _assign('child_to_bus', self.child, self.bus)
+        second = _assign('child_to_bus', self.child, self.other_bus)
+        self.assertEqual(list(CurrentAssignment.objects.values_list('assignment_id', flat=True)), [second.id])
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'expired')
+
+        second.cancel(reason='Moved school')
+        self.assertFalse(CurrentAssignment.objects.exists())
+
+    def test_lookups_are_single_joins(self):
+        driver, minder, route = DriverFactory(), BusMinderFactory(), BusRouteFactory()
+        _assign('child_to_bus', self.child, self.bus)
+        _assign('driver_to_bus', driver, self.bus)
+        _assign('minder_to_bus', minder, self.bus)
+        _assign('bus_to_route', self.bus, route)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(CurrentAssignment.related(self.child, 'bus').first(), self.bus)
+        with self.assertNumQueries(1):
+            self.assertEqual(CurrentAssignment.related(self.bus, 'driver').select_related('user').first(), driver)
+        self.assertEqual(CurrentAssignment.related(driver, 'bus').first(), self.bus)
+        self.assertEqual(CurrentAssignment.related(self.bus, 'minder').first(), minder)
+        self.assertEqual(CurrentAssignment.related(self.bus, 'route').first(), route)
+        self.assertEqual(list(CurrentAssignment.related(self.bus, 'child')), [self.child])
+
+    def test_date_window_respected(self):
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        _assign('child_to_bus', self.child, self.bus, effective_date=tomorrow)
+        self.assertIsNone(CurrentAssignment.related(self.child, 'bus').first())
+        self.assertFalse(Assignment.get_active_assignments_for(self.child, 'child_to_bus').exists())
+        self.assertEqual(CurrentAssignment.related(self.child, 'bus', on=tomorrow).first(), self.bus)
+
+    def test_get_assignments_to_goes_through_current_table(self):
+        assignment = _assign('child_to_bus', self.child, self.bus)
+        self.assertEqual(list(Assignment.get_assignments_to(self.bus, 'child_to_bus')), [assignment])
+        self.assertEqual(list(Assignment.get_assignments_to(self.bus, 'driver_to_bus')), [])
+        self.assertEqual(list(Assignment.get_active_assignments_for(self.child)), [assignment])
+
+
+class CheckCurrentAssignmentsCommandTests(TestCase):
+    def test_reports_and_repairs_drift(self):
+        bus = BusFactory()
+        kept = _assign('child_to_bus', ChildFactory(), bus)
+        lost = _assign('child_to_bus', ChildFactory(), bus)
+        CurrentAssignment.objects.filter(assignment=lost).delete()
+        Assignment.objects.filter(pk=kept.pk).update(status='cancelled')  # bypasses save()
+
+        out = StringIO()
+        call_command('check_current_assignments', stdout=out)
+        self.assertIn('1 missing, 1 stale, 0 mismatched', out.getvalue())
+
+        call_command('check_current_assignments', '--repair', stdout=StringIO())
+        self.assertEqual(list(CurrentAssignment.objects.values_list('assignment_id', flat=True)), [lost.id])
+
+        out = StringIO()
+        call_command('check_current_assignments', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+    def test_backfilled_after_migrate(self):
+        bus = BusFactory()
+        driver = DriverFactory()
+        assignments = [_assign('child_to_bus', ChildFactory(), bus), _assign('driver_to_bus', driver, bus)]
+        # As on the first deploy: active assignments written before the table existed
+        CurrentAssignment.objects.all().delete()
+        self.assertEqual(list(Assignment.get_assignments_to(bus)), [])
+
+        config = apps.get_app_config('assignments')
+        post_migrate.send(sender=config, app_config=config, verbosity=0, interactive=False,
+                          using='default', apps=apps, plan=[])
+        self.assertEqual(sorted(Assignment.get_assignments_to(bus), key=lambda a: a.pk), assignments)
+        self.assertEqual(CurrentAssignment.related(driver, 'bus').get(), bus)
+        # Nothing left to add on the next migrate
+        self.assertEqual(CurrentAssignment.backfill(), 0)
@@ -0,0 +1,127 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels_redis.core import RedisChannelLayer
+from django.test import SimpleTestCase
+
+from notifications import utils
+from notifications.broadcast import group_send_many
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def zremrangebyscore(self, key, min, max):
+        self.ops.append(('zrem', key, min, max))
+
+    def zrange(self, key, start, end):
+        self.ops.append(('zrange', key))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        replies = []
+        for op in self.ops:
+            zset = self.redis.zsets.setdefault(op[1], {})
+            if op[0] == 'zrem':
+                for member in [m for m, score in zset.items() if op[2] <= score <= op[3]]:
+                    del zset[member]
+                replies.append(0)
+            else:
+                replies.append([m for m, _ in sorted(zset.items(), key=lambda item: item[1])])
+        return replies
+
+
+class _FakeRedis:
+    """Just enough of redis.asyncio for the batched group send path."""
+
+    def __init__(self):
+        self.zsets = {}
+        self.round_trips = 0
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+    async def zadd(self, key, mapping):
+        self.round_trips += 1
+        self.zsets.setdefault(key, {}).update({member.encode(): score for member, score in mapping.items()})
+
+    async def expire(self, key, seconds):
+        self.round_trips += 1
+
+    async def eval(self, script, numkeys, *args):
+        self.round_trips += 1
+        keys, argv = args[:numkeys], args[numkeys:]
+        for i, key in enumerate(keys):
+            zset = self.zsets.setdefault(key, {})
+            if len(zset) < int(argv[numkeys + i]):
+                zset[argv[i]] = float(argv[2 * numkeys + i])
+        return 0
+
+
+class BatchedGroupSendTests(SimpleTestCase):
+    def test_in_memory_layer_delivers_every_message(self):
+        layer = get_channel_layer()
+        channels = []
+        for parent_id in range(5):
+            channel = async_to_sync(layer.new_channel)()
+            async_to_sync(layer.group_add)(f"parent_notifications_{parent_id}", channel)
+            channels.append(channel)
+
+        errors = group_send_many([
+            (f"parent_notifications_{parent_id}", {'type': 'trip_notification', 'n': parent_id})
+            for parent_id in range(5)
+        ])
+
+        self.assertEqual(errors, [])
+        for parent_id, channel in enumerate(channels):
+            self.assertEqual(async_to_sync(layer.receive)(channel)['n'], parent_id)
+
+    def test_redis_layer_uses_constant_round_trips(self):
+        layer = RedisChannelLayer(hosts=['redis://localhost:6379/0'])
+        redis = _FakeRedis()
+        with mock.patch.object(RedisChannelLayer, 'connection', lambda self, index: redis):
+            for parent_id in range(1000):
+                async_to_sync(layer.group_add)(f"parent_notifications_{parent_id}", f"specific.{parent_id}")
+            redis.round_trips = 0
+
+            errors = group_send_many([
+                (f"parent_notifications_{parent_id}", {'type': 'trip_notification', 'n': parent_id})
+                for parent_id in range(1000)
+            ], channel_layer=layer)
+
+        self.assertEqual(errors, [])
+        # members pipeline + channel expiry pipeline + two 500-message EVALs
+        self.assertEqual(redis.round_trips, 4)
+        queued = redis.zsets[layer.prefix + 'specific.42']
+        message = layer.deserialize(next(iter(queued)))
+        self.assertEqual(message['n'], 42)
+        self.assertEqual(message['__asgi_channel__'], ['specific.42'])
+
+    def test_redis_layer_keeps_batch_order_per_channel(self):
+        layer = RedisChannelLayer(hosts=['redis://localhost:6379/0'])
+        redis = _FakeRedis()
+        with mock.patch.object(RedisChannelLayer, 'connection', lambda self, index: redis):
+            async_to_sync(layer.group_add)("parent_notifications_1", "specific.1")
+            with mock.patch('notifications.broadcast.PUSH_CHUNK', 2):
+                group_send_many([
+                    ("parent_notifications_1", {'type': 'trip_notification', 'n': n}) for n in range(5)
+                ], channel_layer=layer)
+
+        queued = redis.zsets[layer.prefix + 'specific.1']
+        by_score = sorted(queued, key=queued.get)
+        self.assertEqual([layer.deserialize(payload)['n'] for payload in by_score], [0, 1, 2, 3, 4])
+        self.assertEqual(len(set(queued.values())), 5)
+
+    def test_notification_batch_sends_once(self):
+        with mock.patch.object(utils, 'group_send_many', return_value=[]) as send:
+            with utils.notification_batch():
+                utils.send_notification_to_parent(1, 'trip_notification', {'title': 'a'})
+                utils.send_notification_to_parent(2, 'trip_notification', {'title': 'b'})
+                self.assertFalse(send.called)
+
+        send.assert_called_once()
+        groups = [group for group, _ in send.call_args.args[0]]
+        self.assertEqual(groups, ['parent_notifications_1', 'parent_notifications_2'])
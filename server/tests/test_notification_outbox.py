@@ -0,0 +1,129 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assignments.models import Assignment
+from notifications.models import Notification, NotificationOutbox
+from notifications.outbox import OutboxDispatcher
+from trips.models import Trip
+from .factories import BusFactory, ChildFactory, ParentFactory, UserFactory
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=80)
+        self.trip = Trip.objects.create(bus=self.bus, driver=UserFactory(user_type='driver'), route='Route',
+                                        trip_type='pickup', scheduled_time=timezone.now())
+
+    def _add_children(self, n):
+        parents = []
+        for _ in range(n):
+            parent = ParentFactory()
+            child = ChildFactory(parent=parent)
+            Assignment.objects.create(assignment_type='child_to_bus', assignee=child, assigned_to=self.bus,
+                                      effective_date=timezone.now().date(), status='active')
+            parents.append(parent)
+        return parents
+
+    def _start(self):
+        self.trip.status = 'in-progress'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.trip.save()
+        return callbacks
+
+    def test_status_change_only_writes_outbox_row(self):
+        self._add_children(5)
+        callbacks = self._start()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(Notification.objects.count(), 0)
+        event = NotificationOutbox.objects.get()
+        self.assertEqual((event.event_type, event.status), ('trip_started', 'pending'))
+
+    def test_request_cost_independent_of_children(self):
+        self._add_children(2)
+        with CaptureQueriesContext(connection) as small:
+            self._start()
+
+        self._add_children(40)
+        self.trip = Trip.objects.create(bus=self.bus, driver=self.trip.driver, route='Route',
+                                        trip_type='dropoff', scheduled_time=timezone.now())
+        with CaptureQueriesContext(connection) as large:
+            self._start()
+        self.assertEqual(len(small), len(large))
+
+    def test_dispatch_creates_notifications_and_pushes(self):
+        parents = self._add_children(3)
+        self._start()
+
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"parent_notifications_{parents[0].user_id}", channel)
+
+        self.assertEqual(OutboxDispatcher.drain(), 1)
+
+        event = NotificationOutbox.objects.get()
+        self.assertEqual((event.status, event.recipients), ('done', 3))
+        self.assertEqual(Notification.objects.filter(trip=self.trip, notification_type='trip_started').count(), 3)
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['notification_type'], 'trip_started')
+        self.assertEqual(message['trip_id'], self.trip.id)
+
+        # Drained rows are not dispatched twice
+        self.assertEqual(OutboxDispatcher.drain(), 0)
+
+    def test_dispatch_queries_independent_of_recipients(self):
+        self._add_children(3)
+        self._start()
+        with CaptureQueriesContext(connection) as small:
+            OutboxDispatcher.drain()
+
+        self._add_children(30)
+        self.trip.status = 'completed'
+        self.trip.save()
+        with CaptureQueriesContext(connection) as large:
+            OutboxDispatcher.drain()
+
+        self.assertEqual(Notification.objects.filter(notification_type='trip_completed').count(), 33)
+        self.assertEqual(len(small), len(large))
+
+    def test_failed_event_is_retried(self):
+        self._add_children(1)
+        self._start()
+        NotificationOutbox.objects.update(event_type='unknown')
+        OutboxDispatcher.drain()
+        event = NotificationOutbox.objects.get()
+        self.assertEqual(event.status, 'pending')
+        self.assertEqual(event.attempts, 1)
+        self.assertTrue(event.last_error)
+
+
+class NotificationFanoutTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=80)
+        self.trip = Trip.objects.create(bus=self.bus, driver=UserFactory(user_type='driver'), route='Route',
+                                        trip_type='pickup', scheduled_time=timezone.now())
+
+    def _assign(self, child):
+        Assignment.objects.create(assignment_type='child_to_bus', assignee=child, assigned_to=self.bus,
+                                  effective_date=timezone.now().date(), status='active')
+
+    def test_siblings_share_one_notification(self):
+        family = ParentFactory()
+        siblings = [ChildFactory(parent=family, first_name=name, last_name='Otim') for name in ('Amy', 'Ben', 'Cal')]
+        only_child = ChildFactory(parent=ParentFactory())
+        for child in siblings + [only_child]:
+            self._assign(child)
+
+        self.trip.status = 'in-progress'
+        self.trip.save()
+        OutboxDispatcher.drain()
+
+        self.assertEqual(NotificationOutbox.objects.get().recipients, 2)
+        consolidated = Notification.objects.get(parent=family)
+        self.assertIsNone(consolidated.child)
+        self.assertEqual(consolidated.title, 'Amy Otim, Ben Otim and Cal Otim Pickup Trip Started')
+        self.assertEqual(sorted(consolidated.additional_data['child_ids']), sorted(c.id for c in siblings))
+        self.assertEqual(Notification.objects.get(parent=only_child.parent).child, only_child)
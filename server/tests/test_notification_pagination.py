@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from notifications.models import Notification
+from .factories import BusFactory, ChildFactory, ParentFactory
+
+
+class NotificationInboxPaginationTests(TestCase):
+    def setUp(self):
+        self.parent = ParentFactory()
+        self.child = ChildFactory(parent=self.parent)
+        self.bus = BusFactory()
+        now = timezone.now()
+        notes = Notification.objects.bulk_create([
+            Notification(parent=self.parent, child=self.child, bus=self.bus,
+                         notification_type='general', title=f'Note {i}', message='Hello')
+            for i in range(45)
+        ])
+        # Pairs share a timestamp so the id tie-breaker is exercised
+        for i, note in enumerate(notes):
+            Notification.objects.filter(pk=note.pk).update(created_at=now - timedelta(minutes=i // 2))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.parent.user)
+
+    def _walk(self, url, on_page=None):
+        seen = []
+        while url:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            seen.extend(row['id'] for row in resp.data['results'])
+            if on_page:
+                on_page()
+            url = resp.data['next']
+        return seen
+
+    def test_walks_every_notification_once_newest_first(self):
+        seen = self._walk('/api/notifications/?limit=10')
+        expected = list(
+            Notification.objects.filter(parent=self.parent)
+            .order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_new_notifications_do_not_shift_pages(self):
+        before = set(Notification.objects.values_list('id', flat=True))
+
+        def arrive():
+            Notification.objects.create(parent=self.parent, notification_type='general',
+                                        title='New', message='Arrived mid-scroll')
+
+        seen = self._walk('/api/notifications/?limit=10', on_page=arrive)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), before)
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        first = self.client.get('/api/notifications/?limit=10')
+        with CaptureQueriesContext(connection) as first_ctx:
+            self.client.get('/api/notifications/?limit=10')
+
+        url = first.data['next']
+        for _ in range(3):
+            url = self.client.get(url).data['next']
+        with CaptureQueriesContext(connection) as deep_ctx:
+            resp = self.client.get(url)
+        self.assertEqual(len(resp.data['results']), 5)
+        self.assertIsNone(resp.data['next'])
+        self.assertEqual(len(deep_ctx), len(first_ctx))
+
+    def test_compact_rows_and_limit_cap(self):
+        resp = self.client.get('/api/notifications/?limit=500&compact=true')
+        self.assertEqual(len(resp.data['results']), 45)
+        row = resp.data['results'][0]
+        self.assertNotIn('additional_data', row)
+        self.assertEqual(row['bus_number'], self.bus.bus_number)
+        self.assertEqual(row['child_name'], f"{self.child.first_name} {self.child.last_name}")
+
+    def test_offset_paging_still_supported(self):
+        resp = self.client.get('/api/notifications/?limit=10&offset=40')
+        self.assertEqual(resp.data['count'], 45)
+        self.assertEqual(len(resp.data['results']), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        resp = self.client.get('/api/notifications/?cursor=not-a-cursor')
+        self.assertEqual(resp.status_code, 404)
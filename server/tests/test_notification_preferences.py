@@ -0,0 +1,115 @@
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from notifications.models import Notification, NotificationOutbox, NotificationPreference
+from notifications.outbox import OutboxDispatcher
+from notifications.preferences import PreferenceMap
+from notifications.push import PushDispatcher
+from notifications.utils import send_child_pickup_notification, send_emergency_notification
+from trips.models import Trip
+from .factories import BusFactory, ChildFactory, ParentFactory, UserFactory
+
+
+class PreferenceFanoutTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=80)
+        self.trip = Trip.objects.create(bus=self.bus, driver=UserFactory(user_type='driver'), route='Route',
+                                        trip_type='pickup', scheduled_time=timezone.now())
+        self.parents = {}
+        for mode in ('all', 'mute', 'digest', 'push_only'):
+            parent = ParentFactory()
+            ChildFactory(parent=parent, assigned_bus=self.bus)
+            if mode != 'all':
+                NotificationPreference.objects.create(parent=parent, modes={'trip_started': mode})
+            self.parents[mode] = parent.user_id
+
+    def test_preferences_load_in_one_query(self):
+        with self.assertNumQueries(1):
+            preferences = PreferenceMap.load(self.parents.values())
+        self.assertEqual(preferences.mode(self.parents['mute'], 'trip_started'), 'mute')
+        self.assertEqual(preferences.mode(self.parents['mute'], 'bus_approaching'), 'all')
+        self.assertEqual(preferences.mode(self.parents['all'], 'trip_started'), 'all')
+
+    def test_outbox_skips_muted_channels_before_writing(self):
+        event = NotificationOutbox(event_type='trip_started', trip=self.trip)
+        with mock.patch('notifications.outbox.send_notifications_to_parents') as sockets, \
+                mock.patch.object(PushDispatcher, 'submit') as push_only:
+            self.assertEqual(OutboxDispatcher.dispatch_event(event), 2)
+
+        self.assertEqual(
+            set(Notification.objects.values_list('parent_id', flat=True)),
+            {self.parents['all'], self.parents['digest']},
+        )
+        self.assertEqual([parent_id for parent_id, _, _ in sockets.call_args.args[0]], [self.parents['all']])
+        (parent_id, message), = push_only.call_args.args[0]
+        self.assertEqual(parent_id, self.parents['push_only'])
+        self.assertEqual(message['notification_type'], 'trip_started')
+
+    def test_single_notifications_respect_preferences(self):
+        parent = ParentFactory()
+        child = ChildFactory(parent=parent)
+        NotificationPreference.objects.create(parent=parent, modes={'child_picked_up': 'mute'})
+        attendance = SimpleNamespace(timestamp=timezone.now(), latitude=None, longitude=None)
+
+        with mock.patch('notifications.utils.send_notifications_to_parents') as sockets:
+            send_child_pickup_notification(parent.user_id, child, self.bus, attendance)
+            self.assertFalse(Notification.objects.filter(parent=parent).exists())
+            sockets.assert_not_called()
+
+            NotificationPreference.objects.filter(parent=parent).update(modes={'emergency': 'mute'})
+            send_emergency_notification(parent.user_id, self.bus, 'Breakdown')
+            sockets.assert_called_once()
+
+
+class PreferenceEndpointTests(TestCase):
+    def setUp(self):
+        self.parent = ParentFactory()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.parent.user)
+
+    def test_put_and_get(self):
+        resp = self.client.put('/api/notifications/preferences/', {
+            'modes': {'bus_approaching': 'mute', 'trip_started': 'all'},
+        }, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['modes']['bus_approaching'], 'mute')
+        # Defaults are not stored
+        self.assertEqual(NotificationPreference.objects.get(parent=self.parent).modes, {'bus_approaching': 'mute'})
+
+        resp = self.client.get('/api/notifications/preferences/')
+        self.assertEqual(resp.data['modes']['bus_approaching'], 'mute')
+        self.assertEqual(resp.data['modes']['major_delay'], 'all')
+
+    def test_invalid_modes_rejected(self):
+        for modes in ({'emergency': 'mute'}, {'bus_approaching': 'loud'}, {'unknown': 'mute'}):
+            resp = self.client.put('/api/notifications/preferences/', {'modes': modes}, format='json')
+            self.assertEqual(resp.status_code, 400, modes)
+
+
+class NotificationDigestTests(TestCase):
+    def test_digest_summarises_since_last_run(self):
+        parent = ParentFactory()
+        NotificationPreference.objects.create(parent=parent, modes={'bus_approaching': 'digest'})
+        for _ in range(3):
+            Notification.objects.create(parent=parent, notification_type='bus_approaching', title='Near', message='m')
+        Notification.objects.create(parent=parent, notification_type='trip_started', title='Go', message='m')
+        stale = Notification.objects.create(parent=parent, notification_type='bus_approaching', title='Old', message='m')
+        Notification.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(days=3))
+
+        with mock.patch('notifications.management.commands.send_notification_digests.send_notifications_to_parents') as send:
+            call_command('send_notification_digests', stdout=StringIO())
+            (parent_id, _, data), = send.call_args.args[0]
+            self.assertEqual(parent_id, parent.user_id)
+            self.assertEqual(data['counts'], {'bus_approaching': 3})
+            self.assertEqual(data['title'], '3 new updates')
+
+            send.reset_mock()
+            call_command('send_notification_digests', stdout=StringIO())
+            self.assertEqual(send.call_args.args[0], [])
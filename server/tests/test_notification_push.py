@@ -0,0 +1,175 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from notifications import push
+from notifications.models import DevicePushToken
+from notifications.push import PushDispatcher, PushProvider, PushProviderError, PushResult
+from notifications.utils import send_notification_to_parent
+from .factories import ParentFactory, UserFactory
+
+
+def _local(**config):
+    return {'local': {'BACKEND': 'notifications.push.LocalPushProvider', **config}}
+
+
+def _note(title='Bus 12 Started Trip'):
+    return {'notification_type': 'trip_started', 'title': title, 'message': 'On the way', 'bus_id': 12}
+
+
+class ConcurrencyProbe(PushProvider):
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.active = self.peak = self.requests = 0
+
+    async def send_batch(self, tokens, message):
+        self.requests += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return PushResult(sent=len(tokens))
+
+
+class Unavailable(PushProvider):
+    calls = 0
+
+    async def send_batch(self, tokens, message):
+        Unavailable.calls += 1
+        raise PushProviderError('503 from provider')
+
+
+class PushDispatcherTests(TestCase):
+    def setUp(self):
+        push.reset_providers()
+        self.addCleanup(push.reset_providers)
+        self.parents = [ParentFactory() for _ in range(5)]
+
+    def _register(self, parent, token, provider='local'):
+        DevicePushToken.objects.create(parent=parent, token=token, platform='android', provider=provider)
+
+    def _provider(self):
+        return push.get_providers()['local'][0]
+
+    @override_settings(PUSH_PROVIDERS=_local(BATCH_SIZE=2))
+    def test_identical_payloads_share_requests(self):
+        for i, parent in enumerate(self.parents):
+            self._register(parent, f'tok-{i}')
+        notifications = [(parent.user_id, {**_note(), 'id': f'uuid-{i}'}) for i, parent in enumerate(self.parents)]
+
+        with self.assertNumQueries(1):
+            batches = PushDispatcher.plan(notifications)
+        self.assertEqual([len(tokens) for _, _, tokens in batches], [2, 2, 1])
+
+        stats = PushDispatcher.dispatch(notifications)
+        self.assertEqual((stats.sent, stats.requests), (5, 3))
+        token, message = self._provider().sent[0]
+        self.assertEqual(message.title, 'Bus 12 Started Trip')
+        self.assertIn(('bus_id', '12'), message.data)
+
+    @override_settings(PUSH_PROVIDERS=_local(), PUSH_RETRY_BACKOFF=0)
+    def test_invalid_tokens_pruned_and_transient_failures_retried(self):
+        parent = self.parents[0]
+        for token in ('good', 'invalid-old-phone', 'flaky-network'):
+            self._register(parent, token)
+
+        stats = PushDispatcher.dispatch([(parent.user_id, _note())])
+
+        self.assertEqual((stats.sent, stats.failed, stats.pruned), (2, 0, 1))
+        self.assertEqual(stats.requests, 2)  # the retry only carries the flaky token
+        self.assertEqual(
+            set(DevicePushToken.objects.values_list('token', flat=True)), {'good', 'flaky-network'}
+        )
+
+    @override_settings(
+        PUSH_PROVIDERS={'down': {'BACKEND': 'tests.test_notification_push.Unavailable'}},
+        PUSH_RETRY_BACKOFF=0,
+    )
+    def test_request_failures_give_up_after_max_attempts(self):
+        Unavailable.calls = 0
+        self._register(self.parents[0], 'tok', provider='down')
+        stats = PushDispatcher.dispatch([(self.parents[0].user_id, _note())])
+        self.assertEqual(Unavailable.calls, push.MAX_ATTEMPTS)
+        self.assertEqual((stats.sent, stats.failed), (0, 1))
+        self.assertTrue(DevicePushToken.objects.exists())
+
+    @override_settings(
+        PUSH_PROVIDERS={'probe': {'BACKEND': 'tests.test_notification_push.ConcurrencyProbe',
+                                  'BATCH_SIZE': 1, 'RATE_LIMIT': 1000}},
+    )
+    def test_worker_pool_is_bounded(self):
+        for i, parent in enumerate(self.parents):
+            self._register(parent, f'tok-{i}', provider='probe')
+        PushDispatcher.dispatch([(parent.user_id, _note()) for parent in self.parents], workers=2)
+        provider = push.get_providers()['probe'][0]
+        self.assertEqual(provider.requests, 5)
+        self.assertEqual(provider.peak, 2)
+
+    @override_settings(PUSH_PROVIDERS=_local(BATCH_SIZE=1, RATE_LIMIT=40))
+    def test_provider_rate_limit(self):
+        for i in range(60):
+            self._register(self.parents[i % 5], f'tok-{i}')
+        notifications = [(parent.user_id, _note()) for parent in self.parents]
+        started = time.monotonic()
+        stats = PushDispatcher.dispatch(notifications)
+        # 40 requests of burst, then 20 more at 40/s
+        self.assertEqual(stats.requests, 60)
+        self.assertGreaterEqual(time.monotonic() - started, 0.4)
+
+    @override_settings(PUSH_PROVIDERS=_local())
+    def test_sends_are_pushed_after_commit(self):
+        with mock.patch.object(PushDispatcher, '_enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                send_notification_to_parent(self.parents[0].user_id, 'trip_notification', _note())
+                enqueue.assert_not_called()
+        (parent_id, data), = enqueue.call_args.args[0]
+        self.assertEqual(parent_id, self.parents[0].user_id)
+        self.assertEqual(data['title'], 'Bus 12 Started Trip')
+
+    def test_no_providers_means_no_push(self):
+        with mock.patch.object(PushDispatcher, '_enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                send_notification_to_parent(self.parents[0].user_id, 'trip_notification', _note())
+        enqueue.assert_not_called()
+
+
+@override_settings(PUSH_PROVIDERS=_local(), PUSH_DEFAULT_PROVIDER='local')
+class PushTokenEndpointTests(TestCase):
+    def setUp(self):
+        push.reset_providers()
+        self.addCleanup(push.reset_providers)
+        self.parent = ParentFactory()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.parent.user)
+
+    def test_register_and_unregister(self):
+        resp = self.client.post('/api/notifications/devices/', {'token': 'abc', 'platform': 'ios'}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        token = DevicePushToken.objects.get(token='abc')
+        self.assertEqual((token.parent_id, token.provider), (self.parent.user_id, 'local'))
+
+        # Re-registering the same device is idempotent
+        self.client.post('/api/notifications/devices/', {'token': 'abc', 'platform': 'ios'}, format='json')
+        self.assertEqual(DevicePushToken.objects.count(), 1)
+
+        resp = self.client.post('/api/notifications/devices/unregister/', {'token': 'abc'}, format='json')
+        self.assertEqual(resp.data['count'], 1)
+        self.assertFalse(DevicePushToken.objects.exists())
+
+    def test_platform_is_validated(self):
+        resp = self.client.post('/api/notifications/devices/', {'token': 'abc', 'platform': 'pager'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_provider_is_validated(self):
+        resp = self.client.post('/api/notifications/devices/',
+                                {'token': 'abc', 'platform': 'ios', 'provider': 'fcm'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(DevicePushToken.objects.exists())
+
+    def test_parent_profile_required(self):
+        self.client.force_authenticate(user=UserFactory(user_type='parent'))
+        resp = self.client.post('/api/notifications/devices/', {'token': 'abc', 'platform': 'ios'}, format='json')
+        self.assertEqual(resp.status_code, 404)
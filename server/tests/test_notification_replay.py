@@ -0,0 +1,130 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notifications import stream
+from notifications.consumers import ParentNotificationsConsumer
+from notifications.utils import send_notification_to_parent
+from .factories import ParentFactory
+
+
+def _trip_message(title):
+    return {'notification_type': 'trip_started', 'title': title, 'message': title}
+
+
+class NotificationStreamTests(SimpleTestCase):
+    def setUp(self):
+        stream.get_streams().clear()
+
+    def test_replay_returns_entries_after_last_id(self):
+        ids = stream.append_many([(7, {'n': i}) for i in range(4)])
+        entries, truncated = stream.replay(7, ids[1])
+        self.assertEqual([message['n'] for _, message in entries], [2, 3])
+        self.assertFalse(truncated)
+
+    def test_trimmed_position_is_reported(self):
+        with self.settings(NOTIFICATION_STREAM_MAXLEN=3):
+            ids = stream.append_many([(7, {'n': i}) for i in range(6)])
+            entries, truncated = stream.replay(7, ids[0])
+        self.assertEqual([message['n'] for _, message in entries], [3, 4, 5])
+        self.assertTrue(truncated)
+
+    def test_sent_notifications_carry_stream_id(self):
+        with mock.patch('notifications.utils.group_send_many', return_value=[]) as send:
+            send_notification_to_parent(9, 'trip_notification', _trip_message('Started'))
+        (entry_id, stored), = stream.replay(9, None)[0]
+        group, live = send.call_args.args[0][0]
+        self.assertEqual(group, 'parent_notifications_9')
+        self.assertEqual(live['stream_id'], entry_id)
+        self.assertEqual(stored['title'], 'Started')
+
+
+class ParentNotificationReplayTests(TransactionTestCase):
+    def setUp(self):
+        stream.get_streams().clear()
+        self.parent = ParentFactory()
+        self.token = str(AccessToken.for_user(self.parent.user))
+
+    async def _connect(self, last_id=None):
+        path = f"/ws/notifications/parent/?token={self.token}"
+        if last_id:
+            path += f"&last_id={last_id}"
+        communicator = WebsocketCommunicator(ParentNotificationsConsumer.as_asgi(), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'connected')
+        return communicator
+
+    def _last_seen(self):
+        entries, _ = stream.replay(self.parent.user_id, None)
+        return entries[-1][0]
+
+    def test_reconnect_replays_gap_in_one_frame(self):
+        send_notification_to_parent(self.parent.user_id, 'trip_notification', _trip_message('first'))
+        last_seen = self._last_seen()
+        # Sent while the phone was offline
+        for title in ('second', 'third'):
+            send_notification_to_parent(self.parent.user_id, 'trip_notification', _trip_message(title))
+
+        async def scenario():
+            communicator = await self._connect(last_id=last_seen)
+            frame = await communicator.receive_json_from()
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+            return frame
+
+        frame = async_to_sync(scenario)()
+        self.assertEqual(frame['type'], 'replay')
+        self.assertFalse(frame['truncated'])
+        self.assertEqual([n['title'] for n in frame['notifications']], ['second', 'third'])
+        self.assertEqual(frame['last_id'], frame['notifications'][-1]['stream_id'])
+
+    def test_live_notifications_after_replay(self):
+        send_notification_to_parent(self.parent.user_id, 'trip_notification', _trip_message('seen'))
+        last_seen = self._last_seen()
+
+        async def scenario():
+            communicator = await self._connect()
+            await communicator.send_json_to({'type': 'resume', 'last_id': last_seen})
+            self.assertTrue(await communicator.receive_nothing())  # nothing missed
+
+            await sync_to_async(send_notification_to_parent)(
+                self.parent.user_id, 'trip_notification', _trip_message('live')
+            )
+            frame = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return frame
+
+        frame = async_to_sync(scenario)()
+        self.assertEqual(frame['title'], 'live')
+        self.assertTrue(frame['stream_id'])
+
+    def test_digest_delivered_live_and_on_replay(self):
+        digest = {'notification_type': 'digest', 'title': '2 new updates',
+                  'message': '2 Bus Approaching', 'counts': {'bus_approaching': 2}}
+        send_notification_to_parent(self.parent.user_id, 'trip_notification', _trip_message('seen'))
+        last_seen = self._last_seen()
+
+        async def scenario():
+            communicator = await self._connect()
+            await sync_to_async(send_notification_to_parent)(self.parent.user_id, 'digest_notification', dict(digest))
+            live = await communicator.receive_json_from()
+            # The socket survives the digest
+            await sync_to_async(send_notification_to_parent)(
+                self.parent.user_id, 'trip_notification', _trip_message('after')
+            )
+            after = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+            communicator = await self._connect(last_id=last_seen)
+            replayed = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return live, after, replayed
+
+        live, after, replayed = async_to_sync(scenario)()
+        self.assertEqual((live['type'], live['counts']), ('digest_notification', {'bus_approaching': 2}))
+        self.assertEqual(after['title'], 'after')
+        self.assertEqual([n['title'] for n in replayed['notifications']], ['2 new updates', 'after'])
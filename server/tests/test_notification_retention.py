@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from notifications.models import Notification, NotificationArchive
+from notifications.retention import archive_notifications, read_archive
+from .factories import BusFactory, ChildFactory, ParentFactory
+
+
+class NotificationRetentionTests(TestCase):
+    def setUp(self):
+        self.parent = ParentFactory()
+        self.other = ParentFactory()
+        self.child = ChildFactory(parent=self.parent)
+        self.bus = BusFactory()
+        self.old = timezone.make_aware(datetime(2024, 3, 10, 8, 0))
+
+    def _make(self, parent, n, created_at, is_read=True, **extra):
+        notes = Notification.objects.bulk_create([
+            Notification(parent=parent, notification_type='general', title=f'Note {i}',
+                         message='Hello', is_read=is_read, **extra)
+            for i in range(n)
+        ])
+        Notification.objects.filter(pk__in=[note.pk for note in notes]).update(created_at=created_at)
+        return notes
+
+    def test_archives_only_old_read_notifications(self):
+        self._make(self.parent, 5, self.old, child=self.child, bus=self.bus)
+        self._make(self.parent, 2, self.old, is_read=False)
+        recent = self._make(self.parent, 3, timezone.now())
+
+        result = archive_notifications(days=90, chunk_size=2)
+
+        self.assertEqual(result.moved, 5)
+        self.assertEqual(result.chunks, 3)
+        remaining = Notification.objects.filter(parent=self.parent)
+        self.assertEqual(remaining.filter(is_read=False).count(), 2)
+        self.assertEqual(remaining.filter(is_read=True).count(), len(recent))
+        self.assertEqual(NotificationArchive.objects.filter(parent=self.parent).count(), 3)
+
+        rows = read_archive(self.parent.user_id, self.old.date())
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['child_name'], f"{self.child.first_name} {self.child.last_name}")
+        self.assertEqual(rows[0]['bus_number'], self.bus.bus_number)
+        self.assertEqual([row['id'] for row in rows], sorted((row['id'] for row in rows), reverse=True))
+
+    def test_chunk_statements_stay_bounded(self):
+        self._make(self.parent, 6, self.old)
+        self._make(self.other, 6, self.old - timedelta(days=40))
+        with CaptureQueriesContext(connection) as ctx:
+            result = archive_notifications(days=90, chunk_size=4)
+        self.assertEqual(result.moved, 12)
+        # One DELETE per chunk, never one for the whole backlog
+        deletes = [q for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(Notification.objects.count(), 0)
+        months = set(NotificationArchive.objects.values_list('parent_id', 'month'))
+        self.assertEqual(len(months), 2)
+
+    def test_archive_endpoint(self):
+        self._make(self.parent, 3, self.old)
+        self._make(self.other, 2, self.old)
+        archive_notifications(days=90)
+
+        client = APIClient()
+        client.force_authenticate(user=self.parent.user)
+        resp = client.get('/api/notifications/archive/')
+        self.assertEqual(resp.data['months'], [{'month': '2024-03', 'count': 3}])
+
+        resp = client.get('/api/notifications/archive/?month=2024-03')
+        self.assertEqual(resp.data['count'], 3)
+        self.assertEqual(resp.data['results'][0]['title'], 'Note 2')
+
+        self.assertEqual(client.get('/api/notifications/archive/?month=March').status_code, 400)
+
+    def test_command_reports_throughput(self):
+        self._make(self.parent, 4, self.old)
+        out = StringIO()
+        call_command('archive_notifications', '--chunk-size', '3', stdout=out)
+        self.assertIn('Archived 4 notifications', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
@@ -0,0 +1,101 @@
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notifications import consumers
+from notifications.consumers import ParentNotificationsConsumer
+from notifications.models import Notification
+from notifications.unread import UnreadCounter
+from notifications.utils import save_notification_to_db
+from .factories import ParentFactory
+
+
+def _notify(parent, n=1):
+    return [save_notification_to_db(parent.user_id, 'general', f'Note {i}', 'Hello') for i in range(n)]
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.parent = ParentFactory()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.parent.user)
+
+    def _count(self):
+        resp = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(resp.status_code, 200)
+        return resp.data['count']
+
+    def test_counter_tracks_create_read_and_read_all(self):
+        notes = _notify(self.parent, 3)
+        self.assertEqual(self._count(), 3)  # recounted once, then cached
+
+        _notify(self.parent, 2)
+        self.assertEqual(self._count(), 5)
+
+        self.client.post(f'/api/notifications/{notes[0].id}/mark-read/')
+        self.client.post(f'/api/notifications/{notes[0].id}/mark-read/')  # already read
+        self.assertEqual(self._count(), 4)
+
+        self.client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(self._count(), 0)
+
+    def test_cached_count_needs_no_count_query(self):
+        _notify(self.parent, 2)
+        UnreadCounter.get(self.parent.user_id)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(UnreadCounter.get(self.parent.user_id), 2)
+        self.assertEqual(len(ctx), 0)
+
+    def test_missing_counter_is_not_incremented_from_zero(self):
+        _notify(self.parent, 2)
+        cache.clear()
+        UnreadCounter.incr(self.parent.user_id)
+        self.assertEqual(UnreadCounter.get(self.parent.user_id), 2)
+
+    def test_reconcile_fixes_drift(self):
+        _notify(self.parent, 2)
+        UnreadCounter.get(self.parent.user_id)
+        Notification.objects.filter(parent=self.parent).update(is_read=True)  # behind the counter's back
+        self.assertEqual(UnreadCounter.reconcile([self.parent.user_id]), {self.parent.user_id: 0})
+        self.assertEqual(UnreadCounter.get(self.parent.user_id), 0)
+
+
+class SocketReadReceiptTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.parent = ParentFactory()
+        self.notes = _notify(self.parent, 4)
+
+    def test_receipts_are_flushed_in_one_update(self):
+        token = str(AccessToken.for_user(self.parent.user))
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                ParentNotificationsConsumer.as_asgi(), f"/ws/notifications/parent/?token={token}"
+            )
+            await communicator.connect()
+            await communicator.receive_json_from()
+            for note in self.notes[:3]:
+                await communicator.send_json_to({'type': 'mark_as_read', 'notification_id': note.id})
+                ack = await communicator.receive_json_from()
+                assert ack['type'] == 'notification_marked_read'
+            await communicator.send_json_to({'type': 'get_unread_count'})
+            count = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return count
+
+        original = consumers.READ_RECEIPT_FLUSH_DELAY
+        consumers.READ_RECEIPT_FLUSH_DELAY = 60  # only the explicit count request flushes
+        try:
+            count = async_to_sync(scenario)()
+        finally:
+            consumers.READ_RECEIPT_FLUSH_DELAY = original
+
+        self.assertEqual(count, {'type': 'unread_count', 'count': 1})
+        self.assertEqual(Notification.objects.filter(parent=self.parent, is_read=True).count(), 3)
@@ -0,0 +1,136 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .helpers import create_sample_data
+from trips.models import RouteMatrixEntry
+from trips.route_matrix import eta_offsets, get_leg, get_route_matrix, grid_key, invalidate_point
+
+SCHOOL = (-1.2864, 36.8172)
+HOME_A = (-1.2800, 36.8200)
+HOME_B = (-1.2900, 36.8100)
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, n):
+        self._n = n
+
+    def json(self):
+        return {
+            'distances': [[0 if i == j else 1000.0 for j in range(self._n)] for i in range(self._n)],
+            'durations': [[0 if i == j else 120.0 for j in range(self._n)] for i in range(self._n)],
+        }
+
+
+def _fake_get(url, params=None, timeout=None):
+    return _FakeResponse(url.rsplit('/', 1)[1].count(';') + 1)
+
+
+@override_settings(MAPBOX_ACCESS_TOKEN='')
+class RouteMatrixTests(TestCase):
+    def test_grid_key_snaps_nearby_points(self):
+        self.assertEqual(grid_key(-1.28641, 36.81722), grid_key(-1.28639, 36.81718))
+
+    def test_estimates_are_used_but_not_persisted(self):
+        matrix = get_route_matrix([SCHOOL, HOME_A, HOME_B])
+        self.assertFalse(matrix.complete)
+        self.assertGreater(matrix.durations_s[0][1], 0)
+        self.assertEqual(matrix.durations_s[1][1], 0)
+        self.assertEqual(RouteMatrixEntry.objects.count(), 0)
+
+    def test_cached_pairs_make_no_external_calls(self):
+        points = [SCHOOL, HOME_A]
+        RouteMatrixEntry.objects.create(origin=grid_key(*SCHOOL), destination=grid_key(*HOME_A),
+                                        distance_m=1500, duration_s=300)
+        RouteMatrixEntry.objects.create(origin=grid_key(*HOME_A), destination=grid_key(*SCHOOL),
+                                        distance_m=1600, duration_s=320)
+        with override_settings(MAPBOX_ACCESS_TOKEN='tok'), \
+                patch('trips.route_matrix.requests.get') as get:
+            matrix = get_route_matrix(points)
+        get.assert_not_called()
+        self.assertTrue(matrix.complete)
+        self.assertEqual(matrix.durations_s[1][0], 320)
+
+    def test_missing_pairs_fetched_from_mapbox_once(self):
+        points = [SCHOOL, HOME_A, HOME_B]
+        with override_settings(MAPBOX_ACCESS_TOKEN='tok'), \
+                patch('trips.route_matrix.requests.get', side_effect=_fake_get) as get:
+            first = get_route_matrix(points)
+            second = get_route_matrix(points)
+        self.assertEqual(get.call_count, 1)
+        self.assertTrue(first.complete and second.complete)
+        self.assertEqual(RouteMatrixEntry.objects.count(), 6)
+
+    def test_eta_offsets_read_stop_legs_from_the_matrix(self):
+        RouteMatrixEntry.objects.create(origin=grid_key(*HOME_A), destination=grid_key(*HOME_B),
+                                        distance_m=2000, duration_s=240)
+        with override_settings(MAPBOX_ACCESS_TOKEN='tok'), \
+                patch('trips.route_matrix.requests.get') as get:
+            self.assertEqual(eta_offsets(SCHOOL, [HOME_A, HOME_B], first_leg_s=60), [60, 300])
+            # Without a live first leg, it comes from get_leg()
+            offsets = eta_offsets(SCHOOL, [HOME_A, HOME_B])
+        get.assert_not_called()
+        self.assertEqual(offsets, [get_leg(SCHOOL, HOME_A)[1], get_leg(SCHOOL, HOME_A)[1] + 240])
+
+    def test_bus_etas_use_matrix_and_one_live_leg(self):
+        from unittest.mock import AsyncMock
+        from asgiref.sync import async_to_sync
+        from buses.consumers import BusLocationConsumer
+
+        RouteMatrixEntry.objects.create(origin=grid_key(*HOME_A), destination=grid_key(*HOME_B),
+                                        distance_m=2000, duration_s=240)
+        consumer = BusLocationConsumer()
+        consumer.group_name = 'bus_1'
+        consumer.channel_layer = AsyncMock()
+        consumer._get_trip_remaining_stops = AsyncMock(return_value={'trip_type': 'pickup', 'stops': [
+            {'child_ids': [1], 'lat': HOME_A[0], 'lng': HOME_A[1]},
+            {'child_ids': [2, 3], 'lat': HOME_B[0], 'lng': HOME_B[1]},
+        ]})
+
+        class _Directions:
+            status_code = 200
+
+            def json(self):
+                return {'routes': [{'duration': 90.0}]}
+
+        with override_settings(MAPBOX_ACCESS_TOKEN='tok'), \
+                patch('buses.consumers.req_lib.get', return_value=_Directions()) as get:
+            async_to_sync(consumer._broadcast_etas)(1, *SCHOOL)
+
+        # Only the bus -> first stop leg goes to Mapbox
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(get.call_args.args[0].split('?')[0].rsplit('/', 1)[1].count(';'), 1)
+        _, message = consumer.channel_layer.group_send.call_args.args
+        self.assertEqual(message['etas'], {'1': 90, '2': 330, '3': 330})
+
+    def test_invalidate_point_drops_both_directions(self):
+        RouteMatrixEntry.objects.create(origin=grid_key(*SCHOOL), destination=grid_key(*HOME_A),
+                                        distance_m=1, duration_s=1)
+        RouteMatrixEntry.objects.create(origin=grid_key(*HOME_A), destination=grid_key(*HOME_B),
+                                        distance_m=1, duration_s=1)
+        RouteMatrixEntry.objects.create(origin=grid_key(*SCHOOL), destination=grid_key(*HOME_B),
+                                        distance_m=1, duration_s=1)
+        self.assertEqual(invalidate_point(*HOME_A), 2)
+        self.assertEqual(RouteMatrixEntry.objects.count(), 1)
+
+
+class HomeLocationInvalidationTests(TestCase):
+    def setUp(self):
+        self.d = create_sample_data()
+        self.parent = self.d['parent_profile']
+        self.parent.home_latitude, self.parent.home_longitude = HOME_A
+        self.parent.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.d['parent_user'])
+
+    def test_moving_home_invalidates_cached_pairs(self):
+        RouteMatrixEntry.objects.create(origin=grid_key(*SCHOOL), destination=grid_key(*HOME_A),
+                                        distance_m=1, duration_s=1)
+        resp = self.client.patch('/api/parents/home-location/',
+                                 {'homeLatitude': HOME_B[0], 'homeLongitude': HOME_B[1]},
+                                 format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(RouteMatrixEntry.objects.exists())
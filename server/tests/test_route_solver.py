@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .helpers import create_sample_data
+from trips.models import Stop
+from trips.route_solver import (
+    build_distance_matrix,
+    haversine_km,
+    route_length,
+    solve_stop_order,
+)
+from trips.views import _optimize_trip_stops_background
+
+SCHOOL = (-1.2864, 36.8172)
+
+
+def _random_homes(n, seed=7):
+    rng = random.Random(seed)
+    return [(SCHOOL[0] + rng.uniform(-0.07, 0.07), SCHOOL[1] + rng.uniform(-0.07, 0.07))
+            for _ in range(n)]
+
+
+def _length(order, homes, trip_type):
+    matrix = build_distance_matrix([SCHOOL] + homes)
+    path = [0] + [i + 1 for i in order] + ([0] if trip_type == 'pickup' else [])
+    return route_length(path, matrix)
+
+
+class RouteSolverTests(TestCase):
+    def test_haversine_known_distance(self):
+        # One degree of latitude is ~111 km.
+        self.assertAlmostEqual(haversine_km(0, 0, 1, 0), 111.19, places=1)
+
+    def test_order_is_permutation_of_stops(self):
+        homes = _random_homes(25)
+        for trip_type in ('pickup', 'dropoff'):
+            order = solve_stop_order(homes, SCHOOL, trip_type)
+            self.assertEqual(sorted(order), list(range(25)))
+
+    def test_trivial_routes(self):
+        self.assertEqual(solve_stop_order([], SCHOOL, 'pickup'), [])
+        self.assertEqual(solve_stop_order([SCHOOL], SCHOOL, 'dropoff'), [0])
+
+    def test_collinear_dropoff_visits_outward(self):
+        # Homes on a line heading away from school: dropoff is open-ended,
+        # so the shortest route walks outward in distance order.
+        homes = [(SCHOOL[0] + 0.01 * k, SCHOOL[1]) for k in (3, 1, 4, 2)]
+        self.assertEqual(solve_stop_order(homes, SCHOOL, 'dropoff'), [1, 3, 0, 2])
+
+    def test_solver_beats_assignment_order(self):
+        homes = _random_homes(40)
+        for trip_type in ('pickup', 'dropoff'):
+            order = solve_stop_order(homes, SCHOOL, trip_type)
+            self.assertLess(_length(order, homes, trip_type),
+                            _length(list(range(40)), homes, trip_type))
+
+    def test_sixty_stops_under_100ms(self):
+        homes = _random_homes(60)
+        matrix = build_distance_matrix([SCHOOL] + homes)
+        started = time.perf_counter()
+        solve_stop_order(homes, SCHOOL, 'pickup', matrix=matrix)
+        self.assertLess(time.perf_counter() - started, 0.1)
+
+
+@override_settings(MAPBOX_ACCESS_TOKEN='', SCHOOL_LATITUDE=SCHOOL[0], SCHOOL_LONGITUDE=SCHOOL[1])
+class OptimizeTripStopsTests(TestCase):
+    def setUp(self):
+        self.d = create_sample_data()
+        self.trip = self.d['trip']
+
+    def test_orders_stops_without_mapbox_token(self):
+        self.trip.trip_type = 'dropoff'
+        self.trip.save()
+        # Created far-to-near; the solver should reverse them.
+        for k, offset in enumerate((0.03, 0.02, 0.01)):
+            Stop.objects.create(
+                trip=self.trip, address=f'Home {k}',
+                latitude=SCHOOL[0] + offset, longitude=SCHOOL[1],
+                scheduled_time=timezone.now(), order=k,
+            )
+
+        _optimize_trip_stops_background(self.trip.id)
+
+        addresses = list(self.trip.stops.order_by('order').values_list('address', flat=True))
+        self.assertEqual(addresses, ['Home 2', 'Home 1', 'Home 0'])
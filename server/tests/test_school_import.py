@@ -0,0 +1,192 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from admins.onboarding import SchoolImport, read_rows
+from assignments.models import Assignment
+from buses.models import Bus
+from children.models import Child
+from drivers.models import Driver
+from parents.models import Parent
+from .factories import BusFactory, DriverFactory, UserFactory
+
+BUSES_CSV = """bus_number,number_plate,capacity,model
+S1,KAA 001A,30,Isuzu
+S2,KAA 002A,2,
+"""
+
+
+def families_csv(n, bus_number='S1', first=0):
+    lines = ['parent_first_name,parent_last_name,parent_phone,child_first_name,child_last_name,class_grade,bus_number']
+    for i in range(first, first + n):
+        # Two children per family
+        lines.append(f'Pat,P{i // 2},07990{i // 2:05d},Kid,K{i},P{i % 6 + 1},{bus_number}')
+    return '\n'.join(lines) + '\n'
+
+
+class SchoolImportTests(TestCase):
+    def setUp(self):
+        self.admin = UserFactory(user_type='admin')
+
+    def test_buses_upsert_and_plate_conflict(self):
+        SchoolImport('buses').run(read_rows(BUSES_CSV))
+        result = SchoolImport('buses').run(read_rows(
+            "bus_number,number_plate,capacity\nS1,KAA 001A,45\nS3,KAA 002A,20\nS4,,10\n"
+        ))
+        self.assertEqual((result.created, result.updated), (0, 1))
+        self.assertEqual([(e.row, e.message) for e in result.errors], [
+            (3, 'Missing number_plate'),
+            (2, 'Number plate KAA 002A already belongs to bus S2'),
+        ])
+        self.assertEqual(Bus.objects.get(bus_number='S1').capacity, 45)
+        self.assertFalse(Bus.objects.filter(bus_number='S3').exists())
+
+    def test_families_create_parents_children_and_assignments(self):
+        SchoolImport('buses').run(read_rows(BUSES_CSV))
+        result = SchoolImport('families', chunk_size=4, assigned_by=self.admin).run(read_rows(families_csv(10)))
+
+        self.assertEqual((result.rows, result.chunks, result.assigned, result.errors), (10, 3, 10, []))
+        self.assertEqual(Parent.objects.count(), 5)
+        self.assertEqual(Child.objects.count(), 10)
+        parent = Parent.objects.select_related('user').get(contact_number='0799000001')
+        self.assertEqual(parent.user.user_type, 'parent')
+        self.assertFalse(parent.user.has_usable_password())
+        self.assertEqual(parent.parent_children.count(), 2)
+        bus = Bus.objects.get(bus_number='S1')
+        self.assertEqual(Assignment.get_assignments_to(bus, 'child_to_bus').count(), 10)
+
+        # Re-running the file changes nothing
+        again = SchoolImport('families').run(read_rows(families_csv(10)))
+        self.assertEqual((again.created, again.assigned), (0, 0))
+        self.assertEqual(Child.objects.count(), 10)
+
+    def test_family_rows_over_capacity_are_reported(self):
+        SchoolImport('buses').run(read_rows(BUSES_CSV))
+        result = SchoolImport('families').run(read_rows(families_csv(3, bus_number='S2')))
+        self.assertEqual(Child.objects.count(), 3)
+        self.assertEqual(result.assigned, 0)
+        self.assertEqual([e.row for e in result.errors], [1, 2, 3])
+        self.assertIn('Not assigned to bus S2', result.errors[0].message)
+
+    def test_phone_of_another_role_is_rejected(self):
+        driver = DriverFactory()
+        rows = [{'parent_first_name': 'A', 'parent_last_name': 'B', 'parent_phone': driver.phone_number,
+                 'child_first_name': 'C', 'child_last_name': 'D', 'class_grade': 'P1'}]
+        result = SchoolImport('families').run(rows)
+        self.assertEqual(result.created, 0)
+        self.assertIn('already registered', result.errors[0].message)
+
+    def test_staff_assigned_to_buses(self):
+        SchoolImport('buses').run(read_rows(BUSES_CSV))
+        rows = [
+            {'role': 'driver', 'first_name': 'Dan', 'last_name': 'D', 'phone_number': '0799100001',
+             'license_number': 'LIC-1', 'bus_number': 'S1'},
+            {'role': 'minder', 'first_name': 'Mia', 'last_name': 'M', 'phone_number': '0799100002', 'bus_number': 'S1'},
+            {'role': 'driver', 'first_name': 'No', 'last_name': 'Licence', 'phone_number': '0799100003'},
+        ]
+        result = SchoolImport('staff').run(rows)
+        self.assertEqual((result.created, result.assigned), (2, 2))
+        self.assertEqual([e.row for e in result.errors], [3])
+        driver = Driver.objects.get(phone_number='0799100001')
+        self.assertEqual(driver.license_number, 'LIC-1')
+        self.assertEqual(Assignment.get_active_assignments_for(driver, 'driver_to_bus').count(), 1)
+
+        rows[0]['first_name'] = 'Daniel'
+        again = SchoolImport('staff').run(rows[:2])
+        self.assertEqual((again.created, again.updated, again.assigned), (0, 1, 0))
+        driver.user.refresh_from_db()
+        self.assertEqual(driver.user.first_name, 'Daniel')
+
+    def test_chunk_query_count_is_constant(self):
+        SchoolImport('buses').run(read_rows(BUSES_CSV))
+        BusFactory(bus_number='S9', capacity=500)
+
+        def run(n, first):
+            with CaptureQueriesContext(connection) as ctx:
+                SchoolImport('families', chunk_size=n).run(read_rows(families_csv(n, 'S9', first)))
+            return len(ctx)
+
+        run(2, 500)  # warm the content type cache
+        self.assertEqual(run(4, 0), run(40, 100))
+
+    def test_failed_chunk_rolls_back_and_resumes(self):
+        SchoolImport('buses').run(read_rows(BUSES_CSV))
+        importer = SchoolImport('families', chunk_size=4)
+        original = SchoolImport._assign_children
+        calls = []
+
+        def fail_second_chunk(self, *args):
+            calls.append(1)
+            if len(calls) == 2:
+                raise DatabaseError('connection lost')
+            return original(self, *args)
+
+        with mock.patch.object(SchoolImport, '_assign_children', fail_second_chunk):
+            with self.assertRaises(DatabaseError):
+                importer.run(read_rows(families_csv(10)))
+        self.assertEqual(importer.result.next_row, 4)
+        self.assertEqual(Child.objects.count(), 4)
+
+        result = SchoolImport('families', chunk_size=4).run(read_rows(families_csv(10)), resume_from=4)
+        self.assertEqual((result.rows, result.assigned), (6, 6))
+        self.assertEqual(Child.objects.count(), 10)
+
+    def test_add_only_chunks_do_not_overfill_a_bus(self):
+        BusFactory(bus_number='S5', capacity=3)
+        result = SchoolImport('families', chunk_size=2).run(read_rows(families_csv(8, bus_number='S5')))
+
+        bus = Bus.objects.get(bus_number='S5')
+        self.assertEqual(Assignment.get_assignments_to(bus, 'child_to_bus').count(), 2)
+        self.assertEqual(result.assigned, 2)
+        # A bus's batch is all or nothing, so every later chunk overflows whole
+        self.assertEqual([e.row for e in result.errors], [3, 4, 5, 6, 7, 8])
+        self.assertTrue(all('Not assigned to bus S5' in e.message for e in result.errors))
+
+    def test_json_rows_are_normalized(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        buses = [{'bus_number': 'S7', 'number_plate': 'KAA 007A', 'capacity': 30}]
+        resp = client.post('/api/admins/import/', {'kind': 'buses', 'rows': buses}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual(Bus.objects.get(bus_number='S7').capacity, 30)
+
+        families = [{'Parent_First_Name': 'Ann', 'parent_last_name': 'A', 'parent_phone': 799200001,
+                     'child_first_name': 'Kid', 'child_last_name': ' One ', 'class_grade': 'P1',
+                     'bus_number': 'S7'}]
+        for created in (2, 0):
+            resp = client.post('/api/admins/import/', {'kind': 'families', 'rows': families}, format='json')
+            self.assertEqual(resp.status_code, 200, resp.data)
+            self.assertEqual((resp.data['created'], resp.data['errors']), (created, []))
+        self.assertTrue(Parent.objects.filter(contact_number='799200001').exists())
+        self.assertEqual(Child.objects.get().last_name, 'One')
+
+        resp = client.post('/api/admins/import/', {'kind': 'buses', 'rows': ['S8']}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_command_and_endpoint(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(BUSES_CSV)
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        call_command('import_school', 'buses', f.name, stdout=out)
+        self.assertIn('Imported 2 buses rows', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_school', 'buses', f.name + '.txt', stdout=out)
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        upload = io.BytesIO(families_csv(4).encode())
+        upload.name = 'families.csv'
+        resp = client.post('/api/admins/import/', {'kind': 'families', 'file': upload}, format='multipart')
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertEqual((resp.data['rows'], resp.data['assigned']), (4, 4))
+
+        resp = client.post('/api/admins/import/', {'kind': 'pets', 'rows': []}, format='json')
+        self.assertEqual(resp.status_code, 400)
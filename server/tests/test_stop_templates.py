@@ -0,0 +1,103 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assignments.models import Assignment
+from trips.models import RouteStopTemplate, Stop, Trip
+from trips.stop_templates import StopTemplateService
+from .factories import BusFactory, ChildFactory, ParentFactory, UserFactory
+
+
+def _assign(child, bus):
+    return Assignment.objects.create(
+        assignment_type='child_to_bus',
+        assignee=child,
+        assigned_to=bus,
+        effective_date=timezone.now().date(),
+        status='active',
+    )
+
+
+class StopTemplateMaintenanceTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=80)
+        self.parent = ParentFactory(home_latitude=-1.28, home_longitude=36.82, address='Plot 1')
+        self.child = ChildFactory(parent=self.parent)
+
+    def test_assignment_creates_template(self):
+        _assign(self.child, self.bus)
+        template = RouteStopTemplate.objects.get(bus=self.bus, child=self.child)
+        self.assertEqual(template.address, 'Plot 1')
+        self.assertAlmostEqual(float(template.latitude), -1.28)
+
+    def test_cancelled_assignment_removes_template(self):
+        assignment = _assign(self.child, self.bus)
+        assignment.cancel(reason='moved school')
+        self.assertFalse(RouteStopTemplate.objects.filter(child=self.child).exists())
+
+    def test_reassignment_moves_template_to_new_bus(self):
+        _assign(self.child, self.bus)
+        other_bus = BusFactory(capacity=80)
+        _assign(self.child, other_bus)
+        self.assertEqual(
+            list(RouteStopTemplate.objects.filter(child=self.child).values_list('bus_id', flat=True)),
+            [other_bus.id],
+        )
+
+    def test_home_location_change_updates_template(self):
+        _assign(self.child, self.bus)
+        self.parent.home_latitude = -1.30
+        self.parent.home_longitude = 36.80
+        self.parent.save(update_fields=['home_latitude', 'home_longitude'])
+        template = RouteStopTemplate.objects.get(child=self.child)
+        self.assertAlmostEqual(float(template.latitude), -1.30)
+
+
+class PopulateTripTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=80)
+        self.driver_user = UserFactory(user_type='driver')
+
+    def _bus_with_children(self, n):
+        for i in range(n):
+            parent = ParentFactory(home_latitude=-1.28 + i * 0.001, home_longitude=36.82)
+            _assign(ChildFactory(parent=parent), self.bus)
+
+    def _new_trip(self):
+        now = timezone.now()
+        return Trip.objects.create(bus=self.bus, driver=self.driver_user, trip_type='pickup',
+                                   status='in-progress', scheduled_time=now, start_time=now)
+
+    def test_populates_children_and_stops(self):
+        self._bus_with_children(3)
+        parent_without_home = ParentFactory(home_latitude=None, home_longitude=None)
+        _assign(ChildFactory(parent=parent_without_home), self.bus)
+
+        trip = self._new_trip()
+        created = StopTemplateService.populate_trip(trip, self.bus)
+
+        self.assertEqual(created, 3)
+        self.assertEqual(trip.children.count(), 4)
+        self.assertEqual(sorted(trip.stops.values_list('order', flat=True)), [0, 1, 2])
+        self.assertEqual(Stop.children.through.objects.filter(stop__trip=trip).count(), 3)
+
+    def test_rebuilds_missing_templates(self):
+        self._bus_with_children(2)
+        RouteStopTemplate.objects.all().delete()
+        trip = self._new_trip()
+        self.assertEqual(StopTemplateService.populate_trip(trip, self.bus), 2)
+
+    def test_query_count_independent_of_children(self):
+        self._bus_with_children(5)
+        trip = self._new_trip()
+        with CaptureQueriesContext(connection) as small:
+            StopTemplateService.populate_trip(trip, self.bus)
+
+        self._bus_with_children(55)
+        trip = self._new_trip()
+        with CaptureQueriesContext(connection) as large:
+            StopTemplateService.populate_trip(trip, self.bus)
+
+        self.assertEqual(trip.stops.count(), 60)
+        self.assertEqual(len(small), len(large))
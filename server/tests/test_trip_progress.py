@@ -0,0 +1,123 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from assignments.models import Assignment
+from attendance.models import Attendance
+from trips.models import Stop, Trip
+from trips.stop_templates import StopTemplateService
+from .factories import BusFactory, ChildFactory, ParentFactory, UserFactory
+
+
+class TripProgressTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=40)
+        self.children = []
+        for i in range(3):
+            child = ChildFactory(parent=ParentFactory(home_latitude=-1.28 + i * 0.01, home_longitude=36.82))
+            Assignment.objects.create(assignment_type='child_to_bus', assignee=child, assigned_to=self.bus,
+                                      effective_date=timezone.now().date(), status='active')
+            self.children.append(child)
+        self.trip = Trip.objects.create(bus=self.bus, driver=UserFactory(user_type='driver'), route='Route',
+                                        trip_type='pickup', status='in-progress', scheduled_time=timezone.now())
+        StopTemplateService.populate_trip(self.trip, self.bus)
+
+    def _mark(self, child, status, trip_type='pickup'):
+        attendance, _ = Attendance.objects.get_or_create(
+            child=child, trip_type=trip_type, date=timezone.now().date(), defaults={'bus': self.bus},
+        )
+        attendance.status = status
+        attendance.save()
+        return attendance
+
+    def test_counters_initialised_on_start(self):
+        self.assertEqual(self.trip.total_students, 3)
+        self.assertEqual(self.trip.students_pending, 3)
+        self.assertEqual(self.trip.stops_total, 3)
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.total_students, self.trip.students_completed, self.trip.stops_completed),
+                         (3, 0, 0))
+        self.assertEqual(list(self.trip.stops.values_list('children_total', flat=True)), [1, 1, 1])
+
+    def test_attendance_moves_counters(self):
+        self._mark(self.children[0], 'picked_up')
+        attendance = self._mark(self.children[1], 'absent')
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.students_completed, self.trip.students_absent, self.trip.students_pending),
+                         (1, 1, 1))
+
+        # Correcting a mark moves the child between buckets rather than double counting
+        attendance.status = 'picked_up'
+        attendance.save()
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.students_completed, self.trip.students_absent, self.trip.students_pending),
+                         (2, 0, 1))
+        stop = Stop.objects.get(trip=self.trip, children=self.children[1])
+        self.assertEqual((stop.children_completed, stop.children_absent), (1, 0))
+
+    def _recount(self):
+        completed = absent = 0
+        for status in Attendance.objects.filter(child__in=self.children, trip_type='pickup').values_list('status', flat=True):
+            completed += status in ('picked_up', 'on_bus', 'at_school')
+            absent += status == 'absent'
+        return completed, absent, len(self.children) - completed - absent
+
+    def test_concurrent_marks_from_stale_instances_count_once(self):
+        attendance = self._mark(self.children[0], 'pending')
+        first = Attendance.objects.get(pk=attendance.pk)
+        second = Attendance.objects.get(pk=attendance.pk)
+        for stale in (first, second):
+            stale.status = 'picked_up'
+            stale.save()
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.students_completed, self.trip.students_absent, self.trip.students_pending),
+                         self._recount())
+        self.assertEqual(self.trip.students_completed, 1)
+
+        # A stale instance saving an older status is a real change too
+        first.status = 'picked_up'
+        second.status = 'absent'
+        second.save()
+        first.save()
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.students_completed, self.trip.students_absent, self.trip.students_pending),
+                         self._recount())
+        stop = Stop.objects.get(trip=self.trip, children=self.children[0])
+        self.assertEqual((stop.children_completed, stop.children_absent), (1, 0))
+
+    def test_concurrent_stop_completion_counts_once(self):
+        stop = self.trip.stops.first()
+        first, second = Stop.objects.get(pk=stop.pk), Stop.objects.get(pk=stop.pk)
+        for stale in (first, second):
+            stale.status = 'completed'
+            stale.save()
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.stops_completed, 1)
+
+    def test_other_trip_type_is_ignored(self):
+        self._mark(self.children[0], 'dropped_off', trip_type='dropoff')
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.students_completed, 0)
+
+    def test_stop_completion_counts(self):
+        stop = self.trip.stops.first()
+        stop.status = 'completed'
+        stop.save()
+        stop.save()
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.stops_completed, 1)
+
+    def test_uninitialised_trip_is_counted_on_first_mark(self):
+        Trip.objects.filter(id=self.trip.id).update(total_students=None, students_completed=None,
+                                                     students_absent=None, students_pending=None)
+        self._mark(self.children[2], 'on_bus')
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.total_students, self.trip.students_completed, self.trip.students_pending),
+                         (3, 1, 2))
+
+    def test_serializer_exposes_progress(self):
+        from trips.serializers import TripSerializer
+        self._mark(self.children[0], 'picked_up')
+        data = TripSerializer(Trip.objects.get(id=self.trip.id)).data
+        self.assertEqual(data['studentsCompleted'], 1)
+        self.assertEqual(data['stopsTotal'], 3)
+        self.assertEqual(sum(stop['childrenCompleted'] for stop in data['stops']), 1)
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from assignments.models import Assignment
+from trips.models import Trip
+from trips.scheduling import TripScheduleService
+from .factories import BusFactory, BusRouteFactory, ChildFactory, DriverFactory, ParentFactory
+
+SCHEDULE = {'pickup': '06:30', 'dropoff': '15:45'}
+
+
+def _next_weekday(start):
+    day = start + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+class TripScheduleServiceTests(TestCase):
+    def setUp(self):
+        self.bus = BusFactory(capacity=40)
+        self.driver = DriverFactory()
+        self.route = BusRouteFactory(default_bus=self.bus, default_driver=self.driver, schedule=SCHEDULE)
+        today = timezone.now().date()
+        for i in range(3):
+            parent = ParentFactory(home_latitude=-1.28 + i * 0.01, home_longitude=36.82)
+            Assignment.objects.create(assignment_type='child_to_bus', assignee=ChildFactory(parent=parent),
+                                      assigned_to=self.bus, effective_date=today, status='active')
+        self.day = _next_weekday(today)
+
+    def test_generates_pickup_and_dropoff_with_stops(self):
+        summary = TripScheduleService.generate_for_date(self.day)
+        self.assertEqual(summary['created'], 2)
+
+        trips = Trip.objects.filter(bus=self.bus, status='scheduled').order_by('scheduled_time')
+        self.assertEqual([t.trip_type for t in trips], ['pickup', 'dropoff'])
+        for trip in trips:
+            self.assertEqual(trip.driver_id, self.driver.user_id)
+            self.assertEqual(trip.children.count(), 3)
+            self.assertEqual(sorted(trip.stops.values_list('order', flat=True)), [0, 1, 2])
+        self.assertEqual(timezone.localtime(trips[0].scheduled_time).strftime('%H:%M'), '06:30')
+
+    def test_rerun_is_idempotent(self):
+        TripScheduleService.generate_for_date(self.day)
+        summary = TripScheduleService.generate_for_date(self.day)
+        self.assertEqual(summary['created'], 0)
+        self.assertEqual(summary['skipped_existing'], 2)
+        self.assertEqual(Trip.objects.filter(bus=self.bus).count(), 2)
+
+    def test_respects_schedule_days(self):
+        self.route.schedule = dict(SCHEDULE, days=['sat'])
+        self.route.save()
+        weekday = date(2026, 1, 5)  # a Monday
+        self.assertEqual(TripScheduleService.generate_for_date(weekday)['created'], 0)
+        self.assertEqual(TripScheduleService.generate_for_date(weekday + timedelta(days=5))['created'], 2)
+
+    def test_route_without_driver_is_skipped(self):
+        self.route.default_driver = None
+        self.route.save()
+        summary = TripScheduleService.generate_for_date(self.day)
+        self.assertEqual(summary['created'], 0)
+        self.assertEqual(summary['skipped_unstaffed'], 2)
+
+
+class StartScheduledTripTests(TestCase):
+    def test_driver_start_flips_pre_generated_trip(self):
+        bus = BusFactory(capacity=40)
+        driver = DriverFactory(user__first_name='Moses', user__last_name='Okello')
+        today = timezone.now().date()
+        Assignment.objects.create(assignment_type='driver_to_bus', assignee=driver, assigned_to=bus,
+                                  effective_date=today, status='active')
+        trip = Trip.objects.create(bus=bus, driver=driver.user, trip_type='pickup', status='scheduled',
+                                   scheduled_time=timezone.now(), route='Route A')
+
+        client = APIClient()
+        client.force_authenticate(user=driver.user)
+        resp = client.post('/api/drivers/start-trip/', {'trip_type': 'pickup'}, format='json')
+
+        self.assertEqual(resp.status_code, 201)
+        trip.refresh_from_db()
+        self.assertEqual(trip.status, 'in-progress')
+        self.assertIsNotNone(trip.start_time)
+        self.assertEqual(Trip.objects.filter(bus=bus).count(), 1)
@@ -0,0 +1,57 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from trips.models import Stop, Trip
+from .factories import BusFactory, ChildFactory, ParentFactory, UserFactory
+
+
+class TripSerializationQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserFactory(user_type='admin'))
+        self.driver_user = UserFactory(user_type='driver', first_name='Moses', last_name='Okello')
+        self.minder_user = UserFactory(user_type='busminder', first_name='Ruth', last_name='Akello')
+
+    def _make_trips(self, n, children_per_trip=3):
+        for _ in range(n):
+            bus = BusFactory(capacity=40)
+            trip = Trip.objects.create(bus=bus, driver=self.driver_user, bus_minder=self.minder_user,
+                                       route='Route', trip_type='pickup', scheduled_time=timezone.now())
+            for order in range(children_per_trip):
+                parent = ParentFactory(home_latitude=-1.28, home_longitude=36.82)
+                child = ChildFactory(parent=parent)
+                trip.children.add(child)
+                stop = Stop.objects.create(trip=trip, address='Home', latitude=-1.28, longitude=36.82,
+                                           scheduled_time=timezone.now(), order=children_per_trip - order)
+                stop.children.add(child)
+
+    def _list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get('/api/trips/')
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx), resp
+
+    def test_list_query_count_independent_of_page_size(self):
+        self._make_trips(2)
+        small, _ = self._list_queries()
+
+        self._make_trips(18, children_per_trip=5)
+        large, resp = self._list_queries()
+
+        self.assertEqual(len(resp.data['results']), 20)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
+
+    def test_detail_query_count_and_stop_order(self):
+        self._make_trips(1, children_per_trip=6)
+        trip = Trip.objects.get()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(f'/api/trips/{trip.id}/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertLessEqual(len(ctx), 5)
+        orders = [stop['order'] for stop in resp.data['stops']]
+        self.assertEqual(orders, sorted(orders))
+        self.assertEqual(len(resp.data['children']), 6)
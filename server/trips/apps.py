@@ -5,4 +5,7 @@ class TripsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'trips'
 
-    pass
+    def ready(self):
+        """Connect the stop template and trip progress receivers when the app is ready."""
+        import trips.progress
+        import trips.stop_templates
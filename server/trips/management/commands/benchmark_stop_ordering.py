@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from trips.route_solver import (
+    build_distance_matrix,
+    route_length,
+    solve_stop_order,
+)
+from trips.views import MAPBOX_OPTIMIZATION_MAX_COORDINATES
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks stop ordering: assignment order (what trips get today '
+        'without Mapbox), Mapbox Optimized Trips (if configured) and the '
+        'in-process route solver, on demo homes scattered around the school.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, default=60,
+                            help='Home stops per route (default 60)')
+        parser.add_argument('--runs', type=int, default=20,
+                            help='Random routes per trip type (default 20)')
+        parser.add_argument('--radius-km', type=float, default=8.0,
+                            help='Radius around the school for demo homes')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--mapbox', action='store_true',
+                            help='Also call Mapbox on a route small enough for '
+                                 'its coordinate cap (uses real API quota)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        school = (float(settings.SCHOOL_LATITUDE), float(settings.SCHOOL_LONGITUDE))
+        n_stops = options['stops']
+        runs = options['runs']
+
+        self.stdout.write(
+            f"Stop ordering benchmark — {n_stops} stops, {runs} runs per trip type, "
+            f"seed {options['seed']}"
+        )
+
+        for trip_type in ('pickup', 'dropoff'):
+            naive_km, solved_km, solve_ms = [], [], []
+            for _ in range(runs):
+                homes = self._demo_homes(rng, school, n_stops, options['radius_km'])
+                matrix = build_distance_matrix([school] + homes)
+
+                naive_km.append(self._length(list(range(n_stops)), matrix, trip_type))
+
+                started = time.perf_counter()
+                order = solve_stop_order(homes, school, trip_type, matrix=matrix)
+                solve_ms.append((time.perf_counter() - started) * 1000)
+                solved_km.append(self._length(order, matrix, trip_type))
+
+            naive = statistics.mean(naive_km)
+            solved = statistics.mean(solved_km)
+            self.stdout.write(f"\n[{trip_type}]")
+            self.stdout.write(f"  assignment order : {naive:8.2f} km")
+            self.stdout.write(
+                f"  local solver     : {solved:8.2f} km  "
+                f"({(1 - solved / naive) * 100:.1f}% shorter)"
+            )
+            self.stdout.write(
+                f"  solve time       : mean {statistics.mean(solve_ms):.2f} ms, "
+                f"max {max(solve_ms):.2f} ms"
+            )
+
+            if options['mapbox']:
+                self._compare_mapbox(rng, school, trip_type, options['radius_km'])
+
+    def _compare_mapbox(self, rng, school, trip_type, radius_km):
+        token = getattr(settings, 'MAPBOX_ACCESS_TOKEN', '')
+        if not token:
+            self.stdout.write(self.style.WARNING('  mapbox           : skipped (no token)'))
+            return
+
+        school_coords = 2 if trip_type == 'pickup' else 1
+        n_homes = MAPBOX_OPTIMIZATION_MAX_COORDINATES - school_coords
+        homes = self._demo_homes(rng, school, n_homes, radius_km)
+        matrix = build_distance_matrix([school] + homes)
+
+        coords = [school] + homes + ([school] if trip_type == 'pickup' else [])
+        params = {
+            'source': 'first',
+            'destination': 'last' if trip_type == 'pickup' else 'any',
+            'roundtrip': 'false',
+            'access_token': token,
+        }
+        started = time.perf_counter()
+        resp = requests.get(
+            "https://api.mapbox.com/optimized-trips/v1/mapbox/driving-traffic/"
+            + ';'.join(f"{lng},{lat}" for lat, lng in coords),
+            params=params,
+            timeout=12,
+        )
+        mapbox_ms = (time.perf_counter() - started) * 1000
+        if resp.status_code != 200:
+            self.stdout.write(self.style.WARNING(
+                f'  mapbox           : HTTP {resp.status_code}'
+            ))
+            return
+
+        waypoints = sorted(resp.json().get('waypoints', []),
+                           key=lambda w: w['waypoint_index'])
+        mapbox_order = [wp['original_index'] - 1 for wp in waypoints
+                        if 1 <= wp['original_index'] <= n_homes]
+
+        started = time.perf_counter()
+        local_order = solve_stop_order(homes, school, trip_type, matrix=matrix)
+        local_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(
+            f"  mapbox ({n_homes} stops) : "
+            f"{self._length(mapbox_order, matrix, trip_type):.2f} km in {mapbox_ms:.0f} ms"
+        )
+        self.stdout.write(
+            f"  local  ({n_homes} stops) : "
+            f"{self._length(local_order, matrix, trip_type):.2f} km in {local_ms:.2f} ms"
+        )
+
+    @staticmethod
+    def _demo_homes(rng, school, n, radius_km):
+        # ~111 km per degree; good enough for scattering demo points.
+        deg = radius_km / 111.0
+        return [
+            (school[0] + rng.uniform(-deg, deg), school[1] + rng.uniform(-deg, deg))
+            for _ in range(n)
+        ]
+
+    @staticmethod
+    def _length(order, matrix, trip_type):
+        path = [0] + [i + 1 for i in order]
+        if trip_type == 'pickup':
+            path.append(0)
+        return route_length(path, matrix)
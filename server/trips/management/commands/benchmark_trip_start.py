@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assignments.models import Assignment
+from buses.models import Bus
+from children.models import Child
+from parents.models import Parent
+from trips.models import Stop, Trip
+from trips.stop_templates import StopTemplateService
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks starting a trip: the per-child loop trip start used to run '
+        'versus cloning route stop templates. All data is created inside a '
+        'transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--children', type=int, default=60)
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            bus, driver_user = self._seed(options['children'])
+
+            legacy = [self._measure(self._legacy_start, bus, driver_user)
+                      for _ in range(options['runs'])]
+            templated = [self._measure(self._templated_start, bus, driver_user)
+                         for _ in range(options['runs'])]
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Trip start benchmark — {options['children']} children, "
+                          f"{options['runs']} runs")
+        for label, results in (('per-child loop', legacy), ('stop templates', templated)):
+            queries = results[0][0]
+            best_ms = min(ms for _, ms in results)
+            self.stdout.write(f"  {label:15}: {queries:4d} queries, best {best_ms:7.2f} ms")
+
+    def _seed(self, n):
+        stamp = int(time.time())
+        bus = Bus.objects.create(bus_number=f'BENCH-{stamp}', number_plate=f'BENCH {stamp}',
+                                 capacity=n + 10)
+        driver_user = User.objects.create_user(username=f'bench_driver_{stamp}',
+                                               password='x', user_type='driver')
+        today = timezone.now().date()
+        for i in range(n):
+            user = User.objects.create_user(username=f'bench_parent_{stamp}_{i}',
+                                            password='x', user_type='parent')
+            parent = Parent.objects.create(user=user, contact_number=f'07{stamp % 10**7:07d}{i}',
+                                           address=f'Plot {i}',
+                                           home_latitude=-1.28 + i * 0.0005,
+                                           home_longitude=36.82 - i * 0.0003)
+            child = Child.objects.create(first_name=f'Child{i}', last_name='Bench',
+                                         class_grade='P1', parent=parent)
+            Assignment.objects.create(assignment_type='child_to_bus', assignee=child,
+                                      assigned_to=bus, effective_date=today, status='active')
+        return bus, driver_user
+
+    @staticmethod
+    def _new_trip(bus, driver_user):
+        now = timezone.now()
+        return Trip.objects.create(bus=bus, driver=driver_user, trip_type='pickup',
+                                   status='scheduled', scheduled_time=now, start_time=now)
+
+    def _measure(self, start, bus, driver_user):
+        trip = self._new_trip(bus, driver_user)
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            start(trip, bus)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        return len(ctx), elapsed_ms
+
+    @staticmethod
+    def _legacy_start(trip, bus):
+        # The loop drivers.views.start_trip ran before stop templates.
+        for order, child_assignment in enumerate(Assignment.get_assignments_to(bus, 'child_to_bus')):
+            child = child_assignment.assignee
+            trip.children.add(child)
+            parent = getattr(child, 'parent', None)
+            stop = Stop.objects.create(
+                trip=trip,
+                address=parent.address or 'No address',
+                latitude=parent.home_latitude,
+                longitude=parent.home_longitude,
+                scheduled_time=trip.scheduled_time,
+                order=order,
+            )
+            stop.children.add(child)
+
+    @staticmethod
+    def _templated_start(trip, bus):
+        StopTemplateService.populate_trip(trip, bus)
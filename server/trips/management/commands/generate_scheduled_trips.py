@@ -0,0 +1,48 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from trips.scheduling import TripScheduleService
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates 'scheduled' trips from BusRoute.schedule for the whole fleet, "
+        "with children and ordered stops attached. Safe to re-run: existing "
+        "trips are skipped. Intended for a nightly cron job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='First day to generate (YYYY-MM-DD, default tomorrow)')
+        parser.add_argument('--days', type=int, default=1, help='Number of days to generate')
+        parser.add_argument('--route', type=int, action='append', dest='routes',
+                            help='Limit to this BusRoute id (repeatable)')
+        parser.add_argument('--fetch-matrix', action='store_true',
+                            help='Allow Mapbox Matrix calls for uncached home pairs')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                first_day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        else:
+            first_day = timezone.localdate() + timedelta(days=1)
+
+        for offset in range(options['days']):
+            day = first_day + timedelta(days=offset)
+            started = time.perf_counter()
+            summary = TripScheduleService.generate_for_date(
+                day,
+                route_ids=options['routes'],
+                allow_external=options['fetch_matrix'],
+            )
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"{day}: created {summary['created']} trips with {summary['stops']} stops "
+                f"in {elapsed:.2f}s "
+                f"(skipped {summary['skipped_existing']} existing, "
+                f"{summary['skipped_unstaffed']} without a driver)"
+            ))
@@ -118,12 +118,17 @@ class Trip(models.Model):
         help_text="Children assigned to this trip"
     )
 
-    # Trip Summary (populated when trip is completed)
+    # Trip Summary (maintained live while in progress, finalised on completion)
     total_students = models.IntegerField(null=True, blank=True, help_text="Total students on this trip")
     students_completed = models.IntegerField(null=True, blank=True, help_text="Students picked up/dropped off")
     students_absent = models.IntegerField(null=True, blank=True, help_text="Students marked absent")
     students_pending = models.IntegerField(null=True, blank=True, help_text="Students not marked")
 
+    # Live progress — the four counters above, plus these, are kept current
+    # while the trip is in progress by trips.progress (no re-counting on read).
+    stops_total = models.IntegerField(null=True, blank=True, help_text="Stops on this trip")
+    stops_completed = models.IntegerField(null=True, blank=True, help_text="Stops marked completed")
+
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -187,6 +192,11 @@ class Stop(models.Model):
     # Order in route
     order = models.IntegerField(default=0, help_text="Order of this stop in the route")
 
+    # Per-stop progress, maintained by trips.progress as attendance is marked
+    children_total = models.IntegerField(default=0, help_text="Children at this stop")
+    children_completed = models.IntegerField(default=0, help_text="Children picked up/dropped off")
+    children_absent = models.IntegerField(default=0, help_text="Children marked absent")
+
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -198,3 +208,78 @@ class Stop(models.Model):
         ordering = ['trip', 'order']
         verbose_name = 'Stop'
         verbose_name_plural = 'Stops'
+
+
+class RouteMatrixEntry(models.Model):
+    """
+    Cached road distance/duration between two grid-snapped coordinates.
+
+    Keys are "lat,lng" strings rounded by trips.route_matrix.grid_key(), so
+    every stop at (roughly) the same home shares one row per neighbour.
+    Filled lazily from the Mapbox Matrix API and invalidated when a parent
+    moves their home pin.
+    """
+    origin = models.CharField(max_length=32, help_text="Grid key of the origin")
+    destination = models.CharField(max_length=32, help_text="Grid key of the destination")
+    distance_m = models.FloatField(help_text="Road distance in metres")
+    duration_s = models.FloatField(help_text="Typical driving time in seconds")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.origin} → {self.destination}: {self.distance_m:.0f} m"
+
+    class Meta:
+        verbose_name = 'Route Matrix Entry'
+        verbose_name_plural = 'Route Matrix Entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['origin', 'destination'],
+                name='unique_route_matrix_pair',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['destination']),
+        ]
+
+
+class RouteStopTemplate(models.Model):
+    """
+    Precomputed stop for one child on a bus's route.
+
+    Trip start clones these rows into Stop (and the Trip/Stop children
+    through tables) with bulk_create instead of resolving assignments and
+    parent homes child by child.  Rows are created when a child is assigned
+    to the bus, removed when the assignment ends, and re-pointed when the
+    parent moves their home pin — see trips.stop_templates.
+    """
+    bus = models.ForeignKey(
+        Bus,
+        on_delete=models.CASCADE,
+        related_name='stop_templates',
+        help_text="Bus whose route this stop belongs to"
+    )
+    child = models.ForeignKey(
+        Child,
+        on_delete=models.CASCADE,
+        related_name='stop_templates',
+        help_text="Child picked up / dropped off at this stop"
+    )
+    address = models.CharField(max_length=255, help_text="Stop address")
+
+    # Null when the parent has not geocoded their home yet: the child still
+    # rides the trip but gets no Stop.
+    latitude = models.DecimalField(max_digits=12, decimal_places=8, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=12, decimal_places=8, null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.bus} - {self.child} @ {self.address}"
+
+    class Meta:
+        ordering = ['bus', 'id']
+        verbose_name = 'Route Stop Template'
+        verbose_name_plural = 'Route Stop Templates'
+        constraints = [
+            models.UniqueConstraint(fields=['bus', 'child'], name='unique_stop_template_per_child'),
+        ]
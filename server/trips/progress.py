@@ -0,0 +1,258 @@
+"""
+Live trip progress counters.
+
+Trip.total_students / students_completed / students_absent /
+students_pending, Trip.stops_total / stops_completed and the per-stop
+Stop.children_* counts are initialised once when a trip goes in-progress
+and then moved with F-expression UPDATEs as attendance is marked and stops
+complete.  Dashboards read the columns; nothing re-counts Attendance rows
+on read.  Status changes are claimed with a conditional UPDATE before the
+save (see the receivers), so concurrent marks of the same row apply their
+delta once.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.db.models import Count, F
+from django.db.models.signals import post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from attendance.models import Attendance
+
+from .models import Stop, Trip
+
+# Attendance statuses that count as "done" for each trip type.  The legacy
+# statuses are still written by older clients.
+COMPLETED_STATUSES = {
+    'pickup': {'picked_up', 'on_bus', 'at_school'},
+    'dropoff': {'dropped_off'},
+}
+ABSENT_STATUSES = {'absent'}
+
+
+def bucket(trip_type, attendance_status):
+    """Classify an attendance status as 'completed', 'absent' or 'pending'."""
+    if attendance_status in COMPLETED_STATUSES.get(trip_type, ()):
+        return 'completed'
+    if attendance_status in ABSENT_STATUSES:
+        return 'absent'
+    return 'pending'
+
+
+class TripProgressService:
+    """Initialise and incrementally maintain trip progress counters."""
+
+    @staticmethod
+    def initialize(trips):
+        """
+        (Re)compute counters for the given trips (ids or instances) from scratch.
+
+        Runs a fixed number of aggregate queries plus one UPDATE per distinct
+        set of counter values, so freshly created trips (all zero progress)
+        share a handful of UPDATEs however many there are.  Trip instances
+        passed in get the new values too, so callers can serialize them
+        straight away.
+        """
+        instances = {}
+        trip_ids = []
+        for trip in trips:
+            if isinstance(trip, Trip):
+                instances[trip.id] = trip
+                trip_ids.append(trip.id)
+            else:
+                trip_ids.append(trip)
+        if not trip_ids:
+            return
+        today = date.today()
+        trip_types = dict(Trip.objects.filter(id__in=trip_ids).values_list('id', 'trip_type'))
+
+        totals = Counter(dict(
+            Trip.children.through.objects.filter(trip_id__in=trip_ids)
+            .values('trip_id').annotate(n=Count('id')).values_list('trip_id', 'n')
+        ))
+        stops_total = Counter()
+        stops_completed = Counter()
+        for trip_id, stop_status, n in (
+            Stop.objects.filter(trip_id__in=trip_ids)
+            .values('trip_id', 'status').annotate(n=Count('id'))
+            .values_list('trip_id', 'status', 'n')
+        ):
+            stops_total[trip_id] += n
+            if stop_status == 'completed':
+                stops_completed[trip_id] += n
+
+        marked = defaultdict(Counter)
+        for trip_id, trip_type, status, n in (
+            Attendance.objects.filter(date=today, child__trips__id__in=trip_ids)
+            .values('child__trips__id', 'trip_type', 'status').annotate(n=Count('id'))
+            .values_list('child__trips__id', 'trip_type', 'status', 'n')
+        ):
+            if trip_type == trip_types.get(trip_id):
+                marked[trip_id][bucket(trip_type, status)] += n
+
+        groups = defaultdict(list)
+        for trip_id in trip_ids:
+            total = totals[trip_id]
+            completed = marked[trip_id]['completed']
+            absent = marked[trip_id]['absent']
+            values = (total, completed, absent, max(total - completed - absent, 0),
+                      stops_total[trip_id], stops_completed[trip_id])
+            groups[values].append(trip_id)
+            if trip_id in instances:
+                trip = instances[trip_id]
+                (trip.total_students, trip.students_completed, trip.students_absent,
+                 trip.students_pending, trip.stops_total, trip.stops_completed) = values
+        for (total, completed, absent, pending, n_stops, n_stops_done), ids in groups.items():
+            Trip.objects.filter(id__in=ids).update(
+                total_students=total,
+                students_completed=completed,
+                students_absent=absent,
+                students_pending=pending,
+                stops_total=n_stops,
+                stops_completed=n_stops_done,
+            )
+
+        TripProgressService._initialize_stops(trip_ids, trip_types, today)
+
+    @staticmethod
+    def _initialize_stops(trip_ids, trip_types, today):
+        stop_totals = dict(
+            Stop.children.through.objects.filter(stop__trip_id__in=trip_ids)
+            .values('stop_id').annotate(n=Count('id')).values_list('stop_id', 'n')
+        )
+        marked = defaultdict(Counter)
+        for stop_id, trip_id, trip_type, status, n in (
+            Attendance.objects.filter(date=today, child__trip_stops__trip_id__in=trip_ids)
+            .values('child__trip_stops__id', 'child__trip_stops__trip_id', 'trip_type', 'status')
+            .annotate(n=Count('id'))
+            .values_list('child__trip_stops__id', 'child__trip_stops__trip_id', 'trip_type', 'status', 'n')
+        ):
+            if trip_type == trip_types.get(trip_id):
+                marked[stop_id][bucket(trip_type, status)] += n
+
+        groups = defaultdict(list)
+        for stop_id, total in stop_totals.items():
+            groups[(total, marked[stop_id]['completed'], marked[stop_id]['absent'])].append(stop_id)
+        for (total, completed, absent), ids in groups.items():
+            Stop.objects.filter(id__in=ids).update(
+                children_total=total,
+                children_completed=completed,
+                children_absent=absent,
+            )
+
+    @staticmethod
+    def record_attendance(attendance, old_status):
+        """Shift counters for a child's attendance moving from old_status."""
+        if attendance.date != date.today():
+            return
+        before = bucket(attendance.trip_type, old_status)
+        after = bucket(attendance.trip_type, attendance.status)
+        if before == after:
+            return
+
+        trips = Trip.objects.filter(
+            status='in-progress', trip_type=attendance.trip_type, children=attendance.child_id,
+        )
+        uninitialised = list(trips.filter(total_students__isnull=True).values_list('id', flat=True))
+        if uninitialised:
+            # First mark on a trip nobody initialised (e.g. created via the
+            # admin API): a full count already includes this change.
+            TripProgressService.initialize(uninitialised)
+
+        delta = Counter({after: 1})
+        delta.subtract({before: 1})
+        trip_ids = list(trips.exclude(id__in=uninitialised).values_list('id', flat=True))
+        if trip_ids:
+            Trip.objects.filter(id__in=trip_ids).update(
+                students_completed=F('students_completed') + delta['completed'],
+                students_absent=F('students_absent') + delta['absent'],
+                students_pending=F('students_pending') + delta['pending'],
+            )
+            Stop.objects.filter(trip_id__in=trip_ids, children=attendance.child_id).update(
+                children_completed=F('children_completed') + delta['completed'],
+                children_absent=F('children_absent') + delta['absent'],
+            )
+
+    @staticmethod
+    def record_stop_status(stop, old_status):
+        was_done = old_status == 'completed'
+        is_done = stop.status == 'completed'
+        if was_done == is_done:
+            return
+        Trip.objects.filter(id=stop.trip_id, stops_completed__isnull=False).update(
+            stops_completed=F('stops_completed') + (1 if is_done else -1)
+        )
+
+
+# ---------------------------------------------------------------------------
+# Receivers
+# ---------------------------------------------------------------------------
+# post_init remembers the status each instance was loaded with.  For
+# Attendance and Stop that is only a guess at the row's current status: a
+# double-tap or retry can save the same row from two stale instances.
+# pre_save therefore moves the status with a conditional UPDATE
+# (claim_status_change) and only the save whose UPDATE won applies a delta.
+
+def claim_status_change(model, instance, guess):
+    """
+    Move `instance`'s row to instance.status if it is still `guess`
+    (re-reading and retrying when it is not).  Returns the status the row
+    moved from, or None if it already had the new status.
+    """
+    new = instance.status
+    rows = model.objects.filter(pk=instance.pk)
+    old = guess
+    while True:
+        if old == new:
+            # Usually nothing to do, unless the loaded status is stale
+            old = rows.values_list('status', flat=True).first()
+            if old is None or old == new:
+                return None
+        if rows.filter(status=old).update(status=new):
+            return old
+        old = rows.values_list('status', flat=True).first()
+        if old is None:
+            return None
+
+
+@receiver(post_init, sender=Attendance)
+@receiver(post_init, sender=Stop)
+@receiver(post_init, sender=Trip)
+def remember_loaded_status(sender, instance, **kwargs):
+    instance._loaded_status = None if instance._state.adding else instance.__dict__.get('status')
+
+
+@receiver(pre_save, sender=Attendance)
+@receiver(pre_save, sender=Stop)
+def claim_status_on_save(sender, instance, update_fields=None, **kwargs):
+    instance._status_change = None
+    if instance._state.adding or (update_fields is not None and 'status' not in update_fields):
+        return
+    old_status = claim_status_change(sender, instance, getattr(instance, '_loaded_status', None))
+    if old_status is not None:
+        instance._status_change = old_status
+
+
+@receiver(post_save, sender=Attendance)
+def update_progress_on_attendance(sender, instance, created, **kwargs):
+    instance._loaded_status = instance.status
+    if created:
+        TripProgressService.record_attendance(instance, None)
+    elif getattr(instance, '_status_change', None) is not None:
+        TripProgressService.record_attendance(instance, instance._status_change)
+
+
+@receiver(post_save, sender=Stop)
+def update_progress_on_stop(sender, instance, created, **kwargs):
+    instance._loaded_status = instance.status
+    if not created and getattr(instance, '_status_change', None) is not None:
+        TripProgressService.record_stop_status(instance, instance._status_change)
+
+
+@receiver(post_save, sender=Trip)
+def initialize_progress_on_start(sender, instance, **kwargs):
+    old_status = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if instance.status == 'in-progress' and old_status != 'in-progress':
+        TripProgressService.initialize([instance])
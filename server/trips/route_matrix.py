@@ -0,0 +1,204 @@
+"""
+Persistent pairwise distance/duration matrix for home coordinates.
+
+Parent homes almost never move, so the road distance between two homes (or
+a home and the school) is fetched from Mapbox once, stored in
+RouteMatrixEntry, and read back on every later trip start and for the
+stop-to-stop legs of live bus ETAs (eta_offsets).  Coordinates are
+snapped to a ~11 m grid so GPS jitter in the saved pin doesn't create new
+keys.
+
+Pairs Mapbox has not answered for (no token, API down) are filled with a
+local estimate — haversine × detour factor at an urban average speed — which
+is good enough for stop ordering but is never persisted.
+"""
+
+from dataclasses import dataclass
+from itertools import combinations_with_replacement
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+
+from .models import RouteMatrixEntry
+from .route_solver import haversine_km
+
+GRID_PRECISION = 4  # decimal places, ~11 m at the equator
+
+# Local estimator: straight-line distance understates road distance, and
+# school-run traffic averages well under the speed limit.
+ROAD_DETOUR_FACTOR = 1.3
+AVERAGE_SPEED_KMH = 25.0
+
+# Mapbox Matrix API accepts 25 coordinates per request on the driving
+# profile.  Blocks of 12 let any two blocks share one request.
+MAPBOX_MATRIX_BLOCK_SIZE = 12
+MAPBOX_MATRIX_URL = "https://api.mapbox.com/directions-matrix/v1/mapbox/driving/{coords}"
+
+
+def grid_key(lat, lng):
+    """Snap a coordinate to the cache grid and return its string key."""
+    return f"{float(lat):.{GRID_PRECISION}f},{float(lng):.{GRID_PRECISION}f}"
+
+
+def _key_to_point(key):
+    lat, lng = key.split(',')
+    return float(lat), float(lng)
+
+
+def estimate(origin, destination):
+    """Return (distance_m, duration_s) between two (lat, lng) points."""
+    km = haversine_km(origin[0], origin[1], destination[0], destination[1]) * ROAD_DETOUR_FACTOR
+    return km * 1000, km / AVERAGE_SPEED_KMH * 3600
+
+
+@dataclass
+class RouteMatrix:
+    """
+    n×n distance/duration matrices over the points passed to
+    get_route_matrix(), in the same order.  `complete` is True when every
+    off-diagonal pair came from road data rather than the estimator.
+    """
+    distances_m: list
+    durations_s: list
+    complete: bool
+
+    def symmetric_durations(self):
+        """Durations averaged over both directions, for the TSP solver."""
+        d = self.durations_s
+        n = len(d)
+        return [[(d[i][j] + d[j][i]) / 2 for j in range(n)] for i in range(n)]
+
+
+def get_route_matrix(points, allow_external=True):
+    """
+    Build a RouteMatrix for a list of (lat, lng) points.
+
+    One query reads every cached pair.  Missing pairs are fetched from
+    Mapbox (when MAPBOX_ACCESS_TOKEN is set and `allow_external`), stored,
+    and anything still missing falls back to estimate().
+    """
+    keys = [grid_key(lat, lng) for lat, lng in points]
+    unique_keys = list(dict.fromkeys(keys))
+
+    pairs = {
+        (row.origin, row.destination): (row.distance_m, row.duration_s)
+        for row in RouteMatrixEntry.objects.filter(
+            origin__in=unique_keys, destination__in=unique_keys
+        ).only('origin', 'destination', 'distance_m', 'duration_s')
+    }
+
+    missing = [(a, b) for a in unique_keys for b in unique_keys
+               if a != b and (a, b) not in pairs]
+
+    token = getattr(settings, 'MAPBOX_ACCESS_TOKEN', '')
+    if missing and token and allow_external:
+        pairs.update(_fetch_from_mapbox(missing, token))
+
+    n = len(points)
+    distances = [[0.0] * n for _ in range(n)]
+    durations = [[0.0] * n for _ in range(n)]
+    complete = True
+    for i in range(n):
+        for j in range(n):
+            if keys[i] == keys[j]:
+                continue
+            value = pairs.get((keys[i], keys[j]))
+            if value is None:
+                value = estimate(points[i], points[j])
+                complete = False
+            distances[i][j], durations[i][j] = value
+
+    return RouteMatrix(distances, durations, complete)
+
+
+def _fetch_from_mapbox(missing, token):
+    """
+    Fetch the given (origin_key, destination_key) pairs from the Mapbox
+    Matrix API, persist them and return {pair: (distance_m, duration_s)}.
+    """
+    wanted = set(missing)
+    involved = list(dict.fromkeys(k for pair in missing for k in pair))
+    blocks = [involved[i:i + MAPBOX_MATRIX_BLOCK_SIZE]
+              for i in range(0, len(involved), MAPBOX_MATRIX_BLOCK_SIZE)]
+
+    fetched = {}
+    for a, b in combinations_with_replacement(range(len(blocks)), 2):
+        coords = blocks[a] if a == b else blocks[a] + blocks[b]
+        if not any((o, d) in wanted for o in coords for d in coords if o != d):
+            continue
+
+        try:
+            resp = requests.get(
+                MAPBOX_MATRIX_URL.format(coords=';'.join(
+                    f"{lng},{lat}" for lat, lng in map(_key_to_point, coords)
+                )),
+                params={'annotations': 'distance,duration', 'access_token': token},
+                timeout=10,
+            )
+        except requests.RequestException as exc:
+            print(f"⚠️  Mapbox matrix request failed: {exc}")
+            break
+        if resp.status_code != 200:
+            print(f"⚠️  Mapbox matrix request failed: HTTP {resp.status_code}")
+            break
+
+        data = resp.json()
+        for i, origin in enumerate(coords):
+            for j, destination in enumerate(coords):
+                if i == j or (origin, destination) not in wanted:
+                    continue
+                distance = data['distances'][i][j]
+                duration = data['durations'][i][j]
+                if distance is None or duration is None:
+                    continue  # no road route between the two points
+                fetched[(origin, destination)] = (distance, duration)
+
+    if fetched:
+        RouteMatrixEntry.objects.bulk_create(
+            [RouteMatrixEntry(origin=o, destination=d, distance_m=dist, duration_s=dur)
+             for (o, d), (dist, dur) in fetched.items()],
+            ignore_conflicts=True,
+        )
+    return fetched
+
+
+def get_leg(origin, destination, allow_external=False):
+    """
+    (distance_m, duration_s) for a single leg — e.g. bus → next stop ETA.
+
+    External calls are off by default: a moving bus position is not worth a
+    Mapbox request or a persisted row.
+    """
+    matrix = get_route_matrix([origin, destination], allow_external=allow_external)
+    return matrix.distances_m[0][1], matrix.durations_s[0][1]
+
+
+def eta_offsets(origin, stops, first_leg_s=None):
+    """
+    Cumulative seconds from `origin` (the live bus position) to each of
+    `stops`, (lat, lng) points in visiting order.
+
+    The stop-to-stop legs are read from the persisted matrix, which trip
+    start already filled for these homes; they are never fetched here.
+    The first leg is `first_leg_s` when the caller has a live figure for
+    it, otherwise get_leg().
+    """
+    if not stops:
+        return []
+    durations = get_route_matrix(stops, allow_external=False).durations_s
+    if first_leg_s is None:
+        first_leg_s = get_leg(origin, stops[0])[1]
+    offsets = [first_leg_s]
+    for i in range(1, len(stops)):
+        offsets.append(offsets[-1] + durations[i - 1][i])
+    return offsets
+
+
+def invalidate_point(lat, lng):
+    """Drop every cached pair touching the grid cell of (lat, lng)."""
+    key = grid_key(lat, lng)
+    deleted, _ = RouteMatrixEntry.objects.filter(
+        Q(origin=key) | Q(destination=key)
+    ).delete()
+    return deleted
@@ -0,0 +1,227 @@
+"""
+In-process stop-order solver used on trip start.
+
+Solves the single-vehicle routing problem for one trip:
+
+  pickup  — school → homes … → school   (school is ALWAYS last)
+  dropoff — school → homes …            (school is ALWAYS first, open end)
+
+Construction is nearest-neighbour from the school, followed by 2-opt and
+Or-opt improvement passes over a distance matrix.  Everything is plain
+Python on small lists so a 60-stop route solves in a few milliseconds —
+no external calls, no waypoint cap.  Mapbox (when configured) is only an
+optional refinement on top of this result.
+"""
+
+import hashlib
+import math
+import time
+
+from django.core.cache import cache
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Matrices are cached by their (rounded) coordinate set so that repeated
+# solves for the same bus — restarts, reorders, benchmarks — skip the
+# O(n²) haversine pass entirely.
+MATRIX_CACHE_TTL = 60 * 60 * 24
+MATRIX_COORD_PRECISION = 5  # ~1 m
+
+# Safety net for pathological inputs; normal routes converge far sooner.
+DEFAULT_TIME_BUDGET_S = 0.08
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    lat1_r = math.radians(lat1)
+    lat2_r = math.radians(lat2)
+    dlat = lat2_r - lat1_r
+    dlng = math.radians(lng2 - lng1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(lat1_r) * math.cos(lat2_r) * math.sin(dlng / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def build_distance_matrix(points):
+    """Return an n×n symmetric matrix (list of lists) of haversine km."""
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        lat_i, lng_i = points[i]
+        row = matrix[i]
+        for j in range(i + 1, n):
+            d = haversine_km(lat_i, lng_i, points[j][0], points[j][1])
+            row[j] = d
+            matrix[j][i] = d
+    return matrix
+
+
+def _matrix_cache_key(points):
+    digest = hashlib.sha1(
+        ';'.join(
+            f"{round(lat, MATRIX_COORD_PRECISION)},{round(lng, MATRIX_COORD_PRECISION)}"
+            for lat, lng in points
+        ).encode()
+    ).hexdigest()
+    return f"route_solver:matrix:{digest}"
+
+
+def get_distance_matrix(points):
+    """Cached wrapper around build_distance_matrix()."""
+    key = _matrix_cache_key(points)
+    try:
+        matrix = cache.get(key)
+    except Exception:
+        matrix = None
+    if matrix is not None and len(matrix) == len(points):
+        return matrix
+
+    matrix = build_distance_matrix(points)
+    try:
+        cache.set(key, matrix, MATRIX_CACHE_TTL)
+    except Exception:
+        pass  # cache is an optimisation only
+    return matrix
+
+
+def route_length(path, matrix):
+    """Total length of a path (list of matrix indices)."""
+    return sum(matrix[path[k]][path[k + 1]] for k in range(len(path) - 1))
+
+
+def _nearest_neighbour(matrix, start, nodes):
+    path = [start]
+    remaining = set(nodes)
+    current = start
+    while remaining:
+        row = matrix[current]
+        nxt = min(remaining, key=row.__getitem__)
+        path.append(nxt)
+        remaining.remove(nxt)
+        current = nxt
+    return path
+
+
+def _two_opt(path, matrix, fixed_end, deadline):
+    """
+    In-place 2-opt on `path`.  path[0] is always fixed; path[-1] is fixed
+    when `fixed_end` is True (pickup), otherwise the tail may move freely.
+    """
+    n = len(path)
+    last = n - 1 if fixed_end else n
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, last - 1):
+            j = i + 1
+            while j < last:
+                a, b, c = path[i - 1], path[i], path[j]
+                if j + 1 < n:
+                    d = path[j + 1]
+                    delta = matrix[a][c] + matrix[b][d] - matrix[a][b] - matrix[c][d]
+                else:
+                    # Open tail: reversing the suffix just drops edge c→d.
+                    delta = matrix[a][c] - matrix[a][b]
+                if delta < -1e-9:
+                    path[i:j + 1] = path[j:i - 1:-1]
+                    improved = True
+                j += 1
+    return path
+
+
+def _or_opt(path, matrix, fixed_end, deadline, max_segment=3):
+    """
+    In-place Or-opt: relocate segments of 1..max_segment consecutive stops
+    to a cheaper position (optionally reversed).  Endpoints stay fixed as
+    in _two_opt().  Returns True if any move was applied.
+    """
+    improved_any = False
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        n = len(path)
+        last = n - 1 if fixed_end else n
+        for seg_len in range(1, max_segment + 1):
+            i = 1
+            while i <= last - seg_len:
+                j = i + seg_len - 1
+                prev, first, tail = path[i - 1], path[i], path[j]
+                nxt = path[j + 1] if j + 1 < n else None
+
+                removal_gain = matrix[prev][first]
+                if nxt is not None:
+                    removal_gain += matrix[tail][nxt] - matrix[prev][nxt]
+
+                best_delta, best_pos, best_rev = -1e-9, None, False
+                # Candidate edges (u, v) outside the segment; k indexes u.
+                for k in range(0, last if fixed_end else n):
+                    if i - 1 <= k <= j:
+                        continue
+                    u = path[k]
+                    v = path[k + 1] if k + 1 < n else None
+                    if v is None:
+                        fwd = matrix[u][first]
+                        rev = matrix[u][tail]
+                    else:
+                        base = matrix[u][v]
+                        fwd = matrix[u][first] + matrix[tail][v] - base
+                        rev = matrix[u][tail] + matrix[first][v] - base
+                    if fwd - removal_gain < best_delta:
+                        best_delta, best_pos, best_rev = fwd - removal_gain, k, False
+                    if seg_len > 1 and rev - removal_gain < best_delta:
+                        best_delta, best_pos, best_rev = rev - removal_gain, k, True
+
+                if best_pos is not None:
+                    segment = path[i:j + 1]
+                    if best_rev:
+                        segment.reverse()
+                    if best_pos < i:
+                        path[best_pos + 1:j + 1] = segment + path[best_pos + 1:i]
+                    else:
+                        path[i:best_pos + 1] = path[j + 1:best_pos + 1] + segment
+                    improved = improved_any = True
+                i += 1
+    return improved_any
+
+
+def solve_stop_order(home_points, school_point, trip_type, matrix=None,
+                     time_budget=DEFAULT_TIME_BUDGET_S):
+    """
+    Order home stops for a trip.
+
+    Args:
+        home_points:  list of (lat, lng) tuples, one per stop.
+        school_point: (lat, lng) of the school.
+        trip_type:    'pickup' (school last) or 'dropoff' (school first).
+        matrix:       optional precomputed matrix over [school] + home_points.
+        time_budget:  hard ceiling in seconds for the improvement phase.
+
+    Returns:
+        list of indices into `home_points` in visiting order.
+    """
+    n_homes = len(home_points)
+    if n_homes < 2:
+        return list(range(n_homes))
+
+    if matrix is None:
+        matrix = get_distance_matrix([school_point] + list(home_points))
+
+    deadline = time.perf_counter() + time_budget
+    school = 0
+    homes = range(1, n_homes + 1)
+
+    # Both trip types leave from the school node (bus depot proxy, same as
+    # the Mapbox `source=first` request); pickup additionally returns to it.
+    path = _nearest_neighbour(matrix, school, homes)
+    fixed_end = trip_type == 'pickup'
+    if fixed_end:
+        path.append(school)
+
+    while time.perf_counter() < deadline:
+        _two_opt(path, matrix, fixed_end, deadline)
+        if not _or_opt(path, matrix, fixed_end, deadline):
+            break
+
+    if fixed_end:
+        path = path[:-1]
+    return [idx - 1 for idx in path[1:]]
@@ -0,0 +1,209 @@
+"""
+Ahead-of-time trip generation from BusRoute.schedule.
+
+Instead of building every trip when the driver taps "start" at 07:00, the
+generate_scheduled_trips command creates the next day's trips for the
+whole fleet the evening before — children attached, stops cloned from the
+route stop templates and already ordered.  Starting one of these trips
+only flips its status (see find_scheduled_trip()).
+
+BusRoute.schedule format:
+
+    {
+        "pickup":  "06:30",
+        "dropoff": "15:45",
+        "days":    ["mon", "tue", "wed", "thu", "fri"]   # optional, default Mon–Fri
+    }
+
+Either time may be omitted; {"pickup": {"time": "06:30"}} is also accepted.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from assignments.models import Assignment, BusRoute
+from buses.models import Bus
+
+from .models import Trip
+from .route_matrix import get_route_matrix
+from .route_solver import solve_stop_order
+from .stop_templates import StopTemplateService
+
+TRIP_TYPES = ('pickup', 'dropoff')
+DEFAULT_DAYS = ('mon', 'tue', 'wed', 'thu', 'fri')
+DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+def _parse_time(value):
+    if isinstance(value, dict):
+        value = value.get('time')
+    if not value:
+        return None
+    try:
+        return time.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _runs_on(schedule, day):
+    days = schedule.get('days') or DEFAULT_DAYS
+    wanted = set()
+    for d in days:
+        if isinstance(d, int) and 0 <= d < 7:
+            wanted.add(DAY_NAMES[d])
+        elif isinstance(d, str):
+            wanted.add(d.strip().lower()[:3])
+    return DAY_NAMES[day.weekday()] in wanted
+
+
+def find_scheduled_trip(bus, trip_type):
+    """Today's pre-generated trip for this bus, if the scheduler made one."""
+    today = timezone.localdate()
+    return (
+        Trip.objects.filter(
+            bus=bus,
+            trip_type=trip_type,
+            status='scheduled',
+            scheduled_time__date=today,
+        )
+        .order_by('scheduled_time')
+        .first()
+    )
+
+
+class TripScheduleService:
+    """Bulk, idempotent generation of scheduled trips for a day."""
+
+    @staticmethod
+    def generate_for_date(day, route_ids=None, allow_external=False):
+        """
+        Create `scheduled` trips for every active route that runs on `day`.
+
+        Trips that already exist for the same bus, trip type and day (in any
+        status) are left alone, so re-running is safe.
+
+        Returns a summary dict: created, skipped_existing, skipped_unstaffed,
+        stops.
+        """
+        routes = BusRoute.objects.filter(is_active=True)
+        if route_ids:
+            routes = routes.filter(id__in=route_ids)
+        routes = list(routes)
+
+        bus_ct = ContentType.objects.get_for_model(Bus)
+        route_ct = ContentType.objects.get_for_model(BusRoute)
+        active = Q(status='active', effective_date__lte=day) & (
+            Q(expiry_date__isnull=True) | Q(expiry_date__gte=day)
+        )
+
+        # Bus per route: default_bus wins, else an active bus_to_route assignment.
+        route_bus = {r.id: r.default_bus_id for r in routes if r.default_bus_id}
+        unresolved = [r.id for r in routes if r.id not in route_bus]
+        if unresolved:
+            for route_id, bus_id in Assignment.objects.filter(
+                active,
+                assignment_type='bus_to_route',
+                assignee_content_type=bus_ct,
+                assigned_to_content_type=route_ct,
+                assigned_to_object_id__in=unresolved,
+            ).values_list('assigned_to_object_id', 'assignee_object_id'):
+                route_bus.setdefault(route_id, bus_id)
+
+        # Driver / minder per bus from assignments (Driver and BusMinder use
+        # the user as primary key, so assignee_object_id is the user id).
+        bus_staff = defaultdict(dict)
+        for assignment_type, bus_id, user_id in Assignment.objects.filter(
+            active,
+            assignment_type__in=['driver_to_bus', 'minder_to_bus'],
+            assigned_to_content_type=bus_ct,
+            assigned_to_object_id__in=set(route_bus.values()),
+        ).values_list('assignment_type', 'assigned_to_object_id', 'assignee_object_id'):
+            bus_staff[bus_id].setdefault(assignment_type, user_id)
+
+        tz = timezone.get_current_timezone()
+        day_start = timezone.make_aware(datetime.combine(day, time.min), tz)
+        existing = set(
+            Trip.objects.filter(
+                bus_id__in=set(route_bus.values()),
+                scheduled_time__gte=day_start,
+                scheduled_time__lt=day_start + timedelta(days=1),
+            ).values_list('bus_id', 'trip_type')
+        )
+
+        summary = {'created': 0, 'skipped_existing': 0, 'skipped_unstaffed': 0, 'stops': 0}
+        new_trips = []
+        planned = set()
+        for route in routes:
+            schedule = route.schedule or {}
+            bus_id = route_bus.get(route.id)
+            if not bus_id or not isinstance(schedule, dict) or not _runs_on(schedule, day):
+                continue
+            for trip_type in TRIP_TYPES:
+                departs = _parse_time(schedule.get(trip_type))
+                if departs is None:
+                    continue
+                if (bus_id, trip_type) in existing or (bus_id, trip_type) in planned:
+                    summary['skipped_existing'] += 1
+                    continue
+                driver_id = route.default_driver_id or bus_staff[bus_id].get('driver_to_bus')
+                if not driver_id:
+                    summary['skipped_unstaffed'] += 1
+                    continue
+                planned.add((bus_id, trip_type))
+                new_trips.append(Trip(
+                    bus_id=bus_id,
+                    driver_id=driver_id,
+                    bus_minder_id=route.default_minder_id or bus_staff[bus_id].get('minder_to_bus'),
+                    trip_type=trip_type,
+                    status='scheduled',
+                    scheduled_time=timezone.make_aware(datetime.combine(day, departs), tz),
+                    route=route.name,
+                ))
+
+        if not new_trips:
+            return summary
+
+        with transaction.atomic():
+            new_trips = Trip.objects.bulk_create(new_trips)
+            created = StopTemplateService.populate_trips(
+                new_trips,
+                on_date=day,
+                order_stops=TripScheduleService.stop_orderer(allow_external),
+            )
+
+        summary['created'] = len(new_trips)
+        summary['stops'] = sum(created.values())
+        return summary
+
+    @staticmethod
+    def stop_orderer(allow_external=False):
+        """
+        Build an `order_stops` callback for populate_trips() that solves each
+        trip's visiting order before its stops are inserted.
+
+        Both trips of a bus share one route matrix lookup.
+        """
+        school_lat = getattr(settings, 'SCHOOL_LATITUDE', None)
+        school_lng = getattr(settings, 'SCHOOL_LONGITUDE', None)
+        if not school_lat or not school_lng:
+            return None
+        school_point = (float(school_lat), float(school_lng))
+        matrices = {}
+
+        def order_stops(trip, templates):
+            home_points = [(float(t.latitude), float(t.longitude)) for t in templates]
+            key = tuple(home_points)
+            if key not in matrices:
+                matrices[key] = get_route_matrix(
+                    [school_point] + home_points, allow_external=allow_external
+                ).symmetric_durations()
+            order = solve_stop_order(home_points, school_point, trip.trip_type, matrix=matrices[key])
+            return [templates[i] for i in order]
+
+        return order_stops
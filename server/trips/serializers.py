@@ -1,26 +1,33 @@
 from rest_framework import serializers
 from .models import Trip, Stop
+from children.models import Child
 from children.serializers import ChildSerializer
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 
 User = get_user_model()
 
 
 class StopSerializer(serializers.ModelSerializer):
     """Serializer for Stop model - uses camelCase for frontend"""
-    # use 'children.all' so the serializer receives a QuerySet (iterable), not the manager
+    # source is the manager, not 'children.all': DRF calls .all() itself, and
+    # calling it on an already-evaluated QuerySet would bypass the prefetch.
     childrenIds = serializers.PrimaryKeyRelatedField(
-        source='children.all',
+        source='children',
         many=True,
         read_only=True
     )
     location = serializers.SerializerMethodField()
     scheduledTime = serializers.DateTimeField(source='scheduled_time')
     actualTime = serializers.DateTimeField(source='actual_time', allow_null=True, required=False)
+    childrenTotal = serializers.IntegerField(source='children_total', read_only=True)
+    childrenCompleted = serializers.IntegerField(source='children_completed', read_only=True)
+    childrenAbsent = serializers.IntegerField(source='children_absent', read_only=True)
 
     class Meta:
         model = Stop
-        fields = ['id', 'address', 'location', 'childrenIds', 'scheduledTime', 'actualTime', 'status', 'order']
+        fields = ['id', 'address', 'location', 'childrenIds', 'scheduledTime', 'actualTime', 'status', 'order',
+                  'childrenTotal', 'childrenCompleted', 'childrenAbsent']
 
     def get_location(self, obj):
         return {
@@ -77,9 +84,9 @@ class TripSerializer(serializers.ModelSerializer):
     endTime = serializers.DateTimeField(source='end_time', allow_null=True, required=False)
     currentLocation = serializers.SerializerMethodField()
     stops = serializers.SerializerMethodField()
-    # expose children IDs as list of PKs; use `.all` to get a QuerySet
+    # expose children IDs as list of PKs (manager source — see StopSerializer)
     childrenIds = serializers.PrimaryKeyRelatedField(
-        source='children.all',
+        source='children',
         many=True,
         read_only=True
     )
@@ -87,6 +94,8 @@ class TripSerializer(serializers.ModelSerializer):
     studentsCompleted = serializers.IntegerField(source='students_completed', allow_null=True, required=False)
     studentsAbsent = serializers.IntegerField(source='students_absent', allow_null=True, required=False)
     studentsPending = serializers.IntegerField(source='students_pending', allow_null=True, required=False)
+    stopsTotal = serializers.IntegerField(source='stops_total', read_only=True, allow_null=True)
+    stopsCompleted = serializers.IntegerField(source='stops_completed', read_only=True, allow_null=True)
     createdAt = serializers.DateTimeField(source='created_at', read_only=True)
     children = serializers.SerializerMethodField()
 
@@ -97,17 +106,37 @@ class TripSerializer(serializers.ModelSerializer):
             'route', 'type', 'status',
             'scheduledTime', 'startTime', 'endTime', 'currentLocation',
             'stops', 'childrenIds', 'children', 'totalStudents', 'studentsCompleted',
-            'studentsAbsent', 'studentsPending', 'createdAt'
+            'studentsAbsent', 'studentsPending', 'stopsTotal', 'stopsCompleted', 'createdAt'
         ]
 
+    @staticmethod
+    def optimize_queryset(queryset):
+        """
+        Eager-load everything this serializer reads so a list of trips costs
+        a fixed number of queries regardless of page size.
+        """
+        return queryset.select_related('bus', 'driver', 'bus_minder').prefetch_related(
+            Prefetch(
+                'stops',
+                queryset=Stop.objects.order_by('order').prefetch_related(
+                    Prefetch('children', queryset=Child.objects.only('id'))
+                ),
+            ),
+            Prefetch('children', queryset=Child.objects.select_related('parent')),
+        )
+
     def get_stops(self, obj):
         """Return stops ordered by the `order` field so clients always get them in sequence."""
-        ordered = obj.stops.order_by('order')
-        return StopSerializer(ordered, many=True).data
+        # Stop.Meta.ordering sorts by order within a trip, and the prefetch in
+        # optimize_queryset() is ordered the same way, so .all() is safe here.
+        return StopSerializer(obj.stops.all(), many=True).data
 
     def get_children(self, obj):
         result = []
-        for child in obj.children.select_related('parent').all():
+        children = obj.children.all()
+        if 'children' not in getattr(obj, '_prefetched_objects_cache', {}):
+            children = children.select_related('parent')
+        for child in children:
             parent = getattr(child, 'parent', None)
             lat = float(parent.home_latitude) if parent and parent.home_latitude else None
             lng = float(parent.home_longitude) if parent and parent.home_longitude else None
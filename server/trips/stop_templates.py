@@ -0,0 +1,229 @@
+"""
+Route stop templates: the per-child stop data a trip start needs, kept
+ready ahead of time.
+
+Starting a trip used to resolve every child_to_bus assignment's
+GenericForeignKey, add the child to the trip, create a Stop and attach the
+child to it — several queries per child inside the driver's request.  Now
+StopTemplateService.populate_trip() / populate_trips() run a fixed number
+of queries whatever the number of children or trips.
+
+Templates are maintained by the receivers at the bottom of this module
+(connected from TripsConfig.ready()).
+"""
+
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from assignments.models import Assignment
+from buses.models import Bus
+from children.models import Child
+from parents.models import Parent
+
+from .models import RouteStopTemplate, Stop, Trip
+from .progress import TripProgressService
+
+
+def _stop_fields(child):
+    """Address and coordinates for a child's stop, taken from their parent."""
+    parent = getattr(child, 'parent', None)
+    address = (
+        parent.address if parent and parent.address
+        else getattr(child, 'address', None) or 'No address'
+    )
+    return {
+        'address': address[:255],
+        'latitude': getattr(parent, 'home_latitude', None),
+        'longitude': getattr(parent, 'home_longitude', None),
+    }
+
+
+class StopTemplateService:
+    """Build, maintain and clone route stop templates."""
+
+    @staticmethod
+    def sync_child(bus_id, child):
+        """Create or refresh the template for a child newly assigned to a bus."""
+        RouteStopTemplate.objects.filter(child=child).exclude(bus_id=bus_id).delete()
+        RouteStopTemplate.objects.update_or_create(
+            bus_id=bus_id, child=child, defaults=_stop_fields(child),
+        )
+
+    @staticmethod
+    def remove_child(bus_id, child_id):
+        RouteStopTemplate.objects.filter(bus_id=bus_id, child_id=child_id).delete()
+
+    @staticmethod
+    def refresh_parent(parent):
+        """Re-point every template for this parent's children at their home."""
+        updates = {
+            'latitude': parent.home_latitude,
+            'longitude': parent.home_longitude,
+        }
+        if parent.address:
+            updates['address'] = parent.address[:255]
+        RouteStopTemplate.objects.filter(child__parent=parent).update(**updates)
+
+    @staticmethod
+    def build_templates(pairs):
+        """Bulk-create templates for (bus_id, child_id) pairs that lack one."""
+        children = Child.objects.in_bulk(
+            {child_id for _, child_id in pairs}
+        )
+        parents = Parent.objects.in_bulk(
+            {child.parent_id for child in children.values() if child.parent_id}
+        )
+        templates = []
+        for bus_id, child_id in pairs:
+            child = children.get(child_id)
+            if child is None:
+                continue
+            child.parent = parents.get(child.parent_id)
+            templates.append(RouteStopTemplate(bus_id=bus_id, child=child, **_stop_fields(child)))
+        return RouteStopTemplate.objects.bulk_create(templates, ignore_conflicts=True)
+
+    @staticmethod
+    def populate_trip(trip, bus):
+        """
+        Attach the bus's assigned children to `trip` and create one Stop per
+        child with a geocoded home, in a constant number of queries.
+
+        Returns the number of stops created.
+        """
+        trip.bus = bus
+        return StopTemplateService.populate_trips([trip])[trip.id]
+
+    @staticmethod
+    def populate_trips(trips, on_date=None, order_stops=None):
+        """
+        populate_trip() for many trips at once — still a constant number of
+        queries, however many trips, buses and children are involved.
+
+        The set of children always comes from the active child_to_bus
+        assignments; templates only supply the stop data, so a stale or
+        missing template can never add or drop a child.
+
+        `on_date` picks which assignments count as active (default today),
+        so trips generated ahead of time get that day's riders.
+        `order_stops(trip, templates)`, if given, returns the templates in
+        visiting order so stops are inserted already ordered.
+
+        Returns {trip_id: stops_created}.
+        """
+        bus_ids = {trip.bus_id for trip in trips}
+        today = on_date or timezone.now().date()
+        children_by_bus = defaultdict(dict)  # bus_id -> ordered set of child ids
+        for bus_id, child_id in Assignment.objects.filter(
+            assignment_type='child_to_bus',
+            assigned_to_content_type=ContentType.objects.get_for_model(Bus),
+            assigned_to_object_id__in=bus_ids,
+            status='active',
+            effective_date__lte=today,
+        ).filter(
+            Q(expiry_date__isnull=True) | Q(expiry_date__gte=today)
+        ).values_list('assigned_to_object_id', 'assignee_object_id'):
+            children_by_bus[bus_id][child_id] = None
+
+        wanted = {(bus_id, child_id)
+                  for bus_id, child_ids in children_by_bus.items() for child_id in child_ids}
+        all_child_ids = {child_id for _, child_id in wanted}
+
+        def load_templates():
+            return {
+                (t.bus_id, t.child_id): t
+                for t in RouteStopTemplate.objects.filter(
+                    bus_id__in=bus_ids, child_id__in=all_child_ids
+                )
+            }
+
+        templates = load_templates() if wanted else {}
+        missing = wanted - templates.keys()
+        if missing:
+            # First trip since deploy, or a template was lost — build inline.
+            StopTemplateService.build_templates(missing)
+            templates = load_templates()
+
+        trip_children = []
+        stops = []
+        stop_children = []
+        for trip in trips:
+            with_home = []
+            for child_id in children_by_bus.get(trip.bus_id, {}):
+                trip_children.append(Trip.children.through(trip_id=trip.id, child_id=child_id))
+                template = templates.get((trip.bus_id, child_id))
+                if template is not None and template.latitude is not None and template.longitude is not None:
+                    with_home.append(template)
+            if order_stops and len(with_home) > 1:
+                with_home = order_stops(trip, with_home)
+            # Without order_stops this order is provisional; the background
+            # optimiser rewrites it.
+            for order, template in enumerate(with_home):
+                stops.append(Stop(
+                    trip=trip,
+                    address=template.address,
+                    latitude=template.latitude,
+                    longitude=template.longitude,
+                    scheduled_time=trip.scheduled_time,
+                    order=order,
+                    children_total=1,
+                ))
+                stop_children.append(template.child_id)
+
+        Trip.children.through.objects.bulk_create(trip_children, ignore_conflicts=True)
+        stops = Stop.objects.bulk_create(stops)
+        Stop.children.through.objects.bulk_create([
+            Stop.children.through(stop_id=stop.id, child_id=child_id)
+            for stop, child_id in zip(stops, stop_children)
+        ])
+
+        # Trips that are already running need their progress counters now;
+        # scheduled ones are counted when they flip to in-progress.
+        TripProgressService.initialize(trip for trip in trips if trip.status == 'in-progress')
+
+        created = {trip.id: 0 for trip in trips}
+        for stop in stops:
+            created[stop.trip_id] += 1
+        return created
+
+
+# ---------------------------------------------------------------------------
+# Template maintenance
+# ---------------------------------------------------------------------------
+
+def _is_child_to_bus(assignment):
+    return (
+        assignment.assignment_type == 'child_to_bus'
+        and assignment.assignee_content_type_id == ContentType.objects.get_for_model(Child).id
+    )
+
+
+@receiver(post_save, sender=Assignment)
+def sync_stop_template_on_assignment(sender, instance, **kwargs):
+    if not _is_child_to_bus(instance):
+        return
+    if instance.status == 'active':
+        child = Child.objects.select_related('parent').filter(pk=instance.assignee_object_id).first()
+        if child:
+            StopTemplateService.sync_child(instance.assigned_to_object_id, child)
+    else:
+        StopTemplateService.remove_child(instance.assigned_to_object_id, instance.assignee_object_id)
+
+
+@receiver(post_delete, sender=Assignment)
+def remove_stop_template_on_assignment_delete(sender, instance, **kwargs):
+    if _is_child_to_bus(instance):
+        StopTemplateService.remove_child(instance.assigned_to_object_id, instance.assignee_object_id)
+
+
+@receiver(post_save, sender=Parent)
+def refresh_stop_templates_on_home_change(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not {'home_latitude', 'home_longitude', 'address'} & set(update_fields):
+        return
+    StopTemplateService.refresh_parent(instance)
@@ -34,29 +34,114 @@ class SchoolInfoView(APIView):
 
 
 # ---------------------------------------------------------------------------
-# Server-side Mapbox optimisation helper (called from TripStartView)
+# Server-side stop-order optimisation (called from TripStartView)
 # ---------------------------------------------------------------------------
 
+# Mapbox Optimized Trips accepts at most 12 coordinates per request.  Pickup
+# uses two of them for the school (start + locked end), dropoff uses one.
+MAPBOX_OPTIMIZATION_MAX_COORDINATES = 12
+
+
+def _persist_stop_order(ordered_stop_ids) -> None:
+    """Write Stop.order for the given sequence in a single UPDATE."""
+    stops = [Stop(id=stop_id, order=new_order)
+             for new_order, stop_id in enumerate(ordered_stop_ids)]
+    Stop.objects.bulk_update(stops, ['order'])
+
+
+def _mapbox_refine_stop_order(trip, valid, school_lat, school_lng, mapbox_token):
+    """
+    Ask Mapbox Optimized Trips for a traffic-aware order of `valid` stops.
+
+    Returns the ordered stop IDs, or None when the request fails.
+    """
+    school_coord = f"{float(school_lng)},{float(school_lat)}"
+    home_coords  = [f"{float(s.longitude)},{float(s.latitude)}" for s in valid]
+    n_homes = len(home_coords)
+
+    # ── Pickup: [school_start, home_1..N, school_end]  source=first  destination=last
+    # ── Dropoff: [school, home_1..N]                   source=first  destination=any
+    if trip.trip_type == 'pickup':
+        # School is both the conceptual starting point (bus depot proxy)
+        # AND the locked final destination — Mapbox can never reorder it.
+        coords_str = ';'.join([school_coord] + home_coords + [school_coord])
+        params = {
+            'source':      'first',
+            'destination': 'last',    # school is ALWAYS last — guaranteed
+            'roundtrip':   'false',
+        }
+    else:  # dropoff
+        coords_str = ';'.join([school_coord] + home_coords)
+        params = {
+            'source':      'first',
+            'destination': 'any',
+            'roundtrip':   'false',
+        }
+
+    params['geometries']    = 'geojson'
+    params['access_token']  = mapbox_token
+
+    resp = requests.get(
+        f"https://api.mapbox.com/optimized-trips/v1/mapbox/driving-traffic/{coords_str}",
+        params=params,
+        timeout=12,
+    )
+
+    if resp.status_code != 200:
+        print(f"⚠️  Mapbox optimisation failed for trip {trip.id}: "
+              f"HTTP {resp.status_code}")
+        return None
+
+    data = resp.json()
+    waypoints = sorted(
+        data.get('waypoints', []),
+        key=lambda w: w['waypoint_index'],
+    )
+
+    # Extract ordered stop IDs — skip school coordinate(s)
+    ordered_stop_ids = []
+    for wp in waypoints:
+        orig_idx = wp['original_index']
+        if trip.trip_type == 'pickup':
+            # orig_idx 0 = school start  |  1..N = homes  |  N+1 = school end
+            if orig_idx == 0 or orig_idx == n_homes + 1:
+                continue
+            ordered_stop_ids.append(valid[orig_idx - 1].id)
+        else:
+            # orig_idx 0 = school  |  1..N = homes
+            if orig_idx == 0:
+                continue
+            ordered_stop_ids.append(valid[orig_idx - 1].id)
+
+    return ordered_stop_ids
+
+
 def _optimize_trip_stops_background(trip_id: int) -> None:
     """
     Runs in a daemon thread after a trip starts.
 
-    1. Calls Mapbox Optimized Trips API (driving-traffic profile).
-    2. Extracts the optimised home-stop order.
-    3. Updates each Stop.order field in the DB atomically.
+    1. Solves the stop order in-process (route_solver) over the persistent
+       route matrix (route_matrix) and persists it immediately.  Once the
+       homes on a route have been seen before this makes no network calls.
+    2. If the matrix had to fall back to straight-line estimates, a token
+       is set and the route fits in one Optimized Trips request, refines
+       the order with Mapbox and persists that instead.
 
     This is the single source of truth for stop ordering.
     All clients subsequently read `order_by('order')` from the DB
     and never need to re-derive the sequence themselves.
     """
+    from .route_matrix import get_route_matrix
+    from .route_solver import solve_stop_order
+
     try:
         school_lat = getattr(settings, 'SCHOOL_LATITUDE', None)
         school_lng = getattr(settings, 'SCHOOL_LONGITUDE', None)
         mapbox_token = getattr(settings, 'MAPBOX_ACCESS_TOKEN', '')
 
-        if not school_lat or not school_lng or not mapbox_token:
+        if not school_lat or not school_lng:
             print(f"⚠️  Trip {trip_id}: skipping optimisation — "
-                  "SCHOOL_LATITUDE / SCHOOL_LONGITUDE / MAPBOX_ACCESS_TOKEN not set")
+                  "SCHOOL_LATITUDE / SCHOOL_LONGITUDE not set")
             return
 
         trip = Trip.objects.prefetch_related('stops').get(id=trip_id)
@@ -66,70 +151,33 @@ def _optimize_trip_stops_background(trip_id: int) -> None:
         if len(valid) < 2:
             return  # nothing to optimise
 
-        school_coord = f"{float(school_lng)},{float(school_lat)}"
-        home_coords  = [f"{float(s.longitude)},{float(s.latitude)}" for s in valid]
-        n_homes = len(home_coords)
-
-        # ── Pickup: [school_start, home_1..N, school_end]  source=first  destination=last
-        # ── Dropoff: [school, home_1..N]                   source=first  destination=any
-        if trip.trip_type == 'pickup':
-            # School is both the conceptual starting point (bus depot proxy)
-            # AND the locked final destination — Mapbox can never reorder it.
-            coords_str = ';'.join([school_coord] + home_coords + [school_coord])
-            params = {
-                'source':      'first',
-                'destination': 'last',    # school is ALWAYS last — guaranteed
-                'roundtrip':   'false',
-            }
-        else:  # dropoff
-            coords_str = ';'.join([school_coord] + home_coords)
-            params = {
-                'source':      'first',
-                'destination': 'any',
-                'roundtrip':   'false',
-            }
-
-        params['geometries']    = 'geojson'
-        params['access_token']  = mapbox_token
-
-        resp = requests.get(
-            f"https://api.mapbox.com/optimized-trips/v1/mapbox/driving-traffic/{coords_str}",
-            params=params,
-            timeout=12,
+        school_point = (float(school_lat), float(school_lng))
+        home_points = [(float(s.latitude), float(s.longitude)) for s in valid]
+        route_matrix = get_route_matrix([school_point] + home_points)
+        order = solve_stop_order(
+            home_points,
+            school_point,
+            trip.trip_type,
+            matrix=route_matrix.symmetric_durations(),
         )
+        _persist_stop_order([valid[i].id for i in order])
+        print(f"✅ Trip {trip_id}: ordered {len(order)} stops locally "
+              f"({trip.trip_type})")
+
+        if route_matrix.complete:
+            return  # already ordered on road durations
 
-        if resp.status_code != 200:
-            print(f"⚠️  Mapbox optimisation failed for trip {trip_id}: "
-                  f"HTTP {resp.status_code}")
+        school_coords = 2 if trip.trip_type == 'pickup' else 1
+        if not mapbox_token or len(valid) + school_coords > MAPBOX_OPTIMIZATION_MAX_COORDINATES:
             return
 
-        data = resp.json()
-        waypoints = sorted(
-            data.get('waypoints', []),
-            key=lambda w: w['waypoint_index'],
+        ordered_stop_ids = _mapbox_refine_stop_order(
+            trip, valid, school_lat, school_lng, mapbox_token
         )
-
-        # Extract ordered stop IDs — skip school coordinate(s)
-        ordered_stop_ids = []
-        for wp in waypoints:
-            orig_idx = wp['original_index']
-            if trip.trip_type == 'pickup':
-                # orig_idx 0 = school start  |  1..N = homes  |  N+1 = school end
-                if orig_idx == 0 or orig_idx == n_homes + 1:
-                    continue
-                ordered_stop_ids.append(valid[orig_idx - 1].id)
-            else:
-                # orig_idx 0 = school  |  1..N = homes
-                if orig_idx == 0:
-                    continue
-                ordered_stop_ids.append(valid[orig_idx - 1].id)
-
-        # Persist the optimised order — single atomic write per stop
-        for new_order, stop_id in enumerate(ordered_stop_ids):
-            Stop.objects.filter(id=stop_id).update(order=new_order)
-
-        print(f"✅ Trip {trip_id}: optimised {len(ordered_stop_ids)} stops "
-              f"({trip.trip_type})")
+        if ordered_stop_ids and len(ordered_stop_ids) == len(valid):
+            _persist_stop_order(ordered_stop_ids)
+            print(f"✅ Trip {trip_id}: refined {len(ordered_stop_ids)} stops "
+                  f"with Mapbox ({trip.trip_type})")
 
     except Exception as exc:
         print(f"⚠️  _optimize_trip_stops_background trip={trip_id}: {exc}")
@@ -141,7 +189,7 @@ class TripListCreateView(generics.ListCreateAPIView):
     POST /api/trips/ - Create new trip
     """
     permission_classes = [IsAuthenticated]
-    queryset = Trip.objects.select_related('bus', 'driver', 'bus_minder').prefetch_related('children', 'stops').order_by('-id')
+    queryset = TripSerializer.optimize_queryset(Trip.objects.order_by('-id'))
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -182,7 +230,7 @@ class TripDetailView(generics.RetrieveUpdateDestroyAPIView):
     DELETE /api/trips/{id}/ - Delete trip
     """
     permission_classes = [IsAuthenticated]
-    queryset = Trip.objects.select_related('bus', 'driver', 'bus_minder').prefetch_related('children', 'stops').order_by('-id')
+    queryset = TripSerializer.optimize_queryset(Trip.objects.order_by('-id'))
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
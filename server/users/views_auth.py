@@ -8,7 +8,7 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from drivers.models import Driver
 from busminders.models import BusMinder
-from assignments.models import Assignment
+from assignments.identity_map import active_assignments_for, assignments_to, first_active_for
 from datetime import date
 
 logger = logging.getLogger(__name__)
@@ -58,13 +58,13 @@ def unified_phone_login(request):
         bus_data = None
         route_data = None
 
-        assignment = Assignment.get_active_assignments_for(driver, 'driver_to_bus').first()
+        assignment = first_active_for(driver, 'driver_to_bus')
 
         if assignment:
             bus = assignment.assigned_to
 
             # Get children assigned to this bus
-            child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+            child_assignments = assignments_to(bus, 'child_to_bus')
             today = date.today()
 
             children_data = []
@@ -88,7 +88,7 @@ def unified_phone_login(request):
             }
 
             # Get route if assigned
-            route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+            route_assignment = first_active_for(bus, 'bus_to_route')
             if route_assignment:
                 route = route_assignment.assigned_to
                 route_data = {
@@ -126,7 +126,7 @@ def unified_phone_login(request):
         refresh = RefreshToken.for_user(user)
 
         # Get assigned buses and routes
-        assignments = Assignment.get_active_assignments_for(busminder, 'minder_to_bus')
+        assignments = active_assignments_for(busminder, 'minder_to_bus')
 
         buses_data = []
         routes_data = []
@@ -135,7 +135,7 @@ def unified_phone_login(request):
             bus = assignment.assigned_to
 
             # Get children for this bus
-            child_assignments = Assignment.get_assignments_to(bus, 'child_to_bus')
+            child_assignments = assignments_to(bus, 'child_to_bus')
             children_data = []
 
             for child_assignment in child_assignments:
@@ -159,7 +159,7 @@ def unified_phone_login(request):
             buses_data.append(bus_data)
 
             # Get route for this bus
-            route_assignment = Assignment.get_active_assignments_for(bus, 'bus_to_route').first()
+            route_assignment = first_active_for(bus, 'bus_to_route')
             if route_assignment:
                 route = route_assignment.assigned_to
                 route_data = {